@@ -6,7 +6,7 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from .models import (
     User, UserProfile, UserSession, AuditLog,
-    AdminRole, AdminAssignment
+    AdminRole, AdminAssignment, Notification
 )
 
 
@@ -177,6 +177,24 @@ class AuditLogAdmin(admin.ModelAdmin):
         return request.user.is_superuser
 
 
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    """
+    Admin for notification delivery state.
+    """
+    list_display = [
+        'user', 'channel', 'category', 'priority', 'status', 'title',
+        'created_at', 'sent_at'
+    ]
+    list_filter = ['channel', 'status', 'category', 'priority', 'created_at']
+    search_fields = ['user__email', 'title']
+    raw_id_fields = ['user']
+    readonly_fields = ['created_at', 'sent_at', 'read_at']
+
+    def has_add_permission(self, request):
+        return False
+
+
 @admin.register(AdminRole)
 class AdminRoleAdmin(admin.ModelAdmin):
     """
@@ -9,3 +9,6 @@ class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.accounts'
     verbose_name = 'apps.accounts'
+
+    def ready(self):
+        import apps.accounts.signals  # noqa: F401
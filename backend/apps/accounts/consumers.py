@@ -1,17 +1,156 @@
 """
-WebSocket consumers for real-time notifications.
+Consumers for real-time notifications.
+
+``NotificationConsumer`` serves WebSockets. ``NotificationStreamConsumer``
+serves the same events as Server-Sent Events for clients that cannot
+hold a WebSocket; both join the same gateway groups and resume from the
+same stream ids.
 """
 
+import asyncio
 import json
+from collections import deque
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.exceptions import StopConsumer
+from channels.generic.http import AsyncHttpConsumer
 from channels.generic.websocket import AsyncWebsocketConsumer
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+from . import gateway
 
 User = get_user_model()
 
+# Recently sent event ids, so replayed and live copies are sent once
+SEEN_EVENT_IDS = 1000
+SSE_HEARTBEAT_SECONDS = 15
+SSE_RETRY_MILLISECONDS = 3000
+
+
+class GatewayConsumerMixin:
+    """
+    Gateway membership shared by the WebSocket and SSE consumers.
 
-class NotificationConsumer(AsyncWebsocketConsumer):
+    Joins the user's gateway groups and sends everything through a
+    bounded outbound queue drained by a writer task; subclasses provide
+    ``send_message``.
+    """
+
+    async def join_gateway(self):
+        self.gateway_groups = await database_sync_to_async(gateway.groups_for)(self.user)
+        for group in self.gateway_groups:
+            await self.channel_layer.group_add(group, self.channel_name)
+        self.outbound = gateway.OutboundQueue()
+        self.reported_drops = 0
+        self.last_event_id = None
+        self.seen_ids = deque(maxlen=SEEN_EVENT_IDS)
+        await gateway.touch_presence(self.user.pk, self.channel_name)
+
+    async def leave_gateway(self):
+        if not hasattr(self, 'gateway_groups'):
+            return
+        if hasattr(self, 'writer'):
+            self.writer.cancel()
+        for group in self.gateway_groups:
+            await self.channel_layer.group_discard(group, self.channel_name)
+        await gateway.drop_presence(self.user.pk, self.channel_name)
+
+    def start_writer(self):
+        self.writer = asyncio.ensure_future(self.write_loop())
+
+    async def resume(self, last_event_id):
+        """
+        Queue the broadcasts the client missed after ``last_event_id``.
+        """
+        try:
+            events = await gateway.events_since(self.gateway_groups, last_event_id)
+        except (TypeError, ValueError):
+            self.outbound.put({'type': 'error', 'error': 'Invalid last_event_id'})
+            return
+        for event_id, message in events:
+            self.enqueue_event(event_id, message)
+        self.outbound.put({'type': 'resumed', 'count': len(events)})
+
+    async def write_loop(self):
+        """
+        Send queued messages; after drops, tell the client where to resume.
+        """
+        while True:
+            message = await self.outbound.get()
+            await self.send_message(message)
+            if message.get('id'):
+                self.last_event_id = message['id']
+            if not len(self.outbound) and self.outbound.dropped > self.reported_drops:
+                await self.send_message({
+                    'type': 'gap',
+                    'dropped': self.outbound.dropped - self.reported_drops,
+                    'last_event_id': self.last_event_id,
+                })
+                self.reported_drops = self.outbound.dropped
+
+    def enqueue_event(self, event_id, message):
+        if event_id in self.seen_ids:
+            return
+        self.seen_ids.append(event_id)
+        self.outbound.put(
+            {
+                'type': message['event'],
+                'id': event_id,
+                'data': message['payload'],
+            },
+            merge_key=message.get('merge_key'),
+        )
+
+    async def gateway_event(self, event):
+        """
+        Queue a gateway broadcast for the client.
+        """
+        self.enqueue_event(event['id'], event)
+
+    async def notification_message(self, event):
+        """
+        Send notification message to the client.
+        """
+        self.outbound.put({
+            'type': 'notification',
+            'message': event['message'],
+            'notification_type': event.get('notification_type', 'info'),
+            'data': event.get('data', {})
+        })
+
+    async def chat_message(self, event):
+        """
+        Send chat message to the client.
+        """
+        self.outbound.put({
+            'type': 'chat',
+            'message': event['message'],
+            'sender': event['sender'],
+            'timestamp': event['timestamp']
+        })
+
+    async def system_message(self, event):
+        """
+        Send system message to the client.
+        """
+        self.outbound.put({
+            'type': 'system',
+            'message': event['message'],
+            'system_type': event.get('system_type', 'info')
+        })
+
+
+class NotificationConsumer(GatewayConsumerMixin, AsyncWebsocketConsumer):
     """
     WebSocket consumer for real-time notifications.
+
+    Clients ping to keep their presence alive, and resume missed
+    broadcasts either with ``?last_event_id=`` on connect or a ``resume``
+    message.
     """
 
     async def connect(self):
@@ -20,24 +159,24 @@ class NotificationConsumer(AsyncWebsocketConsumer):
         """
         self.user = self.scope["user"]
 
-        if self.user.is_authenticated:
-            await self.channel_layer.group_add(
-                f"user_{self.user.id}",
-                self.channel_name
-            )
-            await self.accept()
-        else:
+        if not self.user.is_authenticated:
             await self.close()
+            return
+
+        await self.join_gateway()
+        await self.accept()
+        self.start_writer()
+
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        last_event_id = query.get('last_event_id', [None])[0]
+        if last_event_id:
+            await self.resume(last_event_id)
 
     async def disconnect(self, close_code):
         """
         Handle WebSocket disconnection.
         """
-        if hasattr(self, 'user') and self.user.is_authenticated:
-            await self.channel_layer.group_discard(
-                f"user_{self.user.id}",
-                self.channel_name
-            )
+        await self.leave_gateway()
 
     async def receive(self, text_data):
         """
@@ -48,44 +187,115 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             message_type = text_data_json.get('type', 'message')
 
             if message_type == 'ping':
+                await gateway.touch_presence(self.user.pk, self.channel_name)
                 await self.send(text_data=json.dumps({
                     'type': 'pong',
                     'message': 'pong'
                 }))
+            elif message_type == 'resume':
+                await self.resume(text_data_json.get('last_event_id'))
 
         except json.JSONDecodeError:
             await self.send(text_data=json.dumps({
                 'error': 'Invalid JSON format'
             }))
 
-    async def notification_message(self, event):
-        """
-        Send notification message to WebSocket.
-        """
-        await self.send(text_data=json.dumps({
-            'type': 'notification',
-            'message': event['message'],
-            'notification_type': event.get('notification_type', 'info'),
-            'data': event.get('data', {})
-        }))
+    async def send_message(self, message):
+        await self.send(text_data=json.dumps(message))
 
-    async def chat_message(self, event):
-        """
-        Send chat message to WebSocket.
-        """
-        await self.send(text_data=json.dumps({
-            'type': 'chat',
-            'message': event['message'],
-            'sender': event['sender'],
-            'timestamp': event['timestamp']
-        }))
 
-    async def system_message(self, event):
-        """
-        Send system message to WebSocket.
-        """
-        await self.send(text_data=json.dumps({
-            'type': 'system',
-            'message': event['message'],
-            'system_type': event.get('system_type', 'info')
-        }))
+class NotificationStreamConsumer(GatewayConsumerMixin, AsyncHttpConsumer):
+    """
+    Server-Sent Events stream of the events ``NotificationConsumer``
+    sends, for clients that cannot hold a WebSocket.
+
+    Authenticates with the session, an ``Authorization: Bearer`` header
+    or ``?token=`` (``EventSource`` cannot set headers). Each gateway
+    event carries its stream id as the SSE ``id``, so a reconnecting
+    ``EventSource`` resumes through ``Last-Event-ID``; ``?last_event_id=``
+    does the same for the first connection. A comment line every
+    ``SSE_HEARTBEAT_SECONDS`` keeps proxies from closing the stream and
+    refreshes presence.
+    """
+
+    async def http_request(self, message):
+        # Unlike the base class, keep the consumer running after
+        # ``handle`` so channel layer events reach the open response.
+        if "body" in message:
+            self.body.append(message["body"])
+        if not message.get("more_body"):
+            await self.handle(b"".join(self.body))
+
+    async def handle(self, body):
+        self.user = await self.authenticate()
+        if not self.user.is_authenticated:
+            await self.send_response(
+                401, json.dumps({'error': 'Authentication required'}).encode(),
+                headers=[(b'Content-Type', b'application/json')],
+            )
+            raise StopConsumer()
+
+        await self.join_gateway()
+        await self.send_headers(headers=[
+            (b'Content-Type', b'text/event-stream'),
+            (b'Cache-Control', b'no-cache'),
+            (b'X-Accel-Buffering', b'no'),
+        ])
+        await self.send_body(f"retry: {SSE_RETRY_MILLISECONDS}\n\n".encode(), more_body=True)
+        self.start_writer()
+        self.heartbeat = asyncio.ensure_future(self.heartbeat_loop())
+
+        last_event_id = self.header('last-event-id') or self.query('last_event_id')
+        if last_event_id:
+            await self.resume(last_event_id)
+
+    async def disconnect(self):
+        if hasattr(self, 'heartbeat'):
+            self.heartbeat.cancel()
+        await self.leave_gateway()
+
+    def header(self, name):
+        for key, value in self.scope.get('headers', []):
+            if key.decode('latin1').lower() == name:
+                return value.decode('latin1')
+        return None
+
+    def query(self, name):
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        return query.get(name, [None])[0]
+
+    async def authenticate(self):
+        user = self.scope.get('user')
+        if user is not None and user.is_authenticated:
+            return user
+        authorization = self.header('authorization') or ''
+        token = (
+            authorization[7:] if authorization.startswith('Bearer ')
+            else self.query('token')
+        )
+        if token:
+            token_user = await database_sync_to_async(self.token_user)(token)
+            if token_user is not None:
+                return token_user
+        return AnonymousUser()
+
+    def token_user(self, raw_token):
+        authentication = JWTAuthentication()
+        try:
+            return authentication.get_user(authentication.get_validated_token(raw_token))
+        except (AuthenticationFailed, InvalidToken):
+            return None
+
+    async def heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(SSE_HEARTBEAT_SECONDS)
+            await gateway.touch_presence(self.user.pk, self.channel_name)
+            await self.send_body(b": ping\n\n", more_body=True)
+
+    async def send_message(self, message):
+        lines = []
+        if message.get('id'):
+            lines.append(f"id: {message['id']}")
+        lines.append(f"event: {message.get('type', 'message')}")
+        lines.append(f"data: {json.dumps(message)}")
+        await self.send_body(("\n".join(lines) + "\n\n").encode(), more_body=True)
@@ -0,0 +1,290 @@
+"""
+Real-time notification gateway.
+
+Every WebSocket connection joins a handful of channel groups: its user,
+its tenant, its role, its classes and ``everyone``. Notifying a whole
+audience is then one ``group_send`` per group instead of one per user.
+
+Broadcast events are also appended to a short Redis stream per group,
+so a client that reconnects (or fell behind) can ask for everything
+after the last event id it saw. Each connection drains the channel
+layer into a bounded ``OutboundQueue``: events carrying a merge key
+replace the queued event with the same key, and when a slow client's
+queue is full the oldest event is dropped and the client is told where
+the gap starts so it can resume from the stream.
+
+Presence is a sorted set of connections scored by heartbeat expiry; a
+connection that stops pinging ages out after ``PRESENCE_TTL_SECONDS``.
+Without ``REDIS_URL`` streams and presence live in-process, which is
+enough for a single development server.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import time
+from collections import OrderedDict, defaultdict, deque
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+from core.redis import get_async_redis, get_redis
+
+logger = logging.getLogger(__name__)
+
+EVERYONE_GROUP = 'everyone'
+PRESENCE_KEY = 'gateway:presence'
+PRESENCE_TTL_SECONDS = 60
+STREAM_MAXLEN = 1000
+STREAM_TTL_SECONDS = 24 * 3600
+OUTBOUND_QUEUE_SIZE = 100
+
+_memory_streams = defaultdict(lambda: deque(maxlen=STREAM_MAXLEN))
+_memory_presence = {}
+_memory_sequence = itertools.count()
+
+
+def user_group(user_id):
+    return f"user_{user_id}"
+
+
+def tenant_group(tenant_id):
+    return f"tenant_{tenant_id}"
+
+
+def role_group(role):
+    return f"role_{role}"
+
+
+def class_group(class_id):
+    return f"class_{class_id}"
+
+
+def groups_for(user):
+    """Channel groups a user's connections join."""
+    from apps.classes.models import Class
+    from apps.students.models import Student
+
+    groups = [EVERYONE_GROUP, user_group(user.pk), role_group(user.user_type)]
+    if user.tenant_id:
+        groups.append(tenant_group(user.tenant_id))
+    class_ids = set(
+        Student.objects.filter(
+            user=user, current_class__isnull=False
+        ).values_list('current_class_id', flat=True)
+    )
+    class_ids.update(
+        Class.objects.filter(class_teacher__user=user).values_list('pk', flat=True)
+    )
+    groups.extend(class_group(class_id) for class_id in sorted(class_ids))
+    return groups
+
+
+def event_key(event_id):
+    """Sort key for stream ids (``<ms>-<seq>``)."""
+    ms, _, seq = str(event_id).partition('-')
+    return int(ms), int(seq or 0)
+
+
+def _stream_key(group):
+    return f"gateway:stream:{group}"
+
+
+def append_events(entries):
+    """
+    Append ``(group, message)`` broadcasts to their groups' replay
+    streams in one round trip; returns their ids.
+    """
+    client = get_redis()
+    if client is None:
+        ids = []
+        for group, message in entries:
+            event_id = f"{int(time.time() * 1000)}-{next(_memory_sequence)}"
+            _memory_streams[group].append((event_id, message))
+            ids.append(event_id)
+        return ids
+    with client.pipeline(transaction=False) as pipe:
+        for group, message in entries:
+            key = _stream_key(group)
+            pipe.xadd(
+                key, {'message': json.dumps(message)},
+                maxlen=STREAM_MAXLEN, approximate=True,
+            )
+            pipe.expire(key, STREAM_TTL_SECONDS)
+        results = pipe.execute()
+    return results[::2]
+
+
+async def events_since(groups, last_event_id):
+    """Broadcasts to ``groups`` after ``last_event_id``, oldest first."""
+    after = event_key(last_event_id)
+    client = get_async_redis()
+    if client is None:
+        events = [
+            (event_id, message)
+            for group in groups
+            for event_id, message in _memory_streams.get(group, ())
+            if event_key(event_id) > after
+        ]
+    else:
+        async with client.pipeline(transaction=False) as pipe:
+            for group in groups:
+                pipe.xrange(
+                    _stream_key(group), min=f"({last_event_id}", max='+',
+                    count=STREAM_MAXLEN,
+                )
+            results = await pipe.execute()
+        events = [
+            (event_id, json.loads(fields['message']))
+            for entries in results
+            for event_id, fields in entries
+        ]
+    return sorted(events, key=lambda event: event_key(event[0]))
+
+
+def broadcast_many(broadcasts):
+    """
+    Send ``(group, payload, event, merge_key)`` broadcasts: one stream
+    round trip, then one ``group_send`` per broadcast, run concurrently.
+    Returns each broadcast's event id, or the exception its send raised.
+    """
+    messages = [
+        (group, {'event': event, 'payload': payload, 'merge_key': merge_key})
+        for group, payload, event, merge_key in broadcasts
+    ]
+    ids = append_events(messages)
+    layer = get_channel_layer()
+    if layer is None:
+        return ids
+
+    async def send_all():
+        return await asyncio.gather(
+            *[
+                layer.group_send(
+                    group, {'type': 'gateway.event', 'id': event_id, **message}
+                )
+                for (group, message), event_id in zip(messages, ids)
+            ],
+            return_exceptions=True,
+        )
+
+    results = async_to_sync(send_all)()
+    return [
+        result if isinstance(result, Exception) else event_id
+        for event_id, result in zip(ids, results)
+    ]
+
+
+def broadcast(group, payload, event='notification', merge_key=None):
+    """
+    Send ``payload`` to every connection in ``group`` with one
+    ``group_send`` and record it for replay. Returns the event id.
+    """
+    [result] = broadcast_many([(group, payload, event, merge_key)])
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+
+def push_to_user(user_id, payload, event='notification', merge_key=None):
+    """
+    Broadcast to one user's connections once the transaction commits.
+    Best effort: the row that triggered the push is already saved, so a
+    channel layer or stream failure is logged rather than raised.
+    """
+    def push():
+        try:
+            broadcast(user_group(user_id), payload, event, merge_key)
+        except Exception as e:
+            logger.error(f"Push to user {user_id} failed: {e}")
+
+    transaction.on_commit(push)
+
+
+def _presence_member(user_id, channel_name):
+    return f"{user_id}:{channel_name}"
+
+
+async def touch_presence(user_id, channel_name):
+    """Register or refresh a connection's heartbeat."""
+    member = _presence_member(user_id, channel_name)
+    expires = time.time() + PRESENCE_TTL_SECONDS
+    client = get_async_redis()
+    if client is None:
+        _memory_presence[member] = expires
+        return
+    await client.zadd(PRESENCE_KEY, {member: expires})
+
+
+async def drop_presence(user_id, channel_name):
+    member = _presence_member(user_id, channel_name)
+    client = get_async_redis()
+    if client is None:
+        _memory_presence.pop(member, None)
+        return
+    await client.zrem(PRESENCE_KEY, member)
+
+
+def online_users():
+    """Ids of users with at least one live connection."""
+    now = time.time()
+    client = get_redis()
+    if client is None:
+        for member, expires in list(_memory_presence.items()):
+            if expires <= now:
+                _memory_presence.pop(member, None)
+        members = _memory_presence
+    else:
+        with client.pipeline(transaction=False) as pipe:
+            pipe.zremrangebyscore(PRESENCE_KEY, '-inf', now)
+            pipe.zrange(PRESENCE_KEY, 0, -1)
+            _, members = pipe.execute()
+    return {member.split(':', 1)[0] for member in members}
+
+
+class OutboundQueue:
+    """
+    Bounded per-connection send queue.
+
+    A message with a ``merge_key`` replaces the queued message with the
+    same key in place (latest state wins). When the queue is full the
+    oldest message is dropped and ``dropped`` is incremented.
+    """
+
+    def __init__(self, maxsize=OUTBOUND_QUEUE_SIZE):
+        self.maxsize = maxsize
+        self.dropped = 0
+        self.merged = 0
+        self._items = OrderedDict()
+        self._sequence = itertools.count()
+        self._ready = asyncio.Event()
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, message, merge_key=None):
+        """Queue ``message``; returns ``'queued'``, ``'merged'`` or ``'dropped'``."""
+        if merge_key is not None:
+            key = ('merge', merge_key)
+            if key in self._items:
+                self._items[key] = message
+                self.merged += 1
+                return 'merged'
+        else:
+            key = ('seq', next(self._sequence))
+        status = 'queued'
+        if len(self._items) >= self.maxsize:
+            self._items.popitem(last=False)
+            self.dropped += 1
+            status = 'dropped'
+        self._items[key] = message
+        self._ready.set()
+        return status
+
+    async def get(self):
+        while not self._items:
+            self._ready.clear()
+            await self._ready.wait()
+        _, message = self._items.popitem(last=False)
+        return message
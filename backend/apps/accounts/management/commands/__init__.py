@@ -0,0 +1 @@
+# Commands package for accounts app
@@ -0,0 +1,184 @@
+"""
+Load test for the notification gateway.
+
+Simulates WebSocket connections as channels on an in-memory channel
+layer. Every simulated socket joins the same groups a real connection
+would (everyone, role, tenant, class, user), drains the layer into a
+gateway ``OutboundQueue`` and "sends" from it, a fraction of them with a
+per-message delay to stand in for slow clients. Broadcasts go out as one
+``group_send`` per group, and the report shows how many deliveries were
+sent, merged or dropped and how long they took.
+
+The stock in-memory layer sweeps every channel and group membership for
+expiry on each receive, which is quadratic at this scale and would
+measure the sweep rather than the gateway, so the harness runs it at
+most once a second.
+"""
+import asyncio
+import time
+
+from channels.layers import InMemoryChannelLayer
+from django.core.management.base import BaseCommand
+
+from apps.accounts import gateway
+
+TENANTS = 10
+CLASSES = 300
+CLEAN_INTERVAL_SECONDS = 1.0
+
+
+class LoadTestChannelLayer(InMemoryChannelLayer):
+    """In-memory layer that sweeps for expired messages once a second."""
+
+    _cleaned_at = 0.0
+
+    def _clean_expired(self):
+        now = time.monotonic()
+        if now - self._cleaned_at >= CLEAN_INTERVAL_SECONDS:
+            self._cleaned_at = now
+            super()._clean_expired()
+
+
+class SimulatedSocket:
+    def __init__(self, index, channel_name, send_delay, queue_size):
+        self.index = index
+        self.channel_name = channel_name
+        self.send_delay = send_delay
+        self.outbound = gateway.OutboundQueue(queue_size)
+        self.taken = 0
+        self.sent = 0
+        self.busy = False
+        self.latencies = []
+
+    @property
+    def groups(self):
+        return [
+            gateway.EVERYONE_GROUP,
+            gateway.role_group('teacher' if self.index % 20 == 0 else 'student'),
+            gateway.tenant_group(self.index % TENANTS),
+            gateway.class_group(self.index % CLASSES),
+            gateway.user_group(self.index),
+        ]
+
+    async def read(self, layer):
+        while True:
+            message = await layer.receive(self.channel_name)
+            self.taken += 1
+            self.outbound.put(message, merge_key=message.get('merge_key'))
+
+    async def write(self):
+        while True:
+            message = await self.outbound.get()
+            self.busy = True
+            if self.send_delay:
+                await asyncio.sleep(self.send_delay)
+            self.latencies.append(time.perf_counter() - message['sent_at'])
+            self.sent += 1
+            self.busy = False
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Command(BaseCommand):
+    help = 'Load test the notification gateway against the in-memory channel layer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sockets', type=int, default=10000)
+        parser.add_argument('--broadcasts', type=int, default=50)
+        parser.add_argument(
+            '--merge-every', type=int, default=2,
+            help='Every Nth broadcast carries a merge key (0 disables)',
+        )
+        parser.add_argument('--slow-fraction', type=float, default=0.1)
+        parser.add_argument(
+            '--slow-delay', type=float, default=0.02,
+            help='Seconds a slow client takes to send one message',
+        )
+        parser.add_argument('--queue-size', type=int, default=gateway.OUTBOUND_QUEUE_SIZE)
+        parser.add_argument('--timeout', type=float, default=120.0)
+
+    def handle(self, *args, **options):
+        report = asyncio.run(self.run(options))
+        for label, value in report:
+            self.stdout.write(f'{label:<28}{value}')
+        self.stdout.write(self.style.SUCCESS('Gateway load test finished'))
+
+    async def run(self, options):
+        layer = LoadTestChannelLayer(capacity=max(100, options['broadcasts'] * 2))
+        slow_every = (
+            round(1 / options['slow_fraction']) if options['slow_fraction'] > 0 else 0
+        )
+        sockets = []
+        started = time.perf_counter()
+        for index in range(options['sockets']):
+            slow = slow_every and index % slow_every == 0
+            socket = SimulatedSocket(
+                index, await layer.new_channel(),
+                options['slow_delay'] if slow else 0, options['queue_size'],
+            )
+            for group in socket.groups:
+                await layer.group_add(group, socket.channel_name)
+            sockets.append(socket)
+        tasks = [
+            asyncio.ensure_future(coroutine)
+            for socket in sockets
+            for coroutine in (socket.read(layer), socket.write())
+        ]
+        connected = time.perf_counter() - started
+
+        started = time.perf_counter()
+        group_sends = 0
+        for number in range(options['broadcasts']):
+            merge = options['merge_every'] and number % options['merge_every'] == 0
+            await layer.group_send(gateway.EVERYONE_GROUP, {
+                'type': 'gateway.event',
+                'id': f'{number}-0',
+                'event': 'notification',
+                'payload': {'number': number},
+                'merge_key': 'unread_count' if merge else None,
+                'sent_at': time.perf_counter(),
+            })
+            group_sends += 1
+            # Let readers and writers run between broadcasts
+            await asyncio.sleep(0)
+        broadcast_time = time.perf_counter() - started
+
+        last_taken, deadline = -1, time.monotonic() + options['timeout']
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+            taken = sum(socket.taken for socket in sockets)
+            idle = all(not len(s.outbound) and not s.busy for s in sockets)
+            if idle and taken == last_taken:
+                break
+            last_taken = taken
+        drain_time = time.perf_counter() - started
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        fast = [lat for s in sockets if not s.send_delay for lat in s.latencies]
+        slow = [lat for s in sockets if s.send_delay for lat in s.latencies]
+        expected = len(sockets) * options['broadcasts']
+        taken = sum(socket.taken for socket in sockets)
+        return [
+            ('Sockets', len(sockets)),
+            ('Slow sockets', sum(1 for s in sockets if s.send_delay)),
+            ('Connect time', f'{connected:.2f}s'),
+            ('group_send calls', group_sends),
+            ('Deliveries expected', expected),
+            ('Lost at channel layer', expected - taken),
+            ('Merged in queues', sum(s.outbound.merged for s in sockets)),
+            ('Dropped from queues', sum(s.outbound.dropped for s in sockets)),
+            ('Sent to clients', sum(s.sent for s in sockets)),
+            ('Broadcast time', f'{broadcast_time:.2f}s'),
+            ('Drain time', f'{drain_time:.2f}s'),
+            ('Fast p50 / p99 latency', f'{percentile(fast, .5) * 1000:.1f}ms / '
+                                       f'{percentile(fast, .99) * 1000:.1f}ms'),
+            ('Slow p50 / p99 latency', f'{percentile(slow, .5) * 1000:.1f}ms / '
+                                       f'{percentile(slow, .99) * 1000:.1f}ms'),
+        ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_user_admin_institutes_user_admin_level_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('channel', models.CharField(choices=[('in_app', 'In-app'), ('push', 'Push'), ('email', 'Email'), ('sms', 'SMS')], max_length=10)),
+                ('category', models.CharField(choices=[('general', 'General'), ('academic', 'Academic'), ('attendance', 'Attendance'), ('fee', 'Fee'), ('event', 'Event'), ('emergency', 'Emergency'), ('schedule', 'Schedule'), ('notice', 'Notice')], default='general', max_length=20)),
+                ('priority', models.CharField(choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High'), ('urgent', 'Urgent')], default='medium', max_length=10)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('digest', 'Awaiting Digest'), ('sent', 'Sent'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('title', models.CharField(max_length=200)),
+                ('message', models.TextField()),
+                ('data', models.JSONField(blank=True, default=dict)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('read_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Notification',
+                'verbose_name_plural': 'Notifications',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['channel', 'status', 'created_at'], name='accounts_no_channel_88b286_idx'), models.Index(fields=['user', 'channel', '-created_at'], name='accounts_no_user_id_c08314_idx')],
+            },
+        ),
+    ]
@@ -778,3 +778,71 @@ class AdminAssignment(models.Model):
     def is_valid(self):
         """Check if assignment is valid and active."""
         return self.is_active and not self.is_expired()
+
+
+class Notification(models.Model):
+    """
+    One notification to one user over one channel, with its delivery
+    state. In-app notifications are delivered by being stored here.
+    """
+    CHANNEL_CHOICES = [
+        ('in_app', 'In-app'),
+        ('push', 'Push'),
+        ('email', 'Email'),
+        ('sms', 'SMS'),
+    ]
+    CATEGORY_CHOICES = [
+        ('general', 'General'),
+        ('academic', 'Academic'),
+        ('attendance', 'Attendance'),
+        ('fee', 'Fee'),
+        ('event', 'Event'),
+        ('emergency', 'Emergency'),
+        ('schedule', 'Schedule'),
+        ('notice', 'Notice'),
+    ]
+    PRIORITY_CHOICES = [
+        ('low', 'Low'),
+        ('medium', 'Medium'),
+        ('high', 'High'),
+        ('urgent', 'Urgent'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('digest', 'Awaiting Digest'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='notifications'
+    )
+    channel = models.CharField(max_length=10, choices=CHANNEL_CHOICES)
+    category = models.CharField(
+        max_length=20, choices=CATEGORY_CHOICES, default='general'
+    )
+    priority = models.CharField(
+        max_length=10, choices=PRIORITY_CHOICES, default='medium'
+    )
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default='pending'
+    )
+    title = models.CharField(max_length=200)
+    message = models.TextField()
+    data = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    read_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Notification'
+        verbose_name_plural = 'Notifications'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['channel', 'status', 'created_at']),
+            models.Index(fields=['user', 'channel', '-created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_channel_display()} to {self.user_id}: {self.title}"
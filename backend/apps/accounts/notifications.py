@@ -0,0 +1,331 @@
+"""
+Notification dispatcher.
+
+Apps describe what to tell whom with ``notify``; the dispatcher expands
+the recipients, drops channels the user has opted out of (guardian
+settings and ``UserPreference`` switches), and stores one
+``Notification`` row per user and channel. In-app notifications are
+delivered by that insert. Push, email and SMS rows are handed to one
+Celery task per channel in batches; each task runs on its own queue
+with its own rate limit, so a slow SMTP server cannot hold up push
+delivery. Low-priority email and SMS are not sent one by one but held
+for the periodic digest, which sends each user one message covering
+all of them.
+"""
+import logging
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Notification
+
+logger = logging.getLogger(__name__)
+
+CHANNELS = ('in_app', 'push', 'email', 'sms')
+DEFAULT_CHANNELS = ('in_app', 'push', 'email')
+DIGEST_CHANNELS = ('email', 'sms')
+DIGEST_PRIORITIES = ('low',)
+BATCH_SIZES = {'push': 500, 'email': 100, 'sms': 100}
+RECIPIENT_CHUNK_SIZE = 2000
+SMS_MAX_LENGTH = 160
+
+# UserPreference keys (boolean) that switch a channel off when false
+CHANNEL_PREFERENCES = {
+    'push': 'push_notifications',
+    'email': 'email_notifications',
+    'sms': 'sms_notifications',
+}
+# GuardianSettings switches for whole notification categories
+GUARDIAN_CATEGORIES = {
+    'academic': 'academic_notifications',
+    'attendance': 'attendance_notifications',
+    'fee': 'fee_notifications',
+    'event': 'event_notifications',
+    'emergency': 'emergency_notifications',
+}
+TRUE_VALUES = ('true', '1', 'yes', 'on')
+
+
+class NotificationError(Exception):
+    """Raised when a notification intent is invalid."""
+
+
+class LoggingSMSBackend:
+    """Default SMS backend: logs messages instead of sending them."""
+
+    def send(self, phone_number, text):
+        logger.info(f"SMS to {phone_number}: {text}")
+
+
+def get_sms_backend():
+    """The backend named by ``settings.SMS_BACKEND``."""
+    path = getattr(
+        settings, 'SMS_BACKEND', 'apps.accounts.notifications.LoggingSMSBackend'
+    )
+    return import_string(path)()
+
+
+def guardian_users(student_ids):
+    """Ids of users whose guardians receive notifications about the students."""
+    from apps.guardians.models import GuardianStudent
+
+    return set(
+        GuardianStudent.objects.filter(
+            student_id__in=student_ids, can_receive_notifications=True
+        ).values_list('guardian__user_id', flat=True)
+    )
+
+
+def _user_ids(recipients):
+    if hasattr(recipients, 'values_list'):
+        return set(recipients.values_list('pk', flat=True))
+    return {getattr(recipient, 'pk', recipient) for recipient in recipients}
+
+
+def opted_out(user_ids, category):
+    """``{channel: user ids}`` that must not get ``category`` on ``channel``."""
+    from apps.guardians.models import GuardianSettings
+    from apps.settings.models import UserPreference
+
+    blocked = defaultdict(set)
+    category_field = GUARDIAN_CATEGORIES.get(category)
+    fields = ['guardian__user_id', *CHANNEL_PREFERENCES.values()]
+    if category_field:
+        fields.append(category_field)
+    for row in GuardianSettings.objects.filter(
+        guardian__user_id__in=user_ids
+    ).values(*fields):
+        for channel, field in CHANNEL_PREFERENCES.items():
+            if not row[field] or (category_field and not row[category_field]):
+                blocked[channel].add(row['guardian__user_id'])
+
+    keys = {key: channel for channel, key in CHANNEL_PREFERENCES.items()}
+    for user_id, key, value in UserPreference.objects.filter(
+        user_id__in=user_ids, key__in=keys
+    ).values_list('user_id', 'key', 'value'):
+        if value.strip().lower() not in TRUE_VALUES:
+            blocked[keys[key]].add(user_id)
+    return blocked
+
+
+def notify(recipients, title, message, category='general', priority='medium',
+           channels=None, data=None):
+    """
+    Notify ``recipients`` (users, user ids or a user queryset) over
+    ``channels``. Returns the number of notifications stored.
+    """
+    channels = tuple(channels or DEFAULT_CHANNELS)
+    unknown = set(channels) - set(CHANNELS)
+    if unknown:
+        raise NotificationError(f"Unknown channels: {', '.join(sorted(unknown))}")
+    if category not in dict(Notification.CATEGORY_CHOICES):
+        raise NotificationError(f"Unknown category: {category}")
+    if priority not in dict(Notification.PRIORITY_CHOICES):
+        raise NotificationError(f"Unknown priority: {priority}")
+
+    user_ids = sorted(_user_ids(recipients))
+    now = timezone.now()
+    stored = 0
+    for start in range(0, len(user_ids), RECIPIENT_CHUNK_SIZE):
+        chunk = user_ids[start:start + RECIPIENT_CHUNK_SIZE]
+        blocked = opted_out(chunk, category)
+        notifications = []
+        for channel in channels:
+            if channel == 'in_app':
+                status = 'sent'
+            elif channel in DIGEST_CHANNELS and priority in DIGEST_PRIORITIES:
+                status = 'digest'
+            else:
+                status = 'pending'
+            notifications.extend(
+                Notification(
+                    user_id=user_id, channel=channel, category=category,
+                    priority=priority, status=status, title=title,
+                    message=message, data=data or {},
+                    sent_at=now if status == 'sent' else None,
+                )
+                for user_id in chunk
+                if user_id not in blocked[channel]
+            )
+        with transaction.atomic():
+            created = Notification.objects.bulk_create(notifications, batch_size=1000)
+            queue_deliveries(created)
+        stored += len(created)
+    return stored
+
+
+def queue_deliveries(notifications):
+    """Queue pending notifications per channel, in batches, after commit."""
+    from .tasks import (
+        deliver_email_notifications, deliver_push_notifications,
+        deliver_sms_notifications,
+    )
+
+    tasks = {
+        'push': deliver_push_notifications,
+        'email': deliver_email_notifications,
+        'sms': deliver_sms_notifications,
+    }
+    pending = defaultdict(list)
+    for notification in notifications:
+        if notification.status == 'pending':
+            pending[notification.channel].append(notification.pk)
+    for channel, ids in pending.items():
+        size = BATCH_SIZES[channel]
+        for start in range(0, len(ids), size):
+            batch = ids[start:start + size]
+            transaction.on_commit(
+                lambda task=tasks[channel], batch=batch: task.delay(batch)
+            )
+
+
+def _record(sent, failed):
+    """Store the outcome of a delivery attempt."""
+    now = timezone.now()
+    if sent:
+        Notification.objects.filter(pk__in=sent).update(
+            status='sent', sent_at=now, error=''
+        )
+    by_error = defaultdict(list)
+    for pk, error in failed.items():
+        by_error[error].append(pk)
+    for error, pks in by_error.items():
+        Notification.objects.filter(pk__in=pks).update(status='failed', error=error)
+
+
+def _send_email(items):
+    """Send ``(pks, user, subject, body)`` items over one SMTP connection."""
+    sent, failed = [], {}
+    connection = get_connection()
+    connection.open()
+    try:
+        for pks, user, subject, body in items:
+            if not user.email:
+                failed.update(dict.fromkeys(pks, 'No email address'))
+                continue
+            try:
+                EmailMessage(
+                    subject, body, settings.DEFAULT_FROM_EMAIL, [user.email],
+                    connection=connection,
+                ).send()
+                sent.extend(pks)
+            except Exception as e:
+                failed.update(dict.fromkeys(pks, str(e)))
+    finally:
+        connection.close()
+    return sent, failed
+
+
+def _send_sms(items):
+    """Send ``(pks, user, subject, body)`` items through the SMS backend."""
+    backend = get_sms_backend()
+    sent, failed = [], {}
+    for pks, user, subject, body in items:
+        if not user.phone_number:
+            failed.update(dict.fromkeys(pks, 'No phone number'))
+            continue
+        try:
+            backend.send(user.phone_number, f"{subject}: {body}"[:SMS_MAX_LENGTH])
+            sent.extend(pks)
+        except Exception as e:
+            failed.update(dict.fromkeys(pks, str(e)))
+    return sent, failed
+
+
+SENDERS = {'email': _send_email, 'sms': _send_sms}
+
+
+def _pending(channel, ids):
+    return Notification.objects.filter(
+        pk__in=ids, channel=channel, status='pending'
+    ).select_related('user').only(
+        'title', 'message', 'user', 'user__email', 'user__phone_number'
+    )
+
+
+def deliver(channel, ids):
+    """Send one batch of pending email or SMS notifications."""
+    items = [
+        ([notification.pk], notification.user, notification.title,
+         notification.message)
+        for notification in _pending(channel, ids)
+    ]
+    sent, failed = SENDERS[channel](items)
+    _record(sent, failed)
+    return len(sent)
+
+
+def deliver_push(ids):
+    """Send one batch of push notifications through the gateway."""
+    from . import gateway
+
+    notifications = list(
+        Notification.objects.filter(
+            pk__in=ids, channel='push', status='pending'
+        ).values('pk', 'user_id', 'title', 'message', 'category', 'priority', 'data')
+    )
+    # Each push gets a stream id, so clients can resume after a reconnect
+    results = gateway.broadcast_many([
+        (gateway.user_group(n['user_id']), {
+            'message': n['message'],
+            'notification_type': n['category'],
+            'data': {
+                **n['data'], 'id': n['pk'], 'title': n['title'],
+                'priority': n['priority'],
+            },
+        }, 'notification', None)
+        for n in notifications
+    ])
+    sent = [
+        n['pk'] for n, result in zip(notifications, results)
+        if not isinstance(result, Exception)
+    ]
+    _record(sent, {
+        n['pk']: str(result)
+        for n, result in zip(notifications, results) if isinstance(result, Exception)
+    })
+    return len(sent)
+
+
+def send_digests():
+    """
+    Send every user one email (and one SMS) covering all their
+    low-priority notifications held for the digest.
+    """
+    held = defaultdict(list)
+    for notification in Notification.objects.filter(status='digest').select_related(
+        'user'
+    ).only(
+        'channel', 'title', 'user', 'user__email', 'user__phone_number',
+        'user__first_name', 'user__last_name'
+    ).order_by('user_id', 'created_at'):
+        held[(notification.channel, notification.user_id)].append(notification)
+
+    sent_total = 0
+    for channel in DIGEST_CHANNELS:
+        items = []
+        for (held_channel, _), notifications in held.items():
+            if held_channel != channel:
+                continue
+            user = notifications[0].user
+            count = len(notifications)
+            subject = f"You have {count} new notification{'s' if count != 1 else ''}"
+            if channel == 'email':
+                lines = "\n".join(f"- {n.title}" for n in notifications)
+                body = (
+                    f"Hello {user.get_full_name() or user.email},\n\n"
+                    f"{lines}\n\nBest regards,\nEduCore Ultra Team\n"
+                )
+            else:
+                body = "; ".join(n.title for n in notifications)
+            items.append(([n.pk for n in notifications], user, subject, body))
+        if items:
+            sent, failed = SENDERS[channel](items)
+            _record(sent, failed)
+            sent_total += len(sent)
+    logger.info(f"Sent {sent_total} digested notifications")
+    return sent_total
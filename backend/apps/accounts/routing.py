@@ -1,5 +1,5 @@
 """
-WebSocket routing for real-time notifications.
+WebSocket and Server-Sent Events routing for real-time notifications.
 """
 
 from django.urls import re_path
@@ -8,3 +8,8 @@ from . import consumers
 websocket_urlpatterns = [
     re_path(r'ws/notifications/$', consumers.NotificationConsumer.as_asgi()),
 ]
+
+# Mounted under sse/ in core.asgi
+sse_urlpatterns = [
+    re_path(r'notifications/$', consumers.NotificationStreamConsumer.as_asgi()),
+]
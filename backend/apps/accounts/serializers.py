@@ -4,7 +4,9 @@ Serializers for the accounts app.
 
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from .models import UserProfile, AdminRole, AdminAssignment, AuditLog
+from .models import (
+    UserProfile, AdminRole, AdminAssignment, AuditLog, Notification
+)
 
 User = get_user_model()
 
@@ -222,6 +224,22 @@ class AuditLogSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'timestamp')
 
 
+class NotificationSerializer(serializers.ModelSerializer):
+    """Serializer for in-app notifications."""
+    is_read = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Notification
+        fields = [
+            'id', 'category', 'priority', 'title', 'message', 'data',
+            'is_read', 'read_at', 'created_at'
+        ]
+        read_only_fields = fields
+
+    def get_is_read(self, obj):
+        return obj.read_at is not None
+
+
 class PermissionCheckSerializer(serializers.Serializer):
     """Serializer for permission check requests."""
     permission = serializers.CharField(required=False)
@@ -0,0 +1,39 @@
+"""
+Push notifications stored by other apps to their recipient's gateway
+group, so clients get them over the WebSocket or SSE stream instead of
+polling the apps' ``unread`` endpoints.
+"""
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from apps.guardians.models import GuardianNotification
+from apps.timetable.models import ScheduleNotification
+
+from .gateway import push_to_user
+
+
+@receiver(post_save, sender=GuardianNotification)
+def push_guardian_notification(sender, instance, created, **kwargs):
+    """Push new guardian notifications to the guardian's user"""
+    if created and instance.guardian.user_id:
+        push_to_user(instance.guardian.user_id, {
+            'id': instance.pk,
+            'title': instance.title,
+            'message': instance.message,
+            'notification_type': instance.notification_type,
+            'priority': instance.priority,
+            'created_at': instance.created_at.isoformat(),
+        }, event='guardian_notification')
+
+
+@receiver(post_save, sender=ScheduleNotification)
+def push_schedule_notification(sender, instance, created, **kwargs):
+    """Push new schedule notifications to their recipient"""
+    if created:
+        push_to_user(instance.recipient_id, {
+            'id': instance.pk,
+            'title': instance.title,
+            'message': instance.message,
+            'notification_type': instance.notification_type,
+            'created_at': instance.created_at.isoformat(),
+        }, event='schedule_notification')
@@ -10,6 +10,7 @@ from datetime import timedelta
 import logging
 
 from .models import UserSession, User
+from .notifications import deliver, deliver_push, send_digests
 
 logger = logging.getLogger(__name__)
 
@@ -157,3 +158,45 @@ def send_password_reset_email_task(user_id, reset_token):
     except Exception as e:
         logger.error(f"Failed to send password reset email: {e}")
         raise
+
+
+@shared_task(bind=True, rate_limit='10/m', max_retries=3, default_retry_delay=60)
+def deliver_email_notifications(self, notification_ids):
+    """
+    Email a batch of notifications over one SMTP connection.
+    Runs on the notifications.email queue.
+    """
+    try:
+        sent = deliver('email', notification_ids)
+    except Exception as e:
+        # Per-message failures are recorded; this is the connection itself
+        logger.error(f"Email notification batch failed, retrying: {e}")
+        raise self.retry(exc=e)
+    return f"Emailed {sent} of {len(notification_ids)} notifications"
+
+
+@shared_task(rate_limit='120/m')
+def deliver_push_notifications(notification_ids):
+    """
+    Push a batch of notifications to connected WebSocket clients.
+    Runs on the notifications.push queue.
+    """
+    sent = deliver_push(notification_ids)
+    return f"Pushed {sent} of {len(notification_ids)} notifications"
+
+
+@shared_task(rate_limit='5/m')
+def deliver_sms_notifications(notification_ids):
+    """
+    Text a batch of notifications through the configured SMS backend.
+    Runs on the notifications.sms queue.
+    """
+    sent = deliver('sms', notification_ids)
+    return f"Texted {sent} of {len(notification_ids)} notifications"
+
+
+@shared_task
+def send_notification_digests():
+    """Send each user one digest of their held low-priority notifications."""
+    sent = send_digests()
+    return f"Digested {sent} notifications"
@@ -0,0 +1,81 @@
+"""
+Tests for the notification gateway: the per-connection outbound queue
+merges, drops and orders events, and the replay stream returns what a
+reconnecting client missed.
+"""
+import asyncio
+from collections import defaultdict, deque
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.test import SimpleTestCase
+
+from apps.accounts import gateway
+from apps.accounts.gateway import OutboundQueue, append_events, events_since
+
+
+class OutboundQueueTests(SimpleTestCase):
+    def drain(self, queue):
+        async def get_all():
+            return [await queue.get() for _ in range(len(queue))]
+        return async_to_sync(get_all)()
+
+    def test_messages_come_out_in_order(self):
+        queue = OutboundQueue()
+        for number in range(3):
+            self.assertEqual(queue.put({'n': number}), 'queued')
+        self.assertEqual([message['n'] for message in self.drain(queue)], [0, 1, 2])
+
+    def test_merge_key_replaces_queued_message_in_place(self):
+        queue = OutboundQueue()
+        queue.put({'n': 'a'}, merge_key='notice:1')
+        queue.put({'n': 'b'})
+        self.assertEqual(queue.put({'n': 'c'}, merge_key='notice:1'), 'merged')
+        self.assertEqual(queue.merged, 1)
+        self.assertEqual([message['n'] for message in self.drain(queue)], ['c', 'b'])
+
+    def test_full_queue_drops_the_oldest(self):
+        queue = OutboundQueue(maxsize=2)
+        queue.put({'n': 0})
+        queue.put({'n': 1})
+        self.assertEqual(queue.put({'n': 2}), 'dropped')
+        self.assertEqual(queue.dropped, 1)
+        self.assertEqual([message['n'] for message in self.drain(queue)], [1, 2])
+
+    def test_get_waits_for_a_message(self):
+        async def scenario():
+            queue = OutboundQueue()
+            waiter = asyncio.ensure_future(queue.get())
+            await asyncio.sleep(0)
+            self.assertFalse(waiter.done())
+            queue.put({'n': 0})
+            return await asyncio.wait_for(waiter, 1)
+        self.assertEqual(async_to_sync(scenario)(), {'n': 0})
+
+
+class EventsSinceTests(SimpleTestCase):
+    def setUp(self):
+        for name in ('get_redis', 'get_async_redis'):
+            patcher = mock.patch.object(gateway, name, return_value=None)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        # A fresh in-process stream store per test
+        streams = defaultdict(lambda: deque(maxlen=gateway.STREAM_MAXLEN))
+        patcher = mock.patch.object(gateway, '_memory_streams', streams)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_returns_events_after_the_last_seen_across_groups(self):
+        first, second, third = append_events([
+            ('everyone', {'n': 1}),
+            ('class_7', {'n': 2}),
+            ('everyone', {'n': 3}),
+        ])
+        append_events([('class_8', {'n': 4})])
+        events = async_to_sync(events_since)(['everyone', 'class_7'], first)
+        self.assertEqual(events, [(second, {'n': 2}), (third, {'n': 3})])
+
+    def test_nothing_after_the_latest_event(self):
+        [latest] = append_events([('everyone', {'n': 1})])
+        self.assertEqual(async_to_sync(events_since)(['everyone'], latest), [])
+        self.assertEqual(async_to_sync(events_since)(['unknown'], '0-0'), [])
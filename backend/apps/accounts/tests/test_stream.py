@@ -0,0 +1,121 @@
+"""
+Tests for pushing stored notifications and for the Server-Sent Events
+stream: a failing push never reaches the saving request, and the stream
+authenticates, labels events with their stream ids and resumes from
+``Last-Event-ID``.
+"""
+from unittest import mock
+
+from asgiref.sync import async_to_sync, sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.test import TestCase
+
+from apps.accounts import gateway
+from apps.accounts.consumers import NotificationStreamConsumer
+from apps.timetable.models import ScheduleNotification
+
+User = get_user_model()
+
+
+def in_memory_gateway(test):
+    """Keep streams and presence in-process and fresh for ``test``."""
+    for name in ('get_redis', 'get_async_redis'):
+        patcher = mock.patch.object(gateway, name, return_value=None)
+        patcher.start()
+        test.addCleanup(patcher.stop)
+    patcher = mock.patch.dict(gateway._memory_streams, clear=True)
+    patcher.start()
+    test.addCleanup(patcher.stop)
+
+
+class PushToUserTests(TestCase):
+    def setUp(self):
+        in_memory_gateway(self)
+        self.user = User.objects.create_user(username='reader', email='reader@example.com')
+
+    def test_failed_push_is_logged_not_raised(self):
+        with mock.patch.object(gateway, 'broadcast_many', side_effect=ConnectionError('down')):
+            with self.assertLogs('apps.accounts.gateway', 'ERROR') as logs:
+                with self.captureOnCommitCallbacks(execute=True):
+                    notification = ScheduleNotification.objects.create(
+                        recipient=self.user, notification_type='reminder',
+                        title='Timetable changed', message='Period 3 moved.',
+                    )
+        self.assertTrue(ScheduleNotification.objects.filter(pk=notification.pk).exists())
+        self.assertIn('down', logs.output[0])
+
+    def test_push_is_recorded_for_replay(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            gateway.push_to_user(self.user.pk, {'title': 'Hello'})
+        [(_, message)] = gateway._memory_streams[gateway.user_group(self.user.pk)]
+        self.assertEqual(message['payload'], {'title': 'Hello'})
+
+
+class NotificationStreamTests(TestCase):
+    def setUp(self):
+        in_memory_gateway(self)
+        self.user = User.objects.create_user(username='reader', email='reader@example.com')
+        self.group = gateway.user_group(self.user.pk)
+
+    def stream(self, user, headers=(), until=None, during=None):
+        """
+        Open the stream and return its response start and the body read
+        until a chunk contains ``until``.
+        """
+        async def scenario():
+            communicator = ApplicationCommunicator(NotificationStreamConsumer.as_asgi(), {
+                'type': 'http', 'method': 'GET', 'path': '/sse/notifications/',
+                'query_string': b'', 'headers': list(headers), 'user': user,
+            })
+            await communicator.send_input({'type': 'http.request', 'body': b''})
+            start = await communicator.receive_output(timeout=5)
+            body = b''
+            if start['status'] == 200 and during is not None:
+                await communicator.receive_output(timeout=5)  # retry hint
+                await sync_to_async(during)()
+            while True:
+                message = await communicator.receive_output(timeout=5)
+                body += message.get('body', b'')
+                if until is None or until.encode() in body or not message.get('more_body'):
+                    break
+            await communicator.send_input({'type': 'http.disconnect'})
+            await communicator.wait(timeout=5)
+            return start, body.decode()
+        return async_to_sync(scenario)()
+
+    def test_anonymous_client_gets_401(self):
+        start, body = self.stream(AnonymousUser())
+        self.assertEqual(start['status'], 401)
+        self.assertIn('Authentication required', body)
+
+    def test_live_event_carries_its_stream_id(self):
+        event_ids = []
+
+        def publish():
+            event_ids.append(gateway.broadcast(self.group, {'title': 'Hello'}))
+
+        start, body = self.stream(self.user, until='Hello', during=publish)
+        self.assertEqual(start['status'], 200)
+        self.assertIn((b'Content-Type', b'text/event-stream'), start['headers'])
+        self.assertIn(f'id: {event_ids[0]}\nevent: notification\n', body)
+
+    def test_last_event_id_resumes_after_it(self):
+        first, second = gateway.append_events([
+            (self.group, {'event': 'notification', 'payload': {'n': 1}, 'merge_key': None}),
+            (self.group, {'event': 'notification', 'payload': {'n': 2}, 'merge_key': None}),
+        ])
+        _, body = self.stream(
+            self.user, headers=[(b'last-event-id', first.encode())], until='resumed'
+        )
+        self.assertNotIn(f'id: {first}\n', body)
+        self.assertIn(f'id: {second}\n', body)
+        self.assertIn('"count": 1', body)
+
+    def test_bad_last_event_id_is_reported(self):
+        _, body = self.stream(
+            self.user, headers=[(b'last-event-id', b'not-an-id')], until='Invalid'
+        )
+        self.assertIn('event: error', body)
+        self.assertIn('Invalid last_event_id', body)
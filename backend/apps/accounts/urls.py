@@ -11,6 +11,9 @@ router.register(r'users', views.UserViewSet)
 router.register(r'admin-roles', views.AdminRoleViewSet)
 router.register(r'admin-assignments', views.AdminAssignmentViewSet)
 router.register(r'audit-logs', views.AuditLogViewSet)
+router.register(
+    r'notifications', views.NotificationViewSet, basename='notifications'
+)
 router.register(
     r'permissions', views.PermissionCheckViewSet, basename='permissions'
 )
@@ -8,10 +8,11 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from rest_framework_simplejwt.tokens import RefreshToken
 from allauth.socialaccount.models import SocialAccount
 
-from .models import AdminRole, AdminAssignment, AuditLog
+from .models import AdminRole, AdminAssignment, AuditLog, Notification
 from .serializers import (
     UserSerializer, UserCreateSerializer, UserUpdateSerializer,
     AdminRoleSerializer, AdminRoleCreateSerializer,
@@ -19,7 +20,8 @@ from .serializers import (
     AuditLogSerializer, PermissionCheckSerializer, PermissionResultSerializer,
     UserPermissionsSerializer, RoleTemplateSerializer,
     AdminRoleAssignmentSerializer, UserPermissionUpdateSerializer,
-    InstituteAccessSerializer, UserAccessSummarySerializer
+    InstituteAccessSerializer, UserAccessSummarySerializer,
+    NotificationSerializer
 )
 from .permissions import (
     UserManagementPermission, AdminManagementPermission
@@ -431,6 +433,43 @@ class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
         return Response(serializer.data)
 
 
+class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    ViewSet for the current user's in-app notifications.
+    """
+    serializer_class = NotificationSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        """Only the current user's in-app notifications."""
+        notifications = Notification.objects.filter(
+            user=self.request.user, channel='in_app'
+        )
+        if self.request.query_params.get('unread') == 'true':
+            notifications = notifications.filter(read_at__isnull=True)
+        return notifications.order_by('-created_at')
+
+    @action(detail=False, methods=['get'])
+    def unread_count(self, request):
+        """Number of unread in-app notifications."""
+        count = Notification.objects.filter(
+            user=request.user, channel='in_app', read_at__isnull=True
+        ).count()
+        return Response({'unread': count})
+
+    @action(detail=False, methods=['post'])
+    def mark_read(self, request):
+        """Mark the given notifications (or all, if none given) as read."""
+        notifications = Notification.objects.filter(
+            user=request.user, channel='in_app', read_at__isnull=True
+        )
+        ids = request.data.get('ids')
+        if ids:
+            notifications = notifications.filter(pk__in=ids)
+        updated = notifications.update(read_at=timezone.now())
+        return Response({'marked_read': updated})
+
+
 class PermissionCheckViewSet(viewsets.ViewSet):
     """
     ViewSet for permission checking.
@@ -248,40 +248,7 @@ def generate_predictive_insights(sender, instance, created, **kwargs):
         logger.error(f"Error generating predictive insights: {e}")
 
 
-@receiver(post_save, sender=AttendanceAnalytics)
-def detect_attendance_anomalies(sender, instance, created, **kwargs):
-    """
-    Detect attendance anomalies and create alerts.
-    """
-    try:
-        if instance.attendance_rate < 75:  # Low attendance threshold
-            # Check if this is a significant drop
-            previous_analytics = AttendanceAnalytics.objects.filter(
-                student=instance.student,
-                class_section=instance.class_section,
-                created_at__lt=instance.created_at
-            ).order_by('-created_at')[:3]
-            
-            if previous_analytics.exists():
-                avg_previous = previous_analytics.aggregate(avg_rate=Avg('attendance_rate'))['avg_rate']
-                if instance.attendance_rate < avg_previous - 20:  # 20% drop
-                    # Create an alert or notification
-                    logger.warning(
-                        f"Attendance anomaly detected for student {instance.student.id}: "
-                        f"Current rate: {instance.attendance_rate}%, Previous average: {avg_previous}%"
-                    )
-                    
-                    # In a real implementation, you would create an alert/notification here
-                    # from notifications.models import Alert
-                    # Alert.objects.create(
-                    #     user=instance.student.parent,
-                    #     title="Attendance Alert",
-                    #     message=f"Your child's attendance has dropped significantly.",
-                    #     alert_type="attendance_anomaly"
-                    # )
-        
-    except Exception as e:
-        logger.error(f"Error detecting attendance anomalies: {e}")
+# Attendance anomaly detection runs in batch, see apps.analytics.tasks.
 
 
 def generate_weekly_analytics_report():
@@ -0,0 +1,42 @@
+"""
+Celery tasks for analytics app.
+"""
+
+from celery import shared_task
+import logging
+
+from .anomalies import AttendanceAnomalyEngine, default_detection_window
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def detect_attendance_anomalies_nightly(days=7):
+    """
+    Re-score the last ``days`` days of attendance for every student.
+
+    Re-running is safe: existing unresolved anomalies are not duplicated.
+    """
+    try:
+        start_date, end_date = default_detection_window(days)
+        created = AttendanceAnomalyEngine().run(start_date, end_date)
+        return f"Stored {created} attendance anomalies"
+    except Exception as e:
+        logger.error(f"Failed to run nightly attendance anomaly detection: {e}")
+        raise
+
+
+@shared_task
+def detect_attendance_anomalies_today():
+    """
+    Incrementally score today's attendance against each student's history.
+    """
+    try:
+        start_date, end_date = default_detection_window(1)
+        created = AttendanceAnomalyEngine().run(
+            start_date, end_date, detection_dates=[end_date]
+        )
+        return f"Stored {created} attendance anomalies for {end_date}"
+    except Exception as e:
+        logger.error(f"Failed to run incremental attendance anomaly detection: {e}")
+        raise
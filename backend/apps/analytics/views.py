@@ -21,6 +21,7 @@ from .serializers import (
     ReportGeneratorSerializer, ModelUpdateSerializer, DataExportSerializer
 )
 from .permissions import AnalyticsPermission
+from .anomalies import class_rate_drops
 
 
 class StudentPerformanceViewSet(viewsets.ModelViewSet):
@@ -234,29 +235,9 @@ class AttendanceAnalyticsViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def anomalies(self, request):
-        """Detect attendance anomalies."""
-        queryset = self.get_queryset()
-
-        # Find students with sudden drops in attendance
-        anomalies = []
-        for record in queryset:
-            previous_records = queryset.filter(
-                student=record.student,
-                created_at__lt=record.created_at
-            ).order_by('-created_at')[:5]
-
-            if previous_records:
-                avg_previous = sum(r.attendance_rate for r in previous_records) / len(previous_records)
-                if record.attendance_rate < avg_previous - 20:  # 20% drop
-                    anomalies.append({
-                        'student': record.student.full_name,
-                        'current_rate': record.attendance_rate,
-                        'previous_avg': round(avg_previous, 2),
-                        'drop_percentage': round(avg_previous - record.attendance_rate, 2),
-                        'date': record.created_at
-                    })
-
-        return Response(anomalies)
+        """Detect sudden drops in class attendance rates."""
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(class_rate_drops(queryset))
 
 
 class ExamAnalyticsViewSet(viewsets.ModelViewSet):
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0001_initial'),
+        ('students', '0001_initial'),
+        ('teachers', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendancerecord',
+            name='client_modified_at',
+            field=models.DateTimeField(blank=True, help_text='Last-modified timestamp reported by the offline client', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['updated_at', 'id'], name='attendance_sync_cursor_idx'),
+        ),
+    ]
@@ -102,11 +102,18 @@ class AttendanceRecord(models.Model):
     marked_by = models.ForeignKey(Teacher, on_delete=models.CASCADE, related_name='marked_attendance')
     marked_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    client_modified_at = models.DateTimeField(
+        null=True, blank=True,
+        help_text="Last-modified timestamp reported by the offline client"
+    )
 
     class Meta:
         unique_together = ['session', 'student']
         ordering = ['-session__date', 'student__user__first_name']
         verbose_name_plural = 'Attendance Records'
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='attendance_sync_cursor_idx'),
+        ]
 
     def __str__(self):
         return f"{self.student.full_name} - {self.session} ({self.status})"
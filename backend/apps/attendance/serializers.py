@@ -211,3 +211,41 @@ class LeaveRequestSummarySerializer(serializers.Serializer):
     approved_requests = serializers.IntegerField()
     rejected_requests = serializers.IntegerField()
     leave_type_distribution = serializers.DictField()
+
+
+# Offline sync serializers
+class SyncSessionSerializer(serializers.Serializer):
+    id = serializers.UUIDField()
+    course_id = serializers.UUIDField()
+    date = serializers.DateField()
+    start_time = serializers.TimeField()
+    end_time = serializers.TimeField()
+    session_type = serializers.ChoiceField(
+        choices=AttendanceSession._meta.get_field('session_type').choices,
+        required=False
+    )
+
+
+class SyncRecordSerializer(serializers.Serializer):
+    id = serializers.UUIDField()
+    session_id = serializers.UUIDField()
+    student_id = serializers.IntegerField()
+    status = serializers.ChoiceField(
+        choices=AttendanceRecord._meta.get_field('status').choices,
+        required=False
+    )
+    arrival_time = serializers.TimeField(required=False, allow_null=True)
+    departure_time = serializers.TimeField(required=False, allow_null=True)
+    remarks = serializers.CharField(required=False, allow_blank=True)
+    modified_at = serializers.DateTimeField()
+
+
+class AttendanceSyncSerializer(serializers.Serializer):
+    cursor = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    sessions = SyncSessionSerializer(many=True, required=False)
+    records = SyncRecordSerializer(many=True, required=False)
+
+    def validate(self, data):
+        if len(data.get('records', [])) > 10000:
+            raise serializers.ValidationError("A sync batch may contain at most 10000 records")
+        return data
@@ -0,0 +1,281 @@
+"""
+Offline-first attendance sync.
+
+Clients buffer sessions and records locally using client-generated UUIDs
+and upload them in one batch. The batch is applied in a single
+transaction with a fixed number of queries regardless of its size, and
+the response carries every server-side change after the client's cursor
+so one round-trip both pushes and pulls a whole day of attendance.
+
+Conflicts are resolved last-writer-wins on the client's
+``modified_at`` timestamp, which makes replaying a batch a no-op.
+
+A teacher can only create sessions for, and mark records in, their own
+courses, and only for students of their tenant.
+"""
+import base64
+import logging
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps.academics.models import Course
+from apps.students.models import Student
+from .models import AttendanceRecord, AttendanceSession
+
+logger = logging.getLogger(__name__)
+
+RECORD_FIELDS = ['status', 'arrival_time', 'departure_time', 'remarks']
+DELTA_PAGE_SIZE = 2000
+
+
+class SyncError(Exception):
+    """Raised when a sync batch cannot be applied."""
+
+
+def encode_cursor(updated_at, record_id):
+    """Encode an opaque ``(updated_at, id)`` cursor."""
+    raw = f"{updated_at.isoformat()}|{record_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by ``encode_cursor``; ``None`` means full sync."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        stamp, record_id = raw.split('|', 1)
+        updated_at = parse_datetime(stamp)
+    except (ValueError, UnicodeDecodeError):
+        updated_at = None
+    if updated_at is None:
+        raise SyncError('Invalid sync cursor')
+    return updated_at, record_id
+
+
+class AttendanceSyncEngine:
+    """
+    Apply an offline attendance batch and compute the server delta.
+
+    Usage:
+        engine = AttendanceSyncEngine(teacher=teacher, tenant=tenant)
+        result = engine.sync(sessions, records, cursor)
+    """
+
+    def __init__(self, teacher, tenant=None):
+        self.teacher = teacher
+        self.tenant = tenant
+
+    def sync(self, sessions, records, cursor=None):
+        decode_cursor(cursor)  # reject a bad cursor before writing anything
+        with transaction.atomic():
+            session_map = self._apply_sessions(sessions)
+            outcomes = self._apply_records(records, session_map)
+        delta, next_cursor, has_more = self.changes_since(cursor)
+        return {
+            'session_ids': {
+                str(client_id): str(server_id)
+                for client_id, server_id in session_map.items()
+                if client_id != server_id
+            },
+            'results': outcomes,
+            'changes': delta,
+            'cursor': next_cursor,
+            'has_more': has_more,
+        }
+
+    def _apply_sessions(self, sessions):
+        """
+        Create sessions the server has not seen yet.
+
+        A session created offline may collide with one another teacher
+        already created for the same course/date/start time; the existing
+        row wins and the returned map redirects the client's id to it.
+        """
+        if not sessions:
+            return {}
+
+        own_courses = {
+            str(course_id) for course_id in Course.objects.filter(
+                id__in={item['course_id'] for item in sessions},
+                teacher=self.teacher,
+            ).values_list('id', flat=True)
+        }
+        # Records for a session in someone else's course are rejected as
+        # unknown sessions
+        sessions = [item for item in sessions if str(item['course_id']) in own_courses]
+        if not sessions:
+            return {}
+
+        AttendanceSession.objects.bulk_create(
+            [
+                AttendanceSession(
+                    id=item['id'],
+                    course_id=item['course_id'],
+                    date=item['date'],
+                    start_time=item['start_time'],
+                    end_time=item['end_time'],
+                    session_type=item.get('session_type', 'regular'),
+                    created_by=self.teacher,
+                )
+                for item in sessions
+            ],
+            ignore_conflicts=True,
+        )
+
+        lookup = Q()
+        for item in sessions:
+            lookup |= Q(
+                course_id=item['course_id'],
+                date=item['date'],
+                start_time=item['start_time'],
+            )
+        existing = {
+            (row['course_id'], row['date'], row['start_time']): row['id']
+            for row in AttendanceSession.objects.filter(lookup).values(
+                'id', 'course_id', 'date', 'start_time'
+            )
+        }
+        return {
+            item['id']: existing.get(
+                (item['course_id'], item['date'], item['start_time']),
+                item['id'],
+            )
+            for item in sessions
+        }
+
+    def _apply_records(self, records, session_map):
+        if not records:
+            return []
+
+        for item in records:
+            item['session_id'] = session_map.get(
+                item['session_id'], item['session_id']
+            )
+
+        session_ids = {item['session_id'] for item in records}
+        sessions = self._own_sessions().in_bulk(session_ids)
+        session_ids = set(sessions)
+
+        students = Student.objects.filter(
+            id__in={item['student_id'] for item in records}
+        )
+        if self.tenant is not None:
+            students = students.filter(tenant=self.tenant)
+        student_ids = set(students.values_list('id', flat=True))
+
+        existing = {
+            (record.session_id, record.student_id): record
+            for record in AttendanceRecord.objects.select_for_update().filter(
+                session_id__in=session_ids
+            )
+        }
+
+        now = timezone.now()
+        to_create, to_update, outcomes = {}, {}, []
+        for item in records:
+            key = (item['session_id'], item['student_id'])
+            session = sessions.get(item['session_id'])
+            if session is None:
+                outcomes.append(self._outcome(item, 'rejected', 'Unknown session'))
+                continue
+            if item['student_id'] not in student_ids:
+                outcomes.append(self._outcome(item, 'rejected', 'Unknown student'))
+                continue
+
+            record = existing.get(key) or to_create.get(key)
+            if record is None:
+                record = AttendanceRecord(
+                    id=item['id'], session_id=session.id,
+                    student_id=item['student_id'], marked_by=self.teacher,
+                )
+                to_create[key] = record
+                action = 'created'
+            elif (record.client_modified_at
+                    and record.client_modified_at >= item['modified_at']):
+                outcomes.append(self._outcome(item, 'unchanged', record=record))
+                continue
+            else:
+                if key not in to_create:
+                    to_update[key] = record
+                action = 'updated'
+
+            for field in RECORD_FIELDS:
+                if field in item:
+                    setattr(record, field, item[field])
+            # Mirror AttendanceRecord.save(), which bulk writes bypass.
+            if record.arrival_time and record.arrival_time > session.start_time:
+                record.status = 'late'
+            record.client_modified_at = item['modified_at']
+            record.marked_by = self.teacher
+            record.updated_at = now
+            outcomes.append(self._outcome(item, action, record=record))
+
+        if to_create:
+            AttendanceRecord.objects.bulk_create(
+                to_create.values(), batch_size=500
+            )
+        if to_update:
+            AttendanceRecord.objects.bulk_update(
+                to_update.values(),
+                RECORD_FIELDS + ['client_modified_at', 'marked_by', 'updated_at'],
+                batch_size=500,
+            )
+
+        logger.info(
+            f"Attendance sync applied {len(to_create)} new and "
+            f"{len(to_update)} updated records"
+        )
+        return outcomes
+
+    def _own_sessions(self):
+        """Sessions of the teacher's courses, within the tenant."""
+        queryset = AttendanceSession.objects.filter(course__teacher=self.teacher)
+        if self.tenant is not None:
+            queryset = queryset.filter(course__teacher__user__tenant=self.tenant)
+        return queryset
+
+    @staticmethod
+    def _outcome(item, action, error=None, record=None):
+        outcome = {'id': str(item['id']), 'result': action}
+        if record is not None:
+            outcome['id'] = str(record.id)
+        if error:
+            outcome['error'] = error
+        return outcome
+
+    def changes_since(self, cursor=None, limit=DELTA_PAGE_SIZE):
+        """
+        Return compact rows changed after ``cursor`` ordered by
+        ``(updated_at, id)``, together with the next cursor.
+        """
+        queryset = AttendanceRecord.objects.all()
+        if self.tenant is not None:
+            queryset = queryset.filter(student__tenant=self.tenant)
+
+        position = decode_cursor(cursor)
+        if position is not None:
+            updated_at, record_id = position
+            queryset = queryset.filter(
+                Q(updated_at__gt=updated_at)
+                | Q(updated_at=updated_at, id__gt=record_id)
+            )
+
+        rows = list(
+            queryset.order_by('updated_at', 'id').values(
+                'id', 'session_id', 'student_id', 'status', 'arrival_time',
+                'departure_time', 'remarks', 'updated_at',
+                'client_modified_at',
+            )[:limit + 1]
+        )
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        if rows:
+            next_cursor = encode_cursor(rows[-1]['updated_at'], rows[-1]['id'])
+        else:
+            next_cursor = cursor
+        return rows, next_cursor, has_more
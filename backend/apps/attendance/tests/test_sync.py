@@ -0,0 +1,177 @@
+"""
+Tests for offline attendance sync: the newest client edit wins, the
+cursor pages through server changes, and a teacher can only write to
+their own courses' sessions and their tenant's students.
+"""
+import uuid
+from datetime import date, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.academic_years.models import AcademicYear
+from apps.academics.models import Course
+from apps.attendance.models import AttendanceRecord
+from apps.attendance.sync import AttendanceSyncEngine
+from apps.attendance.views import AttendanceRecordViewSet
+from apps.classes.models import Class
+from apps.students.models import Student
+from apps.subjects.models import Subject
+from apps.teachers.models import Teacher
+from apps.tenants.models import Tenant
+
+User = get_user_model()
+
+
+def make_tenant(slug):
+    return Tenant.objects.create(
+        name=slug.title(), slug=slug, domain=f"{slug}.example.com",
+        subdomain=slug, email=f"office@{slug}.example.com",
+    )
+
+
+def make_teacher(tenant, number):
+    username = f"{tenant.slug}-teacher-{number}"
+    user = User.objects.create_user(
+        username=username, email=f"{username}@example.com", tenant=tenant
+    )
+    return Teacher.objects.create(
+        user=user, teacher_id=username, employee_number=username,
+        first_name='Teacher', last_name=str(number), date_of_birth=date(1985, 1, 1),
+        gender='F', email=user.email, phone='0100000000', address='1 School Road',
+        city='Dhaka', state='Dhaka', postal_code='1000', joining_date=date(2020, 1, 1),
+        designation='Teacher', department='Science', qualification='MSc',
+    )
+
+
+def make_student(tenant, number):
+    username = f"{tenant.slug}-student-{number}"
+    user = User.objects.create_user(username=username, email=f"{username}@example.com")
+    return Student.objects.create(
+        user=user, tenant=tenant, student_id=f"{tenant.slug}-{number}",
+        admission_number=f"{tenant.slug}-A{number}", first_name='Student',
+        last_name=str(number), date_of_birth=date(2012, 1, 1), gender='M',
+        address='1 School Road', city='Dhaka', state='Dhaka',
+        postal_code='1000', admission_date=date(2024, 1, 1),
+    )
+
+
+def make_course(teacher, code):
+    year, _ = AcademicYear.objects.get_or_create(
+        name='2026', defaults={'start_date': date(2026, 1, 1), 'end_date': date(2026, 12, 31)}
+    )
+    klass = Class.objects.create(name=f'Class {code}', code=code, academic_year=year)
+    subject = Subject.objects.create(name='Science', code=f'SCI-{code}')
+    return Course.objects.create(
+        subject=subject, class_enrolled=klass, teacher=teacher, academic_year='2026'
+    )
+
+
+def session_item(course, start=time(9, 0)):
+    return {
+        'id': uuid.uuid4(), 'course_id': course.pk, 'date': date(2026, 10, 19),
+        'start_time': start, 'end_time': time(10, 0),
+    }
+
+
+def record_item(session_id, student, status, modified_at):
+    return {
+        'id': uuid.uuid4(), 'session_id': session_id, 'student_id': student.pk,
+        'status': status, 'modified_at': modified_at,
+    }
+
+
+class SyncEngineTests(TestCase):
+    def setUp(self):
+        self.tenant = make_tenant('north')
+        self.teacher = make_teacher(self.tenant, 1)
+        self.course = make_course(self.teacher, '7A')
+        self.students = [make_student(self.tenant, number) for number in range(2)]
+        self.engine = AttendanceSyncEngine(teacher=self.teacher, tenant=self.tenant)
+        self.session = session_item(self.course)
+        self.engine.sync([self.session], [])
+        self.now = timezone.now()
+
+    def sync_records(self, *records, engine=None):
+        return (engine or self.engine).sync([], list(records))
+
+    def test_last_writer_wins(self):
+        student = self.students[0]
+        self.sync_records(record_item(self.session['id'], student, 'present', self.now))
+        stale = self.sync_records(
+            record_item(self.session['id'], student, 'absent', self.now - timedelta(minutes=5))
+        )
+        self.assertEqual(stale['results'][0]['result'], 'unchanged')
+        newer = self.sync_records(
+            record_item(self.session['id'], student, 'late', self.now + timedelta(minutes=5))
+        )
+        self.assertEqual(newer['results'][0]['result'], 'updated')
+        record = AttendanceRecord.objects.get(student=student)
+        self.assertEqual(record.status, 'late')
+
+    def test_replaying_a_batch_changes_nothing(self):
+        item = record_item(self.session['id'], self.students[0], 'present', self.now)
+        self.sync_records(dict(item))
+        again = self.sync_records(dict(item))
+        self.assertEqual(again['results'][0]['result'], 'unchanged')
+        self.assertEqual(AttendanceRecord.objects.count(), 1)
+
+    def test_cursor_pages_through_changes(self):
+        for student in self.students:
+            self.sync_records(record_item(self.session['id'], student, 'present', self.now))
+        rows, cursor, has_more = self.engine.changes_since(limit=1)
+        self.assertTrue(has_more)
+        rest, cursor, has_more = self.engine.changes_since(cursor, limit=1)
+        self.assertFalse(has_more)
+        self.assertEqual(
+            {rows[0]['student_id'], rest[0]['student_id']},
+            {student.pk for student in self.students},
+        )
+        self.assertEqual(self.engine.changes_since(cursor)[0], [])
+
+    def test_other_tenants_students_are_rejected(self):
+        outsider = make_student(make_tenant('south'), 1)
+        result = self.sync_records(record_item(self.session['id'], outsider, 'present', self.now))
+        self.assertEqual(result['results'][0]['result'], 'rejected')
+        self.assertFalse(AttendanceRecord.objects.exists())
+
+    def test_other_teachers_sessions_are_rejected(self):
+        other = make_teacher(self.tenant, 2)
+        other_session = session_item(make_course(other, '7B'))
+        AttendanceSyncEngine(teacher=other, tenant=self.tenant).sync([other_session], [])
+
+        result = self.sync_records(
+            record_item(other_session['id'], self.students[0], 'absent', self.now)
+        )
+        self.assertEqual(result['results'][0]['error'], 'Unknown session')
+        self.assertFalse(AttendanceRecord.objects.exists())
+
+    def test_sessions_for_other_teachers_courses_are_not_created(self):
+        other_course = make_course(make_teacher(self.tenant, 2), '7B')
+        item = session_item(other_course)
+        result = self.engine.sync(
+            [item], [record_item(item['id'], self.students[0], 'present', self.now)]
+        )
+        self.assertEqual(result['results'][0]['result'], 'rejected')
+        self.assertFalse(other_course.attendance_sessions.exists())
+
+    def test_changes_are_scoped_to_the_tenant(self):
+        self.sync_records(record_item(self.session['id'], self.students[0], 'present', self.now))
+        south = make_tenant('south')
+        south_engine = AttendanceSyncEngine(teacher=make_teacher(south, 1), tenant=south)
+        self.assertEqual(south_engine.changes_since()[0], [])
+
+
+class SyncViewTests(TestCase):
+    def test_teacher_without_tenant_is_refused(self):
+        teacher = make_teacher(make_tenant('north'), 1)
+        teacher.user.tenant = None
+        teacher.user.save()
+        request = APIRequestFactory().post(
+            '/api/attendance/records/sync/', {'sessions': [], 'records': []}, format='json'
+        )
+        force_authenticate(request, teacher.user)
+        response = AttendanceRecordViewSet.as_view({'post': 'sync'})(request)
+        self.assertEqual(response.status_code, 403)
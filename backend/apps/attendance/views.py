@@ -1,4 +1,4 @@
-from rest_framework import viewsets, permissions, filters
+from rest_framework import viewsets, permissions, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
@@ -6,11 +6,13 @@ from django_filters.rest_framework import DjangoFilterBackend
 from django.utils import timezone
 from datetime import timedelta
 
+from core.parsers import CompressedJSONParser
 from .models import AttendanceRecord, AttendanceReport, AttendanceSession
 from .serializers import (
     AttendanceRecordSerializer, AttendanceReportSerializer,
-    AttendanceSessionSerializer
+    AttendanceSessionSerializer, AttendanceSyncSerializer
 )
+from .sync import AttendanceSyncEngine, SyncError
 
 
 class AttendanceViewSet(viewsets.ModelViewSet):
@@ -163,6 +165,48 @@ class AttendanceRecordViewSet(viewsets.ModelViewSet):
             )
         return AttendanceRecord.objects.none()
 
+    @action(
+        detail=False, methods=['post'],
+        parser_classes=[CompressedJSONParser]
+    )
+    def sync(self, request):
+        """
+        Push an offline batch of sessions/records and pull server changes.
+
+        The body may be gzip or deflate compressed (Content-Encoding).
+        Replaying the same batch is safe: records are keyed by
+        (session, student) and only newer ``modified_at`` values win.
+        """
+        teacher = getattr(request.user, 'teacher_user', None)
+        if teacher is None:
+            return Response(
+                {'error': 'Only teachers can sync attendance'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        serializer = AttendanceSyncSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        tenant = None if request.user.is_superuser else request.user.tenant
+        if tenant is None and not request.user.is_superuser:
+            return Response(
+                {'error': 'Your account is not linked to a tenant'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        engine = AttendanceSyncEngine(teacher=teacher, tenant=tenant)
+        try:
+            result = engine.sync(
+                data.get('sessions', []),
+                data.get('records', []),
+                data.get('cursor')
+            )
+        except SyncError as e:
+            return Response(
+                {'error': str(e)}, status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(result)
+
 
 class AttendanceReportViewSet(viewsets.ModelViewSet):
     """Attendance Report Management"""
@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.utils.html import format_html
 from .models import (
     Plan, Subscription, Fee, Invoice, InvoiceItem, Payment, Transaction,
-    BillingSettings
+    BillingSettings, BillingRun, DailyRevenue, AgeingBucket
 )
 
 
@@ -112,7 +112,8 @@ class InvoiceAdmin(admin.ModelAdmin):
         }),
         ('Amounts', {
             'fields': (
-                'subtotal', 'tax_amount', 'discount_amount', 'total_amount'
+                'subtotal', 'tax_amount', 'discount_amount', 'late_fee_amount',
+                'total_amount'
             )
         }),
         ('Dates', {
@@ -307,6 +308,56 @@ class TransactionAdmin(admin.ModelAdmin):
     transaction_type_display.short_description = 'Type'
 
 
+@admin.register(BillingRun)
+class BillingRunAdmin(admin.ModelAdmin):
+    list_display = [
+        'reference', 'tenant', 'status', 'student_count', 'created_count',
+        'skipped_count', 'total_amount', 'due_date', 'completed_at'
+    ]
+    list_filter = ['status', 'created_at']
+    search_fields = ['reference', 'tenant__name']
+    filter_horizontal = ['fees']
+    readonly_fields = [
+        'student_count', 'created_count', 'skipped_count', 'last_student_id',
+        'total_amount', 'error_message', 'started_at', 'completed_at',
+        'created_at', 'updated_at'
+    ]
+    list_select_related = ['tenant']
+
+
+@admin.register(DailyRevenue)
+class DailyRevenueAdmin(admin.ModelAdmin):
+    list_display = ['date', 'tenant', 'revenue', 'payment_count', 'updated_at']
+    list_filter = ['date']
+    search_fields = ['tenant__name']
+    date_hierarchy = 'date'
+    list_select_related = ['tenant']
+
+    def has_add_permission(self, request):
+        # Rows are derived from payments
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(AgeingBucket)
+class AgeingBucketAdmin(admin.ModelAdmin):
+    list_display = [
+        'tenant', 'student', 'not_due', 'days_0_30', 'days_31_60',
+        'days_61_90', 'days_over_90', 'total_overdue', 'reminded_at'
+    ]
+    search_fields = ['tenant__name', 'student__first_name', 'student__last_name']
+    list_select_related = ['tenant', 'student']
+
+    def has_add_permission(self, request):
+        # Rows are rebuilt by the daily ageing sweep
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(BillingSettings)
 class BillingSettingsAdmin(admin.ModelAdmin):
     list_display = [
@@ -0,0 +1,229 @@
+"""
+Receivables ageing.
+
+A daily sweep replaces the save-time overdue checks: past-due invoices
+move to ``overdue`` and lapsed subscriptions to ``expired`` with one
+UPDATE each, late fees are charged with one UPDATE per distinct tenant
+fee policy, and the outstanding balance of every tenant and student is
+split into 0-30, 31-60, 61-90 and 90+ day buckets by a single grouped
+query and stored in ``AgeingBucket``. Reminder digests, one per payer
+listing all their overdue invoices, are built from the bucket table and
+handed to the mail queue in batches.
+"""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (
+    Count, DecimalField, Exists, F, Max, Min, OuterRef, Q, Sum, Value,
+)
+from django.db.models.functions import Coalesce, Round
+from django.utils import timezone
+
+from .metrics import open_invoices
+from .models import AgeingBucket, BillingSettings, Invoice, Subscription
+
+logger = logging.getLogger(__name__)
+
+# (field, first day past due, last day past due)
+BUCKETS = (
+    ('days_0_30', 0, 30),
+    ('days_31_60', 31, 60),
+    ('days_61_90', 61, 90),
+    ('days_over_90', 91, None),
+)
+BUCKET_FIELDS = [field for field, _, _ in BUCKETS]
+REMINDER_INTERVAL = timedelta(days=7)
+REMINDER_BATCH_SIZE = 100
+
+_money = DecimalField(max_digits=14, decimal_places=2)
+_zero = Value(Decimal('0.00'), output_field=_money)
+
+
+def bucket_filter(field, now):
+    """Invoices whose days past due fall in bucket ``field``."""
+    for name, first, last in BUCKETS:
+        if name == field:
+            if first:
+                condition = Q(due_date__lte=now - timedelta(days=first))
+            else:
+                condition = Q(due_date__lt=now)
+            if last is not None:
+                condition &= Q(due_date__gt=now - timedelta(days=last + 1))
+            return condition
+    raise ValueError(f"Unknown ageing bucket: {field}")
+
+
+def arrears_filter(field=None):
+    """
+    Invoices of payers the bucket table shows in arrears. With ``field``,
+    only payers with arrears in that bucket, and only their invoices in
+    it as of the sweep that built the table.
+    """
+    buckets = AgeingBucket.objects.filter(total_overdue__gt=0)
+    if field:
+        buckets = buckets.filter(**{f'{field}__gt': 0})
+    payers = buckets.filter(tenant=OuterRef('tenant'))
+    condition = Exists(payers.filter(student=OuterRef('student'))) | (
+        Q(student__isnull=True) & Exists(payers.filter(student__isnull=True))
+    )
+    if field:
+        swept_at = AgeingBucket.objects.aggregate(at=Max('computed_at'))['at']
+        condition &= bucket_filter(field, swept_at or timezone.now())
+    return condition
+
+
+def mark_overdue(now):
+    """Move every open invoice past its due date to ``overdue``."""
+    return Invoice.objects.filter(
+        status__in=('sent', 'partially_paid'), due_date__lt=now
+    ).update(status='overdue', updated_at=now)
+
+
+def expire_subscriptions(now):
+    """Move every active subscription past its end date to ``expired``."""
+    return Subscription.objects.filter(
+        status='active', end_date__lte=now
+    ).update(status='expired', updated_at=now)
+
+
+def apply_late_fees(now):
+    """
+    Charge the tenant's late fee once on each invoice overdue beyond the
+    grace period, as a percentage of the invoice total.
+    """
+    policies = defaultdict(list)
+    for tenant_id, rate, grace in BillingSettings.objects.filter(
+        late_fee_rate__gt=0
+    ).values_list('tenant_id', 'late_fee_rate', 'grace_period_days'):
+        policies[(rate, grace)].append(tenant_id)
+
+    charged = 0
+    for (rate, grace), tenant_ids in policies.items():
+        fee = Round(F('total_amount') * rate / 100, 2, output_field=_money)
+        charged += Invoice.objects.filter(
+            tenant_id__in=tenant_ids,
+            status='overdue',
+            late_fee_amount=0,
+            due_date__lt=now - timedelta(days=grace),
+        ).update(
+            late_fee_amount=fee,
+            total_amount=F('total_amount') + fee,
+            updated_at=now,
+        )
+    return charged
+
+
+def ageing_rows(now):
+    """Outstanding per tenant and student, split by bucket, in one query."""
+    outstanding = F('total_amount') - F('paid')
+    overdue = Q(due_date__lt=now)
+    return open_invoices().order_by().values('tenant_id', 'student_id').annotate(
+        not_due=Coalesce(Sum(outstanding, filter=~overdue), _zero),
+        **{
+            field: Coalesce(Sum(outstanding, filter=bucket_filter(field, now)), _zero)
+            for field in BUCKET_FIELDS
+        },
+        total_overdue=Coalesce(Sum(outstanding, filter=overdue), _zero),
+        overdue_count=Count('pk', filter=overdue),
+        oldest_due_date=Min('due_date', filter=overdue),
+    )
+
+
+def refresh_ageing(now):
+    """Rebuild the bucket table, keeping when each payer was last reminded."""
+    reminded = {
+        (tenant_id, student_id): reminded_at
+        for tenant_id, student_id, reminded_at in AgeingBucket.objects.filter(
+            reminded_at__isnull=False
+        ).values_list('tenant_id', 'student_id', 'reminded_at')
+    }
+    buckets = []
+    for row in ageing_rows(now):
+        if row['not_due'] <= 0 and row['total_overdue'] <= 0:
+            continue
+        key = (row['tenant_id'], row['student_id'])
+        # A payer who has cleared their arrears starts afresh.
+        row['reminded_at'] = reminded.get(key) if row['total_overdue'] > 0 else None
+        buckets.append(AgeingBucket(**row, computed_at=now))
+
+    with transaction.atomic():
+        AgeingBucket.objects.all().delete()
+        AgeingBucket.objects.bulk_create(buckets, batch_size=1000)
+    return len(buckets)
+
+
+def reminder_digests(now):
+    """
+    One reminder per payer with arrears who has not been reminded in the
+    last week. Returns the mail messages and the bucket rows they cover.
+    """
+    due = list(
+        AgeingBucket.objects.filter(total_overdue__gt=0)
+        .filter(Q(reminded_at__isnull=True) | Q(reminded_at__lt=now - REMINDER_INTERVAL))
+        .exclude(tenant__billing_settings__send_payment_reminders=False)
+        .select_related('tenant', 'student')
+    )
+    if not due:
+        return [], []
+
+    invoices = defaultdict(list)
+    for invoice in open_invoices().filter(
+        status='overdue', tenant_id__in={bucket.tenant_id for bucket in due}
+    ).order_by('due_date').values(
+        'tenant_id', 'student_id', 'invoice_number', 'total_amount', 'paid',
+        'due_date',
+    ):
+        invoices[(invoice['tenant_id'], invoice['student_id'])].append(invoice)
+
+    messages, covered = [], []
+    for bucket in due:
+        student, tenant = bucket.student, bucket.tenant
+        recipient = (student and student.email) or tenant.email
+        lines = invoices.get((bucket.tenant_id, bucket.student_id))
+        if not recipient or not lines:
+            continue
+        name = f"{student.first_name} {student.last_name}" if student else tenant.name
+        body = "\n".join(
+            f"- {line['invoice_number']}: ${line['total_amount'] - line['paid']} "
+            f"due {line['due_date']:%Y-%m-%d} "
+            f"({(now - line['due_date']).days} days overdue)"
+            for line in lines
+        )
+        messages.append((
+            f"Payment Reminder - ${bucket.total_overdue} overdue",
+            f"Dear {name},\n\n"
+            f"The following invoices are overdue:\n\n{body}\n\n"
+            f"Total overdue: ${bucket.total_overdue}\n\n"
+            f"Please make the payment as soon as possible to avoid additional "
+            f"late fees.\n\nBest regards,\nEduCore Ultra Billing Team\n",
+            settings.DEFAULT_FROM_EMAIL,
+            [recipient],
+        ))
+        covered.append(bucket.pk)
+    return messages, covered
+
+
+def sweep(now=None):
+    """
+    Daily run: age invoices and subscriptions, charge late fees, rebuild
+    the bucket table and build the reminder digests.
+    """
+    now = now or timezone.now()
+    result = {
+        'overdue': mark_overdue(now),
+        'expired': expire_subscriptions(now),
+        'late_fees': apply_late_fees(now),
+        'buckets': refresh_ageing(now),
+    }
+    result['messages'], result['reminded_ids'] = reminder_digests(now)
+    logger.info(
+        f"Ageing sweep: {result['overdue']} invoices overdue, "
+        f"{result['expired']} subscriptions expired, {result['late_fees']} "
+        f"late fees, {result['buckets']} buckets, "
+        f"{len(result['messages'])} reminders"
+    )
+    return result
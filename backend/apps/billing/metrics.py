@@ -0,0 +1,203 @@
+"""
+Billing metrics.
+
+Dashboard figures come from one conditional-aggregate query each over
+invoices, payments and subscriptions. Revenue trends read the
+``DailyRevenue`` fact table, one row per tenant and day, which is
+refreshed for the affected day whenever a payment is written and
+reconciled nightly for the last few days. A year-long series is then a
+grouped read over at most 365 rows per tenant instead of a scan of
+every payment.
+"""
+import logging
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import (
+    Count, DateField, DecimalField, OuterRef, Q, Subquery, Sum, Value,
+)
+from django.db.models.functions import Coalesce, TruncDate, TruncMonth
+from django.utils import timezone
+
+from .models import DailyRevenue, Invoice, Payment, Subscription
+
+logger = logging.getLogger(__name__)
+
+# Payments count towards the day they were completed on.
+REVENUE_DAY = TruncDate(Coalesce('processed_date', 'payment_date'))
+RECONCILE_DAYS = 7
+OPEN_STATUSES = ('sent', 'overdue', 'partially_paid')
+
+_money = DecimalField(max_digits=14, decimal_places=2)
+_zero = Value(Decimal('0.00'), output_field=_money)
+
+
+def open_invoices(tenant=None):
+    """Open invoices annotated with what is still owed on them."""
+    paid = Payment.objects.filter(
+        invoice=OuterRef('pk'), status='completed'
+    ).order_by().values('invoice').annotate(total=Sum('amount')).values('total')
+    invoices = Invoice.objects.filter(status__in=OPEN_STATUSES)
+    if tenant is not None:
+        invoices = invoices.filter(tenant=tenant)
+    return invoices.annotate(
+        paid=Coalesce(Subquery(paid, output_field=_money), Value(Decimal('0')),
+                      output_field=_money)
+    )
+
+
+def revenue_day(payment):
+    """The fact-table day a payment's revenue is booked on."""
+    return timezone.localdate(payment.processed_date or payment.payment_date)
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def revenue_rows(payments):
+    """Completed revenue grouped by tenant and day."""
+    return payments.filter(status='completed').annotate(
+        day=REVENUE_DAY
+    ).order_by().values('invoice__tenant_id', 'day').annotate(
+        revenue=Sum('amount'), payment_count=Count('pk')
+    )
+
+
+def refresh_daily_revenue(days, tenant_ids=None):
+    """
+    Recompute the fact rows for ``days`` (and ``tenant_ids``, all tenants
+    when ``None``) from the payments table. Returns the rows written.
+    """
+    days = sorted(set(days))
+    if not days:
+        return 0
+    start, end = _day_start(days[0]), _day_start(days[-1] + timedelta(days=1))
+    payments = Payment.objects.filter(
+        Q(processed_date__gte=start, processed_date__lt=end)
+        | Q(processed_date__isnull=True, payment_date__gte=start,
+            payment_date__lt=end)
+    )
+    facts = DailyRevenue.objects.filter(date__in=days)
+    if tenant_ids is not None:
+        payments = payments.filter(invoice__tenant_id__in=tenant_ids)
+        facts = facts.filter(tenant_id__in=tenant_ids)
+
+    rows = [
+        DailyRevenue(
+            tenant_id=row['invoice__tenant_id'],
+            date=row['day'],
+            revenue=row['revenue'],
+            payment_count=row['payment_count'],
+        )
+        for row in revenue_rows(payments)
+        if row['day'] in days
+    ]
+    keep = {(row.tenant_id, row.date) for row in rows}
+    with transaction.atomic():
+        # Days whose last completed payment was refunded or deleted.
+        facts.filter(pk__in=[
+            pk for pk, tenant_id, date in facts.values_list('pk', 'tenant_id', 'date')
+            if (tenant_id, date) not in keep
+        ]).delete()
+        DailyRevenue.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['tenant', 'date'],
+            update_fields=['revenue', 'payment_count', 'updated_at'],
+        )
+    return len(rows)
+
+
+def reconcile_daily_revenue(days=RECONCILE_DAYS, today=None):
+    """
+    Refresh the last ``days`` days for every tenant, picking up payments
+    changed with ``QuerySet.update`` or moved to another day.
+    """
+    today = today or timezone.localdate()
+    written = refresh_daily_revenue(
+        [today - timedelta(days=offset) for offset in range(days)]
+    )
+    logger.info(f"Reconciled {written} daily revenue rows over {days} days")
+    return written
+
+
+def dashboard_figures(tenant_id=None):
+    """Dashboard figures in one aggregate query per table."""
+    invoices = Invoice.objects.all()
+    payments = Payment.objects.all()
+    subscriptions = Subscription.objects.all()
+    if tenant_id is not None:
+        invoices = invoices.filter(tenant_id=tenant_id)
+        payments = payments.filter(invoice__tenant_id=tenant_id)
+        subscriptions = subscriptions.filter(tenant_id=tenant_id)
+
+    pending, overdue = Q(status='sent'), Q(status='overdue')
+    figures = invoices.aggregate(
+        total_invoices=Count('pk'),
+        pending_invoices=Count('pk', filter=pending),
+        overdue_invoices=Count('pk', filter=overdue),
+        pending_amount=Coalesce(Sum('total_amount', filter=pending), _zero),
+        overdue_amount=Coalesce(Sum('total_amount', filter=overdue), _zero),
+    )
+    figures.update(payments.aggregate(
+        total_payments=Count('pk'),
+        total_revenue=Coalesce(
+            Sum('amount', filter=Q(status='completed')), _zero
+        ),
+    ))
+    active = Q(status='active')
+    figures.update(subscriptions.aggregate(
+        active_subscriptions=Count('pk', filter=active),
+        expiring_subscriptions=Count('pk', filter=active & Q(
+            end_date__lte=timezone.now() + timedelta(days=30)
+        )),
+    ))
+    return figures
+
+
+def month_starts(months, today=None):
+    """First days of the last ``months`` calendar months, newest first."""
+    month = (today or timezone.localdate()).replace(day=1)
+    starts = []
+    for _ in range(months):
+        starts.append(month)
+        month = (month - timedelta(days=1)).replace(day=1)
+    return starts
+
+
+def revenue_trends(months=12, tenant_id=None, today=None):
+    """
+    Revenue, payment and invoice counts per calendar month, newest first:
+    one grouped read of the fact table and one of invoices.
+    """
+    starts = month_starts(months, today)
+    facts = DailyRevenue.objects.filter(date__gte=starts[-1])
+    invoices = Invoice.objects.filter(issue_date__gte=_day_start(starts[-1]))
+    if tenant_id is not None:
+        facts = facts.filter(tenant_id=tenant_id)
+        invoices = invoices.filter(tenant_id=tenant_id)
+
+    revenue = {
+        row['month']: row
+        for row in facts.annotate(month=TruncMonth('date')).order_by()
+        .values('month').annotate(
+            revenue=Sum('revenue'), payment_count=Sum('payment_count')
+        )
+    }
+    invoice_counts = dict(
+        invoices.annotate(
+            month=TruncMonth('issue_date', output_field=DateField())
+        ).order_by().values('month').annotate(count=Count('pk'))
+        .values_list('month', 'count')
+    )
+    return [
+        {
+            'period': start.strftime('%Y-%m'),
+            'revenue': revenue.get(start, {}).get('revenue') or Decimal('0.00'),
+            'invoice_count': invoice_counts.get(start, 0),
+            'payment_count': revenue.get(start, {}).get('payment_count') or 0,
+        }
+        for start in starts
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce, TruncDate
+
+
+def backfill_daily_revenue(apps, schema_editor):
+    Payment = apps.get_model('billing', 'Payment')
+    DailyRevenue = apps.get_model('billing', 'DailyRevenue')
+    rows = Payment.objects.filter(status='completed').annotate(
+        day=TruncDate(Coalesce('processed_date', 'payment_date'))
+    ).order_by().values('invoice__tenant_id', 'day').annotate(
+        revenue=Sum('amount'), payment_count=Count('pk')
+    )
+    DailyRevenue.objects.bulk_create(
+        [
+            DailyRevenue(
+                tenant_id=row['invoice__tenant_id'], date=row['day'],
+                revenue=row['revenue'], payment_count=row['payment_count'],
+            )
+            for row in rows
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0002_billing_runs'),
+        ('tenants', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('payment_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_revenue', to='tenants.tenant')),
+            ],
+            options={
+                'verbose_name': 'Daily Revenue',
+                'verbose_name_plural': 'Daily Revenue',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['date'], name='billing_dai_date_b41a49_idx')],
+                'constraints': [models.UniqueConstraint(fields=('tenant', 'date'), name='unique_daily_revenue')],
+            },
+        ),
+        migrations.RunPython(backfill_daily_revenue, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0003_daily_revenue'),
+        ('students', '0001_initial'),
+        ('tenants', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='late_fee_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.CreateModel(
+            name='AgeingBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('not_due', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('days_0_30', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('days_31_60', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('days_61_90', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('days_over_90', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_overdue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('overdue_count', models.PositiveIntegerField(default=0)),
+                ('oldest_due_date', models.DateTimeField(blank=True, null=True)),
+                ('reminded_at', models.DateTimeField(blank=True, null=True)),
+                ('computed_at', models.DateTimeField()),
+                ('student', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='ageing_buckets', to='students.student')),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ageing_buckets', to='tenants.tenant')),
+            ],
+            options={
+                'verbose_name': 'Ageing Bucket',
+                'verbose_name_plural': 'Ageing Buckets',
+                'ordering': ['-total_overdue'],
+                'indexes': [models.Index(fields=['tenant', '-total_overdue'], name='billing_age_tenant__433346_idx')],
+            },
+        ),
+    ]
@@ -159,6 +159,73 @@ class Fee(models.Model):
         return f"{self.name} - ${self.amount}"
 
 
+class BillingRun(models.Model):
+    """Ledger entry for one batch invoicing run over a student cohort"""
+    STATUS_CHOICES = [
+        ('pending', _('Pending')),
+        ('running', _('Running')),
+        ('completed', _('Completed')),
+        ('failed', _('Failed')),
+    ]
+
+    tenant = models.ForeignKey(
+        'tenants.Tenant', on_delete=models.CASCADE,
+        related_name='billing_runs'
+    )
+    reference = models.CharField(
+        max_length=50, help_text="Unique per tenant, e.g. 2025-T1"
+    )
+    fees = models.ManyToManyField(Fee, related_name='billing_runs')
+    student_class = models.ForeignKey(
+        'classes.Class', on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='billing_runs',
+        help_text="Limit the cohort to one class"
+    )
+    academic_year = models.ForeignKey(
+        'academic_years.AcademicYear', on_delete=models.SET_NULL, null=True,
+        blank=True, related_name='billing_runs',
+        help_text="Limit the cohort to one academic year"
+    )
+    due_date = models.DateTimeField()
+    notes = models.TextField(blank=True)
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default='pending'
+    )
+
+    # Progress, kept per chunk so an interrupted run can resume
+    student_count = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    skipped_count = models.PositiveIntegerField(default=0)
+    last_student_id = models.BigIntegerField(null=True, blank=True)
+    total_amount = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0
+    )
+    error_message = models.TextField(blank=True)
+
+    started_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='billing_runs'
+    )
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _("Billing Run")
+        verbose_name_plural = _("Billing Runs")
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['tenant', 'reference'],
+                name='unique_billing_run_reference'
+            ),
+        ]
+
+    def __str__(self):
+        return f"Billing run {self.reference} ({self.status})"
+
+
 class Invoice(models.Model):
     """Invoice model"""
     STATUS_CHOICES = [
@@ -182,6 +249,10 @@ class Invoice(models.Model):
         Subscription, on_delete=models.SET_NULL, null=True, blank=True,
         related_name='invoices'
     )
+    billing_run = models.ForeignKey(
+        BillingRun, on_delete=models.PROTECT, null=True, blank=True,
+        related_name='invoices'
+    )
     status = models.CharField(
         max_length=20, choices=STATUS_CHOICES, default='draft'
     )
@@ -197,6 +268,9 @@ class Invoice(models.Model):
     discount_amount = models.DecimalField(
         max_digits=10, decimal_places=2, default=0
     )
+    late_fee_amount = models.DecimalField(
+        max_digits=10, decimal_places=2, default=0
+    )
     total_amount = models.DecimalField(
         max_digits=10, decimal_places=2, default=0
     )
@@ -208,6 +282,13 @@ class Invoice(models.Model):
         verbose_name = _("Invoice")
         verbose_name_plural = _("Invoices")
         ordering = ['-issue_date']
+        constraints = [
+            # One invoice per student per run, so a re-run skips them.
+            models.UniqueConstraint(
+                fields=['billing_run', 'student'],
+                name='unique_billing_run_student'
+            ),
+        ]
 
     def __str__(self):
         return f"Invoice {self.invoice_number} - {self.tenant.name}"
@@ -233,6 +314,7 @@ class Invoice(models.Model):
         """Calculate total amount"""
         self.total_amount = (
             self.subtotal + self.tax_amount - self.discount_amount
+            + self.late_fee_amount
         )
         return self.total_amount
 
@@ -245,7 +327,7 @@ class Invoice(models.Model):
     @property
     def is_overdue(self):
         return (
-            self.status in ['sent', 'partially_paid'] and
+            self.status in ['sent', 'partially_paid', 'overdue'] and
             timezone.now() > self.due_date
         )
 
@@ -371,6 +453,67 @@ class Payment(models.Model):
             self.invoice.mark_as_paid()
 
 
+class DailyRevenue(models.Model):
+    """Completed payments per tenant and day, kept current on payment writes"""
+    tenant = models.ForeignKey(
+        'tenants.Tenant', on_delete=models.CASCADE,
+        related_name='daily_revenue'
+    )
+    date = models.DateField()
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    payment_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _("Daily Revenue")
+        verbose_name_plural = _("Daily Revenue")
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['tenant', 'date'], name='unique_daily_revenue'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['date']),
+        ]
+
+    def __str__(self):
+        return f"{self.tenant_id} {self.date}: ${self.revenue}"
+
+
+class AgeingBucket(models.Model):
+    """Outstanding receivables per tenant and student, by days past due"""
+    tenant = models.ForeignKey(
+        'tenants.Tenant', on_delete=models.CASCADE,
+        related_name='ageing_buckets'
+    )
+    student = models.ForeignKey(
+        'students.Student', on_delete=models.CASCADE, null=True, blank=True,
+        related_name='ageing_buckets'
+    )
+    not_due = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    days_0_30 = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    days_31_60 = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    days_61_90 = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    days_over_90 = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_overdue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    overdue_count = models.PositiveIntegerField(default=0)
+    oldest_due_date = models.DateTimeField(null=True, blank=True)
+    reminded_at = models.DateTimeField(null=True, blank=True)
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = _("Ageing Bucket")
+        verbose_name_plural = _("Ageing Buckets")
+        ordering = ['-total_overdue']
+        indexes = [
+            models.Index(fields=['tenant', '-total_overdue']),
+        ]
+
+    def __str__(self):
+        return f"Ageing {self.tenant_id}/{self.student_id}: ${self.total_overdue} overdue"
+
+
 class Transaction(models.Model):
     """Transaction model for financial tracking"""
     TRANSACTION_TYPES = [
@@ -0,0 +1,474 @@
+"""
+Bank and gateway statement reconciliation.
+
+Statement files (CSV, OFX or MT940) are parsed line by line into credit
+entries. Each entry is matched against the open invoices, which are
+loaded once into two hash indexes:
+
+* the invoice number, normalised to upper-case alphanumerics, looked up
+  at every ``INV`` occurrence in the entry's reference and narrative;
+* the outstanding amount, used when no reference is found. A single
+  invoice owing exactly the amount is a match; among several, the
+  fuzzy fallback compares misspelt references and the payer name with
+  the student's name and accepts a clear winner.
+
+Matched entries become completed ``Payment`` rows with their income
+``Transaction`` in one transaction with one status update per outcome,
+instead of a save and three signal round-trips per payment. Entries
+that cannot be matched are reported with the reason.
+
+Each payment records the line's bank reference, or for lines without
+one a fingerprint of the date, amount and narrative, so importing the
+same statement again books nothing twice.
+"""
+import codecs
+import csv
+import hashlib
+import logging
+import re
+from collections import Counter, defaultdict
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from difflib import SequenceMatcher
+
+from django.db import transaction
+from django.utils import timezone
+
+from .metrics import open_invoices, refresh_daily_revenue
+from .models import Invoice, Payment, Transaction
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('csv', 'ofx', 'mt940')
+REFERENCE_PREFIX = 'INV'
+# Amount buckets larger than this are too ambiguous to match by name.
+FUZZY_CANDIDATE_LIMIT = 200
+FUZZY_THRESHOLD = 0.85
+FUZZY_MARGIN = 0.1
+
+CSV_COLUMNS = {
+    'date': ('date', 'value date', 'booking date', 'transaction date', 'posted'),
+    'amount': ('amount', 'credit', 'credit amount', 'paid in'),
+    'debit': ('debit', 'debit amount', 'paid out'),
+    'reference': ('reference', 'ref', 'payment reference', 'customer reference'),
+    'description': ('description', 'narrative', 'details', 'memo', 'remarks'),
+    'payer': ('payer', 'name', 'counterparty', 'remitter', 'from'),
+    'bank_reference': ('transaction id', 'bank reference', 'id', 'fitid', 'utr'),
+}
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y', '%m/%d/%Y', '%Y%m%d')
+
+
+class ReconciliationError(Exception):
+    """Raised when a statement cannot be reconciled."""
+
+
+# Parsing
+
+def normalise(text):
+    return re.sub(r'[^A-Z0-9]', '', (text or '').upper())
+
+
+def parse_amount(value):
+    value = (value or '').strip().replace(' ', '')
+    if not value:
+        return None
+    if ',' in value and '.' not in value:
+        # MT940 and continental statements use a decimal comma.
+        value = value.replace(',', '.')
+    try:
+        return Decimal(value.replace(',', '')).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        return None
+
+
+def parse_date(value):
+    value = (value or '').strip()[:10]
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _entry(line, date, amount, reference='', description='', payer='',
+           bank_reference=''):
+    return {
+        'line': line,
+        'date': date,
+        'amount': amount,
+        'reference': reference.strip(),
+        'description': description.strip(),
+        'payer': payer.strip(),
+        'bank_reference': bank_reference.strip(),
+    }
+
+
+def _column(row, field):
+    for name in CSV_COLUMNS[field]:
+        if row.get(name):
+            return row[name]
+    return ''
+
+
+def parse_csv(lines):
+    """Credit entries from a CSV statement with a header row."""
+    reader = csv.DictReader(lines)
+    reader.fieldnames = [
+        (name or '').strip().lower() for name in reader.fieldnames or []
+    ]
+    for row in reader:
+        amount = parse_amount(_column(row, 'amount'))
+        if amount is None and _column(row, 'debit'):
+            continue
+        yield _entry(
+            reader.line_num, parse_date(_column(row, 'date')), amount,
+            _column(row, 'reference'), _column(row, 'description'),
+            _column(row, 'payer'), _column(row, 'bank_reference'),
+        )
+
+
+OFX_TAG = re.compile(r'<(/?[A-Z0-9.]+)>([^<\r\n]*)', re.IGNORECASE)
+
+
+def parse_ofx(lines):
+    """Credit entries from an OFX (SGML or XML) statement."""
+    fields, line_number = None, 0
+    for number, line in enumerate(lines, 1):
+        for tag, value in OFX_TAG.findall(line):
+            tag = tag.upper()
+            if tag == 'STMTTRN':
+                fields, line_number = {}, number
+            elif tag == '/STMTTRN' and fields is not None:
+                yield _entry(
+                    line_number, parse_date(fields.get('DTPOSTED', '')[:8]),
+                    parse_amount(fields.get('TRNAMT')),
+                    fields.get('REFNUM') or fields.get('CHECKNUM', ''),
+                    fields.get('MEMO', ''), fields.get('NAME', ''),
+                    fields.get('FITID', ''),
+                )
+                fields = None
+            elif fields is not None and not tag.startswith('/'):
+                fields[tag] = value.strip()
+
+
+MT940_STATEMENT_LINE = re.compile(
+    r'^:61:(?P<date>\d{6})(?:\d{4})?(?P<mark>R?[CD])[A-Z]?(?P<amount>[\d,]+)'
+    r'[A-Z]\w{3}(?P<reference>[^/]*)(?://(?P<bank_reference>.*))?'
+)
+
+
+def parse_mt940(lines):
+    """Credit entries from an MT940 statement (``:61:`` plus ``:86:``)."""
+    current, field = None, None
+    for number, line in enumerate(lines, 1):
+        line = line.rstrip('\r\n')
+        if line.startswith(':'):
+            field = line[:4]
+            if field == ':61:' or field in (':62F', ':62M', ':64:'):
+                if current is not None:
+                    yield current
+                current = None
+            if field == ':61:':
+                match = MT940_STATEMENT_LINE.match(line)
+                # Credits and reversed debits are incoming money.
+                if match and match['mark'] in ('C', 'RD'):
+                    current = _entry(
+                        number,
+                        datetime.strptime(match['date'], '%y%m%d').date(),
+                        parse_amount(match['amount']),
+                        match['reference'] if match['reference'] != 'NONREF' else '',
+                        bank_reference=match['bank_reference'] or '',
+                    )
+            elif field == ':86:' and current is not None:
+                current['description'] = line[4:].strip()
+        elif field == ':86:' and current is not None and not line.startswith('-'):
+            current['description'] += ' ' + line.strip()
+    if current is not None:
+        yield current
+
+
+def detect_format(name, first_line):
+    name = (name or '').lower()
+    if name.endswith(('.ofx', '.qfx')) or 'OFX' in first_line.upper():
+        return 'ofx'
+    if name.endswith(('.sta', '.940', '.mt940')) or first_line.startswith((':20:', '{1:')):
+        return 'mt940'
+    return 'csv'
+
+
+def parse_statement(stream, fmt=None, name=''):
+    """Yield credit entries from a statement file, detecting its format."""
+    lines = codecs.iterdecode(stream, 'utf-8-sig', errors='replace')
+    first = next(lines, '')
+    fmt = fmt or detect_format(name, first)
+    if fmt not in FORMATS:
+        raise ReconciliationError(f"Unsupported statement format: {fmt}")
+
+    def replay():
+        yield first
+        yield from lines
+
+    parser = {'csv': parse_csv, 'ofx': parse_ofx, 'mt940': parse_mt940}[fmt]
+    return fmt, parser(replay())
+
+
+def line_fingerprint(entry, occurrence):
+    """
+    Stable id for a line without a bank reference: its date, amount and
+    narrative, numbered among identical lines of the same statement.
+    """
+    key = '|'.join([
+        str(entry['date']), str(entry['amount']), normalise(entry['reference']),
+        normalise(entry['description']), normalise(entry['payer']),
+        str(occurrence),
+    ])
+    return f"LINE-{hashlib.sha1(key.encode()).hexdigest()[:32]}"
+
+
+def identify(entries):
+    """Set each entry's ``statement_id``, the key it is booked under."""
+    occurrences = Counter()
+    for entry in entries:
+        if entry['bank_reference']:
+            entry['statement_id'] = entry['bank_reference']
+            continue
+        line = (entry['date'], entry['amount'], normalise(entry['reference']),
+                normalise(entry['description']), normalise(entry['payer']))
+        occurrences[line] += 1
+        entry['statement_id'] = line_fingerprint(entry, occurrences[line])
+    return entries
+
+
+# Matching
+
+class InvoiceIndex:
+    """Open invoices hashed by normalised number and by outstanding amount."""
+
+    def __init__(self, invoices):
+        self.invoices = {}
+        self.by_reference = {}
+        self.by_amount = defaultdict(set)
+        for row in invoices.values(
+            'pk', 'invoice_number', 'tenant_id', 'total_amount', 'paid',
+            'student__first_name', 'student__last_name',
+        ):
+            row['outstanding'] = row['total_amount'] - row['paid']
+            if row['outstanding'] <= 0:
+                continue
+            row['key'] = normalise(row['invoice_number'])
+            row['name'] = normalise(
+                f"{row['student__first_name'] or ''}{row['student__last_name'] or ''}"
+            )
+            self.invoices[row['pk']] = row
+            self.by_reference[row['key']] = row['pk']
+            self.by_amount[row['outstanding']].add(row['pk'])
+        self.key_lengths = sorted({len(key) for key in self.by_reference}, reverse=True)
+
+    def reference_candidates(self, text):
+        """
+        ``INV``-prefixed substrings of ``text`` cut to each known key
+        length (shorter at the end of the text, e.g. a digit dropped).
+        """
+        text = normalise(text)
+        candidates = []
+        start = text.find(REFERENCE_PREFIX)
+        while start != -1:
+            # The word "invoice" itself is not a reference.
+            if text.startswith('INVOICE', start):
+                start = text.find(REFERENCE_PREFIX, start + 1)
+                continue
+            for length in self.key_lengths:
+                candidate = text[start:start + length]
+                if candidate not in candidates:
+                    candidates.append(candidate)
+            start = text.find(REFERENCE_PREFIX, start + 1)
+        return candidates
+
+    def allocate(self, pk, amount):
+        row = self.invoices[pk]
+        self.by_amount[row['outstanding']].discard(pk)
+        row['outstanding'] -= amount
+        if row['outstanding'] > 0:
+            self.by_amount[row['outstanding']].add(pk)
+
+    def match(self, entry):
+        """``(invoice_pk, method)`` for an entry, or ``(None, reason)``."""
+        amount = entry['amount']
+        references = self.reference_candidates(
+            f"{entry['reference']} {entry['description']}"
+        )
+        for candidate in references:
+            pk = self.by_reference.get(candidate)
+            if pk is None:
+                continue
+            if amount > self.invoices[pk]['outstanding']:
+                return None, f"exceeds amount owed on {self.invoices[pk]['invoice_number']}"
+            return pk, 'reference'
+
+        bucket = self.by_amount.get(amount) or set()
+        if not bucket:
+            return None, 'no open invoice for reference or amount'
+        # A reference that names no open invoice (a typo, or an invoice
+        # already paid) must not be overridden by the amount alone.
+        if len(bucket) == 1 and not references:
+            return next(iter(bucket)), 'amount'
+        if len(bucket) > FUZZY_CANDIDATE_LIMIT:
+            return None, f"{len(bucket)} open invoices owe this amount"
+        return self._fuzzy(entry, references, bucket)
+
+    def _fuzzy(self, entry, references, bucket):
+        payer = normalise(entry['payer'] or entry['description'])
+        scored = []
+        for pk in bucket:
+            row = self.invoices[pk]
+            scores = [SequenceMatcher(None, ref, row['key']).ratio() for ref in references]
+            if payer and row['name']:
+                scores.append(SequenceMatcher(None, payer, row['name']).ratio())
+            scored.append((max(scores, default=0), pk))
+        scored.sort(reverse=True)
+        best, pk = scored[0]
+        runner_up = scored[1][0] if len(scored) > 1 else 0
+        if best >= FUZZY_THRESHOLD and best - runner_up >= FUZZY_MARGIN:
+            return pk, 'fuzzy'
+        return None, f"{len(bucket)} open invoices owe this amount, none clearly named"
+
+
+# Applying
+
+def _apply(index, matches, user, fmt):
+    now = timezone.now()
+    payments, transactions = [], []
+    for entry, pk, method in matches:
+        payment = Payment(
+            invoice_id=pk,
+            amount=entry['amount'],
+            payment_method='bank_transfer',
+            status='completed',
+            transaction_id=entry['statement_id'],
+            gateway_response={
+                'statement_format': fmt,
+                'statement_line': entry['line'],
+                'value_date': entry['date'].isoformat() if entry['date'] else None,
+                'match': method,
+            },
+            paid_by=None,
+            processed_by=user,
+            processed_date=now,
+            notes=f"Reconciled from statement: {entry['reference'] or entry['description']}"[:500],
+        )
+        payment.payment_id = payment.generate_payment_id()
+        payments.append(payment)
+    Payment.objects.bulk_create(payments, batch_size=1000)
+
+    for payment in payments:
+        row = index.invoices[payment.invoice_id]
+        txn = Transaction(
+            tenant_id=row['tenant_id'],
+            transaction_type='income',
+            amount=payment.amount,
+            description=f"Payment for invoice {row['invoice_number']}",
+            reference=payment.payment_id,
+            payment=payment,
+            invoice_id=payment.invoice_id,
+            created_by=user,
+        )
+        txn.transaction_id = txn.generate_transaction_id()
+        transactions.append(txn)
+    Transaction.objects.bulk_create(transactions, batch_size=1000)
+
+    touched = {payment.invoice_id for payment in payments}
+    paid = [pk for pk in touched if index.invoices[pk]['outstanding'] <= 0]
+    Invoice.objects.filter(pk__in=paid).update(
+        status='paid', paid_date=now, updated_at=now
+    )
+    Invoice.objects.filter(pk__in=touched - set(paid)).update(
+        status='partially_paid', updated_at=now
+    )
+
+    tenant_ids = {index.invoices[pk]['tenant_id'] for pk in touched}
+    payment_ids = [payment.pk for payment in payments]
+    transaction.on_commit(lambda: refresh_daily_revenue(
+        [timezone.localdate(now)], tenant_ids=tenant_ids
+    ))
+    transaction.on_commit(lambda: _queue_confirmations(payment_ids))
+    return payments, len(paid)
+
+
+def _queue_confirmations(payment_ids):
+    from .tasks import send_payment_confirmations
+    send_payment_confirmations.delay(payment_ids)
+
+
+def reconcile_statement(stream, fmt=None, name='', tenant=None, user=None,
+                        dry_run=False):
+    """
+    Match a statement against open invoices and, unless ``dry_run``,
+    record every matched entry. Returns the reconciliation report.
+    """
+    fmt, entries = parse_statement(stream, fmt, name)
+    entries = identify(list(entries))
+
+    with transaction.atomic():
+        invoices = open_invoices(tenant)
+        if not dry_run:
+            invoices = invoices.select_for_update(of=('self',))
+        index = InvoiceIndex(invoices)
+
+        # Lines already booked by an earlier import of the same statement,
+        # read under the invoice locks: a concurrent import of the same
+        # file waits for this one to commit and then sees its payments.
+        booked = Payment.objects.filter(
+            payment_method='bank_transfer',
+            transaction_id__in={entry['statement_id'] for entry in entries},
+        )
+        if tenant is not None:
+            booked = booked.filter(invoice__tenant=tenant)
+        seen = set(booked.values_list('transaction_id', flat=True))
+
+        matches, unmatched, duplicates, skipped = [], [], [], 0
+        for entry in entries:
+            if entry['amount'] is None or entry['amount'] <= 0:
+                skipped += 1
+                continue
+            if entry['statement_id'] in seen:
+                duplicates.append(entry)
+                continue
+            seen.add(entry['statement_id'])
+            pk, method = index.match(entry)
+            if pk is None:
+                unmatched.append({**entry, 'reason': method})
+                continue
+            index.allocate(pk, entry['amount'])
+            matches.append((entry, pk, method))
+
+        paid_count = 0
+        if matches and not dry_run:
+            _, paid_count = _apply(index, matches, user, fmt)
+
+    report = {
+        'format': fmt,
+        'dry_run': dry_run,
+        'matched_count': len(matches),
+        'matched_amount': sum((entry['amount'] for entry, _, _ in matches), Decimal('0.00')),
+        'paid_invoices': paid_count,
+        'unmatched_count': len(unmatched),
+        'duplicate_count': len(duplicates),
+        'skipped_count': skipped,
+        'matched': [
+            {
+                'line': entry['line'],
+                'amount': entry['amount'],
+                'invoice': index.invoices[pk]['invoice_number'],
+                'method': method,
+            }
+            for entry, pk, method in matches
+        ],
+        'unmatched': unmatched,
+    }
+    logger.info(
+        f"Statement reconciliation ({fmt}{', dry run' if dry_run else ''}): "
+        f"{len(matches)} matched, {len(unmatched)} unmatched, "
+        f"{len(duplicates)} duplicates"
+    )
+    return report
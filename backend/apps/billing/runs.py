@@ -0,0 +1,256 @@
+"""
+Batch fee invoicing.
+
+A ``BillingRun`` bills a fee schedule to a student cohort (a tenant's
+active students, optionally narrowed to one class and academic year).
+Invoices and their items are computed in memory and inserted with
+``bulk_create`` in keyset-paginated chunks. Invoice numbers are derived
+from the run and the student, and the (run, student) unique constraint
+makes re-runs skip students already invoiced. A worker claims the run
+with a conditional status update, so a run is never billed by two
+workers at once. Progress is recorded on
+the run after every chunk, so an interrupted run resumes where it
+stopped, and notifications are queued in batches once a chunk commits.
+
+Each progress update doubles as a heartbeat: a ``running`` run whose
+``updated_at`` is older than ``STALE_CLAIM_TIMEOUT`` was abandoned by
+its worker (killed mid-run) and can be claimed again. Progress updates
+are conditional on the claim's last heartbeat, so a worker whose claim
+was taken over rolls its chunk back instead of billing alongside the
+new one.
+"""
+import logging
+from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Q, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.students.models import Student
+
+from .models import BillingRun, BillingSettings, Fee, Invoice, InvoiceItem
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 2000
+NOTIFICATION_BATCH_SIZE = 500
+CENT = Decimal('0.01')
+STALE_CLAIM_TIMEOUT = timedelta(minutes=30)
+
+
+class BillingRunError(Exception):
+    """Raised when a billing run cannot be executed."""
+
+
+def cohort(run):
+    """Active students billed by ``run``."""
+    students = Student.objects.filter(
+        tenant_id=run.tenant_id, is_active=True, status='active'
+    )
+    if run.student_class_id:
+        students = students.filter(current_class_id=run.student_class_id)
+    if run.academic_year_id:
+        students = students.filter(academic_year_id=run.academic_year_id)
+    return students
+
+
+def invoice_number(run_id, student_id):
+    """Deterministic invoice number for a student's invoice in a run."""
+    return f"INV-R{run_id:05d}-S{student_id:07d}"
+
+
+def queue_notifications(invoice_ids):
+    """Queue invoice notifications in batches once the transaction commits."""
+    from .tasks import send_invoice_notifications
+
+    for start in range(0, len(invoice_ids), NOTIFICATION_BATCH_SIZE):
+        batch = invoice_ids[start:start + NOTIFICATION_BATCH_SIZE]
+        transaction.on_commit(
+            lambda batch=batch: send_invoice_notifications.delay(batch)
+        )
+
+
+class BillingRunEngine:
+    """
+    Execute (or resume) a ``BillingRun``.
+
+    Usage:
+        run = BillingRun.objects.create(tenant=tenant, reference='2025-T1', ...)
+        run.fees.set(fees)
+        BillingRunEngine(run).execute()
+    """
+
+    def __init__(self, run, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.run = run
+        self.chunk_size = chunk_size
+
+    def execute(self):
+        run = self.run
+        if run.status == 'completed':
+            return run
+
+        fees = list(run.fees.filter(is_active=True).order_by('pk'))
+        if not fees:
+            raise BillingRunError("A billing run needs at least one active fee")
+        if run.due_date <= timezone.now():
+            raise BillingRunError("Due date must be in the future")
+        self._prepare(fees)
+
+        students = cohort(run)
+        # Claim the run atomically so two workers never bill it at once.
+        now = timezone.now()
+        claimed = BillingRun.objects.filter(
+            Q(status__in=['pending', 'failed'])
+            | Q(status='running', updated_at__lt=now - STALE_CLAIM_TIMEOUT),
+            pk=run.pk,
+        ).update(
+            status='running',
+            student_count=Case(
+                When(status='pending', then=Value(students.count())),
+                default=F('student_count'),
+                output_field=PositiveIntegerField(),
+            ),
+            error_message='',
+            started_at=Coalesce('started_at', Value(now)),
+            updated_at=now,
+        )
+        run.refresh_from_db()
+        if not claimed:
+            if run.status == 'completed':
+                return run
+            raise BillingRunError(f"Billing run {run.pk} is already {run.status}")
+        self.heartbeat = now
+
+        try:
+            while self._process_chunk(students):
+                pass
+        except Exception as e:
+            self._held().update(
+                status='failed', error_message=str(e),
+                updated_at=timezone.now()
+            )
+            run.refresh_from_db()
+            logger.error(f"Billing run {run.pk} failed: {e}")
+            raise
+
+        self._held().update(
+            status='completed', completed_at=timezone.now(),
+            updated_at=timezone.now()
+        )
+        run.refresh_from_db()
+        logger.info(
+            f"Billing run {run.pk} completed: {run.created_count} invoices "
+            f"created, {run.skipped_count} skipped"
+        )
+        return run
+
+    def _held(self):
+        """The run, as long as this worker's claim has not been taken over."""
+        return BillingRun.objects.filter(
+            pk=self.run.pk, status='running', updated_at=self.heartbeat
+        )
+
+    def _prepare(self, fees):
+        """Price the fee schedule once; every invoice in the run shares it."""
+        settings = BillingSettings.objects.filter(
+            tenant_id=self.run.tenant_id
+        ).only('tax_rate').first()
+        tax_rate = settings.tax_rate if settings else Decimal('0')
+
+        self.fees = fees
+        self.subtotal = sum((fee.amount for fee in fees), Decimal('0.00'))
+        self.tax_amount = (self.subtotal * tax_rate / 100).quantize(
+            CENT, rounding=ROUND_HALF_UP
+        )
+        self.total_amount = self.subtotal + self.tax_amount
+
+    def _process_chunk(self, students):
+        """Invoice the next chunk of students; return ``False`` when done."""
+        run = self.run
+        chunk = students.order_by('id')
+        if run.last_student_id:
+            chunk = chunk.filter(id__gt=run.last_student_id)
+        student_ids = list(chunk.values_list('id', flat=True)[:self.chunk_size])
+        if not student_ids:
+            return False
+
+        with transaction.atomic():
+            existing = set(
+                Invoice.objects.filter(
+                    billing_run=run, student_id__in=student_ids
+                ).values_list('student_id', flat=True)
+            )
+            invoices = [
+                Invoice(
+                    invoice_number=invoice_number(run.pk, student_id),
+                    tenant_id=run.tenant_id,
+                    student_id=student_id,
+                    billing_run=run,
+                    status='sent',
+                    due_date=run.due_date,
+                    subtotal=self.subtotal,
+                    tax_amount=self.tax_amount,
+                    total_amount=self.total_amount,
+                    notes=run.notes,
+                )
+                for student_id in student_ids
+                if student_id not in existing
+            ]
+            Invoice.objects.bulk_create(invoices, ignore_conflicts=True)
+            # Conflict-ignoring inserts do not return keys on every backend.
+            # The claim in ``execute`` makes this the run's only writer, so
+            # the run's invoices that were missing before the insert are
+            # exactly the ones it created.
+            created = dict(
+                Invoice.objects.filter(
+                    billing_run=run,
+                    student_id__in=[invoice.student_id for invoice in invoices],
+                ).values_list('student_id', 'pk')
+            )
+            InvoiceItem.objects.bulk_create(
+                [
+                    InvoiceItem(
+                        invoice_id=invoice_id,
+                        fee=fee,
+                        description=fee.name,
+                        quantity=1,
+                        unit_price=fee.amount,
+                        total_price=fee.amount,
+                    )
+                    for invoice_id in created.values()
+                    for fee in self.fees
+                ],
+                batch_size=5000,
+            )
+            heartbeat = timezone.now()
+            held = self._held().update(
+                created_count=F('created_count') + len(created),
+                skipped_count=F('skipped_count') + len(student_ids) - len(created),
+                total_amount=F('total_amount') + self.total_amount * len(created),
+                last_student_id=student_ids[-1],
+                updated_at=heartbeat,
+            )
+            if not held:
+                # Roll the chunk back; the worker holding the claim bills it
+                raise BillingRunError(
+                    f"Billing run {run.pk} was claimed by another worker"
+                )
+            self.heartbeat = heartbeat
+            queue_notifications(sorted(created.values()))
+        run.last_student_id = student_ids[-1]
+        return len(student_ids) == self.chunk_size
+
+
+def recurring_fees(month):
+    """Recurring fees falling due in ``month`` (1-12)."""
+    frequencies = ['', 'monthly']
+    if month % 3 == 1:
+        frequencies.append('quarterly')
+    if month == 1:
+        frequencies.append('yearly')
+    return Fee.objects.filter(
+        is_recurring=True, is_active=True,
+        recurring_frequency__in=frequencies,
+    )
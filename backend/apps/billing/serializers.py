@@ -1,9 +1,10 @@
 from rest_framework import serializers
+from rest_framework.validators import UniqueTogetherValidator
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 from .models import (
     Plan, Subscription, Fee, Invoice, InvoiceItem, Payment, Transaction,
-    BillingSettings
+    BillingSettings, BillingRun, AgeingBucket
 )
 
 
@@ -88,14 +89,16 @@ class InvoiceSerializer(serializers.ModelSerializer):
         model = Invoice
         fields = [
             'id', 'invoice_number', 'tenant', 'tenant_id', 'student',
-            'student_id', 'subscription', 'subscription_id', 'status',
-            'issue_date', 'due_date', 'paid_date', 'subtotal', 'tax_amount',
-            'discount_amount', 'total_amount', 'notes', 'items', 'is_overdue',
+            'student_id', 'subscription', 'subscription_id', 'billing_run',
+            'status', 'issue_date', 'due_date', 'paid_date', 'subtotal', 'tax_amount',
+            'discount_amount', 'late_fee_amount', 'total_amount', 'notes', 'items',
+            'is_overdue',
             'days_overdue', 'created_at', 'updated_at'
         ]
         read_only_fields = [
-            'id', 'invoice_number', 'issue_date', 'paid_date', 'created_at',
-            'updated_at', 'is_overdue', 'days_overdue'
+            'id', 'invoice_number', 'billing_run', 'late_fee_amount',
+            'issue_date', 'paid_date',
+            'created_at', 'updated_at', 'is_overdue', 'days_overdue'
         ]
 
     def validate(self, data):
@@ -209,6 +212,57 @@ class BillingSettingsSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
+class AgeingBucketSerializer(serializers.ModelSerializer):
+    tenant = serializers.StringRelatedField()
+    student = serializers.StringRelatedField()
+
+    class Meta:
+        model = AgeingBucket
+        fields = [
+            'id', 'tenant', 'student', 'not_due', 'days_0_30', 'days_31_60',
+            'days_61_90', 'days_over_90', 'total_overdue', 'overdue_count',
+            'oldest_due_date', 'reminded_at', 'computed_at'
+        ]
+
+
+class BillingRunSerializer(serializers.ModelSerializer):
+    fees = serializers.PrimaryKeyRelatedField(
+        many=True, queryset=Fee.objects.filter(is_active=True)
+    )
+
+    class Meta:
+        model = BillingRun
+        fields = [
+            'id', 'tenant', 'reference', 'fees', 'student_class',
+            'academic_year', 'due_date', 'notes', 'status', 'student_count',
+            'created_count', 'skipped_count', 'last_student_id',
+            'total_amount', 'error_message', 'started_by', 'started_at',
+            'completed_at', 'created_at', 'updated_at'
+        ]
+        read_only_fields = [
+            'id', 'status', 'student_count', 'created_count',
+            'skipped_count', 'last_student_id', 'total_amount',
+            'error_message', 'started_by', 'started_at', 'completed_at',
+            'created_at', 'updated_at'
+        ]
+        validators = [
+            UniqueTogetherValidator(
+                queryset=BillingRun.objects.all(),
+                fields=['tenant', 'reference']
+            )
+        ]
+
+    def validate(self, data):
+        if 'due_date' in data:
+            if data['due_date'] <= timezone.now():
+                raise ValidationError("Due date must be in the future")
+        if 'fees' in data and not data['fees']:
+            raise ValidationError("A billing run needs at least one fee")
+        if self.instance and self.instance.status != 'pending':
+            raise ValidationError("Only pending billing runs can be changed")
+        return data
+
+
 # Dashboard and Analytics Serializers
 class BillingDashboardSerializer(serializers.Serializer):
     total_invoices = serializers.IntegerField()
@@ -300,6 +354,17 @@ class GenerateInvoiceSerializer(serializers.Serializer):
     include_recurring = serializers.BooleanField(default=True)
 
 
+class ExecuteBillingRunSerializer(serializers.Serializer):
+    run_async = serializers.BooleanField(default=False)
+
+
+class ReconcileStatementSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    format = serializers.ChoiceField(
+        choices=['csv', 'ofx', 'mt940'], required=False)
+    dry_run = serializers.BooleanField(default=False)
+
+
 class SendPaymentReminderSerializer(serializers.Serializer):
     invoice_id = serializers.IntegerField()
     reminder_type = serializers.ChoiceField(choices=['email', 'sms', 'both'])
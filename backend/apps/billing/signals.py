@@ -1,10 +1,16 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.utils import timezone
 from django.core.mail import send_mail
 from django.conf import settings
-from .models import Invoice, Payment, Transaction, Subscription, Fee
+from django.db import transaction
+from .models import BillingRun, Invoice, Payment, Transaction, Subscription
+from .metrics import refresh_daily_revenue, revenue_day
+from .runs import BillingRunEngine, recurring_fees
 from datetime import timedelta
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 @receiver(post_save, sender=Payment)
@@ -24,6 +30,18 @@ def create_transaction_on_payment(sender, instance, created, **kwargs):
         )
 
 
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def refresh_revenue_on_payment(sender, instance, created=False, **kwargs):
+    """Refresh the revenue fact row for the day a payment is booked on"""
+    if created and instance.status != 'completed':
+        return
+    day, tenant_id = revenue_day(instance), instance.invoice.tenant_id
+    transaction.on_commit(
+        lambda: refresh_daily_revenue([day], tenant_ids=[tenant_id])
+    )
+
+
 @receiver(post_save, sender=Invoice)
 def update_invoice_status_on_payment(sender, instance, **kwargs):
     """Update invoice status based on payment status"""
@@ -38,37 +56,12 @@ def update_invoice_status_on_payment(sender, instance, **kwargs):
 
 @receiver(post_save, sender=Invoice)
 def send_invoice_notification(sender, instance, created, **kwargs):
-    """Send email notification when invoice is created"""
+    """Queue an email notification once a new invoice is committed"""
     if created and settings.EMAIL_HOST:
-        try:
-            subject = f"New Invoice - {instance.invoice_number}"
-            message = f"""
-            Dear {instance.tenant.name},
-
-            A new invoice has been generated for your account:
-            Invoice Number: {instance.invoice_number}
-            Amount: ${instance.total_amount}
-            Due Date: {instance.due_date.strftime('%Y-%m-%d')}
-
-            Please make the payment before the due date to avoid late fees.
-
-            Best regards,
-            EduCore Ultra Billing Team
-            """
-
-            # Send to tenant admin email
-            if (hasattr(instance.tenant, 'admin_email') and
-                    instance.tenant.admin_email):
-                send_mail(
-                    subject=subject,
-                    message=message,
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[instance.tenant.admin_email],
-                    fail_silently=True
-                )
-        except Exception as e:
-            # Log error but don't fail the transaction
-            print(f"Failed to send invoice notification: {e}")
+        from .tasks import send_invoice_notifications
+        transaction.on_commit(
+            lambda: send_invoice_notifications.delay([instance.pk])
+        )
 
 
 @receiver(post_save, sender=Payment)
@@ -141,101 +134,35 @@ def send_subscription_notification(sender, instance, created, **kwargs):
             print(f"Failed to send subscription notification: {e}")
 
 
-@receiver(post_save, sender=Invoice)
-def check_overdue_invoices(sender, instance, **kwargs):
-    """Check and update overdue invoices"""
-    if instance.status in ['sent', 'partially_paid'] and instance.is_overdue:
-        instance.status = 'overdue'
-        instance.save(update_fields=['status'])
-
-
-@receiver(post_save, sender=Subscription)
-def check_expiring_subscriptions(sender, instance, **kwargs):
-    """Check and update expiring subscriptions"""
-    if instance.status == 'active' and instance.end_date <= timezone.now():
-        instance.status = 'expired'
-        instance.save(update_fields=['status'])
-
-
 # Automatic invoice generation for recurring fees
 def generate_recurring_invoices():
-    """Generate invoices for recurring fees"""
-
-    recurring_fees = Fee.objects.filter(is_recurring=True, is_active=True)
-
-    for fee in recurring_fees:
-        # Get all active tenants
-        from apps.tenants.models import Tenant
-        tenants = Tenant.objects.filter(is_active=True)
-
-        for tenant in tenants:
-            # Check if invoice already exists for this month
-            current_month = timezone.now().replace(
-                day=1, hour=0, minute=0, second=0, microsecond=0)
-            existing_invoice = Invoice.objects.filter(
-                tenant=tenant,
-                items__fee=fee,
-                issue_date__gte=current_month
-            ).first()
-
-            if not existing_invoice:
-                # Create invoice for recurring fee
-                invoice = Invoice.objects.create(
-                    tenant=tenant,
-                    due_date=timezone.now() + timedelta(days=30),
-                    subtotal=fee.amount,
-                    total_amount=fee.amount
-                )
-
-                # Create invoice item
-                from .models import InvoiceItem
-                InvoiceItem.objects.create(
-                    invoice=invoice,
-                    fee=fee,
-                    description=fee.name,
-                    quantity=1,
-                    unit_price=fee.amount,
-                    total_price=fee.amount
-                )
-
-
-# This function can be called by a Celery task or management command
-def send_payment_reminders():
-    """Send payment reminders for overdue invoices"""
-    overdue_invoices = Invoice.objects.filter(
-        status='overdue',
-        due_date__lte=timezone.now()
+    """
+    Bill this month's recurring fees to every active student, through one
+    billing run per tenant. The run reference is derived from the month,
+    so calling this again resumes or skips the month's runs.
+    """
+    from apps.tenants.models import Tenant
+
+    today = timezone.localdate()
+    fees = list(recurring_fees(today.month))
+    if not fees:
+        return []
+
+    tenants = Tenant.objects.filter(is_active=True).exclude(
+        billing_settings__auto_generate_invoices=False
     )
-
-    for invoice in overdue_invoices:
-        if settings.EMAIL_HOST:
-            try:
-                subject = (f"Payment Reminder - "
-                           f"Invoice {invoice.invoice_number}")
-                message = f"""
-                Dear {invoice.tenant.name},
-
-                This is a reminder that your invoice is overdue:
-                Invoice Number: {invoice.invoice_number}
-                Amount: ${invoice.total_amount}
-                Due Date: {invoice.due_date.strftime('%Y-%m-%d')}
-                Days Overdue: {invoice.days_overdue}
-
-                Please make the payment as soon as possible to avoid
-                additional late fees.
-
-                Best regards,
-                EduCore Ultra Billing Team
-                """
-
-                if (hasattr(invoice.tenant, 'admin_email') and
-                        invoice.tenant.admin_email):
-                    send_mail(
-                        subject=subject,
-                        message=message,
-                        from_email=settings.DEFAULT_FROM_EMAIL,
-                        recipient_list=[invoice.tenant.admin_email],
-                        fail_silently=True
-                    )
-            except Exception as e:
-                print(f"Failed to send payment reminder: {e}")
+    runs = []
+    for tenant in tenants:
+        run, created = BillingRun.objects.get_or_create(
+            tenant=tenant,
+            reference=f"recurring-{today:%Y-%m}",
+            defaults={'due_date': timezone.now() + timedelta(days=30)},
+        )
+        if created:
+            run.fees.set(fees)
+        try:
+            runs.append(BillingRunEngine(run).execute())
+        except Exception as e:
+            # One tenant's failure must not hold up the others' billing
+            logger.error(f"Recurring billing for tenant {tenant.pk} failed: {e}")
+    return runs
@@ -0,0 +1,166 @@
+"""
+Celery tasks for billing app.
+"""
+
+from celery import shared_task
+from django.conf import settings
+from django.core.mail import send_mass_mail
+from django.utils import timezone
+import logging
+
+from .ageing import REMINDER_BATCH_SIZE, sweep
+from .metrics import reconcile_daily_revenue
+from .models import AgeingBucket, BillingRun, Invoice, Payment
+from .runs import BillingRunEngine, BillingRunError
+from .signals import generate_recurring_invoices
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def execute_billing_run(self, run_id):
+    """
+    Execute or resume a billing run.
+
+    Progress is committed per chunk, so a retry continues after the last
+    invoiced student instead of starting over.
+    """
+    try:
+        run = BillingRun.objects.get(pk=run_id)
+    except BillingRun.DoesNotExist:
+        logger.error(f"Billing run {run_id} not found")
+        raise
+
+    try:
+        run = BillingRunEngine(run).execute()
+        return f"Billing run {run_id}: {run.created_count} invoices created"
+    except BillingRunError as e:
+        # Invalid or already claimed runs fail the same way on every retry
+        logger.error(f"Billing run {run_id} not executed: {e}")
+        raise
+    except Exception as e:
+        logger.error(f"Billing run {run_id} failed, retrying: {e}")
+        raise self.retry(exc=e)
+
+
+@shared_task
+def send_invoice_notifications(invoice_ids):
+    """
+    Email a batch of new invoices over one SMTP connection, to the
+    student or, failing that, the tenant contact address.
+    """
+    if not settings.EMAIL_HOST:
+        return "Email is not configured"
+
+    invoices = Invoice.objects.filter(pk__in=invoice_ids).select_related(
+        'tenant', 'student'
+    ).only(
+        'invoice_number', 'total_amount', 'due_date', 'tenant__name',
+        'tenant__email', 'student__first_name', 'student__last_name',
+        'student__email',
+    )
+    messages = []
+    for invoice in invoices:
+        student = invoice.student
+        recipient = (student and student.email) or invoice.tenant.email
+        if not recipient:
+            continue
+        name = (
+            f"{student.first_name} {student.last_name}" if student
+            else invoice.tenant.name
+        )
+        messages.append((
+            f"New Invoice - {invoice.invoice_number}",
+            f"Dear {name},\n\n"
+            f"A new invoice has been generated for your account:\n"
+            f"Invoice Number: {invoice.invoice_number}\n"
+            f"Amount: ${invoice.total_amount}\n"
+            f"Due Date: {invoice.due_date:%Y-%m-%d}\n\n"
+            f"Please make the payment before the due date to avoid late fees.\n\n"
+            f"Best regards,\nEduCore Ultra Billing Team\n",
+            settings.DEFAULT_FROM_EMAIL,
+            [recipient],
+        ))
+    sent = send_mass_mail(messages, fail_silently=True)
+    return f"Sent {sent} of {len(invoice_ids)} invoice notifications"
+
+
+@shared_task
+def send_payment_confirmations(payment_ids):
+    """
+    Email confirmations for a batch of completed payments over one SMTP
+    connection, to the payer, the student or the tenant contact address.
+    """
+    if not settings.EMAIL_HOST:
+        return "Email is not configured"
+
+    payments = Payment.objects.filter(pk__in=payment_ids).select_related(
+        'paid_by', 'invoice__tenant', 'invoice__student'
+    )
+    messages = []
+    for payment in payments:
+        invoice = payment.invoice
+        recipient = (
+            (payment.paid_by and payment.paid_by.email)
+            or (invoice.student and invoice.student.email)
+            or invoice.tenant.email
+        )
+        if not recipient:
+            continue
+        messages.append((
+            f"Payment Confirmation - {payment.payment_id}",
+            f"Your payment has been successfully processed:\n"
+            f"Payment ID: {payment.payment_id}\n"
+            f"Amount: ${payment.amount}\n"
+            f"Method: {payment.get_payment_method_display()}\n"
+            f"Invoice: {invoice.invoice_number}\n\n"
+            f"Thank you for your payment!\n\n"
+            f"Best regards,\nEduCore Ultra Billing Team\n",
+            settings.DEFAULT_FROM_EMAIL,
+            [recipient],
+        ))
+    sent = send_mass_mail(messages, fail_silently=True)
+    return f"Sent {sent} of {len(payment_ids)} payment confirmations"
+
+
+@shared_task
+def generate_recurring_fee_invoices():
+    """Bill this month's recurring fees through per-tenant billing runs."""
+    runs = generate_recurring_invoices()
+    created = sum(run.created_count for run in runs)
+    return f"Recurring billing: {len(runs)} runs, {created} invoices"
+
+
+@shared_task
+def reconcile_revenue_facts():
+    """Refresh the last week of daily revenue rows from the payments table."""
+    written = reconcile_daily_revenue()
+    return f"Reconciled {written} daily revenue rows"
+
+
+@shared_task
+def run_ageing_sweep():
+    """
+    Daily receivables sweep: mark overdue invoices, expire subscriptions,
+    charge late fees, rebuild ageing buckets and queue reminder digests.
+    """
+    result = sweep()
+    messages = result['messages']
+    if settings.EMAIL_HOST:
+        for start in range(0, len(messages), REMINDER_BATCH_SIZE):
+            send_mail_batch.delay(messages[start:start + REMINDER_BATCH_SIZE])
+        AgeingBucket.objects.filter(pk__in=result['reminded_ids']).update(
+            reminded_at=timezone.now()
+        )
+    return (
+        f"{result['overdue']} invoices overdue, {result['expired']} "
+        f"subscriptions expired, {result['late_fees']} late fees, "
+        f"{len(messages)} reminders queued"
+    )
+
+
+@shared_task
+def send_mail_batch(messages):
+    """Send a batch of ``(subject, message, from, recipients)`` over one connection."""
+    sent = send_mass_mail(messages, fail_silently=True)
+    return f"Sent {sent} of {len(messages)} emails"
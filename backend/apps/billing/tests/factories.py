@@ -0,0 +1,27 @@
+"""
+Fixtures shared by the billing tests.
+"""
+from datetime import timedelta
+
+from django.utils import timezone
+
+from apps.billing.models import Invoice
+from apps.tenants.models import Tenant
+
+
+def make_tenant(slug):
+    return Tenant.objects.create(
+        name=slug.title(), slug=slug, domain=f"{slug}.example.com",
+        subdomain=slug, email=f"office@{slug}.example.com",
+    )
+
+
+def make_invoice(tenant, number, total, due_in_days=30):
+    # ``Invoice.clean`` reads ``issue_date`` before ``save`` sets it, so
+    # fixtures are inserted directly.
+    [invoice] = Invoice.objects.bulk_create([Invoice(
+        invoice_number=number, tenant=tenant, status='sent',
+        due_date=timezone.now() + timedelta(days=due_in_days),
+        subtotal=total, total_amount=total,
+    )])
+    return invoice
@@ -0,0 +1,97 @@
+"""
+Tests for the receivables sweep: invoices turn overdue in bulk, late
+fees are charged once, balances land in the right ageing bucket and the
+overdue endpoint reads the bucket table.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.billing.ageing import sweep
+from apps.billing.models import AgeingBucket, BillingSettings, Invoice
+from apps.billing.tests.factories import make_invoice, make_tenant
+from apps.billing.views import InvoiceViewSet
+
+User = get_user_model()
+
+
+class SweepTests(TestCase):
+    def setUp(self):
+        self.tenant = make_tenant('north')
+        self.current = make_invoice(self.tenant, 'INV-1', Decimal('50.00'), 10)
+        self.recent = make_invoice(self.tenant, 'INV-2', Decimal('100.00'), -5)
+        self.old = make_invoice(self.tenant, 'INV-3', Decimal('200.00'), -45)
+
+    def test_sweep_marks_overdue_and_buckets_balances(self):
+        result = sweep()
+        self.assertEqual(result['overdue'], 2)
+        self.assertEqual(
+            set(Invoice.objects.filter(status='overdue').values_list('invoice_number', flat=True)),
+            {'INV-2', 'INV-3'},
+        )
+        bucket = AgeingBucket.objects.get(tenant=self.tenant, student=None)
+        self.assertEqual(bucket.not_due, Decimal('50.00'))
+        self.assertEqual(bucket.days_0_30, Decimal('100.00'))
+        self.assertEqual(bucket.days_31_60, Decimal('200.00'))
+        self.assertEqual(bucket.total_overdue, Decimal('300.00'))
+        self.assertEqual(bucket.overdue_count, 2)
+
+    def test_late_fee_is_charged_once(self):
+        BillingSettings.objects.create(
+            tenant=self.tenant, late_fee_rate=Decimal('10'), grace_period_days=7
+        )
+        sweep()
+        sweep()
+        self.old.refresh_from_db()
+        self.recent.refresh_from_db()
+        self.assertEqual(self.old.late_fee_amount, Decimal('20.00'))
+        self.assertEqual(self.old.total_amount, Decimal('220.00'))
+        # Still within the grace period
+        self.assertEqual(self.recent.late_fee_amount, Decimal('0.00'))
+
+    def test_one_reminder_digest_per_payer(self):
+        result = sweep()
+        self.assertEqual(len(result['messages']), 1)
+        subject, body, _, recipients = result['messages'][0]
+        self.assertIn('$300.00', subject)
+        self.assertIn('INV-2', body)
+        self.assertIn('INV-3', body)
+        self.assertEqual(recipients, [self.tenant.email])
+
+
+class OverdueEndpointTests(TestCase):
+    def setUp(self):
+        self.tenant = make_tenant('north')
+        make_invoice(self.tenant, 'INV-2', Decimal('100.00'), -5)
+        make_invoice(self.tenant, 'INV-3', Decimal('200.00'), -45)
+        self.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='x'
+        )
+
+    def overdue(self, **params):
+        request = APIRequestFactory().get('/api/billing/invoices/overdue/', params)
+        force_authenticate(request, self.admin)
+        response = InvoiceViewSet.as_view({'get': 'overdue'})(request)
+        self.assertEqual(response.status_code, 200)
+        return {row['invoice_number'] for row in response.data['results']}
+
+    def test_lists_payers_in_the_bucket_table(self):
+        sweep()
+        self.assertEqual(self.overdue(), {'INV-2', 'INV-3'})
+        self.assertEqual(self.overdue(bucket='days_31_60'), {'INV-3'})
+        self.assertEqual(self.overdue(bucket='days_61_90'), set())
+
+    def test_payers_missing_from_the_table_are_not_listed(self):
+        sweep()
+        AgeingBucket.objects.all().delete()
+        self.assertEqual(self.overdue(), set())
+
+    def test_unknown_bucket_is_rejected(self):
+        request = APIRequestFactory().get(
+            '/api/billing/invoices/overdue/', {'bucket': 'days_1_2'}
+        )
+        force_authenticate(request, self.admin)
+        response = InvoiceViewSet.as_view({'get': 'overdue'})(request)
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,38 @@
+"""
+Tests for the billing analytics endpoints: the ``tenant`` filter is
+validated before it reaches the database.
+"""
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.billing.views import BillingAnalyticsViewSet
+
+User = get_user_model()
+
+
+class TenantFilterTests(TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='x'
+        )
+
+    def call(self, action, tenant):
+        request = self.factory.get('/api/billing/analytics/', {'tenant': tenant})
+        force_authenticate(request, self.admin)
+        return BillingAnalyticsViewSet.as_view({'get': action})(request)
+
+    def test_malformed_tenant_is_rejected(self):
+        for action in ('dashboard', 'revenue_trends'):
+            response = self.call(action, 'not-a-uuid')
+            self.assertEqual(response.status_code, 400, action)
+            self.assertIn('tenant', response.data)
+
+    def test_valid_tenant_filters(self):
+        for action in ('dashboard', 'revenue_trends'):
+            response = self.call(action, str(uuid.uuid4()))
+            self.assertEqual(response.status_code, 200, action)
+        self.assertEqual(self.call('dashboard', str(uuid.uuid4())).data['total_invoices'], 0)
@@ -0,0 +1,129 @@
+"""
+Tests for statement reconciliation: entries match by reference or
+amount, a re-imported statement books nothing twice (with or without
+bank references) and reconciling is scoped to the user's tenant.
+"""
+import io
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.billing import reconciliation
+from apps.billing.models import Payment
+from apps.billing.reconciliation import reconcile_statement
+from apps.billing.tests.factories import make_invoice, make_tenant
+from apps.billing.views import PaymentViewSet
+
+User = get_user_model()
+
+
+def statement(*rows):
+    lines = ['Date,Amount,Reference,Description,Transaction ID']
+    lines.extend(','.join(row) for row in rows)
+    return io.BytesIO('\n'.join(lines).encode())
+
+
+class ReconcileStatementTests(TestCase):
+    def setUp(self):
+        self.tenant = make_tenant('north')
+        self.invoice = make_invoice(self.tenant, 'INV-2026-0001', Decimal('100.00'))
+        self.other = make_invoice(self.tenant, 'INV-2026-0002', Decimal('75.50'))
+
+    def reconcile(self, stream, **kwargs):
+        return reconcile_statement(stream, 'csv', tenant=self.tenant, **kwargs)
+
+    def test_matches_by_reference_and_amount(self):
+        report = self.reconcile(statement(
+            ('2026-10-01', '100.00', 'INV-2026-0001', 'School fees', 'TX1'),
+            ('2026-10-01', '75.50', '', 'Term fees', 'TX2'),
+            ('2026-10-01', '12.00', '', 'Unknown', 'TX3'),
+        ))
+        self.assertEqual(report['matched_count'], 2)
+        self.assertEqual(
+            {row['method'] for row in report['matched']}, {'reference', 'amount'}
+        )
+        self.assertEqual(report['unmatched_count'], 1)
+        self.assertEqual(report['paid_invoices'], 2)
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.status, 'paid')
+
+    def test_dry_run_records_nothing(self):
+        report = self.reconcile(statement(
+            ('2026-10-01', '100.00', 'INV-2026-0001', '', 'TX1'),
+        ), dry_run=True)
+        self.assertEqual(report['matched_count'], 1)
+        self.assertFalse(Payment.objects.exists())
+
+    def test_reimport_with_bank_references_is_skipped(self):
+        rows = (('2026-10-01', '40.00', 'INV-2026-0001', '', 'TX1'),)
+        self.reconcile(statement(*rows))
+        report = self.reconcile(statement(*rows))
+        self.assertEqual(report['duplicate_count'], 1)
+        self.assertEqual(Payment.objects.count(), 1)
+
+    def test_reimport_without_bank_references_is_skipped(self):
+        # Two identical instalments on one statement are separate payments
+        rows = (
+            ('2026-10-01', '40.00', 'INV-2026-0001', 'Instalment', ''),
+            ('2026-10-01', '40.00', 'INV-2026-0001', 'Instalment', ''),
+        )
+        first = self.reconcile(statement(*rows))
+        self.assertEqual(first['matched_count'], 2)
+
+        again = self.reconcile(statement(*rows))
+        self.assertEqual(again['matched_count'], 0)
+        self.assertEqual(again['duplicate_count'], 2)
+        self.assertEqual(Payment.objects.count(), 2)
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.status, 'partially_paid')
+
+    def test_concurrent_import_waiting_on_the_lock_books_nothing_twice(self):
+        rows = (('2026-10-01', '40.00', 'INV-2026-0001', 'Instalment', ''),)
+        build_index = reconciliation.InvoiceIndex
+        raced = {}
+
+        def index_after_concurrent_import(invoices):
+            # The other import held the invoice locks and committed first
+            if not raced:
+                raced['report'] = None
+                raced['report'] = self.reconcile(statement(*rows))
+            return build_index(invoices)
+
+        with mock.patch.object(reconciliation, 'InvoiceIndex', index_after_concurrent_import):
+            report = self.reconcile(statement(*rows))
+        self.assertEqual(raced['report']['matched_count'], 1)
+        self.assertEqual(report['matched_count'], 0)
+        self.assertEqual(report['duplicate_count'], 1)
+        self.assertEqual(Payment.objects.count(), 1)
+
+    def test_other_tenants_invoices_are_not_matched(self):
+        south = make_tenant('south')
+        make_invoice(south, 'INV-2026-0003', Decimal('30.00'))
+        report = self.reconcile(statement(
+            ('2026-10-01', '30.00', 'INV-2026-0003', '', 'TX1'),
+        ))
+        self.assertEqual(report['matched_count'], 0)
+
+
+class ReconcileViewTests(TestCase):
+    def test_user_without_tenant_is_refused(self):
+        make_invoice(make_tenant('north'), 'INV-2026-0001', Decimal('100.00'))
+        user = User.objects.create_user(
+            username='clerk', email='clerk@example.com', password='x'
+        )
+        upload = SimpleUploadedFile(
+            'statement.csv', statement(
+                ('2026-10-01', '100.00', 'INV-2026-0001', '', 'TX1'),
+            ).getvalue(),
+        )
+        request = APIRequestFactory().post(
+            '/api/billing/payments/reconcile/', {'file': upload}, format='multipart'
+        )
+        force_authenticate(request, user)
+        response = PaymentViewSet.as_view({'post': 'reconcile'})(request)
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Payment.objects.exists())
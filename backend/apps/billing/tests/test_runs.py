@@ -0,0 +1,165 @@
+"""
+Tests for batch invoicing: a run bills its cohort once, resumes where it
+stopped, is claimed by one worker at a time (and again once that worker
+stops heartbeating) and recurring billing keeps going when one tenant
+fails.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.billing.models import BillingRun, Fee, Invoice, InvoiceItem
+from apps.billing.runs import STALE_CLAIM_TIMEOUT, BillingRunEngine, BillingRunError
+from apps.billing.signals import generate_recurring_invoices
+from apps.billing.tasks import execute_billing_run
+from apps.billing.tests.factories import make_tenant
+from apps.students.models import Student
+
+User = get_user_model()
+
+
+def make_student(tenant, number):
+    username = f"{tenant.slug}-student-{number}"
+    user = User.objects.create_user(
+        username=username, email=f"{username}@example.com", password='x'
+    )
+    return Student.objects.create(
+        user=user, tenant=tenant, student_id=f"{tenant.slug}-{number}",
+        admission_number=f"{tenant.slug}-A{number}", first_name='Student',
+        last_name=str(number), date_of_birth=date(2012, 1, 1), gender='M',
+        address='1 School Road', city='Dhaka', state='Dhaka',
+        postal_code='1000', admission_date=date(2024, 1, 1),
+    )
+
+
+def make_run(tenant, fees, reference='2026-T1'):
+    run = BillingRun.objects.create(
+        tenant=tenant, reference=reference,
+        due_date=timezone.now() + timedelta(days=30),
+    )
+    run.fees.set(fees)
+    return run
+
+
+class BillingRunEngineTests(TestCase):
+    def setUp(self):
+        self.tenant = make_tenant('north')
+        self.students = [make_student(self.tenant, number) for number in range(5)]
+        self.fees = [
+            Fee.objects.create(name='Tuition', fee_type='tuition', amount=Decimal('100.00')),
+            Fee.objects.create(name='Library', fee_type='library', amount=Decimal('10.00')),
+        ]
+
+    def test_run_bills_every_student_once(self):
+        run = BillingRunEngine(make_run(self.tenant, self.fees), chunk_size=2).execute()
+        self.assertEqual(run.status, 'completed')
+        self.assertEqual(run.student_count, 5)
+        self.assertEqual(run.created_count, 5)
+        self.assertEqual(run.total_amount, Decimal('550.00'))
+        self.assertEqual(Invoice.objects.filter(billing_run=run).count(), 5)
+        self.assertEqual(InvoiceItem.objects.filter(invoice__billing_run=run).count(), 10)
+
+    def test_resume_only_itemises_new_invoices(self):
+        run = make_run(self.tenant, self.fees)
+        BillingRunEngine(run, chunk_size=2).execute()
+        # Rewind as if the run stopped after its first chunk
+        BillingRun.objects.filter(pk=run.pk).update(
+            status='failed', last_student_id=self.students[1].pk
+        )
+        Invoice.objects.filter(student__in=self.students[2:]).delete()
+        run.refresh_from_db()
+
+        run = BillingRunEngine(run, chunk_size=2).execute()
+        self.assertEqual(run.status, 'completed')
+        self.assertEqual(Invoice.objects.filter(billing_run=run).count(), 5)
+        for invoice in Invoice.objects.filter(billing_run=run):
+            self.assertEqual(invoice.items.count(), 2)
+
+    def test_rerun_skips_students_already_invoiced(self):
+        run = make_run(self.tenant, self.fees)
+        BillingRunEngine(run).execute()
+        BillingRun.objects.filter(pk=run.pk).update(status='failed', last_student_id=None)
+        run.refresh_from_db()
+
+        run = BillingRunEngine(run).execute()
+        self.assertEqual(run.skipped_count, 5)
+        self.assertEqual(InvoiceItem.objects.filter(invoice__billing_run=run).count(), 10)
+
+    def test_running_run_is_not_claimed_twice(self):
+        run = make_run(self.tenant, self.fees)
+        stale = BillingRun.objects.get(pk=run.pk)
+        BillingRun.objects.filter(pk=run.pk).update(status='running')
+        with self.assertRaises(BillingRunError):
+            BillingRunEngine(stale).execute()
+        self.assertFalse(Invoice.objects.filter(billing_run=run).exists())
+
+    def test_abandoned_run_is_reclaimed(self):
+        run = make_run(self.tenant, self.fees)
+        # A worker was killed mid-run and stopped sending heartbeats
+        last_heartbeat = timezone.now() - STALE_CLAIM_TIMEOUT - timedelta(minutes=1)
+        BillingRun.objects.filter(pk=run.pk).update(status='running', updated_at=last_heartbeat)
+        run.refresh_from_db()
+        run = BillingRunEngine(run).execute()
+        self.assertEqual(run.status, 'completed')
+        self.assertEqual(Invoice.objects.filter(billing_run=run).count(), 5)
+
+    def test_worker_that_lost_its_claim_rolls_back(self):
+        run = make_run(self.tenant, self.fees)
+        engine = BillingRunEngine(run, chunk_size=2)
+        process_chunk = engine._process_chunk
+
+        def taken_over_after_first_chunk(students):
+            more = process_chunk(students)
+            # Another worker reclaims the run and heartbeats
+            BillingRun.objects.filter(pk=run.pk).update(
+                updated_at=timezone.now() + timedelta(seconds=1)
+            )
+            return more
+
+        with mock.patch.object(engine, '_process_chunk', taken_over_after_first_chunk):
+            with self.assertRaises(BillingRunError):
+                engine.execute()
+        run.refresh_from_db()
+        self.assertEqual(run.status, 'running')
+        self.assertEqual(run.created_count, 2)
+        self.assertEqual(Invoice.objects.filter(billing_run=run).count(), 2)
+
+    def test_completed_run_is_returned_unchanged(self):
+        run = BillingRunEngine(make_run(self.tenant, self.fees)).execute()
+        again = BillingRunEngine(run).execute()
+        self.assertEqual(again.created_count, 5)
+        self.assertEqual(Invoice.objects.filter(billing_run=run).count(), 5)
+
+    def test_task_does_not_retry_invalid_run(self):
+        Fee.objects.update(is_active=False)
+        run = make_run(self.tenant, self.fees)
+        with mock.patch.object(execute_billing_run, 'retry') as retry:
+            with self.assertRaises(BillingRunError):
+                execute_billing_run.run(run.pk)
+        retry.assert_not_called()
+
+
+class RecurringBillingTests(TestCase):
+    def test_one_failing_tenant_does_not_stop_the_others(self):
+        north, south = make_tenant('north'), make_tenant('south')
+        make_student(north, 1)
+        make_student(south, 1)
+        Fee.objects.create(
+            name='Tuition', fee_type='tuition', amount=Decimal('100.00'),
+            is_recurring=True, recurring_frequency='monthly',
+        )
+        execute = BillingRunEngine.execute
+
+        def fail_for_north(engine):
+            if engine.run.tenant_id == north.pk:
+                raise BillingRunError("boom")
+            return execute(engine)
+
+        with mock.patch.object(BillingRunEngine, 'execute', fail_for_north):
+            runs = generate_recurring_invoices()
+        self.assertEqual([run.tenant_id for run in runs], [south.pk])
+        self.assertEqual(Invoice.objects.filter(tenant=south).count(), 1)
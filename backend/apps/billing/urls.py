@@ -2,7 +2,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     PlanViewSet, SubscriptionViewSet, FeeViewSet, InvoiceViewSet,
-    PaymentViewSet, TransactionViewSet, BillingSettingsViewSet,
+    BillingRunViewSet, PaymentViewSet, TransactionViewSet, BillingSettingsViewSet,
     BillingAnalyticsViewSet
 )
 
@@ -11,6 +11,7 @@ router.register(r'plans', PlanViewSet)
 router.register(r'subscriptions', SubscriptionViewSet)
 router.register(r'fees', FeeViewSet)
 router.register(r'invoices', InvoiceViewSet)
+router.register(r'runs', BillingRunViewSet)
 router.register(r'payments', PaymentViewSet)
 router.register(r'transactions', TransactionViewSet)
 router.register(r'settings', BillingSettingsViewSet)
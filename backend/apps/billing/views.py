@@ -1,17 +1,25 @@
 from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.parsers import MultiPartParser, FormParser
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Count, Sum
 from django.utils import timezone
 from datetime import timedelta
 from decimal import Decimal
+import uuid
 
 from .models import (
     Plan, Subscription, Fee, Invoice, InvoiceItem, Payment, Transaction,
-    BillingSettings
+    BillingSettings, BillingRun, AgeingBucket
 )
+from .ageing import BUCKET_FIELDS, arrears_filter
+from .metrics import dashboard_figures, revenue_trends
+from .reconciliation import ReconciliationError, reconcile_statement
+from .runs import BillingRunEngine, BillingRunError
+from .tasks import execute_billing_run
 from .serializers import (
     PlanSerializer, SubscriptionSerializer, FeeSerializer, InvoiceSerializer,
     InvoiceListSerializer, PaymentSerializer, PaymentListSerializer,
@@ -20,10 +28,23 @@ from .serializers import (
     BillingDashboardSerializer, PaymentAnalyticsSerializer,
     RevenueAnalyticsSerializer, CreateInvoiceSerializer,
     ProcessPaymentSerializer,
-    CancelSubscriptionSerializer, SendPaymentReminderSerializer
+    CancelSubscriptionSerializer, SendPaymentReminderSerializer,
+    BillingRunSerializer, ExecuteBillingRunSerializer,
+    ReconcileStatementSerializer, AgeingBucketSerializer
 )
 
 
+def tenant_param(request):
+    """The ``?tenant=`` filter as a UUID, or ``None`` when it is not given."""
+    value = request.query_params.get('tenant')
+    if not value:
+        return None
+    try:
+        return uuid.UUID(value)
+    except ValueError:
+        raise ValidationError({'tenant': 'Must be a UUID.'})
+
+
 class PlanViewSet(viewsets.ModelViewSet):
     queryset = Plan.objects.all()
     serializer_class = PlanSerializer
@@ -76,10 +97,11 @@ class SubscriptionViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def expiring(self, request):
         """Get subscriptions expiring soon (within 30 days)"""
-        thirty_days_from_now = timezone.now() + timedelta(days=30)
+        now = timezone.now()
         subscriptions = self.queryset.filter(
             status='active',
-            end_date__lte=thirty_days_from_now
+            end_date__gt=now,
+            end_date__lte=now + timedelta(days=30)
         )
         serializer = self.get_serializer(subscriptions, many=True)
         return Response(serializer.data)
@@ -143,7 +165,7 @@ class InvoiceViewSet(viewsets.ModelViewSet):
     filter_backends = [
         DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter
     ]
-    filterset_fields = ['status', 'tenant', 'student']
+    filterset_fields = ['status', 'tenant', 'student', 'billing_run']
     search_fields = ['invoice_number', 'tenant__name', 'student__first_name']
     ordering_fields = ['issue_date', 'due_date', 'total_amount']
     ordering = ['-issue_date']
@@ -162,11 +184,57 @@ class InvoiceViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def overdue(self, request):
-        """Get overdue invoices"""
-        invoices = self.queryset.filter(status='overdue')
+        """
+        Get overdue invoices of the payers in arrears in the ageing bucket
+        table, optionally narrowed to one bucket (?bucket=days_31_60), as
+        of the last daily sweep.
+        """
+        bucket = request.query_params.get('bucket')
+        if bucket and bucket not in BUCKET_FIELDS:
+            return Response(
+                {"error": f"bucket must be one of {', '.join(BUCKET_FIELDS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        invoices = self.filter_queryset(self.get_queryset()).filter(
+            arrears_filter(bucket), status='overdue'
+        ).select_related('tenant', 'student')
+
+        page = self.paginate_queryset(invoices)
+        if page is not None:
+            serializer = InvoiceListSerializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
         serializer = InvoiceListSerializer(invoices, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def ageing(self, request):
+        """
+        Outstanding balances per tenant and student split into ageing
+        buckets, as of the last daily sweep, largest arrears first.
+        """
+        buckets = AgeingBucket.objects.select_related('tenant', 'student')
+        if not request.user.is_superuser:
+            buckets = buckets.filter(tenant=request.user.tenant)
+        elif request.query_params.get('tenant'):
+            buckets = buckets.filter(tenant_id=tenant_param(request))
+        if request.query_params.get('student'):
+            buckets = buckets.filter(student_id=request.query_params['student'])
+        bucket = request.query_params.get('bucket')
+        if bucket:
+            if bucket not in BUCKET_FIELDS:
+                return Response(
+                    {"error": f"bucket must be one of {', '.join(BUCKET_FIELDS)}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            buckets = buckets.filter(**{f'{bucket}__gt': 0})
+
+        page = self.paginate_queryset(buckets)
+        if page is not None:
+            serializer = AgeingBucketSerializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = AgeingBucketSerializer(buckets, many=True)
+        return Response(serializer.data)
+
     @action(detail=False, methods=['post'])
     def create_invoice(self, request):
         """Create a new invoice with items"""
@@ -247,6 +315,66 @@ class InvoiceViewSet(viewsets.ModelViewSet):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class BillingRunViewSet(viewsets.ModelViewSet):
+    queryset = BillingRun.objects.select_related('tenant').prefetch_related(
+        'fees'
+    )
+    serializer_class = BillingRunSerializer
+    permission_classes = [IsAuthenticated]
+    filter_backends = [
+        DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter
+    ]
+    filterset_fields = ['status', 'tenant', 'student_class', 'academic_year']
+    search_fields = ['reference', 'tenant__name']
+    ordering_fields = ['created_at', 'due_date', 'total_amount']
+    ordering = ['-created_at']
+
+    def perform_create(self, serializer):
+        serializer.save(started_by=self.request.user)
+
+    def destroy(self, request, *args, **kwargs):
+        if self.get_object().status != 'pending':
+            return Response(
+                {"error": "Only pending billing runs can be deleted"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return super().destroy(request, *args, **kwargs)
+
+    @action(detail=True, methods=['post'])
+    def execute(self, request, pk=None):
+        """
+        Invoice every student in the run's cohort. With ``run_async`` the
+        run is queued on Celery instead of being executed inline; a failed
+        or interrupted run resumes after the last invoiced student.
+        """
+        run = self.get_object()
+        serializer = ExecuteBillingRunSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        if serializer.validated_data['run_async']:
+            execute_billing_run.delay(run.pk)
+            return Response(
+                BillingRunSerializer(run).data, status=status.HTTP_202_ACCEPTED
+            )
+
+        try:
+            run = BillingRunEngine(run).execute()
+        except BillingRunError as e:
+            return Response(
+                {"error": str(e)}, status=status.HTTP_400_BAD_REQUEST
+            )
+        except Exception:
+            run.refresh_from_db()
+            return Response(
+                BillingRunSerializer(run).data,
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        return Response({
+            'message': f'Created {run.created_count} invoices',
+            'run': BillingRunSerializer(run).data
+        })
+
+
 class PaymentViewSet(viewsets.ModelViewSet):
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
@@ -323,6 +451,38 @@ class PaymentViewSet(viewsets.ModelViewSet):
             status=status.HTTP_200_OK
         )
 
+    @action(
+        detail=False, methods=['post'],
+        parser_classes=[MultiPartParser, FormParser]
+    )
+    def reconcile(self, request):
+        """
+        Reconcile a bank or gateway statement (CSV, OFX or MT940) against
+        open invoices. With ``dry_run`` the matches are reported without
+        recording any payment.
+        """
+        serializer = ReconcileStatementSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        tenant = None if request.user.is_superuser else request.user.tenant
+        if tenant is None and not request.user.is_superuser:
+            # No tenant would mean every tenant's invoices
+            return Response(
+                {"error": "Your account is not linked to a tenant"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        try:
+            report = reconcile_statement(
+                data['file'], data.get('format'), data['file'].name,
+                tenant=tenant, user=request.user, dry_run=data['dry_run']
+            )
+        except ReconciliationError as e:
+            return Response(
+                {"error": str(e)}, status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(report)
+
 
 class TransactionViewSet(viewsets.ModelViewSet):
     queryset = Transaction.objects.all()
@@ -374,39 +534,7 @@ class BillingAnalyticsViewSet(viewsets.ViewSet):
     @action(detail=False, methods=['get'])
     def dashboard(self, request):
         """Get billing dashboard statistics"""
-        total_invoices = Invoice.objects.count()
-        total_payments = Payment.objects.count()
-        total_revenue = Payment.objects.filter(
-            status='completed').aggregate(
-            total=Sum('amount')
-        )['total'] or Decimal('0.00')
-        pending_invoices = Invoice.objects.filter(status='sent').count()
-        overdue_invoices = Invoice.objects.filter(status='overdue').count()
-        pending_amount = Invoice.objects.filter(status='sent').aggregate(
-            total=Sum('total_amount')
-        )['total'] or Decimal('0.00')
-        overdue_amount = Invoice.objects.filter(status='overdue').aggregate(
-            total=Sum('total_amount')
-        )['total'] or Decimal('0.00')
-        active_subscriptions = Subscription.objects.filter(
-            status='active').count()
-        expiring_subscriptions = Subscription.objects.filter(
-            status='active',
-            end_date__lte=timezone.now() + timedelta(days=30)
-        ).count()
-
-        data = {
-            'total_invoices': total_invoices,
-            'total_payments': total_payments,
-            'total_revenue': total_revenue,
-            'pending_invoices': pending_invoices,
-            'overdue_invoices': overdue_invoices,
-            'pending_amount': pending_amount,
-            'overdue_amount': overdue_amount,
-            'active_subscriptions': active_subscriptions,
-            'expiring_subscriptions': expiring_subscriptions,
-        }
-
+        data = dashboard_figures(tenant_param(request))
         serializer = BillingDashboardSerializer(data)
         return Response(serializer.data)
 
@@ -438,35 +566,12 @@ class BillingAnalyticsViewSet(viewsets.ViewSet):
 
     @action(detail=False, methods=['get'])
     def revenue_trends(self, request):
-        """Get revenue trends by period"""
-        # Get last 12 months
-        periods = []
-        for i in range(12):
-            date = timezone.now() - timedelta(days=30*i)
-            period_start = date.replace(
-                day=1, hour=0, minute=0, second=0, microsecond=0)
-            period_end = ((period_start + timedelta(days=32)).replace(day=1)
-                          - timedelta(seconds=1))
-
-            revenue = Payment.objects.filter(
-                status='completed',
-                payment_date__range=(period_start, period_end)
-            ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-
-            invoice_count = Invoice.objects.filter(
-                issue_date__range=(period_start, period_end)
-            ).count()
-
-            payment_count = Payment.objects.filter(
-                payment_date__range=(period_start, period_end)
-            ).count()
-
-            periods.append({
-                'period': period_start.strftime('%Y-%m'),
-                'revenue': revenue,
-                'invoice_count': invoice_count,
-                'payment_count': payment_count
-            })
+        """Get revenue trends by calendar month, newest first"""
+        try:
+            months = min(max(int(request.query_params.get('months', 12)), 1), 36)
+        except ValueError:
+            months = 12
+        periods = revenue_trends(months, tenant_param(request))
 
         serializer = RevenueAnalyticsSerializer(periods, many=True)
         return Response(serializer.data)
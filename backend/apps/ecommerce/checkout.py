@@ -0,0 +1,178 @@
+"""
+Cart checkout.
+
+A checkout turns a cart into an order in one transaction: stock for
+every product in the cart is reserved by a single conditional UPDATE
+(``stock = stock - quantity`` only where enough is left), so concurrent
+checkouts can never oversell, and the order items are inserted with
+``bulk_create`` at the prices read alongside the cart. If any product is
+short the whole checkout rolls back. A client-supplied idempotency key,
+unique per user, makes a retried checkout return the original order
+instead of placing a second one.
+"""
+import logging
+import uuid
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.utils import timezone
+
+from .models import Cart, Order, OrderItem, Product
+
+logger = logging.getLogger(__name__)
+
+CANCELLABLE_STATUSES = ('pending', 'paid')
+
+
+class CheckoutError(Exception):
+    """Raised when a cart cannot be checked out."""
+
+    def __init__(self, message, shortages=None):
+        super().__init__(message)
+        self.shortages = shortages or []
+
+
+def order_number():
+    return f"ORD-{timezone.now():%Y%m%d}-{uuid.uuid4().hex[:10].upper()}"
+
+
+def _quantity_case(quantities):
+    return Case(
+        *[When(pk=pk, then=Value(quantity)) for pk, quantity in quantities.items()],
+        output_field=IntegerField(),
+    )
+
+
+def reserve_stock(quantities):
+    """
+    Decrement stock for ``{product_id: quantity}`` in one statement, only
+    where enough is left. Must run inside the checkout transaction; raises
+    ``CheckoutError`` listing the short products if any could not be
+    reserved.
+    """
+    enough = Q()
+    for pk, quantity in quantities.items():
+        enough |= Q(pk=pk, stock__gte=quantity)
+    reserved = Product.objects.filter(enough, is_active=True).update(
+        stock=F('stock') - _quantity_case(quantities),
+        updated_at=timezone.now(),
+    )
+    if reserved != len(quantities):
+        available = dict(
+            Product.objects.filter(pk__in=quantities).values_list('pk', 'stock')
+        )
+        shortages = [
+            {
+                'product': pk,
+                'requested': quantity,
+                'available': max(available.get(pk, 0), 0),
+            }
+            for pk, quantity in quantities.items()
+            if available.get(pk, 0) < quantity
+        ]
+        raise CheckoutError("Insufficient stock", shortages)
+
+
+def release_stock(quantities):
+    """Return reserved stock for ``{product_id: quantity}`` in one statement."""
+    if quantities:
+        Product.objects.filter(pk__in=quantities).update(
+            stock=F('stock') + _quantity_case(quantities),
+            updated_at=timezone.now(),
+        )
+
+
+def checkout(cart, idempotency_key=None):
+    """
+    Place an order for ``cart`` and empty it.
+
+    Returns ``(order, created)``; ``created`` is ``False`` when the
+    idempotency key matches an order the user already placed.
+    """
+    key = idempotency_key or None
+    if key:
+        existing = Order.objects.filter(user_id=cart.user_id, idempotency_key=key).first()
+        if existing:
+            return existing, False
+
+    try:
+        with transaction.atomic():
+            # Serialise checkouts of the same cart (a no-op on SQLite).
+            Cart.objects.select_for_update().filter(pk=cart.pk).first()
+            items = list(
+                cart.items.select_related('product').only(
+                    'name', 'quantity', 'product__name', 'product__sku',
+                    'product__price', 'product__is_active',
+                )
+            )
+            if not items:
+                raise CheckoutError("Cart is empty")
+
+            quantities, products = defaultdict(int), {}
+            for item in items:
+                product = item.product
+                if product is None or not product.is_active:
+                    raise CheckoutError(f"{item.name or 'A product'} is no longer available")
+                quantities[product.pk] += item.quantity
+                products[product.pk] = product
+
+            reserve_stock(quantities)
+
+            total = sum(
+                (products[pk].price * quantity for pk, quantity in quantities.items()),
+                Decimal('0.00'),
+            )
+            order = Order.objects.create(
+                user_id=cart.user_id,
+                order_number=order_number(),
+                customer_email=cart.user.email,
+                idempotency_key=key,
+                status='pending',
+                total_amount=total,
+            )
+            OrderItem.objects.bulk_create([
+                OrderItem(
+                    order=order,
+                    product=products[pk],
+                    name=products[pk].name,
+                    sku=products[pk].sku,
+                    price=products[pk].price,
+                    quantity=quantity,
+                )
+                for pk, quantity in quantities.items()
+            ])
+            cart.items.all().delete()
+            Cart.objects.filter(pk=cart.pk).update(updated_at=timezone.now())
+    except IntegrityError:
+        # A concurrent retry with the same key won; everything above rolled back.
+        if key:
+            existing = Order.objects.filter(user_id=cart.user_id, idempotency_key=key).first()
+            if existing:
+                return existing, False
+        raise
+
+    logger.info(f"Order {order.order_number} placed for cart {cart.pk}: {total}")
+    return order, True
+
+
+def cancel_order(order):
+    """
+    Cancel a pending or paid order and return its stock. The status change
+    is conditional, so stock is released once even if cancelled twice.
+    """
+    with transaction.atomic():
+        cancelled = Order.objects.filter(
+            pk=order.pk, status__in=CANCELLABLE_STATUSES
+        ).update(status='cancelled', updated_at=timezone.now())
+        if not cancelled:
+            raise CheckoutError("Order cannot be cancelled")
+        quantities = defaultdict(int)
+        for product_id, quantity in order.items.filter(
+            product__isnull=False
+        ).values_list('product_id', 'quantity'):
+            quantities[product_id] += quantity
+        release_stock(quantities)
+    order.refresh_from_db()
+    return order
@@ -0,0 +1,168 @@
+"""
+Flash-sale load test for cart checkout.
+
+Creates a product with ``--units`` in stock and ``--shoppers`` users each
+holding one unit in their cart, then checks every cart out at once from
+its own thread and database connection. The sale passes when exactly
+the stock on hand was sold: no order beyond it, no negative stock and
+every refused shopper's cart left intact. Checkouts that hit a database
+lock (SQLite allows one writer at a time) back off and retry; they are
+reported as retries, not failures.
+
+On SQLite the shoppers' connections open ``IMMEDIATE`` transactions, as
+a concurrent SQLite deployment should: with the default ``DEFERRED``
+mode every checkout takes a read lock before it writes, and under this
+much contention they keep aborting each other.
+
+Everything the test creates is deleted afterwards unless ``--keep`` is
+given.
+"""
+import random
+import threading
+import time
+import uuid
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connection
+from django.db.models import Sum
+
+from apps.ecommerce.checkout import CheckoutError, checkout
+from apps.ecommerce.models import Cart, CartItem, Order, OrderItem, Product
+
+User = get_user_model()
+
+MAX_BACKOFF_SECONDS = 0.05
+
+
+class Command(BaseCommand):
+    help = 'Check out many carts at once against a limited stock and verify nothing is oversold'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shoppers', type=int, default=500)
+        parser.add_argument('--units', type=int, default=100)
+        parser.add_argument(
+            '--keep', action='store_true',
+            help='Keep the product, shoppers and orders created by the test',
+        )
+
+    def handle(self, *args, **options):
+        tag = f"flash-{uuid.uuid4().hex[:8]}"
+        product, carts = self.prepare(tag, options['shoppers'], options['units'])
+        try:
+            sold, refused, retries, elapsed = self.run(carts)
+            report = self.verify(product, options['units'], sold, refused)
+            report.append(('Lock retries', retries))
+            report.append(('Elapsed', f'{elapsed:.2f}s'))
+            report.append(('Checkouts per second', f'{len(carts) / elapsed:.1f}'))
+            for label, value in report:
+                self.stdout.write(f'{label:<28}{value}')
+        finally:
+            if not options['keep']:
+                self.clean_up(tag, product)
+        self.stdout.write(self.style.SUCCESS('Flash sale sold exactly the stock on hand'))
+
+    def prepare(self, tag, shoppers, units):
+        product = Product.objects.create(
+            name='Flash sale item', sku=tag, price=Decimal('10.00'), stock=units
+        )
+        users = []
+        for index in range(shoppers):
+            # No password: hashing one per shopper would dominate the run
+            user = User(username=f'{tag}-{index}', email=f'{tag}-{index}@example.com')
+            user.set_unusable_password()
+            users.append(user)
+        User.objects.bulk_create(users, batch_size=500)
+        users = list(User.objects.filter(username__startswith=f'{tag}-'))
+        carts = Cart.objects.bulk_create(
+            [Cart(user=user) for user in users], batch_size=500
+        )
+        CartItem.objects.bulk_create(
+            [
+                CartItem(
+                    cart=cart, product=product, name=product.name,
+                    sku=product.sku, price=product.price, quantity=1,
+                )
+                for cart in carts
+            ],
+            batch_size=500,
+        )
+        # Checkout reads ``cart.user.email``; load the users up front.
+        for cart, user in zip(carts, users):
+            cart.user = user
+        return product, carts
+
+    def run(self, carts):
+        barrier = threading.Barrier(len(carts))
+        sold, refused, retries = [], [], [0]
+        lock = threading.Lock()
+
+        def attempt(cart):
+            barrier.wait()
+            try:
+                while True:
+                    try:
+                        sold.append(checkout(cart)[0].pk)
+                        return
+                    except CheckoutError:
+                        refused.append(cart.pk)
+                        return
+                    except OperationalError:
+                        # The checkout transaction rolled back; try again
+                        with lock:
+                            retries[0] += 1
+                        time.sleep(random.uniform(0, MAX_BACKOFF_SECONDS))
+            finally:
+                close_old_connections()
+
+        # Thread connections are opened from the shared settings dict
+        options = connection.settings_dict.setdefault('OPTIONS', {})
+        configured = options.get('transaction_mode')
+        if connection.vendor == 'sqlite':
+            options['transaction_mode'] = configured or 'IMMEDIATE'
+        threads = [threading.Thread(target=attempt, args=(cart,)) for cart in carts]
+        started = time.perf_counter()
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            if configured is None:
+                options.pop('transaction_mode', None)
+        return sold, refused, retries[0], time.perf_counter() - started
+
+    def verify(self, product, units, sold, refused):
+        product.refresh_from_db()
+        ordered = OrderItem.objects.filter(product=product).aggregate(
+            units=Sum('quantity')
+        )['units'] or 0
+        left_in_carts = CartItem.objects.filter(product=product).count()
+        report = [
+            ('Shoppers', len(sold) + len(refused)),
+            ('Units on sale', units),
+            ('Orders placed', len(sold)),
+            ('Checkouts refused', len(refused)),
+            ('Units ordered', ordered),
+            ('Stock left', product.stock),
+            ('Carts left unpaid', left_in_carts),
+        ]
+        expected_sold = min(units, len(sold) + len(refused))
+        problems = []
+        if len(sold) != expected_sold or ordered != expected_sold:
+            problems.append(f'{len(sold)} orders for {ordered} units, expected {expected_sold}')
+        if product.stock != units - expected_sold:
+            problems.append(f'stock ended at {product.stock}, expected {units - expected_sold}')
+        if left_in_carts != len(refused):
+            problems.append(f'{left_in_carts} carts left for {len(refused)} refused shoppers')
+        if problems:
+            for label, value in report:
+                self.stderr.write(f'{label:<28}{value}')
+            raise CommandError('Flash sale failed: ' + '; '.join(problems))
+        return report
+
+    def clean_up(self, tag, product):
+        Order.objects.filter(user__username__startswith=f'{tag}-').delete()
+        User.objects.filter(username__startswith=f'{tag}-').delete()
+        product.delete()
@@ -19,6 +19,11 @@ class Product(TimeStampedModel):
     image_url = models.URLField(blank=True)
     is_active = models.BooleanField(default=True)
 
+    class Meta:
+        constraints = [
+            models.CheckConstraint(condition=models.Q(stock__gte=0), name="product_stock_non_negative"),
+        ]
+
     def __str__(self) -> str:
         return f"{self.name} ({self.sku})"
 
@@ -38,6 +43,13 @@ class Order(TimeStampedModel):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
     currency = models.CharField(max_length=10, default="BDT")
     total_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    # Client-supplied key that makes a retried checkout return the same order
+    idempotency_key = models.CharField(max_length=64, null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "idempotency_key"], name="unique_order_idempotency_key"),
+        ]
 
     def __str__(self) -> str:
         return self.order_number
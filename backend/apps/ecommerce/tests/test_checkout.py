@@ -0,0 +1,106 @@
+"""
+Tests for cart checkout: stock is reserved with the order, a short cart
+rolls back completely, idempotency keys return the original order and a
+flash sale never oversells.
+"""
+import io
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+
+from apps.ecommerce.checkout import CheckoutError, cancel_order, checkout
+from apps.ecommerce.models import Cart, CartItem, Order, OrderItem, Product
+
+User = get_user_model()
+
+PARALLEL_CHECKOUTS = 500
+UNITS = 100
+
+
+def make_product(stock, price='10.00', sku='SKU-1'):
+    return Product.objects.create(
+        name=f"Product {sku}", sku=sku, price=Decimal(price), stock=stock
+    )
+
+
+def make_cart(username, *lines):
+    user = User.objects.create_user(username=username, email=f"{username}@example.com")
+    cart = Cart.objects.create(user=user)
+    CartItem.objects.bulk_create([
+        CartItem(
+            cart=cart, product=product, name=product.name, sku=product.sku,
+            price=product.price, quantity=quantity,
+        )
+        for product, quantity in lines
+    ])
+    return cart
+
+
+class CheckoutTests(TestCase):
+    def setUp(self):
+        self.pen = make_product(stock=5, price='2.50', sku='PEN')
+        self.book = make_product(stock=1, price='20.00', sku='BOOK')
+
+    def test_checkout_reserves_stock_and_empties_cart(self):
+        cart = make_cart('buyer', (self.pen, 2), (self.book, 1))
+        order, created = checkout(cart)
+        self.assertTrue(created)
+        self.assertEqual(order.total_amount, Decimal('25.00'))
+        self.assertEqual(
+            dict(OrderItem.objects.filter(order=order).values_list('sku', 'quantity')),
+            {'PEN': 2, 'BOOK': 1},
+        )
+        self.pen.refresh_from_db()
+        self.book.refresh_from_db()
+        self.assertEqual((self.pen.stock, self.book.stock), (3, 0))
+        self.assertFalse(cart.items.exists())
+
+    def test_short_product_rolls_back_the_whole_checkout(self):
+        cart = make_cart('buyer', (self.pen, 2), (self.book, 2))
+        with self.assertRaises(CheckoutError) as raised:
+            checkout(cart)
+        self.assertEqual(
+            raised.exception.shortages,
+            [{'product': self.book.pk, 'requested': 2, 'available': 1}],
+        )
+        self.pen.refresh_from_db()
+        self.assertEqual(self.pen.stock, 5)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(cart.items.count(), 2)
+
+    def test_idempotency_key_returns_the_original_order(self):
+        cart = make_cart('buyer', (self.pen, 1))
+        order, created = checkout(cart, idempotency_key='retry-1')
+        CartItem.objects.create(
+            cart=cart, product=self.pen, name=self.pen.name, price=self.pen.price,
+        )
+        again, created_again = checkout(cart, idempotency_key='retry-1')
+        self.assertTrue(created)
+        self.assertFalse(created_again)
+        self.assertEqual(again.pk, order.pk)
+        self.pen.refresh_from_db()
+        self.assertEqual(self.pen.stock, 4)
+
+    def test_cancelling_releases_stock_once(self):
+        order, _ = checkout(make_cart('buyer', (self.pen, 3)))
+        cancel_order(order)
+        with self.assertRaises(CheckoutError):
+            cancel_order(order)
+        self.pen.refresh_from_db()
+        self.assertEqual(self.pen.stock, 5)
+
+
+class FlashSaleTests(TransactionTestCase):
+    """500 shoppers race for 100 units; exactly 100 may be sold."""
+
+    def test_parallel_checkouts_never_oversell(self):
+        out = io.StringIO()
+        call_command(
+            'flash_sale_loadtest', shoppers=PARALLEL_CHECKOUTS, units=UNITS, stdout=out
+        )
+        self.assertIn(f"{'Orders placed':<28}{UNITS}\n", out.getvalue())
+        self.assertIn('sold exactly the stock on hand', out.getvalue())
+        # The load test cleans up after itself
+        self.assertFalse(Order.objects.exists())
@@ -6,6 +6,7 @@ from django_filters.rest_framework import DjangoFilterBackend
 from django.utils import timezone
 from datetime import timedelta
 
+from .checkout import CheckoutError, cancel_order, checkout
 from .models import (
     Product, Order, OrderItem, Cart, CartItem
 )
@@ -58,15 +59,15 @@ class OrderViewSet(viewsets.ModelViewSet):
     def cancel(self, request, pk=None):
         """Cancel an order"""
         order = self.get_object()
-        if order.status in ['pending', 'paid']:
-            order.status = 'cancelled'
-            order.save()
-            serializer = self.get_serializer(order)
-            return Response(serializer.data)
-        return Response(
-            {'error': 'Order cannot be cancelled'},
-            status=status.HTTP_400_BAD_REQUEST
-        )
+        try:
+            order = cancel_order(order)
+        except CheckoutError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        serializer = self.get_serializer(order)
+        return Response(serializer.data)
 
     @action(detail=False, methods=['get'])
     def recent(self, request):
@@ -103,38 +104,44 @@ class CartViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['post'])
     def checkout(self, request, pk=None):
-        """Checkout cart and create order"""
-        cart = self.get_object()
-        cart_items = cart.items.all()
-
-        if not cart_items.exists():
+        """
+        Checkout cart and create order.
+
+        Stock is reserved atomically; send an ``Idempotency-Key`` header
+        (or ``idempotency_key``) to make retries return the same order.
+        """
+        if pk is None:
+            cart = Cart.objects.filter(user=request.user).first()
+            if cart is None:
+                return Response(
+                    {'error': 'Cart is empty'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        else:
+            cart = self.get_object()
+        key = (
+            request.headers.get('Idempotency-Key')
+            or request.data.get('idempotency_key')
+        )
+        if key and len(key) > 64:
             return Response(
-                {'error': 'Cart is empty'},
+                {'error': 'Idempotency key must be at most 64 characters'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Create order
-        order = Order.objects.create(
-            user=cart.user,
-            total_amount=cart.total_amount,
-            status='pending'
-        )
-
-        # Create order items
-        for item in cart_items:
-            OrderItem.objects.create(
-                order=order,
-                product=item.product,
-                quantity=item.quantity,
-                price=item.product.price
-            )
-
-        # Clear cart
-        cart.items.all().delete()
-        cart.save()
+        try:
+            order, created = checkout(cart, idempotency_key=key)
+        except CheckoutError as e:
+            data = {'error': str(e)}
+            if e.shortages:
+                data['shortages'] = e.shortages
+            return Response(data, status=status.HTTP_400_BAD_REQUEST)
 
         serializer = OrderSerializer(order)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return Response(
+            serializer.data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
 
 
 class CartItemViewSet(viewsets.ModelViewSet):
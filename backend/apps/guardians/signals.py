@@ -6,6 +6,8 @@ from django.utils import timezone
 from datetime import date, timedelta
 from django.db.models import Count, F, Q
 
+from apps.accounts.notifications import notify
+
 from .models import (
     Guardian, GuardianProfile, GuardianStudent, GuardianDocument,
     GuardianSettings, GuardianNotification
@@ -77,24 +79,15 @@ def guardian_student_created(sender, instance, created, **kwargs):
             priority='medium'
         )
         
-        # Send email notification
-        if instance.guardian.email:
-            send_mail(
-                subject=f'Student Link Added - {settings.SCHOOL_NAME}',
-                message=f'''
-                Dear {instance.guardian.full_name},
-                
-                You have been linked to student {instance.student.full_name} ({instance.student.student_id}) as {instance.get_relationship_display()}.
-                
-                You can now view this student's academic progress, attendance, and other information through the parent portal.
-                
-                Best regards,
-                {settings.SCHOOL_NAME} Team
-                ''',
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[instance.guardian.email],
-                fail_silently=True
-            )
+        # Email and push through the notification dispatcher
+        notify(
+            [instance.guardian.user_id],
+            'Student Link Added',
+            f'You have been linked to student {instance.student.full_name} ({instance.student.student_id}) as {instance.get_relationship_display()}. '
+            f'You can now view this student\'s academic progress, attendance, and other information through the parent portal.',
+            category='academic',
+            channels=('push', 'email')
+        )
 
 @receiver(post_save, sender=GuardianDocument)
 def guardian_document_uploaded(sender, instance, created, **kwargs):
@@ -357,10 +357,10 @@ class GuardianNotificationViewSet(viewsets.ModelViewSet):
         if not notification_ids:
             return Response({'error': 'No notification IDs provided'}, status=status.HTTP_400_BAD_REQUEST)
         
-        GuardianNotification.objects.filter(id__in=notification_ids).update(
-            read=True, read_at=timezone.now()
-        )
-        return Response({'message': f'{len(notification_ids)} notifications marked as read'})
+        updated = GuardianNotification.objects.filter(
+            id__in=notification_ids, read=False
+        ).update(read=True, read_at=timezone.now())
+        return Response({'message': f'{updated} notifications marked as read'})
 
     @action(detail=False, methods=['get'])
     def unread(self, request):
@@ -0,0 +1,209 @@
+"""
+Transactional bulk room allocation.
+
+Target rooms are locked with ``SELECT ... FOR UPDATE`` so concurrent
+requests cannot hand out the same bed, free beds are computed in memory
+from the live allocations, and the allocations plus room counters are
+written with one ``bulk_create`` and one ``UPDATE``.
+"""
+import logging
+
+from django.db import transaction
+from django.db.models import Case, IntegerField, Value, When
+
+from .models import Room, RoomAllocation
+
+logger = logging.getLogger(__name__)
+
+LIVE_STATUSES = ('active', 'pending')
+
+
+class AllocationError(Exception):
+    """Raised when an allocation request cannot be satisfied."""
+
+
+def _lock_rooms(queryset):
+    rooms = list(
+        queryset.select_for_update(of=('self',))
+        .select_related('room_type')
+        .order_by('floor', 'room_number', 'id')
+    )
+    occupied = {room.id: set() for room in rooms}
+    for room_id, bed_number in RoomAllocation.objects.filter(
+        room__in=rooms, status__in=LIVE_STATUSES
+    ).values_list('room_id', 'bed_number'):
+        occupied[room_id].add(bed_number)
+    return rooms, occupied
+
+
+def _housed_students(student_ids, tenant):
+    return set(
+        RoomAllocation.objects.filter(
+            student_id__in=student_ids, tenant=tenant,
+            status__in=LIVE_STATUSES
+        ).values_list('student_id', flat=True)
+    )
+
+
+def _free_beds(room, occupied):
+    return [
+        bed for bed in range(1, room.room_type.capacity + 1)
+        if bed not in occupied
+    ]
+
+
+def _write(placements, rooms, occupied, check_in_date, user, tenant, notes):
+    """Persist ``{room_id: [student_id, ...]}`` placements."""
+    by_id = {room.id: room for room in rooms}
+    allocations = []
+    for room_id, student_ids in placements.items():
+        beds = _free_beds(by_id[room_id], occupied[room_id])
+        for student_id, bed_number in zip(student_ids, beds):
+            allocations.append(RoomAllocation(
+                student_id=student_id,
+                room_id=room_id,
+                bed_number=bed_number,
+                check_in_date=check_in_date,
+                allocated_by=user,
+                notes=notes,
+                tenant=tenant,
+            ))
+    RoomAllocation.objects.bulk_create(allocations)
+
+    counts = {
+        room_id: len(occupied[room_id]) + len(student_ids)
+        for room_id, student_ids in placements.items() if student_ids
+    }
+    if counts:
+        capacity = Case(
+            *[When(id=room_id, then=Value(count))
+              for room_id, count in counts.items()],
+            output_field=IntegerField(),
+        )
+        full = [
+            room_id for room_id, count in counts.items()
+            if count >= by_id[room_id].room_type.capacity
+        ]
+        Room.objects.filter(id__in=counts).update(
+            current_capacity=capacity,
+            is_occupied=Case(
+                When(id__in=full, then=Value(True)), default=Value(False)
+            ),
+            status=Case(
+                When(id__in=full, then=Value('occupied')),
+                default=Value('available'),
+            ),
+        )
+    return allocations
+
+
+def allocate_to_room(room_id, student_ids, check_in_date, user, tenant,
+                     notes=''):
+    """
+    Allocate ``student_ids`` to one room, all or nothing.
+
+    Students who already hold a live allocation are skipped and reported.
+    Raises ``AllocationError`` if the room is missing, unavailable or has
+    fewer free beds than students.
+    """
+    with transaction.atomic():
+        rooms, occupied = _lock_rooms(
+            Room.objects.filter(id=room_id, tenant=tenant)
+        )
+        if not rooms:
+            raise AllocationError('Room not found')
+        room = rooms[0]
+        if room.status in ('maintenance', 'reserved'):
+            raise AllocationError(f'Room is {room.get_status_display().lower()}')
+
+        housed = _housed_students(student_ids, tenant)
+        pending = list(dict.fromkeys(
+            student_id for student_id in student_ids if student_id not in housed
+        ))
+        free = len(_free_beds(room, occupied[room.id]))
+        if len(pending) > free:
+            raise AllocationError(
+                f'Room has {free} free beds for {len(pending)} students'
+            )
+
+        allocations = _write(
+            {room.id: pending}, rooms, occupied, check_in_date, user,
+            tenant, notes
+        )
+    return allocations, sorted(housed)
+
+
+def pack(rooms, occupied, groups, strategy='best_fit'):
+    """
+    Place student groups into rooms without splitting a group.
+
+    Groups are placed largest first. ``first_fit`` takes the first room
+    in building order with enough free beds; ``best_fit`` takes the room
+    whose free beds fit the group most tightly, which fills partially
+    occupied rooms before opening empty ones.
+
+    Returns ``(placements, unplaced)``.
+    """
+    free = {room.id: len(_free_beds(room, occupied[room.id])) for room in rooms}
+    order = [room.id for room in rooms]
+    placements = {room_id: [] for room_id in order}
+    unplaced = []
+
+    for group in sorted(groups, key=len, reverse=True):
+        candidates = [room_id for room_id in order if free[room_id] >= len(group)]
+        if not candidates:
+            unplaced.extend(group)
+            continue
+        if strategy == 'best_fit':
+            target = min(candidates, key=lambda room_id: free[room_id])
+        else:
+            target = candidates[0]
+        placements[target].extend(group)
+        free[target] -= len(group)
+
+    return placements, unplaced
+
+
+def auto_allocate(building_id, student_ids, check_in_date, user, tenant,
+                  groups=None, room_type_id=None, strategy='best_fit',
+                  notes=''):
+    """
+    Spread students across the available rooms of a building.
+
+    ``groups`` are lists of students who must share a room; remaining
+    ``student_ids`` are placed individually. Students who could not be
+    placed are returned rather than failing the whole batch.
+    """
+    groups = [list(dict.fromkeys(group)) for group in (groups or []) if group]
+    grouped = {student_id for group in groups for student_id in group}
+    singles = [
+        student_id for student_id in dict.fromkeys(student_ids)
+        if student_id not in grouped
+    ]
+
+    with transaction.atomic():
+        rooms = Room.objects.filter(
+            building_id=building_id, tenant=tenant
+        ).exclude(status__in=('maintenance', 'reserved'))
+        if room_type_id is not None:
+            rooms = rooms.filter(room_type_id=room_type_id)
+        rooms, occupied = _lock_rooms(rooms)
+
+        housed = _housed_students(grouped.union(singles), tenant)
+        items = [
+            [student_id for student_id in group if student_id not in housed]
+            for group in groups
+        ]
+        items += [[student_id] for student_id in singles if student_id not in housed]
+        placements, unplaced = pack(
+            rooms, occupied, [item for item in items if item], strategy
+        )
+        allocations = _write(
+            placements, rooms, occupied, check_in_date, user, tenant, notes
+        )
+
+    logger.info(
+        f"Auto-allocated {len(allocations)} students in building "
+        f"{building_id} ({len(unplaced)} unplaced)"
+    )
+    return allocations, sorted(housed), unplaced
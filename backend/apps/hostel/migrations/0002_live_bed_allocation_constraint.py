@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hostel', '0001_initial'),
+        ('students', '0001_initial'),
+        ('tenants', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='roomallocation',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='roomallocation',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['active', 'pending'])), fields=('room', 'bed_number', 'tenant'), name='unique_live_bed_allocation'),
+        ),
+    ]
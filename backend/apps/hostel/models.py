@@ -113,7 +113,14 @@ class RoomAllocation(models.Model):
 
     class Meta:
         ordering = ['-created_at']
-        unique_together = ['room', 'bed_number', 'tenant']
+        constraints = [
+            # A bed can be reused once its previous allocation has ended.
+            models.UniqueConstraint(
+                fields=['room', 'bed_number', 'tenant'],
+                condition=models.Q(status__in=['active', 'pending']),
+                name='unique_live_bed_allocation',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.student.full_name} - {self.room} (Bed {self.bed_number})"
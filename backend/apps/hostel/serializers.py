@@ -178,6 +178,24 @@ class BulkRoomAllocationSerializer(serializers.Serializer):
     notes = serializers.CharField(required=False, allow_blank=True)
 
 
+class AutoRoomAllocationSerializer(serializers.Serializer):
+    building_id = serializers.IntegerField()
+    student_ids = serializers.ListField(
+        child=serializers.IntegerField(), required=False, default=list
+    )
+    groups = serializers.ListField(
+        child=serializers.ListField(child=serializers.IntegerField()),
+        required=False, default=list,
+        help_text="Lists of students who must share a room"
+    )
+    room_type_id = serializers.IntegerField(required=False, allow_null=True)
+    strategy = serializers.ChoiceField(
+        choices=['best_fit', 'first_fit'], default='best_fit'
+    )
+    check_in_date = serializers.DateField()
+    notes = serializers.CharField(required=False, allow_blank=True)
+
+
 class HostelReportSerializer(serializers.Serializer):
     occupancy_report = serializers.DictField()
     fee_collection_report = serializers.DictField()
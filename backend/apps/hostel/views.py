@@ -20,8 +20,10 @@ from .serializers import (
     VisitorLogSerializer, VisitorLogDetailSerializer,
     HostelDashboardSerializer, RoomStatusUpdateSerializer,
     AllocationStatusUpdateSerializer, FeePaymentSerializer,
-    BulkRoomAllocationSerializer, HostelReportSerializer
+    BulkRoomAllocationSerializer, AutoRoomAllocationSerializer,
+    HostelReportSerializer
 )
+from .allocation import AllocationError, allocate_to_room, auto_allocate
 
 
 class BuildingViewSet(viewsets.ModelViewSet):
@@ -129,25 +131,37 @@ class RoomAllocationViewSet(viewsets.ModelViewSet):
         serializer = BulkRoomAllocationSerializer(data=request.data)
         if serializer.is_valid():
             data = serializer.validated_data
-            room = Room.objects.get(id=data['room_id'])
-            allocations = []
-            
-            for student_id in data['student_ids']:
-                allocation = RoomAllocation.objects.create(
-                    student_id=student_id,
-                    room=room,
-                    bed_number=room.current_capacity + 1,
-                    check_in_date=data['check_in_date'],
-                    allocated_by=request.user,
-                    notes=data.get('notes', ''),
-                    tenant=request.user.tenant
+            try:
+                allocations, skipped = allocate_to_room(
+                    data['room_id'], data['student_ids'],
+                    data['check_in_date'], request.user,
+                    request.user.tenant, data.get('notes', '')
                 )
-                allocations.append(allocation)
-                room.current_capacity += 1
-                room.is_occupied = room.current_capacity >= room.room_type.capacity
-                room.save()
-            
-            return Response(RoomAllocationSerializer(allocations, many=True).data)
+            except AllocationError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+            return Response({
+                'allocations': RoomAllocationSerializer(allocations, many=True).data,
+                'already_allocated': skipped
+            })
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=False, methods=['post'])
+    def auto_allocate(self, request):
+        serializer = AutoRoomAllocationSerializer(data=request.data)
+        if serializer.is_valid():
+            data = serializer.validated_data
+            allocations, skipped, unplaced = auto_allocate(
+                data['building_id'], data['student_ids'],
+                data['check_in_date'], request.user, request.user.tenant,
+                groups=data['groups'], room_type_id=data.get('room_type_id'),
+                strategy=data['strategy'], notes=data.get('notes', '')
+            )
+            return Response({
+                'allocations': RoomAllocationSerializer(allocations, many=True).data,
+                'already_allocated': skipped,
+                'unplaced': unplaced
+            })
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -3,7 +3,7 @@ from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 from .models import (
-    Department, Position, Employee, Payroll, Leave, 
+    Department, Position, Employee, Payroll, PayrollRun, Leave, 
     EmployeeAttendance, Performance, Document
 )
 
@@ -121,6 +121,22 @@ class PayrollAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(PayrollRun)
+class PayrollRunAdmin(admin.ModelAdmin):
+    list_display = [
+        'month', 'year', 'tenant', 'status', 'employee_count',
+        'created_count', 'skipped_count', 'total_net', 'completed_at'
+    ]
+    list_filter = ['status', 'month', 'year', 'created_at']
+    readonly_fields = [
+        'employee_count', 'created_count', 'skipped_count', 'last_employee_id',
+        'total_gross', 'total_net', 'started_at', 'completed_at',
+        'created_at', 'updated_at'
+    ]
+    list_per_page = 25
+    list_select_related = ['tenant']
+
+
 @admin.register(Leave)
 class LeaveAdmin(admin.ModelAdmin):
     list_display = [
@@ -0,0 +1,303 @@
+"""
+Bulk employee attendance.
+
+Attendance is written with a single ``INSERT ... ON CONFLICT (employee,
+date) DO UPDATE`` per batch instead of a get/create/save round-trip per
+employee. Raw biometric/RFID punch logs are streamed line by line,
+folded into first-in/last-out per employee and day, and written through
+the same upsert.
+"""
+import codecs
+import csv
+import json
+import logging
+import uuid
+from datetime import datetime, time
+from decimal import Decimal
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime, parse_time
+
+from .models import Employee, EmployeeAttendance
+
+logger = logging.getLogger(__name__)
+
+UPSERT_FIELDS = [
+    'status', 'check_in_time', 'check_out_time', 'working_hours', 'remarks',
+    'updated_at',
+]
+VALID_STATUSES = {
+    choice for choice, _ in EmployeeAttendance._meta.get_field('status').choices
+}
+LATE_AFTER = time(9, 15)
+# Statuses derived from punches; any other status survives a punch
+PUNCH_STATUSES = {'absent', 'present', 'late'}
+
+
+def scoped_employees(tenant=None):
+    queryset = Employee.objects.all()
+    if tenant is not None:
+        queryset = queryset.filter(user__tenant=tenant)
+    return queryset
+
+
+def upsert_attendance(rows):
+    """
+    Upsert ``EmployeeAttendance`` rows keyed on (employee, date).
+
+    ``rows`` are dicts with ``employee_id``, ``date`` and any of the
+    ``UPSERT_FIELDS``. Returns the set of keys that already existed so
+    callers can report created vs updated.
+    """
+    if not rows:
+        return set()
+
+    keys = {(str(row['employee_id']), row['date']) for row in rows}
+    existing = {
+        key for key in (
+            (str(employee_id), day)
+            for employee_id, day in _existing_rows(keys).values_list(
+                'employee_id', 'date'
+            )
+        )
+        if key in keys
+    }
+
+    now = timezone.now()
+    EmployeeAttendance.objects.bulk_create(
+        [
+            EmployeeAttendance(
+                employee_id=row['employee_id'],
+                date=row['date'],
+                status=row.get('status', 'present'),
+                check_in_time=row.get('check_in_time'),
+                check_out_time=row.get('check_out_time'),
+                working_hours=row.get('working_hours'),
+                remarks=row.get('remarks', ''),
+                updated_at=now,
+            )
+            for row in rows
+        ],
+        update_conflicts=True,
+        unique_fields=['employee', 'date'],
+        update_fields=UPSERT_FIELDS,
+        batch_size=500,
+    )
+    return existing
+
+
+def _existing_rows(keys):
+    """
+    Rows covering the (employee, date) ``keys``; a superset when the
+    batch spans several days, filtered by the caller.
+    """
+    return EmployeeAttendance.objects.filter(
+        employee_id__in={employee_id for employee_id, _ in keys},
+        date__in={day for _, day in keys},
+    )
+
+
+def bulk_mark_attendance(date, records, tenant=None):
+    """
+    Mark attendance for many employees on ``date``.
+
+    Employee ids are validated with one ``in_bulk`` query; the rest is a
+    single upsert. Returns one outcome per input record, in order.
+    """
+    employee_ids = {str(record.get('employee_id')) for record in records}
+    employees = scoped_employees(tenant).in_bulk(
+        [employee_id for employee_id in employee_ids if _is_uuid(employee_id)]
+    )
+    known = {str(pk) for pk in employees}
+
+    outcomes, rows, seen = [], [], {}
+    for record in records:
+        employee_id = str(record.get('employee_id'))
+        status = record.get('status', 'present')
+        if employee_id not in known:
+            outcomes.append({'employee_id': employee_id, 'result': 'rejected',
+                             'error': 'Unknown employee'})
+            continue
+        if status not in VALID_STATUSES:
+            outcomes.append({'employee_id': employee_id, 'result': 'rejected',
+                             'error': 'Invalid status'})
+            continue
+        try:
+            check_in = _parse_time(record.get('check_in_time'))
+            check_out = _parse_time(record.get('check_out_time'))
+        except ValueError:
+            outcomes.append({'employee_id': employee_id, 'result': 'rejected',
+                             'error': 'Invalid time'})
+            continue
+
+        row = {
+            'employee_id': employee_id,
+            'date': date,
+            'status': status,
+            'check_in_time': check_in,
+            'check_out_time': check_out,
+            'working_hours': (
+                _hours_between(check_in, check_out)
+                if check_in and check_out else None
+            ),
+            'remarks': record.get('remarks', ''),
+        }
+        # The last entry for an employee wins, as sequential saves would.
+        if employee_id in seen:
+            rows[seen[employee_id]] = row
+        else:
+            seen[employee_id] = len(rows)
+            rows.append(row)
+        outcomes.append({'employee_id': employee_id, 'result': None})
+
+    existing = upsert_attendance(rows)
+    existing_ids = {employee_id for employee_id, _ in existing}
+    for outcome in outcomes:
+        if outcome['result'] is None:
+            outcome['result'] = (
+                'updated' if outcome['employee_id'] in existing_ids
+                else 'created'
+            )
+    return outcomes
+
+
+def _parse_time(value):
+    if value in (None, ''):
+        return None
+    if isinstance(value, time):
+        return value
+    parsed = parse_time(str(value))
+    if parsed is None:
+        raise ValueError(value)
+    return parsed
+
+
+def _is_uuid(value):
+    try:
+        uuid.UUID(str(value))
+    except ValueError:
+        return False
+    return True
+
+
+def iter_punches(stream, fmt):
+    """
+    Yield ``(employee_code, timestamp)`` tuples from a punch log.
+
+    ``fmt`` is ``csv`` (header row with ``employee_id`` and
+    ``timestamp`` columns) or ``jsonl`` (one object per line with the
+    same keys). Malformed lines are skipped and counted by the caller.
+    """
+    text = codecs.iterdecode(stream, 'utf-8', errors='replace')
+    if fmt == 'csv':
+        lines = csv.DictReader(text)
+    else:
+        lines = (_loads(line) for line in text if line.strip())
+
+    for entry in lines:
+        if not entry:
+            yield None
+            continue
+        code = (entry.get('employee_id') or '').strip()
+        stamp = parse_datetime((entry.get('timestamp') or '').strip())
+        if not code or stamp is None:
+            yield None
+            continue
+        if timezone.is_aware(stamp):
+            stamp = timezone.localtime(stamp)
+        yield code, stamp.replace(tzinfo=None)
+
+
+def _loads(line):
+    try:
+        entry = json.loads(line)
+    except ValueError:
+        return None
+    return entry if isinstance(entry, dict) else None
+
+
+def ingest_punch_logs(stream, fmt='csv', tenant=None, late_after=LATE_AFTER):
+    """
+    Fold a punch log into daily attendance.
+
+    Only the earliest and latest punch per (employee, day) are kept in
+    memory, so memory is bounded by employees x days rather than by the
+    number of punches. Existing check-in/out times are merged so a log
+    can be ingested in several parts; an existing leave, holiday or half
+    day keeps its status.
+    """
+    spans, skipped, total = {}, 0, 0
+    for punch in iter_punches(stream, fmt):
+        total += 1
+        if punch is None:
+            skipped += 1
+            continue
+        code, stamp = punch
+        key = (code, stamp.date())
+        first, last = spans.get(key, (stamp, stamp))
+        spans[key] = (min(first, stamp), max(last, stamp))
+
+    codes = {code for code, _ in spans}
+    employee_ids = dict(
+        scoped_employees(tenant).filter(employee_id__in=codes).values_list(
+            'employee_id', 'id'
+        )
+    )
+    unknown = sorted(codes - set(employee_ids))
+
+    keyed = {
+        (employee_ids[code], day): span
+        for (code, day), span in spans.items()
+        if code in employee_ids
+    }
+    current = {}
+    if keyed:
+        current = {
+            (row.employee_id, row.date): row
+            for row in _existing_rows(keyed)
+        }
+
+    rows = []
+    for (employee_id, day), (first, last) in keyed.items():
+        check_in, check_out = first.time(), last.time()
+        row = current.get((employee_id, day))
+        if row is not None:
+            if row.check_in_time:
+                check_in = min(check_in, row.check_in_time)
+            if row.check_out_time:
+                check_out = max(check_out, row.check_out_time)
+        status = 'late' if check_in > late_after else 'present'
+        if row is not None and row.status not in PUNCH_STATUSES:
+            # Leave, holidays and half days were recorded on purpose
+            status = row.status
+        rows.append({
+            'employee_id': employee_id,
+            'date': day,
+            'status': status,
+            'check_in_time': check_in,
+            'check_out_time': check_out if check_out != check_in else None,
+            'working_hours': _hours_between(check_in, check_out),
+            'remarks': row.remarks if row is not None else '',
+        })
+
+    existing = upsert_attendance(rows)
+    logger.info(
+        f"Ingested {total} punches into {len(rows)} attendance rows "
+        f"({skipped} malformed, {len(unknown)} unknown employees)"
+    )
+    return {
+        'punches': total,
+        'skipped': skipped,
+        'created_count': len(rows) - len(existing),
+        'updated_count': len(existing),
+        'unknown_employees': unknown,
+    }
+
+
+def _hours_between(start, end):
+    if start >= end:
+        return None
+    delta = datetime.combine(datetime.min, end) - datetime.combine(
+        datetime.min, start
+    )
+    return (Decimal(delta.total_seconds()) / 3600).quantize(Decimal('0.01'))
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:43
+
+import django.core.validators
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr', '0001_initial'),
+        ('tenants', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayrollRun',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('month', models.PositiveIntegerField(validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(12)], verbose_name='Month')),
+                ('year', models.PositiveIntegerField(verbose_name='Year')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20, verbose_name='Status')),
+                ('employee_count', models.PositiveIntegerField(default=0, verbose_name='Employee Count')),
+                ('created_count', models.PositiveIntegerField(default=0, verbose_name='Created Count')),
+                ('skipped_count', models.PositiveIntegerField(default=0, verbose_name='Skipped Count')),
+                ('last_employee_id', models.UUIDField(blank=True, null=True, verbose_name='Last Processed Employee')),
+                ('total_gross', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Total Gross')),
+                ('total_net', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Total Net')),
+                ('error_message', models.TextField(blank=True, verbose_name='Error Message')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Started At')),
+                ('completed_at', models.DateTimeField(blank=True, null=True, verbose_name='Completed At')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created At')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated At')),
+                ('started_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payroll_runs', to=settings.AUTH_USER_MODEL, verbose_name='Started By')),
+                ('tenant', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='payroll_runs', to='tenants.tenant', verbose_name='Tenant')),
+            ],
+            options={
+                'verbose_name': 'Payroll Run',
+                'verbose_name_plural': 'Payroll Runs',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='payroll',
+            name='payroll_run',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payrolls', to='hr.payrollrun', verbose_name='Payroll Run'),
+        ),
+        migrations.AddIndex(
+            model_name='payrollrun',
+            index=models.Index(fields=['tenant', 'year', 'month'], name='hr_payrollr_tenant__7d78ba_idx'),
+        ),
+    ]
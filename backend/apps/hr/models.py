@@ -264,6 +264,15 @@ class Payroll(models.Model):
     payment_date = models.DateField(null=True, blank=True, verbose_name=_('Payment Date'))
     payment_method = models.CharField(max_length=50, blank=True, verbose_name=_('Payment Method'))
     
+    payroll_run = models.ForeignKey(
+        'PayrollRun',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='payrolls',
+        verbose_name=_('Payroll Run')
+    )
+
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Created At'))
     updated_at = models.DateTimeField(auto_now=True, verbose_name=_('Updated At'))
@@ -304,6 +313,70 @@ class Payroll(models.Model):
         super().save(*args, **kwargs)
 
 
+class PayrollRun(models.Model):
+    """Ledger entry for one bulk payroll generation run"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    tenant = models.ForeignKey(
+        'tenants.Tenant',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='payroll_runs',
+        verbose_name=_('Tenant')
+    )
+    month = models.PositiveIntegerField(
+        validators=[MinValueValidator(1), MaxValueValidator(12)],
+        verbose_name=_('Month')
+    )
+    year = models.PositiveIntegerField(verbose_name=_('Year'))
+    status = models.CharField(
+        max_length=20,
+        choices=[
+            ('pending', _('Pending')),
+            ('running', _('Running')),
+            ('completed', _('Completed')),
+            ('failed', _('Failed')),
+        ],
+        default='pending',
+        verbose_name=_('Status')
+    )
+
+    # Progress, kept per chunk so an interrupted run can resume
+    employee_count = models.PositiveIntegerField(default=0, verbose_name=_('Employee Count'))
+    created_count = models.PositiveIntegerField(default=0, verbose_name=_('Created Count'))
+    skipped_count = models.PositiveIntegerField(default=0, verbose_name=_('Skipped Count'))
+    last_employee_id = models.UUIDField(null=True, blank=True, verbose_name=_('Last Processed Employee'))
+    total_gross = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name=_('Total Gross'))
+    total_net = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name=_('Total Net'))
+    error_message = models.TextField(blank=True, verbose_name=_('Error Message'))
+
+    started_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='payroll_runs',
+        verbose_name=_('Started By')
+    )
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name=_('Started At'))
+    completed_at = models.DateTimeField(null=True, blank=True, verbose_name=_('Completed At'))
+
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Created At'))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_('Updated At'))
+
+    class Meta:
+        verbose_name = _('Payroll Run')
+        verbose_name_plural = _('Payroll Runs')
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['tenant', 'year', 'month']),
+        ]
+
+    def __str__(self):
+        return f"Payroll run {self.month}/{self.year} ({self.status})"
+
+
 class Leave(models.Model):
     """Leave model for employee leave management"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
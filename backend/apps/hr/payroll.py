@@ -0,0 +1,180 @@
+"""
+Set-based payroll generation.
+
+Salaries are computed by the database over ``.values()`` rows and
+inserted with ``bulk_create`` in keyset-paginated chunks. Existing
+payrolls are skipped through the (employee, month, year) unique
+constraint, and progress is recorded on the ``PayrollRun`` ledger after
+every chunk so an interrupted run resumes where it stopped.
+"""
+import logging
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.utils import timezone
+
+from .models import Employee, Payroll, PayrollRun
+
+logger = logging.getLogger(__name__)
+
+SALARY_FIELDS = [
+    'basic_salary', 'house_rent_allowance', 'medical_allowance',
+    'transport_allowance', 'other_allowances',
+]
+DEFAULT_CHUNK_SIZE = 2000
+
+gross_salary_expression = ExpressionWrapper(
+    F('basic_salary') + F('house_rent_allowance') + F('medical_allowance')
+    + F('transport_allowance') + F('other_allowances'),
+    output_field=DecimalField(max_digits=12, decimal_places=2)
+)
+
+
+def payable_employees(tenant=None):
+    """Active employees for ``tenant`` (all tenants when ``None``)."""
+    queryset = Employee.objects.filter(is_active=True)
+    if tenant is not None:
+        queryset = queryset.filter(user__tenant=tenant)
+    return queryset
+
+
+def preview_payroll(month, year, tenant=None, sample_size=20):
+    """
+    Dry-run a payroll generation without writing anything.
+
+    Returns headcount and totals computed by one aggregate query, the
+    number of employees that already have a payroll for the period, and
+    a small sample of computed rows.
+    """
+    employees = payable_employees(tenant)
+    totals = employees.aggregate(
+        employee_count=Count('id'),
+        total_gross=Sum(gross_salary_expression),
+    )
+    existing = Payroll.objects.filter(
+        month=month, year=year, employee__in=employees
+    ).count()
+    sample = list(
+        employees.annotate(gross_salary=gross_salary_expression)
+        .order_by('id')
+        .values('id', 'employee_id', 'first_name', 'last_name', 'gross_salary')
+        [:sample_size]
+    )
+    total_gross = totals['total_gross'] or Decimal('0')
+    return {
+        'month': month,
+        'year': year,
+        'dry_run': True,
+        'employee_count': totals['employee_count'],
+        'existing_count': existing,
+        'to_create_count': totals['employee_count'] - existing,
+        'total_gross': total_gross,
+        # No deductions are applied at generation time.
+        'total_net': total_gross,
+        'sample': sample,
+    }
+
+
+class PayrollRunEngine:
+    """
+    Execute (or resume) a ``PayrollRun``.
+
+    Usage:
+        run = PayrollRun.objects.create(month=5, year=2025, tenant=tenant)
+        PayrollRunEngine(run).execute()
+    """
+
+    def __init__(self, run, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.run = run
+        self.chunk_size = chunk_size
+
+    def execute(self):
+        run = self.run
+        if run.status == 'completed':
+            return run
+
+        employees = payable_employees(run.tenant)
+        if run.status == 'pending':
+            run.employee_count = employees.count()
+        run.status = 'running'
+        run.error_message = ''
+        run.started_at = run.started_at or timezone.now()
+        run.save(update_fields=[
+            'status', 'employee_count', 'error_message', 'started_at',
+            'updated_at'
+        ])
+
+        try:
+            while self._process_chunk(employees):
+                pass
+        except Exception as e:
+            PayrollRun.objects.filter(pk=run.pk).update(
+                status='failed', error_message=str(e),
+                updated_at=timezone.now()
+            )
+            run.refresh_from_db()
+            logger.error(f"Payroll run {run.pk} failed: {e}")
+            raise
+
+        PayrollRun.objects.filter(pk=run.pk).update(
+            status='completed', completed_at=timezone.now(),
+            updated_at=timezone.now()
+        )
+        run.refresh_from_db()
+        logger.info(
+            f"Payroll run {run.pk} completed: {run.created_count} created, "
+            f"{run.skipped_count} skipped"
+        )
+        return run
+
+    def _process_chunk(self, employees):
+        """Generate payrolls for the next chunk; return ``False`` when done."""
+        run = self.run
+        chunk = employees.order_by('id')
+        if run.last_employee_id:
+            chunk = chunk.filter(id__gt=run.last_employee_id)
+        rows = list(
+            chunk.annotate(gross_salary=gross_salary_expression)
+            .values('id', 'gross_salary', *SALARY_FIELDS)[:self.chunk_size]
+        )
+        if not rows:
+            return False
+
+        employee_ids = [row['id'] for row in rows]
+        existing = set(
+            Payroll.objects.filter(
+                month=run.month, year=run.year, employee_id__in=employee_ids
+            ).values_list('employee_id', flat=True)
+        )
+        payrolls = [
+            Payroll(
+                employee_id=row['id'],
+                month=run.month,
+                year=run.year,
+                gross_salary=row['gross_salary'],
+                total_deductions=Decimal('0'),
+                net_salary=row['gross_salary'],
+                payment_status='pending',
+                payroll_run=run,
+                **{field: row[field] for field in SALARY_FIELDS}
+            )
+            for row in rows
+            if row['id'] not in existing
+        ]
+        chunk_gross = sum(
+            (payroll.gross_salary for payroll in payrolls), Decimal('0')
+        )
+
+        with transaction.atomic():
+            Payroll.objects.bulk_create(payrolls, ignore_conflicts=True)
+            PayrollRun.objects.filter(pk=run.pk).update(
+                created_count=F('created_count') + len(payrolls),
+                skipped_count=F('skipped_count') + len(existing),
+                total_gross=F('total_gross') + chunk_gross,
+                total_net=F('total_net') + chunk_gross,
+                last_employee_id=employee_ids[-1],
+                updated_at=timezone.now(),
+            )
+        run.last_employee_id = employee_ids[-1]
+        return len(rows) == self.chunk_size
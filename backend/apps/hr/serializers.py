@@ -1,7 +1,8 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from .models import (
-    Department, Position, Employee, Payroll, Leave, 
+    Department, Position, Employee, Payroll, PayrollRun, Leave, 
     EmployeeAttendance, Performance, Document
 )
 
@@ -156,6 +157,26 @@ class PayrollCreateSerializer(serializers.ModelSerializer):
         return data
 
 
+class PayrollRunSerializer(serializers.ModelSerializer):
+    """Payroll run ledger serializer"""
+    class Meta:
+        model = PayrollRun
+        fields = '__all__'
+        read_only_fields = [
+            'status', 'employee_count', 'created_count', 'skipped_count',
+            'last_employee_id', 'total_gross', 'total_net', 'error_message',
+            'started_by', 'started_at', 'completed_at', 'created_at', 'updated_at'
+        ]
+
+
+class PayrollGenerateSerializer(serializers.Serializer):
+    """Input for bulk payroll generation"""
+    month = serializers.IntegerField(min_value=1, max_value=12)
+    year = serializers.IntegerField(min_value=2000, max_value=2100)
+    dry_run = serializers.BooleanField(default=False)
+    run_async = serializers.BooleanField(default=False)
+
+
 class LeaveSerializer(serializers.ModelSerializer):
     """Leave serializer"""
     employee_name = serializers.CharField(source='employee.full_name', read_only=True)
@@ -218,6 +239,15 @@ class EmployeeAttendanceCreateSerializer(serializers.ModelSerializer):
         return data
 
 
+class EmployeeAttendanceBulkSerializer(serializers.Serializer):
+    """Input for bulk attendance marking"""
+    date = serializers.DateField(default=lambda: timezone.now().date())
+    attendance = serializers.ListField(
+        child=serializers.DictField(), max_length=5000,
+        help_text="List of records with employee_id, status and optional times"
+    )
+
+
 class PerformanceSerializer(serializers.ModelSerializer):
     """Performance serializer"""
     employee_name = serializers.CharField(source='employee.full_name', read_only=True)
@@ -0,0 +1,33 @@
+"""
+Celery tasks for hr app.
+"""
+
+from celery import shared_task
+import logging
+
+from .models import PayrollRun
+from .payroll import PayrollRunEngine
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def run_payroll(self, run_id):
+    """
+    Execute or resume a payroll run.
+
+    Progress is committed per chunk, so a retry continues after the last
+    processed employee instead of starting over.
+    """
+    try:
+        run = PayrollRun.objects.get(id=run_id)
+    except PayrollRun.DoesNotExist:
+        logger.error(f"Payroll run {run_id} not found")
+        raise
+
+    try:
+        run = PayrollRunEngine(run).execute()
+        return f"Payroll run {run_id}: {run.created_count} created"
+    except Exception as e:
+        logger.error(f"Payroll run {run_id} failed, retrying: {e}")
+        raise self.retry(exc=e)
@@ -0,0 +1 @@
+# Tests package for hr app
@@ -0,0 +1,76 @@
+"""
+Tests for punch log ingestion: punches fold into first-in/last-out per
+employee and day, and a day already recorded as leave, holiday or half
+day keeps its status.
+"""
+import io
+from datetime import date, time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from apps.hr.attendance import ingest_punch_logs
+from apps.hr.models import Department, Employee, EmployeeAttendance, Position
+
+User = get_user_model()
+
+DAY = date(2026, 10, 19)
+
+
+def make_employee(code):
+    department, _ = Department.objects.get_or_create(code='ADM', defaults={'name': 'Admin'})
+    position, _ = Position.objects.get_or_create(
+        code='CLK', defaults={
+            'title': 'Clerk', 'department': department, 'base_salary': Decimal('1000.00'),
+        },
+    )
+    user = User.objects.create_user(username=code, email=f"{code}@example.com")
+    return Employee.objects.create(
+        user=user, employee_id=code, employee_number=code, first_name='Staff',
+        last_name=code, date_of_birth=date(1985, 1, 1), gender='F', email=user.email,
+        phone='0100000000', address='1 School Road', city='Dhaka', state='Dhaka',
+        postal_code='1000', department=department, position=position,
+        joining_date=date(2020, 1, 1), basic_salary=Decimal('1000.00'),
+    )
+
+
+def punch_log(*rows):
+    lines = ['employee_id,timestamp']
+    lines.extend(f'{code},{DAY.isoformat()}T{stamp}' for code, stamp in rows)
+    return io.BytesIO('\n'.join(lines).encode())
+
+
+class IngestPunchLogTests(TestCase):
+    def setUp(self):
+        self.employee = make_employee('E1')
+
+    def attendance(self):
+        return EmployeeAttendance.objects.get(employee=self.employee, date=DAY)
+
+    def test_first_and_last_punch_make_the_day(self):
+        result = ingest_punch_logs(punch_log(
+            ('E1', '09:30:00'), ('E1', '12:00:00'), ('E1', '17:00:00'),
+        ))
+        self.assertEqual(result['created_count'], 1)
+        row = self.attendance()
+        self.assertEqual(row.status, 'late')
+        self.assertEqual(row.check_in_time, time(9, 30))
+        self.assertEqual(row.check_out_time, time(17, 0))
+
+    def test_recorded_leave_keeps_its_status(self):
+        for status in ('leave', 'holiday', 'half_day'):
+            EmployeeAttendance.objects.update_or_create(
+                employee=self.employee, date=DAY,
+                defaults={'status': status, 'remarks': 'Approved'},
+            )
+            ingest_punch_logs(punch_log(('E1', '08:55:00'), ('E1', '12:00:00')))
+            row = self.attendance()
+            self.assertEqual(row.status, status)
+            self.assertEqual(row.remarks, 'Approved')
+            self.assertEqual(row.check_in_time, time(8, 55))
+
+    def test_absence_is_overridden_by_a_punch(self):
+        EmployeeAttendance.objects.create(employee=self.employee, date=DAY, status='absent')
+        ingest_punch_logs(punch_log(('E1', '08:55:00')))
+        self.assertEqual(self.attendance().status, 'present')
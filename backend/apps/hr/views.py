@@ -2,13 +2,14 @@ from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.parsers import MultiPartParser, FormParser
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Q, Count, Sum, Avg
 from django.utils import timezone
 from datetime import datetime, timedelta
 
 from .models import (
-    Department, Position, Employee, Payroll, Leave, 
+    Department, Position, Employee, Payroll, PayrollRun, Leave, 
     EmployeeAttendance, Performance, Document
 )
 from .serializers import (
@@ -18,8 +19,13 @@ from .serializers import (
     EmployeeAttendanceSerializer, EmployeeAttendanceCreateSerializer,
     PerformanceSerializer, PerformanceCreateSerializer, DocumentSerializer,
     DocumentCreateSerializer, HRDashboardSerializer, PayrollSummarySerializer,
-    LeaveSummarySerializer, AttendanceSummarySerializer
+    LeaveSummarySerializer, AttendanceSummarySerializer,
+    PayrollRunSerializer, PayrollGenerateSerializer,
+    EmployeeAttendanceBulkSerializer
 )
+from .attendance import bulk_mark_attendance, ingest_punch_logs
+from .payroll import PayrollRunEngine, preview_payroll
+from .tasks import run_payroll
 
 
 class DepartmentViewSet(viewsets.ModelViewSet):
@@ -172,36 +178,61 @@ class PayrollViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['post'])
     def bulk_generate(self, request):
-        """Bulk generate payroll for all employees"""
-        month = request.data.get('month', timezone.now().month)
-        year = request.data.get('year', timezone.now().year)
-        
-        employees = Employee.objects.filter(is_active=True)
-        created_count = 0
-        
-        for employee in employees:
-            # Check if payroll already exists
-            if not Payroll.objects.filter(employee=employee, month=month, year=year).exists():
-                Payroll.objects.create(
-                    employee=employee,
-                    month=month,
-                    year=year,
-                    basic_salary=employee.basic_salary,
-                    house_rent_allowance=employee.house_rent_allowance,
-                    medical_allowance=employee.medical_allowance,
-                    transport_allowance=employee.transport_allowance,
-                    other_allowances=employee.other_allowances,
-                    gross_salary=employee.total_salary,
-                    net_salary=employee.total_salary,
-                    payment_status='pending'
-                )
-                created_count += 1
-        
+        """
+        Bulk generate payroll for all active employees of the tenant.
+
+        With ``dry_run`` nothing is written and a preview is returned;
+        with ``run_async`` the run is queued on Celery instead of being
+        executed inline.
+        """
+        serializer = PayrollGenerateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        tenant = None if request.user.is_superuser else request.user.tenant
+        if data['dry_run']:
+            return Response(preview_payroll(data['month'], data['year'], tenant))
+
+        run = PayrollRun.objects.create(
+            tenant=tenant,
+            month=data['month'],
+            year=data['year'],
+            started_by=request.user
+        )
+        if data['run_async']:
+            run_payroll.delay(str(run.id))
+            return Response(
+                PayrollRunSerializer(run).data, status=status.HTTP_202_ACCEPTED
+            )
+
+        try:
+            run = PayrollRunEngine(run).execute()
+        except Exception:
+            run.refresh_from_db()
+            return Response(
+                PayrollRunSerializer(run).data,
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
         return Response({
-            'message': f'Generated payroll for {created_count} employees',
-            'created_count': created_count
+            'message': f'Generated payroll for {run.created_count} employees',
+            'created_count': run.created_count,
+            'run': PayrollRunSerializer(run).data
         })
 
+    @action(detail=False, methods=['get'])
+    def runs(self, request):
+        """List payroll run ledger entries"""
+        runs = PayrollRun.objects.select_related('tenant')
+        if not request.user.is_superuser:
+            runs = runs.filter(tenant=request.user.tenant)
+
+        page = self.paginate_queryset(runs)
+        if page is not None:
+            serializer = PayrollRunSerializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = PayrollRunSerializer(runs, many=True)
+        return Response(serializer.data)
+
 
 class LeaveViewSet(viewsets.ModelViewSet):
     """Leave management ViewSet"""
@@ -297,52 +328,51 @@ class EmployeeAttendanceViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['post'])
     def bulk_mark(self, request):
-        """Bulk mark attendance"""
-        date = request.data.get('date', timezone.now().date())
-        attendance_data = request.data.get('attendance', [])
-        
-        created_count = 0
-        updated_count = 0
-        
-        for record in attendance_data:
-            employee_id = record.get('employee_id')
-            status = record.get('status', 'present')
-            check_in_time = record.get('check_in_time')
-            check_out_time = record.get('check_out_time')
-            remarks = record.get('remarks', '')
-            
-            try:
-                employee = Employee.objects.get(id=employee_id)
-                attendance, created = EmployeeAttendance.objects.get_or_create(
-                    employee=employee,
-                    date=date,
-                    defaults={
-                        'status': status,
-                        'check_in_time': check_in_time,
-                        'check_out_time': check_out_time,
-                        'remarks': remarks
-                    }
-                )
-                
-                if created:
-                    created_count += 1
-                else:
-                    attendance.status = status
-                    attendance.check_in_time = check_in_time
-                    attendance.check_out_time = check_out_time
-                    attendance.remarks = remarks
-                    attendance.save()
-                    updated_count += 1
-                    
-            except Employee.DoesNotExist:
-                continue
-        
+        """Bulk mark attendance with a single upsert"""
+        serializer = EmployeeAttendanceBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        tenant = None if request.user.is_superuser else request.user.tenant
+        results = bulk_mark_attendance(data['date'], data['attendance'], tenant)
+        created_count = sum(1 for r in results if r['result'] == 'created')
+        updated_count = sum(1 for r in results if r['result'] == 'updated')
+
         return Response({
             'message': f'Marked attendance for {created_count + updated_count} employees',
             'created_count': created_count,
-            'updated_count': updated_count
+            'updated_count': updated_count,
+            'results': results
         })
 
+    @action(
+        detail=False, methods=['post'],
+        parser_classes=[MultiPartParser, FormParser]
+    )
+    def ingest_punches(self, request):
+        """
+        Ingest a biometric/RFID punch log (CSV or JSON lines) into
+        daily attendance.
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response(
+                {'error': 'file is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        fmt = request.data.get('format') or (
+            'jsonl' if upload.name.endswith(('.jsonl', '.ndjson', '.json'))
+            else 'csv'
+        )
+        if fmt not in ('csv', 'jsonl'):
+            return Response(
+                {'error': 'format must be csv or jsonl'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        tenant = None if request.user.is_superuser else request.user.tenant
+        return Response(ingest_punch_logs(upload, fmt, tenant))
+
 
 class PerformanceViewSet(viewsets.ModelViewSet):
     """Performance evaluation ViewSet"""
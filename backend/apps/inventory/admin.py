@@ -1,9 +1,28 @@
+from django import forms
 from django.contrib import admin
+from .ledger import StockError, movement_delta, post_movement
 from .models import (
     Category, Supplier, Asset, StockItem, Transaction, MaintenanceRecord
 )
 
 
+class TransactionAdminForm(forms.ModelForm):
+    class Meta:
+        model = Transaction
+        fields = '__all__'
+    
+    def clean(self):
+        data = super().clean()
+        if data.get('stock_item') and data.get('transaction_type'):
+            try:
+                movement_delta(data['transaction_type'], data.get('quantity') or 0)
+            except StockError:
+                raise forms.ValidationError(
+                    "Stock adjustments need a direction; record them through the API."
+                )
+        return data
+
+
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
     list_display = ('name', 'parent', 'is_active', 'item_count', 'created_at')
@@ -135,7 +154,7 @@ class StockItemAdmin(admin.ModelAdmin):
         }),
     )
     
-    readonly_fields = ('total_value', 'created_at', 'updated_at')
+    readonly_fields = ('current_stock', 'total_value', 'created_at', 'updated_at')
 
 
 @admin.register(Transaction)
@@ -166,7 +185,7 @@ class TransactionAdmin(admin.ModelAdmin):
         ('Transaction Details', {
             'fields': (
                 'transaction_type', 'reference_number', 'asset',
-                'stock_item', 'quantity'
+                'stock_item', 'quantity', 'stock_delta', 'balance_after'
             )
         }),
         ('Location', {
@@ -180,7 +199,35 @@ class TransactionAdmin(admin.ModelAdmin):
         }),
     )
     
-    readonly_fields = ('total_amount', 'transaction_date', 'created_at')
+    readonly_fields = (
+        'total_amount', 'stock_delta', 'balance_after', 'transaction_date',
+        'created_at'
+    )
+    form = TransactionAdminForm
+    
+    def has_change_permission(self, request, obj=None):
+        # Ledger entries are append-only
+        if obj is not None and obj.stock_item_id:
+            return False
+        return super().has_change_permission(request, obj)
+    
+    def has_delete_permission(self, request, obj=None):
+        if obj is not None and obj.stock_item_id:
+            return False
+        return super().has_delete_permission(request, obj)
+    
+    def save_model(self, request, obj, form, change):
+        if change or not obj.stock_item_id:
+            return super().save_model(request, obj, form, change)
+        movement = post_movement(
+            obj.stock_item_id, obj.transaction_type, obj.quantity,
+            reference_number=obj.reference_number,
+            from_location=obj.from_location, to_location=obj.to_location,
+            unit_price=obj.unit_price, notes=obj.notes,
+        )
+        obj.pk = movement.pk
+        obj.stock_delta = movement.stock_delta
+        obj.balance_after = movement.balance_after
 
 
 @admin.register(MaintenanceRecord)
@@ -0,0 +1,10 @@
+"""
+Inventory category tree, cached with asset and stock item counts.
+"""
+from core.trees import CategoryTree
+
+from .models import Asset, Category, StockItem
+
+category_tree = CategoryTree(
+    Category, counted=[(Asset, 'category'), (StockItem, 'category')]
+)
@@ -0,0 +1,226 @@
+"""
+Stock ledger.
+
+Every stock movement is an append-only ``Transaction`` carrying its signed
+``stock_delta`` and the ``balance_after`` it produced. The item balance
+moves with one ``F()`` UPDATE while the item row is locked with
+``select_for_update``, so concurrent issues and receipts serialise on the
+row and an issue can never take stock below zero.
+
+Balances are snapshotted periodically; an as-of balance is the latest
+snapshot plus the movements recorded since, so it never scans an item's
+whole history.
+"""
+import logging
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import (
+    Case, F, IntegerField, OuterRef, Subquery, Sum, Value, When,
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import StockBalanceSnapshot, StockItem, Transaction
+
+logger = logging.getLogger(__name__)
+
+INBOUND = ('purchase', 'return')
+OUTBOUND = ('sale', 'damage', 'maintenance')
+# Snapshots trail the clock so movements still being committed are not
+# split across the snapshot boundary.
+SNAPSHOT_LAG = timedelta(minutes=5)
+
+
+class StockError(Exception):
+    """Raised when a stock movement cannot be recorded."""
+
+
+def new_reference(prefix='TXN'):
+    return f"{prefix}-{uuid.uuid4().hex[:12].upper()}"
+
+
+def movement_delta(transaction_type, quantity, direction=None):
+    """
+    Signed change to the balance for a movement. Transfers move stock
+    between locations without changing it; adjustments need a direction.
+    """
+    if transaction_type in INBOUND:
+        return quantity
+    if transaction_type in OUTBOUND:
+        return -quantity
+    if transaction_type == 'transfer':
+        return 0
+    if direction not in ('in', 'out'):
+        raise StockError("Adjustments need a direction of 'in' or 'out'")
+    return quantity if direction == 'in' else -quantity
+
+
+def _balance_update(delta):
+    balance = F('current_stock') + delta
+    return {
+        'current_stock': balance,
+        'total_value': balance * F('unit_price'),
+        'updated_at': timezone.now(),
+    }
+
+
+def post_movement(stock_item_id, transaction_type, quantity, direction=None, **details):
+    """Record one movement for a stock item and move its balance."""
+    delta = movement_delta(transaction_type, quantity, direction)
+    with transaction.atomic():
+        try:
+            item = StockItem.objects.select_for_update().only(
+                'id', 'name', 'current_stock'
+            ).get(pk=stock_item_id)
+        except StockItem.DoesNotExist:
+            raise StockError("Stock item not found")
+
+        moved = StockItem.objects.filter(
+            pk=item.pk, current_stock__gte=-delta
+        ).update(**_balance_update(delta))
+        if not moved:
+            raise StockError(
+                f"Insufficient stock for {item.name}: "
+                f"{item.current_stock} available, {quantity} requested"
+            )
+
+        details.setdefault('reference_number', new_reference())
+        return Transaction.objects.create(
+            stock_item_id=item.pk,
+            transaction_type=transaction_type,
+            quantity=quantity,
+            stock_delta=delta,
+            balance_after=item.current_stock + delta,
+            **details
+        )
+
+
+def receive_purchase_order(lines, reference=None, notes=''):
+    """
+    Receive every line of a purchase order in one transaction: one UPDATE
+    for all items and one bulk insert of ``purchase`` movements, numbered
+    ``<reference>-001`` onwards and tagged with the order reference. A
+    reference already received is refused, so a resubmitted order is not
+    booked twice; a concurrent resubmission loses on the unique movement
+    numbers and is refused the same way.
+    """
+    if not lines:
+        raise StockError("A purchase order needs at least one line")
+    reference = reference or new_reference('PO')
+
+    received = defaultdict(int)
+    for line in lines:
+        received[line['stock_item']] += line['quantity']
+
+    try:
+        with transaction.atomic():
+            if Transaction.objects.filter(
+                transaction_type='purchase', order_reference=reference
+            ).exists():
+                raise StockError(f"Purchase order {reference} was already received")
+
+            items = {
+                item.pk: item
+                for item in StockItem.objects.select_for_update()
+                .filter(pk__in=received).order_by('pk').only('id', 'current_stock')
+            }
+            missing = set(received) - set(items)
+            if missing:
+                raise StockError(
+                    f"Unknown stock items: {', '.join(sorted(str(pk) for pk in missing))}"
+                )
+
+            StockItem.objects.filter(pk__in=received).update(**_balance_update(Case(
+                *[When(pk=pk, then=Value(quantity)) for pk, quantity in received.items()],
+                output_field=IntegerField(),
+            )))
+
+            balances = {pk: item.current_stock for pk, item in items.items()}
+            movements = []
+            for number, line in enumerate(lines, 1):
+                pk, quantity = line['stock_item'], line['quantity']
+                balances[pk] += quantity
+                unit_price = line.get('unit_price')
+                movements.append(Transaction(
+                    transaction_type='purchase',
+                    reference_number=f"{reference}-{number:03d}",
+                    order_reference=reference,
+                    stock_item_id=pk,
+                    quantity=quantity,
+                    stock_delta=quantity,
+                    balance_after=balances[pk],
+                    to_location=line.get('location', ''),
+                    unit_price=unit_price,
+                    total_amount=quantity * unit_price if unit_price else None,
+                    notes=notes,
+                ))
+            Transaction.objects.bulk_create(movements)
+    except IntegrityError:
+        raise StockError(f"Purchase order {reference} was already received")
+
+    logger.info(
+        f"Purchase order {reference}: {len(movements)} lines received "
+        f"for {len(received)} items"
+    )
+    return movements
+
+
+def _moved(**window):
+    """Sum of an item's stock deltas inside ``window``, as a subquery."""
+    return Coalesce(Subquery(
+        Transaction.objects.filter(stock_item=OuterRef('pk'), **window)
+        .order_by().values('stock_item')
+        .annotate(total=Sum('stock_delta')).values('total')
+    ), 0)
+
+
+def snapshot_balances(as_of=None):
+    """
+    Snapshot every item's balance as of ``as_of`` (a few minutes ago by
+    default), derived from the current balance and the later movements.
+    """
+    as_of = as_of or timezone.now() - SNAPSHOT_LAG
+    rows = StockItem.objects.annotate(
+        balance=F('current_stock') - _moved(transaction_date__gt=as_of)
+    ).values_list('pk', 'balance')
+    created = StockBalanceSnapshot.objects.bulk_create(
+        [
+            StockBalanceSnapshot(stock_item_id=pk, as_of=as_of, balance=balance)
+            for pk, balance in rows
+        ],
+        ignore_conflicts=True,
+        batch_size=1000,
+    )
+    logger.info(f"Snapshotted {len(created)} stock balances as of {as_of}")
+    return len(created)
+
+
+def balances_as_of(at, items=None):
+    """
+    Annotate ``items`` with ``balance_as_of``: the latest snapshot taken
+    at or before ``at`` plus the movements after it, or, for items with
+    no snapshot yet, the current balance minus the movements since ``at``.
+    """
+    items = StockItem.objects.all() if items is None else items
+    snapshot = StockBalanceSnapshot.objects.filter(
+        stock_item=OuterRef('pk'), as_of__lte=at
+    ).order_by('-as_of')
+    return items.annotate(
+        snapshot_balance=Subquery(snapshot.values('balance')[:1]),
+        snapshot_at=Subquery(snapshot.values('as_of')[:1]),
+    ).annotate(
+        balance_as_of=Case(
+            When(
+                snapshot_at__isnull=False,
+                then=F('snapshot_balance') + _moved(
+                    transaction_date__gt=OuterRef('snapshot_at'),
+                    transaction_date__lte=at,
+                ),
+            ),
+            default=F('current_stock') - _moved(transaction_date__gt=at),
+            output_field=IntegerField(),
+        )
+    )
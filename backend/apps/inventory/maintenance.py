@@ -0,0 +1,292 @@
+"""
+Preventive maintenance scheduling for inventory assets and transport
+vehicles.
+
+Next due dates are computed from time and usage rules and persisted in
+``MaintenanceDue``, one row per item and rule:
+
+* assets: ``service`` (``next_maintenance``, else the last maintenance
+  plus the asset interval) and ``warranty``;
+* vehicles: ``service`` (the earlier of the time rule and the date the
+  mileage rule is forecast to trip, from recent fuel log readings) and
+  the ``insurance``, ``permit``, ``fitness`` and ``puc`` documents. The
+  mileage rule counts from the odometer at the last service: the service
+  log's reading, else the fuel log's reading on or before
+  ``last_service_date``; it is skipped when neither is known.
+
+The daily sweep recomputes the table, bulk-creates ``MaintenanceRecord``
+work orders for assets coming due and sends one digest for everything
+newly inside the lead window. Due lists are then plain indexed reads.
+"""
+import logging
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Min, OuterRef, Subquery
+from django.utils import timezone
+
+from apps.transport.models import FuelRecord, Vehicle
+from apps.transport.models import MaintenanceRecord as ServiceRecord
+
+from .models import Asset, MaintenanceDue, MaintenanceRecord
+
+logger = logging.getLogger(__name__)
+
+INACTIVE_ASSET_STATUSES = ('retired', 'lost', 'stolen')
+VEHICLE_DOCUMENTS = {
+    'insurance': 'insurance_expiry',
+    'permit': 'permit_expiry',
+    'fitness': 'fitness_expiry',
+    'puc': 'puc_expiry',
+}
+# Fuel log window used to estimate daily distance.
+USAGE_WINDOW_DAYS = 90
+
+
+def _due(item_field, item_id, kind, basis, due_date, due_mileage=None):
+    return MaintenanceDue(
+        **{item_field: item_id}, kind=kind, basis=basis, due_date=due_date,
+        due_mileage=due_mileage,
+    )
+
+
+def asset_rules(assets):
+    """Due rows for ``assets`` under the asset service and warranty rules."""
+    interval = timedelta(days=settings.MAINTENANCE_ASSET_INTERVAL_DAYS)
+    rows = []
+    for asset in assets.exclude(status__in=INACTIVE_ASSET_STATUSES).values(
+        'id', 'next_maintenance', 'last_maintenance', 'purchase_date',
+        'created_at', 'warranty_expiry',
+    ):
+        due = asset['next_maintenance'] or (
+            asset['last_maintenance'] or asset['purchase_date']
+            or asset['created_at'].date()
+        ) + interval
+        rows.append(_due('asset_id', asset['id'], 'service', 'time', due))
+        if asset['warranty_expiry']:
+            rows.append(_due(
+                'asset_id', asset['id'], 'warranty', 'document',
+                asset['warranty_expiry']
+            ))
+    return rows
+
+
+def daily_usage(vehicle_ids, today):
+    """Average km per day per vehicle, from fuel log odometer readings."""
+    readings = FuelRecord.objects.filter(
+        vehicle_id__in=vehicle_ids,
+        fuel_date__gte=today - timedelta(days=USAGE_WINDOW_DAYS),
+    ).order_by().values('vehicle_id').annotate(
+        first_day=Min('fuel_date'), last_day=Max('fuel_date'),
+        low=Min('mileage_at_fuel'), high=Max('mileage_at_fuel'),
+    )
+    return {
+        row['vehicle_id']: (row['high'] - row['low']) / (row['last_day'] - row['first_day']).days
+        for row in readings
+        if row['last_day'] > row['first_day']
+    }
+
+
+def _serviced_km(vehicle):
+    """Odometer at the last service, or ``None`` when it is not known."""
+    last_service_date = vehicle['last_service_date']
+    if vehicle['serviced_on'] and (
+        not last_service_date or vehicle['serviced_on'] >= last_service_date
+    ):
+        return vehicle['serviced_at_km']
+    if last_service_date:
+        # Serviced outside the service log; read the fuel log instead
+        return vehicle['logged_at_km']
+    # Never serviced: count from new
+    return 0
+
+
+def vehicle_rules(vehicles, today):
+    """Due rows for ``vehicles`` under the service and document rules."""
+    interval = timedelta(days=settings.MAINTENANCE_VEHICLE_INTERVAL_DAYS)
+    interval_km = settings.MAINTENANCE_VEHICLE_INTERVAL_KM
+    last_service = ServiceRecord.objects.filter(
+        vehicle=OuterRef('pk')
+    ).order_by('-service_date', '-id')
+    odometer_at_service = FuelRecord.objects.filter(
+        vehicle=OuterRef('pk'), fuel_date__lte=OuterRef('last_service_date')
+    ).order_by('-fuel_date', '-mileage_at_fuel')
+    vehicles = list(
+        vehicles.filter(is_active=True).exclude(status='retired').annotate(
+            serviced_on=Subquery(last_service.values('service_date')[:1]),
+            serviced_at_km=Subquery(last_service.values('mileage_at_service')[:1]),
+            service_next=Subquery(last_service.values('next_service_date')[:1]),
+            logged_at_km=Subquery(odometer_at_service.values('mileage_at_fuel')[:1]),
+        ).values(
+            'id', 'purchase_date', 'current_mileage', 'last_service_date',
+            'next_service_date', 'serviced_on', 'serviced_at_km',
+            'service_next', 'logged_at_km', *VEHICLE_DOCUMENTS.values(),
+        )
+    )
+    usage = daily_usage([vehicle['id'] for vehicle in vehicles], today)
+
+    rows = []
+    for vehicle in vehicles:
+        serviced = max(
+            (day for day in (vehicle['last_service_date'], vehicle['serviced_on']) if day),
+            default=vehicle['purchase_date'],
+        )
+        planned = [
+            day for day in (vehicle['service_next'], vehicle['next_service_date'])
+            if day and day > serviced
+        ]
+        due, basis = (min(planned) if planned else serviced + interval), 'time'
+
+        due_mileage, by_usage = None, None
+        serviced_km = _serviced_km(vehicle)
+        if serviced_km is not None:
+            due_mileage = serviced_km + interval_km
+            remaining = due_mileage - vehicle['current_mileage']
+            rate = usage.get(vehicle['id'])
+            if remaining <= 0:
+                by_usage = today
+            elif rate:
+                by_usage = today + timedelta(days=math.ceil(remaining / rate))
+        if by_usage and by_usage < due:
+            due, basis = by_usage, 'usage'
+
+        rows.append(_due('vehicle_id', vehicle['id'], 'service', basis, due, due_mileage))
+        for kind, field in VEHICLE_DOCUMENTS.items():
+            rows.append(_due('vehicle_id', vehicle['id'], kind, 'document', vehicle[field]))
+    return rows
+
+
+def _store(rows, item_field, unique_field, scope):
+    """
+    Replace the due rows of the items in ``scope`` with ``rows``. A row
+    whose due date is unchanged keeps its work order and notification.
+    """
+    existing = {
+        (row[item_field], row['kind']): row
+        for row in scope.values(
+            'id', item_field, 'kind', 'due_date', 'work_order', 'notified_at'
+        )
+    }
+    now = timezone.now()
+    for row in rows:
+        previous = existing.pop((getattr(row, item_field), row.kind), None)
+        if previous and previous['due_date'] == row.due_date:
+            row.work_order_id = previous['work_order']
+            row.notified_at = previous['notified_at']
+        row.computed_at = now
+
+    # Rules that no longer apply, e.g. a retired asset or cleared warranty.
+    scope.filter(pk__in=[row['id'] for row in existing.values()]).delete()
+    MaintenanceDue.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=[unique_field, 'kind'],
+        update_fields=[
+            'basis', 'due_date', 'due_mileage', 'work_order', 'notified_at',
+            'computed_at',
+        ],
+        batch_size=1000,
+    )
+
+
+def refresh_schedule(asset_ids=None, vehicle_ids=None, today=None):
+    """
+    Recompute due rows for the given assets and vehicles, or for every
+    asset and vehicle when neither is given.
+    """
+    today = today or timezone.localdate()
+    everything = asset_ids is None and vehicle_ids is None
+    with transaction.atomic():
+        if everything or asset_ids is not None:
+            assets = Asset.objects.all()
+            scope = MaintenanceDue.objects.filter(asset__isnull=False)
+            if asset_ids is not None:
+                assets = assets.filter(pk__in=asset_ids)
+                scope = scope.filter(asset_id__in=asset_ids)
+            _store(asset_rules(assets), 'asset_id', 'asset', scope)
+        if everything or vehicle_ids is not None:
+            vehicles = Vehicle.objects.all()
+            scope = MaintenanceDue.objects.filter(vehicle__isnull=False)
+            if vehicle_ids is not None:
+                vehicles = vehicles.filter(pk__in=vehicle_ids)
+                scope = scope.filter(vehicle_id__in=vehicle_ids)
+            _store(vehicle_rules(vehicles, today), 'vehicle_id', 'vehicle', scope)
+
+
+def create_work_orders(today):
+    """Bulk-create preventive work orders for asset services coming due."""
+    horizon = today + timedelta(days=settings.MAINTENANCE_LEAD_DAYS)
+    due = list(
+        MaintenanceDue.objects.filter(
+            kind='service', asset__isnull=False, work_order__isnull=True,
+            due_date__lte=horizon,
+        ).select_related('asset')
+    )
+    orders = []
+    for row in due:
+        row.work_order = MaintenanceRecord(
+            asset=row.asset,
+            maintenance_type='preventive',
+            title=f"Preventive maintenance: {row.asset.name}",
+            description=f"Scheduled preventive maintenance due {row.due_date}.",
+            performed_by='Unassigned',
+            scheduled_date=row.due_date,
+        )
+        orders.append(row.work_order)
+    with transaction.atomic():
+        MaintenanceRecord.objects.bulk_create(orders, batch_size=500)
+        MaintenanceDue.objects.bulk_update(due, ['work_order'], batch_size=500)
+    return len(orders)
+
+
+def due_digest(today):
+    """
+    Due rows inside the lead window that have not been announced yet,
+    with the digest subject and body. Returns ``(rows, None, None)``
+    when there is nothing new.
+    """
+    horizon = today + timedelta(days=settings.MAINTENANCE_LEAD_DAYS)
+    rows = list(
+        MaintenanceDue.objects.filter(notified_at__isnull=True, due_date__lte=horizon)
+        .select_related('asset', 'vehicle')
+        .order_by('due_date', 'kind')
+    )
+    if not rows:
+        return rows, None, None
+
+    overdue = sum(row.due_date < today for row in rows)
+    lines = [
+        f"- {row.due_date:%Y-%m-%d}  {row.get_kind_display()}: {row.asset or row.vehicle}"
+        + (" (overdue)" if row.due_date < today else "")
+        for row in rows
+    ]
+    subject = f"Maintenance schedule - {len(rows)} item(s) due, {overdue} overdue"
+    message = (
+        f"The following maintenance items are due by {horizon:%Y-%m-%d}:\n\n"
+        + "\n".join(lines)
+        + "\n\nWork orders have been created for asset services.\n"
+    )
+    return rows, subject, message
+
+
+def sweep(today=None):
+    """
+    Daily run: refresh the schedule and create work orders. Returns the
+    counters and the digest for rows not yet announced.
+    """
+    today = today or timezone.localdate()
+    refresh_schedule(today=today)
+    work_orders = create_work_orders(today)
+    rows, subject, message = due_digest(today)
+    logger.info(
+        f"Maintenance sweep: {work_orders} work orders created, "
+        f"{len(rows)} due items to announce"
+    )
+    return {
+        'work_orders': work_orders,
+        'announce_ids': [row.pk for row in rows],
+        'subject': subject,
+        'message': message,
+    }
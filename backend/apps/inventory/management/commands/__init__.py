@@ -0,0 +1 @@
+# Commands package for inventory app
@@ -0,0 +1,21 @@
+"""
+Rebuild the preventive maintenance schedule.
+
+The daily sweep refreshes every asset and vehicle, so the schedule
+fills itself on the first sweep after deploying; run this to fill it
+straight away or after importing assets or vehicles in bulk.
+"""
+from django.core.management.base import BaseCommand
+
+from apps.inventory.maintenance import refresh_schedule
+from apps.inventory.models import MaintenanceDue
+
+
+class Command(BaseCommand):
+    help = 'Recompute MaintenanceDue for every asset and vehicle'
+
+    def handle(self, *args, **options):
+        refresh_schedule()
+        self.stdout.write(self.style.SUCCESS(
+            f'Maintenance schedule refreshed: {MaintenanceDue.objects.count()} due items'
+        ))
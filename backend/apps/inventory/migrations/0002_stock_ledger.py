@@ -0,0 +1,55 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockBalanceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('as_of', models.DateTimeField(verbose_name='As Of')),
+                ('balance', models.IntegerField(verbose_name='Balance')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created At')),
+            ],
+            options={
+                'verbose_name': 'Stock Balance Snapshot',
+                'verbose_name_plural': 'Stock Balance Snapshots',
+                'ordering': ['-as_of'],
+            },
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='balance_after',
+            field=models.IntegerField(blank=True, null=True, verbose_name='Balance After'),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='stock_delta',
+            field=models.IntegerField(default=0, verbose_name='Stock Change'),
+        ),
+        migrations.AddIndex(
+            model_name='stockitem',
+            index=models.Index(condition=models.Q(('current_stock__lte', models.F('minimum_stock'))), fields=['name'], name='inventory_stock_low_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['stock_item', 'transaction_date'], name='inventory_t_stock_i_111c53_idx'),
+        ),
+        migrations.AddField(
+            model_name='stockbalancesnapshot',
+            name='stock_item',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_snapshots', to='inventory.stockitem', verbose_name='Stock Item'),
+        ),
+        migrations.AddConstraint(
+            model_name='stockbalancesnapshot',
+            constraint=models.UniqueConstraint(fields=('stock_item', 'as_of'), name='unique_stock_snapshot'),
+        ),
+    ]
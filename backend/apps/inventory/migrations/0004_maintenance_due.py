@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_category_children'),
+        ('transport', '0004_route_planning'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MaintenanceDue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('service', 'Service'), ('warranty', 'Warranty Expiry'), ('insurance', 'Insurance Expiry'), ('permit', 'Permit Expiry'), ('fitness', 'Fitness Certificate Expiry'), ('puc', 'Pollution Certificate Expiry')], max_length=20, verbose_name='Kind')),
+                ('basis', models.CharField(choices=[('time', 'Time'), ('usage', 'Usage'), ('document', 'Document')], max_length=20, verbose_name='Basis')),
+                ('due_date', models.DateField(verbose_name='Due Date')),
+                ('due_mileage', models.PositiveIntegerField(blank=True, null=True, verbose_name='Due Mileage')),
+                ('notified_at', models.DateTimeField(blank=True, null=True, verbose_name='Notified At')),
+                ('computed_at', models.DateTimeField(verbose_name='Computed At')),
+                ('asset', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='maintenance_due', to='inventory.asset', verbose_name='Asset')),
+                ('vehicle', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='maintenance_due', to='transport.vehicle', verbose_name='Vehicle')),
+                ('work_order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='inventory.maintenancerecord', verbose_name='Work Order')),
+            ],
+            options={
+                'verbose_name': 'Maintenance Due',
+                'verbose_name_plural': 'Maintenance Due',
+                'ordering': ['due_date'],
+                'indexes': [models.Index(fields=['kind', 'due_date'], name='inventory_m_kind_b1879a_idx')],
+                'constraints': [models.UniqueConstraint(fields=('asset', 'kind'), name='unique_asset_due'), models.UniqueConstraint(fields=('vehicle', 'kind'), name='unique_vehicle_due')],
+            },
+        ),
+    ]
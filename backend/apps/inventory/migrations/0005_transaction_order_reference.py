@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:52
+
+import re
+
+from django.db import migrations, models
+
+ORDER_LINE = re.compile(r'^(?P<order>.+)-\d{3}$')
+
+
+def tag_received_orders(apps, schema_editor):
+    """Tag purchase lines received before the column existed with their order."""
+    Transaction = apps.get_model('inventory', 'Transaction')
+    lines = []
+    for line in Transaction.objects.filter(
+        transaction_type='purchase', order_reference=''
+    ).only('id', 'reference_number').iterator():
+        match = ORDER_LINE.match(line.reference_number)
+        if match:
+            line.order_reference = match.group('order')
+            lines.append(line)
+    Transaction.objects.bulk_update(lines, ['order_reference'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_maintenance_due'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='order_reference',
+            field=models.CharField(blank=True, db_index=True, max_length=100, verbose_name='Purchase Order'),
+        ),
+        migrations.RunPython(tag_received_orders, migrations.RunPython.noop),
+    ]
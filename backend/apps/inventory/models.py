@@ -11,7 +11,7 @@ class Category(models.Model):
     description = models.TextField(blank=True, verbose_name=_('Description'))
     parent = models.ForeignKey(
         'self', on_delete=models.CASCADE, null=True, blank=True,
-        verbose_name=_('Parent Category')
+        related_name='children', verbose_name=_('Parent Category')
     )
     is_active = models.BooleanField(default=True, verbose_name=_('Is Active'))
     
@@ -164,6 +164,13 @@ class StockItem(models.Model):
             models.Index(fields=['category']),
             models.Index(fields=['sku']),
             models.Index(fields=['current_stock']),
+            # Only items at or below their reorder level are indexed, so
+            # low-stock lookups touch the matching rows only.
+            models.Index(
+                fields=['name'],
+                condition=models.Q(current_stock__lte=models.F('minimum_stock')),
+                name='inventory_stock_low_idx',
+            ),
         ]
     
     def __str__(self):
@@ -191,11 +198,14 @@ class Transaction(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     transaction_type = models.CharField(max_length=20, choices=TRANSACTION_TYPES, verbose_name=_('Transaction Type'))
     reference_number = models.CharField(max_length=100, unique=True, verbose_name=_('Reference Number'))
+    order_reference = models.CharField(max_length=100, blank=True, db_index=True, verbose_name=_('Purchase Order'))
     
     # Item Details
     asset = models.ForeignKey(Asset, on_delete=models.CASCADE, null=True, blank=True, verbose_name=_('Asset'))
     stock_item = models.ForeignKey(StockItem, on_delete=models.CASCADE, null=True, blank=True, verbose_name=_('Stock Item'))
     quantity = models.PositiveIntegerField(default=1, verbose_name=_('Quantity'))
+    stock_delta = models.IntegerField(default=0, verbose_name=_('Stock Change'))
+    balance_after = models.IntegerField(null=True, blank=True, verbose_name=_('Balance After'))
     
     # Transaction Details
     from_location = models.CharField(max_length=200, blank=True, verbose_name=_('From Location'))
@@ -219,6 +229,7 @@ class Transaction(models.Model):
             models.Index(fields=['transaction_date']),
             models.Index(fields=['asset']),
             models.Index(fields=['stock_item']),
+            models.Index(fields=['stock_item', 'transaction_date']),
         ]
     
     def __str__(self):
@@ -232,6 +243,31 @@ class Transaction(models.Model):
         super().save(*args, **kwargs)
 
 
+class StockBalanceSnapshot(models.Model):
+    """Periodic snapshot of a stock item's ledger balance"""
+    
+    stock_item = models.ForeignKey(
+        StockItem, on_delete=models.CASCADE, related_name='balance_snapshots',
+        verbose_name=_('Stock Item')
+    )
+    as_of = models.DateTimeField(verbose_name=_('As Of'))
+    balance = models.IntegerField(verbose_name=_('Balance'))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Created At'))
+    
+    class Meta:
+        verbose_name = _('Stock Balance Snapshot')
+        verbose_name_plural = _('Stock Balance Snapshots')
+        ordering = ['-as_of']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['stock_item', 'as_of'], name='unique_stock_snapshot'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.stock_item.name} @ {self.as_of:%Y-%m-%d %H:%M}: {self.balance}"
+
+
 class MaintenanceRecord(models.Model):
     """Maintenance record model for asset maintenance tracking"""
     
@@ -272,3 +308,60 @@ class MaintenanceRecord(models.Model):
     
     def __str__(self):
         return f"{self.asset.name} - {self.title}"
+
+
+class MaintenanceDue(models.Model):
+    """Precomputed next due date for an asset or vehicle maintenance rule"""
+    
+    KIND_CHOICES = [
+        ('service', _('Service')),
+        ('warranty', _('Warranty Expiry')),
+        ('insurance', _('Insurance Expiry')),
+        ('permit', _('Permit Expiry')),
+        ('fitness', _('Fitness Certificate Expiry')),
+        ('puc', _('Pollution Certificate Expiry')),
+    ]
+    
+    BASIS_CHOICES = [
+        ('time', _('Time')),
+        ('usage', _('Usage')),
+        ('document', _('Document')),
+    ]
+    
+    asset = models.ForeignKey(
+        Asset, on_delete=models.CASCADE, null=True, blank=True,
+        related_name='maintenance_due', verbose_name=_('Asset')
+    )
+    vehicle = models.ForeignKey(
+        'transport.Vehicle', on_delete=models.CASCADE, null=True, blank=True,
+        related_name='maintenance_due', verbose_name=_('Vehicle')
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name=_('Kind'))
+    basis = models.CharField(max_length=20, choices=BASIS_CHOICES, verbose_name=_('Basis'))
+    due_date = models.DateField(verbose_name=_('Due Date'))
+    due_mileage = models.PositiveIntegerField(null=True, blank=True, verbose_name=_('Due Mileage'))
+    
+    # Follow-up
+    work_order = models.ForeignKey(
+        MaintenanceRecord, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='+', verbose_name=_('Work Order')
+    )
+    notified_at = models.DateTimeField(null=True, blank=True, verbose_name=_('Notified At'))
+    
+    computed_at = models.DateTimeField(verbose_name=_('Computed At'))
+    
+    class Meta:
+        verbose_name = _('Maintenance Due')
+        verbose_name_plural = _('Maintenance Due')
+        ordering = ['due_date']
+        constraints = [
+            models.UniqueConstraint(fields=['asset', 'kind'], name='unique_asset_due'),
+            models.UniqueConstraint(fields=['vehicle', 'kind'], name='unique_vehicle_due'),
+        ]
+        indexes = [
+            models.Index(fields=['kind', 'due_date']),
+        ]
+    
+    def __str__(self):
+        item = self.asset or self.vehicle
+        return f"{item} - {self.get_kind_display()} due {self.due_date}"
@@ -1,6 +1,10 @@
+from django.db import transaction
 from rest_framework import serializers
+from core.trees import descendant_ids
+from .ledger import post_movement
 from .models import (
-    Category, Supplier, Asset, StockItem, Transaction, MaintenanceRecord
+    Category, Supplier, Asset, StockItem, Transaction, MaintenanceRecord,
+    MaintenanceDue
 )
 
 
@@ -22,6 +26,8 @@ class CategorySerializer(serializers.ModelSerializer):
     
     def get_item_count(self, obj):
         """Get count of items in this category"""
+        if hasattr(obj, 'item_count'):
+            return obj.item_count
         return Asset.objects.filter(category=obj).count() + \
                StockItem.objects.filter(category=obj).count()
 
@@ -45,8 +51,20 @@ class CategoryDetailSerializer(serializers.ModelSerializer):
     
     def get_item_count(self, obj):
         """Get count of items in this category"""
+        if hasattr(obj, 'item_count'):
+            return obj.item_count
         return Asset.objects.filter(category=obj).count() + \
                StockItem.objects.filter(category=obj).count()
+    
+    def validate_parent(self, value):
+        """A category cannot be moved under itself or its descendants"""
+        if value and self.instance and value.pk in descendant_ids(
+            Category, self.instance.pk
+        ):
+            raise serializers.ValidationError(
+                "A category cannot be placed under itself or its subcategories."
+            )
+        return value
 
 
 class SupplierSerializer(serializers.ModelSerializer):
@@ -226,7 +244,27 @@ class StockItemDetailSerializer(serializers.ModelSerializer):
                     "Minimum stock must be less than maximum stock."
                 )
         
+        # Stock levels only change through ledger transactions
+        if (self.instance and 'current_stock' in data
+                and data['current_stock'] != self.instance.current_stock):
+            raise serializers.ValidationError(
+                "Current stock can only be changed by recording a transaction."
+            )
+        
         return data
+    
+    def create(self, validated_data):
+        """Create the item and book any opening stock through the ledger"""
+        opening_stock = validated_data.pop('current_stock', 0)
+        with transaction.atomic():
+            item = super().create(validated_data)
+            if opening_stock:
+                post_movement(
+                    item.pk, 'adjustment', opening_stock, direction='in',
+                    notes='Opening balance'
+                )
+                item.refresh_from_db()
+        return item
 
 
 class TransactionSerializer(serializers.ModelSerializer):
@@ -250,9 +288,12 @@ class TransactionSerializer(serializers.ModelSerializer):
             'reference_number', 'asset', 'asset_name', 'stock_item',
             'stock_item_name', 'item_name', 'quantity', 'from_location',
             'to_location', 'unit_price', 'total_amount', 'notes',
-            'transaction_date', 'created_at'
+            'transaction_date', 'created_at', 'stock_delta', 'balance_after'
+        ]
+        read_only_fields = [
+            'id', 'total_amount', 'transaction_date', 'created_at',
+            'stock_delta', 'balance_after'
         ]
-        read_only_fields = ['id', 'total_amount', 'transaction_date', 'created_at']
     
     def get_item_name(self, obj):
         """Get the name of the item (asset or stock item)"""
@@ -266,6 +307,10 @@ class TransactionSerializer(serializers.ModelSerializer):
 class TransactionDetailSerializer(serializers.ModelSerializer):
     """Detailed transaction serializer for create/update/retrieve views"""
     
+    direction = serializers.ChoiceField(
+        choices=['in', 'out'], write_only=True, required=False,
+        help_text="Direction of an adjustment"
+    )
     asset_name = serializers.CharField(
         source='asset.name', read_only=True
     )
@@ -284,9 +329,14 @@ class TransactionDetailSerializer(serializers.ModelSerializer):
             'reference_number', 'asset', 'asset_name', 'stock_item',
             'stock_item_name', 'item_name', 'quantity', 'from_location',
             'to_location', 'unit_price', 'total_amount', 'notes',
-            'transaction_date', 'created_at'
+            'transaction_date', 'created_at', 'stock_delta', 'balance_after',
+            'direction'
         ]
-        read_only_fields = ['id', 'total_amount', 'transaction_date', 'created_at']
+        read_only_fields = [
+            'id', 'total_amount', 'transaction_date', 'created_at',
+            'stock_delta', 'balance_after'
+        ]
+        extra_kwargs = {'reference_number': {'required': False}}
     
     def get_item_name(self, obj):
         """Get the name of the item (asset or stock item)"""
@@ -364,3 +414,53 @@ class MaintenanceRecordDetailSerializer(serializers.ModelSerializer):
                 )
         
         return data
+
+
+class MaintenanceDueSerializer(serializers.ModelSerializer):
+    """Precomputed maintenance due date for an asset or vehicle"""
+    
+    kind_display = serializers.CharField(source='get_kind_display', read_only=True)
+    item_name = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = MaintenanceDue
+        fields = [
+            'id', 'asset', 'vehicle', 'item_name', 'kind', 'kind_display',
+            'basis', 'due_date', 'due_mileage', 'work_order', 'notified_at',
+            'computed_at'
+        ]
+        read_only_fields = fields
+    
+    def get_item_name(self, obj):
+        """Get the name of the asset or vehicle"""
+        if obj.asset:
+            return obj.asset.name
+        elif obj.vehicle:
+            return str(obj.vehicle)
+        return None
+
+
+class PurchaseOrderLineSerializer(serializers.Serializer):
+    """One line of a purchase order receipt"""
+    
+    stock_item = serializers.UUIDField()
+    quantity = serializers.IntegerField(min_value=1)
+    unit_price = serializers.DecimalField(
+        max_digits=10, decimal_places=2, required=False
+    )
+    location = serializers.CharField(max_length=200, required=False, allow_blank=True)
+
+
+class PurchaseOrderReceiptSerializer(serializers.Serializer):
+    """A full purchase order received in one call"""
+    
+    reference = serializers.CharField(max_length=80, required=False)
+    notes = serializers.CharField(required=False, allow_blank=True, default='')
+    lines = PurchaseOrderLineSerializer(many=True)
+    
+    def validate_lines(self, value):
+        if not value:
+            raise serializers.ValidationError("At least one line is required.")
+        if len(value) > 1000:
+            raise serializers.ValidationError("At most 1000 lines per receipt.")
+        return value
@@ -0,0 +1,47 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from apps.transport.models import MaintenanceRecord as ServiceRecord
+from apps.transport.models import Vehicle
+
+from .maintenance import refresh_schedule
+from .models import Asset, MaintenanceRecord
+
+
+# Keep the precomputed maintenance schedule in step with the items it
+# covers; the daily sweep recomputes everything as a backstop.
+
+
+@receiver(post_save, sender=Asset)
+def refresh_asset_schedule(sender, instance, **kwargs):
+    """Recompute an asset's due dates after it changes"""
+    transaction.on_commit(lambda: refresh_schedule(asset_ids=[instance.pk]))
+
+
+@receiver(post_save, sender=MaintenanceRecord)
+def complete_work_order(sender, instance, **kwargs):
+    """Restart the asset's maintenance interval when a work order is completed"""
+    if instance.is_completed and instance.completed_date:
+        Asset.objects.filter(pk=instance.asset_id).update(
+            last_maintenance=instance.completed_date,
+            next_maintenance=instance.completed_date + timedelta(
+                days=settings.MAINTENANCE_ASSET_INTERVAL_DAYS
+            ),
+        )
+        transaction.on_commit(lambda: refresh_schedule(asset_ids=[instance.asset_id]))
+
+
+@receiver(post_save, sender=Vehicle)
+def refresh_vehicle_schedule(sender, instance, **kwargs):
+    """Recompute a vehicle's due dates after it changes"""
+    transaction.on_commit(lambda: refresh_schedule(vehicle_ids=[instance.pk]))
+
+
+@receiver(post_save, sender=ServiceRecord)
+def refresh_serviced_vehicle_schedule(sender, instance, **kwargs):
+    """Recompute a vehicle's due dates after a service is logged"""
+    transaction.on_commit(lambda: refresh_schedule(vehicle_ids=[instance.vehicle_id]))
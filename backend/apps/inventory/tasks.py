@@ -0,0 +1,56 @@
+"""
+Celery tasks for inventory app.
+"""
+
+from celery import shared_task
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.mail import send_mail
+from django.utils import timezone
+import logging
+
+from .ledger import snapshot_balances
+from .maintenance import sweep
+from .models import MaintenanceDue
+
+User = get_user_model()
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def snapshot_stock_balances():
+    """Snapshot ledger balances so as-of stock queries stay cheap."""
+    created = snapshot_balances()
+    return f"Snapshotted {created} stock balances"
+
+
+@shared_task
+def run_maintenance_sweep():
+    """
+    Daily preventive maintenance sweep: refresh due dates, create work
+    orders and send one digest of newly due items.
+    """
+    result = sweep()
+    if not result['announce_ids']:
+        return f"Created {result['work_orders']} work orders, nothing new to announce"
+
+    recipients = settings.MAINTENANCE_NOTIFICATION_EMAILS or list(
+        User.objects.filter(is_staff=True, is_active=True)
+        .exclude(email='').values_list('email', flat=True)
+    )
+    if recipients:
+        send_mail(
+            result['subject'],
+            result['message'],
+            settings.DEFAULT_FROM_EMAIL,
+            recipients,
+            fail_silently=False,
+        )
+    MaintenanceDue.objects.filter(pk__in=result['announce_ids']).update(
+        notified_at=timezone.now()
+    )
+    return (
+        f"Created {result['work_orders']} work orders, announced "
+        f"{len(result['announce_ids'])} due items to {len(recipients)} recipients"
+    )
@@ -0,0 +1,114 @@
+"""
+Tests for the category tree: the recursive query returns each subtree
+with its depth, a parent cycle cannot be created through the API and
+stays bounded when written behind it, and the cached snapshot rolls
+item counts up and is rebuilt after writes.
+"""
+import uuid
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from apps.inventory.categories import category_tree
+from apps.inventory.models import Category, StockItem
+from apps.inventory.serializers import CategoryDetailSerializer
+from core.trees import MAX_DEPTH, descendant_ids, tree_nodes
+
+
+def make_item(category, name='Pencil'):
+    return StockItem.objects.create(
+        name=name, category=category, sku=f'SKU-{StockItem.objects.count()}',
+        unit='box', unit_price=Decimal('2.00'),
+    )
+
+
+class TreeNodesTests(TestCase):
+    def setUp(self):
+        self.stationery = Category.objects.create(name='Stationery')
+        self.paper = Category.objects.create(name='Paper', parent=self.stationery)
+        self.card = Category.objects.create(name='Card', parent=self.paper)
+        self.furniture = Category.objects.create(name='Furniture')
+
+    def test_whole_forest_with_depths(self):
+        depths = {node.pk: node.depth for node in tree_nodes(Category)}
+        self.assertEqual(depths, {
+            self.stationery.pk: 0, self.paper.pk: 1, self.card.pk: 2,
+            self.furniture.pk: 0,
+        })
+
+    def test_subtree_is_ordered_by_path(self):
+        nodes = tree_nodes(Category, [self.paper.pk])
+        self.assertEqual([node.pk for node in nodes], [self.paper.pk, self.card.pk])
+        self.assertEqual([node.depth for node in nodes], [0, 1])
+        self.assertTrue(nodes[1].path.startswith(nodes[0].path + '/'))
+
+    def test_inactive_categories_prune_their_subtree(self):
+        Category.objects.filter(pk=self.paper.pk).update(is_active=False)
+        nodes = tree_nodes(Category, active_only=True)
+        self.assertEqual(
+            {node.pk for node in nodes}, {self.stationery.pk, self.furniture.pk}
+        )
+
+    def test_descendant_ids(self):
+        self.assertEqual(
+            descendant_ids(Category, self.stationery.pk),
+            {self.stationery.pk, self.paper.pk, self.card.pk},
+        )
+        self.assertEqual(tree_nodes(Category, []), [])
+
+    def test_cannot_move_a_category_under_its_descendant(self):
+        serializer = CategoryDetailSerializer(
+            self.stationery, data={'parent': self.card.pk}, partial=True
+        )
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('parent', serializer.errors)
+
+        serializer = CategoryDetailSerializer(
+            self.paper, data={'parent': self.furniture.pk}, partial=True
+        )
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+
+    def test_cycle_written_behind_the_api_is_bounded(self):
+        Category.objects.filter(pk=self.stationery.pk).update(parent=self.card)
+        nodes = tree_nodes(Category, [self.stationery.pk])
+        self.assertEqual(max(node.depth for node in nodes), MAX_DEPTH)
+
+
+class CategoryTreeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.stationery = Category.objects.create(name='Stationery')
+        self.paper = Category.objects.create(name='Paper', parent=self.stationery)
+        self.card = Category.objects.create(name='Card', parent=self.paper)
+        make_item(self.stationery)
+        make_item(self.paper, 'A4')
+        make_item(self.card, 'Card stock')
+        make_item(self.card, 'Board')
+
+    def test_snapshot_rolls_counts_up_the_tree(self):
+        [root] = category_tree.snapshot()
+        self.assertEqual(root['id'], str(self.stationery.pk))
+        self.assertEqual((root['item_count'], root['subtree_item_count']), (1, 4))
+        [paper] = root['children']
+        self.assertEqual((paper['item_count'], paper['subtree_item_count']), (1, 3))
+        [card] = paper['children']
+        self.assertEqual((card['depth'], card['subtree_item_count']), (2, 2))
+
+        self.assertEqual(category_tree.subtree(self.paper.pk)['name'], 'Paper')
+        self.assertIsNone(category_tree.subtree(uuid.uuid4()))
+
+    def test_snapshot_is_cached_until_a_write(self):
+        category_tree.snapshot()
+        with self.assertNumQueries(0):
+            category_tree.snapshot()
+
+        make_item(self.card, 'Poster')
+        self.assertEqual(category_tree.subtree(self.stationery.pk)['subtree_item_count'], 5)
+
+        Category.objects.create(name='Envelopes', parent=self.paper)
+        names = [child['name'] for child in category_tree.subtree(self.paper.pk)['children']]
+        self.assertEqual(names, ['Card', 'Envelopes'])
+
+        self.card.delete()
+        self.assertEqual(category_tree.subtree(self.stationery.pk)['subtree_item_count'], 2)
@@ -0,0 +1,83 @@
+"""
+Tests for the stock ledger: balances move with every movement, issues
+cannot go below zero and a purchase order is received once.
+"""
+import uuid
+from decimal import Decimal
+
+from django.test import TestCase
+
+from apps.inventory.ledger import StockError, post_movement, receive_purchase_order
+from apps.inventory.models import Category, StockItem, Transaction
+
+
+def make_item(stock=0, sku=None):
+    category = Category.objects.create(name='Stationery')
+    return StockItem.objects.create(
+        name='Pencil', category=category, sku=sku or f'SKU-{StockItem.objects.count()}',
+        unit='box', current_stock=stock, unit_price=Decimal('2.00'),
+    )
+
+
+class LedgerTests(TestCase):
+    def setUp(self):
+        self.item = make_item(stock=5)
+
+    def test_movements_record_running_balance(self):
+        post_movement(self.item.pk, 'purchase', 10, reference_number='IN-1')
+        out = post_movement(self.item.pk, 'sale', 4, reference_number='OUT-1')
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.current_stock, 11)
+        self.assertEqual(out.stock_delta, -4)
+        self.assertEqual(out.balance_after, 11)
+
+    def test_issue_cannot_take_stock_below_zero(self):
+        with self.assertRaises(StockError):
+            post_movement(self.item.pk, 'sale', 6, reference_number='OUT-1')
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.current_stock, 5)
+        self.assertFalse(Transaction.objects.exists())
+
+
+class PurchaseOrderTests(TestCase):
+    def setUp(self):
+        self.pens = make_item()
+        self.paper = make_item()
+
+    def lines(self):
+        return [
+            {'stock_item': self.pens.pk, 'quantity': 3, 'unit_price': Decimal('1.50')},
+            {'stock_item': self.paper.pk, 'quantity': 5},
+            {'stock_item': self.pens.pk, 'quantity': 2},
+        ]
+
+    def test_receives_every_line_once(self):
+        movements = receive_purchase_order(self.lines(), reference='PO-1')
+        self.assertEqual(
+            [m.reference_number for m in movements], ['PO-1-001', 'PO-1-002', 'PO-1-003']
+        )
+        self.assertEqual([m.balance_after for m in movements], [3, 5, 5])
+        self.pens.refresh_from_db()
+        self.paper.refresh_from_db()
+        self.assertEqual((self.pens.current_stock, self.paper.current_stock), (5, 5))
+
+        with self.assertRaises(StockError):
+            receive_purchase_order(self.lines(), reference='PO-1')
+        self.pens.refresh_from_db()
+        self.assertEqual(self.pens.current_stock, 5)
+
+    def test_references_sharing_a_prefix_do_not_collide(self):
+        receive_purchase_order(self.lines(), reference='PO-1')
+        receive_purchase_order(self.lines(), reference='PO-10')
+        receive_purchase_order(self.lines(), reference='PO-1-2')
+        self.pens.refresh_from_db()
+        self.assertEqual(self.pens.current_stock, 15)
+        self.assertEqual(
+            Transaction.objects.filter(order_reference='PO-1').count(), 3
+        )
+
+    def test_unknown_items_are_refused(self):
+        lines = self.lines() + [{'stock_item': uuid.uuid4(), 'quantity': 1}]
+        with self.assertRaises(StockError):
+            receive_purchase_order(lines, reference='PO-2')
+        self.assertFalse(Transaction.objects.exists())
@@ -0,0 +1,99 @@
+"""
+Tests for the maintenance scheduler: the mileage rule counts from the
+odometer at the last service and the schedule covers every vehicle.
+"""
+import io
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from apps.inventory.maintenance import refresh_schedule
+from apps.inventory.models import MaintenanceDue
+from apps.transport.models import FuelRecord, Vehicle
+
+TODAY = date(2026, 6, 1)
+
+
+def make_vehicle(number, **fields):
+    defaults = {
+        'vehicle_number': number, 'registration_number': f'REG-{number}',
+        'make': 'Tata', 'model': 'Starbus', 'year': 2020, 'capacity': 40,
+        'purchase_date': date(2020, 1, 1), 'insurance_expiry': date(2027, 1, 1),
+        'permit_expiry': date(2027, 1, 1), 'fitness_expiry': date(2027, 1, 1),
+        'puc_expiry': date(2027, 1, 1),
+    }
+    defaults.update(fields)
+    return Vehicle.objects.create(**defaults)
+
+
+def log_fuel(vehicle, day, mileage):
+    return FuelRecord.objects.create(
+        vehicle=vehicle, fuel_date=day, fuel_type='diesel',
+        quantity_liters=Decimal('40'), cost_per_liter=Decimal('90'),
+        total_cost=Decimal('3600'), mileage_at_fuel=mileage, fuel_station='Depot',
+    )
+
+
+@override_settings(
+    MAINTENANCE_VEHICLE_INTERVAL_DAYS=90, MAINTENANCE_VEHICLE_INTERVAL_KM=10000
+)
+class VehicleServiceRuleTests(TestCase):
+    def service_due(self, vehicle):
+        refresh_schedule(vehicle_ids=[vehicle.pk], today=TODAY)
+        return MaintenanceDue.objects.get(vehicle=vehicle, kind='service')
+
+    def test_usage_rule_skipped_without_odometer_at_service(self):
+        # Serviced outside the service log with no fuel reading before it:
+        # a high odometer must not make the service due today.
+        vehicle = make_vehicle(
+            'V1', current_mileage=85000, last_service_date=TODAY - timedelta(days=10)
+        )
+        due = self.service_due(vehicle)
+        self.assertEqual(due.basis, 'time')
+        self.assertEqual(due.due_date, TODAY + timedelta(days=80))
+        self.assertIsNone(due.due_mileage)
+
+    def test_usage_rule_counts_from_fuel_log_at_service(self):
+        serviced = TODAY - timedelta(days=10)
+        vehicle = make_vehicle('V2', current_mileage=81000, last_service_date=serviced)
+        log_fuel(vehicle, serviced - timedelta(days=2), 80000)
+        log_fuel(vehicle, serviced + timedelta(days=5), 80500)
+        due = self.service_due(vehicle)
+        self.assertEqual(due.due_mileage, 90000)
+        self.assertEqual(due.basis, 'time')
+
+    def test_usage_rule_trips_past_interval(self):
+        serviced = TODAY - timedelta(days=10)
+        vehicle = make_vehicle('V3', current_mileage=95000, last_service_date=serviced)
+        log_fuel(vehicle, serviced, 80000)
+        due = self.service_due(vehicle)
+        self.assertEqual(due.basis, 'usage')
+        self.assertEqual(due.due_date, TODAY)
+
+    def test_never_serviced_counts_from_new(self):
+        vehicle = make_vehicle('V4', current_mileage=12000)
+        due = self.service_due(vehicle)
+        self.assertEqual(due.due_mileage, 10000)
+
+
+class RefreshScheduleTests(TestCase):
+    def test_full_refresh_covers_every_active_vehicle(self):
+        active = make_vehicle('V1')
+        make_vehicle('V2', status='retired')
+        refresh_schedule(today=TODAY)
+        kinds = set(
+            MaintenanceDue.objects.filter(vehicle=active).values_list('kind', flat=True)
+        )
+        self.assertEqual(kinds, {'service', 'insurance', 'permit', 'fitness', 'puc'})
+        self.assertEqual(
+            MaintenanceDue.objects.filter(vehicle__isnull=False).count(), 5
+        )
+
+    def test_command_builds_the_schedule(self):
+        make_vehicle('V1')
+        out = io.StringIO()
+        call_command('refresh_maintenance_schedule', stdout=out)
+        self.assertEqual(MaintenanceDue.objects.filter(vehicle__isnull=False).count(), 5)
+        self.assertIn('5 due items', out.getvalue())
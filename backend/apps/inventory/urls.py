@@ -2,7 +2,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     CategoryViewSet, SupplierViewSet, AssetViewSet, StockItemViewSet,
-    TransactionViewSet, MaintenanceRecordViewSet
+    TransactionViewSet, MaintenanceRecordViewSet, MaintenanceDueViewSet
 )
 
 router = DefaultRouter()
@@ -12,6 +12,7 @@ router.register(r'assets', AssetViewSet)
 router.register(r'stock-items', StockItemViewSet)
 router.register(r'transactions', TransactionViewSet)
 router.register(r'maintenance-records', MaintenanceRecordViewSet)
+router.register(r'maintenance-due', MaintenanceDueViewSet)
 
 app_name = 'inventory'
 
@@ -1,14 +1,21 @@
-from rest_framework import viewsets, filters
+from rest_framework import viewsets, filters, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from django.utils import timezone
-from django.db.models import Sum, Count, Q, F
+from django.utils.dateparse import parse_datetime
+from django.db.models import (
+    Sum, Count, Q, F, Value, Exists, OuterRef, Subquery, IntegerField
+)
+from django.db.models.functions import Coalesce
 from datetime import timedelta
+from decimal import Decimal
 
 from .models import (
-    Category, Supplier, Asset, StockItem, Transaction, MaintenanceRecord
+    Category, Supplier, Asset, StockItem, Transaction, MaintenanceRecord,
+    MaintenanceDue
 )
 from .serializers import (
     CategorySerializer, CategoryDetailSerializer,
@@ -16,7 +23,13 @@ from .serializers import (
     AssetSerializer, AssetDetailSerializer,
     StockItemSerializer, StockItemDetailSerializer,
     TransactionSerializer, TransactionDetailSerializer,
-    MaintenanceRecordSerializer, MaintenanceRecordDetailSerializer
+    MaintenanceRecordSerializer, MaintenanceRecordDetailSerializer,
+    PurchaseOrderReceiptSerializer, MaintenanceDueSerializer
+)
+from .categories import category_tree
+from .ledger import (
+    StockError, balances_as_of, new_reference, post_movement,
+    receive_purchase_order
 )
 
 
@@ -39,27 +52,46 @@ class CategoryViewSet(viewsets.ModelViewSet):
             return CategoryDetailSerializer
         return CategorySerializer
     
+    def get_queryset(self):
+        def items_in(model):
+            return Coalesce(Subquery(
+                model.objects.filter(category=OuterRef('pk')).order_by()
+                .values('category').annotate(count=Count('pk')).values('count'),
+                output_field=IntegerField()
+            ), 0)
+        
+        return super().get_queryset().select_related('parent').annotate(
+            item_count=items_in(Asset) + items_in(StockItem)
+        )
+    
     @action(detail=False, methods=['get'])
     def tree(self, request):
-        """Get category tree structure"""
-        root_categories = Category.objects.filter(parent=None, is_active=True)
-        serializer = self.get_serializer(root_categories, many=True)
-        return Response(serializer.data)
+        """Get category tree structure with item counts (?root=<id> for a subtree)"""
+        root = request.query_params.get('root')
+        if root:
+            subtree = category_tree.subtree(root)
+            if subtree is None:
+                return Response(
+                    {'error': 'Category not found'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            return Response(subtree)
+        return Response(category_tree.snapshot())
     
     @action(detail=False, methods=['get'])
     def statistics(self, request):
         """Get category statistics"""
-        total_categories = Category.objects.count()
-        active_categories = Category.objects.filter(is_active=True).count()
-        categories_with_items = Category.objects.annotate(
-            item_count=Count('asset') + Count('stockitem')
-        ).filter(item_count__gt=0).count()
+        has_items = (
+            Exists(Asset.objects.filter(category=OuterRef('pk')))
+            | Exists(StockItem.objects.filter(category=OuterRef('pk')))
+        )
+        stats = Category.objects.aggregate(
+            total_categories=Count('id'),
+            active_categories=Count('id', filter=Q(is_active=True)),
+            categories_with_items=Count('id', filter=Q(has_items)),
+        )
         
-        return Response({
-            'total_categories': total_categories,
-            'active_categories': active_categories,
-            'categories_with_items': categories_with_items
-        })
+        return Response(stats)
 
 
 class SupplierViewSet(viewsets.ModelViewSet):
@@ -153,10 +185,11 @@ class AssetViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def maintenance_due(self, request):
-        """Get assets due for maintenance"""
+        """Get assets due for maintenance, from the precomputed schedule"""
         today = timezone.now().date()
         maintenance_due = self.get_queryset().filter(
-            next_maintenance__lte=today,
+            maintenance_due__kind='service',
+            maintenance_due__due_date__lte=today,
             status__in=['available', 'in_use']
         )
         serializer = self.get_serializer(maintenance_due, many=True)
@@ -164,12 +197,13 @@ class AssetViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def warranty_expiring(self, request):
-        """Get assets with warranty expiring soon"""
+        """Get assets with warranty expiring soon, from the precomputed schedule"""
         today = timezone.now().date()
         thirty_days_from_now = today + timedelta(days=30)
         warranty_expiring = self.get_queryset().filter(
-            warranty_expiry__gte=today,
-            warranty_expiry__lte=thirty_days_from_now
+            maintenance_due__kind='warranty',
+            maintenance_due__due_date__gte=today,
+            maintenance_due__due_date__lte=thirty_days_from_now
         )
         serializer = self.get_serializer(warranty_expiring, many=True)
         return Response(serializer.data)
@@ -184,9 +218,9 @@ class AssetViewSet(viewsets.ModelViewSet):
         
         # Assets by status
         status_counts = {}
-        for status, _ in Asset.STATUS_CHOICES:
-            count = Asset.objects.filter(status=status).count()
-            status_counts[status] = count
+        for choice, _ in Asset.STATUS_CHOICES:
+            count = Asset.objects.filter(status=choice).count()
+            status_counts[choice] = count
         
         # Assets by condition
         condition_counts = {}
@@ -283,44 +317,67 @@ class StockItemViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def statistics(self, request):
         """Get stock item statistics"""
-        total_items = StockItem.objects.count()
-        active_items = StockItem.objects.filter(is_active=True).count()
-        total_value = StockItem.objects.aggregate(
-            total=Sum('total_value')
-        )['total'] or 0
-        
-        # Stock status counts
-        out_of_stock = StockItem.objects.filter(current_stock=0).count()
-        low_stock = StockItem.objects.filter(
-            current_stock__lte=F('minimum_stock'),
-            current_stock__gt=0
-        ).count()
-        in_stock = StockItem.objects.filter(
-            current_stock__gt=F('minimum_stock')
-        ).count()
+        stats = StockItem.objects.aggregate(
+            total_items=Count('id'),
+            active_items=Count('id', filter=Q(is_active=True)),
+            total_value=Coalesce(Sum('total_value'), Value(Decimal('0'))),
+            out_of_stock=Count('id', filter=Q(current_stock=0)),
+            low_stock=Count('id', filter=Q(
+                current_stock__lte=F('minimum_stock'), current_stock__gt=0
+            )),
+            in_stock=Count('id', filter=Q(current_stock__gt=F('minimum_stock'))),
+        )
         
         # Items by category
-        category_counts = {}
-        categories = Category.objects.all()
-        for category in categories:
-            count = StockItem.objects.filter(category=category).count()
-            if count > 0:
-                category_counts[category.name] = count
+        stats['category_counts'] = dict(
+            StockItem.objects.order_by().values_list('category__name')
+            .annotate(count=Count('id'))
+        )
         
-        return Response({
-            'total_items': total_items,
-            'active_items': active_items,
-            'total_value': total_value,
-            'out_of_stock': out_of_stock,
-            'low_stock': low_stock,
-            'in_stock': in_stock,
-            'category_counts': category_counts
-        })
+        return Response(stats)
+    
+    @action(detail=False, methods=['post'])
+    def receive(self, request):
+        """Receive a full purchase order in one call"""
+        serializer = PurchaseOrderReceiptSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            movements = receive_purchase_order(
+                serializer.validated_data['lines'],
+                reference=serializer.validated_data.get('reference'),
+                notes=serializer.validated_data['notes'],
+            )
+        except StockError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(
+            TransactionSerializer(movements, many=True).data,
+            status=status.HTTP_201_CREATED
+        )
+    
+    @action(detail=False, methods=['get'])
+    def as_of(self, request):
+        """Get stock balances as of a past moment (?at=ISO datetime)"""
+        at = parse_datetime(request.query_params.get('at', ''))
+        if at is None:
+            return Response(
+                {'error': "Pass 'at' as an ISO 8601 datetime"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if timezone.is_naive(at):
+            at = timezone.make_aware(at)
+        
+        items = balances_as_of(at, self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(
+            items.values('id', 'name', 'sku', 'balance_as_of')
+        )
+        return self.get_paginated_response(page)
 
 
 class TransactionViewSet(viewsets.ModelViewSet):
-    """ViewSet for managing transactions"""
+    """ViewSet for the append-only transaction ledger"""
     
+    http_method_names = ['get', 'post', 'head', 'options']
     queryset = Transaction.objects.all()
     serializer_class = TransactionSerializer
     permission_classes = [IsAuthenticated]
@@ -343,6 +400,24 @@ class TransactionViewSet(viewsets.ModelViewSet):
             return TransactionDetailSerializer
         return TransactionSerializer
     
+    def perform_create(self, serializer):
+        """Stock movements go through the ledger; asset movements are saved as-is"""
+        data = dict(serializer.validated_data)
+        direction = data.pop('direction', None)
+        stock_item = data.pop('stock_item', None)
+        data.setdefault('reference_number', new_reference())
+        if stock_item is None:
+            serializer.instance = Transaction.objects.create(**data)
+            return
+        
+        try:
+            serializer.instance = post_movement(
+                stock_item.pk, data.pop('transaction_type'),
+                data.pop('quantity', 1), direction=direction, **data
+            )
+        except StockError as e:
+            raise ValidationError({'error': str(e)})
+    
     def get_queryset(self):
         queryset = super().get_queryset()
         
@@ -401,6 +476,36 @@ class TransactionViewSet(viewsets.ModelViewSet):
         })
 
 
+class MaintenanceDueViewSet(viewsets.ReadOnlyModelViewSet):
+    """Precomputed maintenance schedule for assets and vehicles"""
+    
+    queryset = MaintenanceDue.objects.select_related(
+        'asset', 'vehicle', 'work_order'
+    )
+    serializer_class = MaintenanceDueSerializer
+    permission_classes = [IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = ['kind', 'basis', 'asset', 'vehicle']
+    ordering_fields = ['due_date']
+    ordering = ['due_date']
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        
+        # Due within the next N days (overdue items included)
+        within = self.request.query_params.get('within_days')
+        if within:
+            try:
+                days = int(within)
+            except ValueError:
+                raise ValidationError({'within_days': 'Must be an integer.'})
+            queryset = queryset.filter(
+                due_date__lte=timezone.now().date() + timedelta(days=days)
+            )
+        
+        return queryset
+
+
 class MaintenanceRecordViewSet(viewsets.ModelViewSet):
     """ViewSet for managing maintenance records"""
     
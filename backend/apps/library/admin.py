@@ -7,6 +7,7 @@ from django.utils import timezone
 from .models import (
     Category, Author, Book, Borrowing, Reservation, Fine, LibrarySettings
 )
+from .inventory import mark_lost
 
 
 @admin.register(Category)
@@ -117,7 +118,12 @@ class BorrowingAdmin(admin.ModelAdmin):
         'borrower__email'
     ]
     ordering = ['-borrowed_date']
-    readonly_fields = ['borrowed_date', 'created_at', 'updated_at', 'days_overdue']
+    # Copies are lent and returned through apps.library.inventory, so the
+    # admin edits dates and notes only.
+    readonly_fields = [
+        'book', 'borrower', 'borrowed_date', 'returned_date', 'status',
+        'created_at', 'updated_at', 'days_overdue'
+    ]
     date_hierarchy = 'borrowed_date'
 
     fieldsets = (
@@ -136,6 +142,9 @@ class BorrowingAdmin(admin.ModelAdmin):
         }),
     )
 
+    def has_add_permission(self, request):
+        return False
+
     def status_display(self, obj):
         colors = {
             'borrowed': 'blue',
@@ -169,8 +178,11 @@ class BorrowingAdmin(admin.ModelAdmin):
     mark_as_returned.short_description = "Mark selected borrowings as returned"
 
     def mark_as_lost(self, request, queryset):
-        queryset.update(status='lost')
-        self.message_user(request, f"Marked {queryset.count()} borrowings as lost")
+        lost = 0
+        for borrowing in queryset.filter(status__in=['borrowed', 'overdue']):
+            mark_lost(borrowing)
+            lost += 1
+        self.message_user(request, f"Marked {lost} borrowings as lost")
     mark_as_lost.short_description = "Mark selected borrowings as lost"
 
 
@@ -8,3 +8,5 @@ class LibraryConfig(AppConfig):
 
     def ready(self):
         import apps.library.signals
+        from .categories import category_tree
+        category_tree.connect_signals()
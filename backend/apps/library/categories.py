@@ -0,0 +1,11 @@
+"""
+Library category tree, cached with book counts.
+"""
+from core.trees import CategoryTree
+
+from .models import Book, Category
+
+category_tree = CategoryTree(
+    Category, counted=[(Book, 'category')],
+    fields=('name', 'description', 'color'),
+)
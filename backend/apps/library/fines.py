@@ -0,0 +1,185 @@
+"""
+Nightly overdue and fine processing.
+
+Past-due borrowings are flipped to ``overdue`` with one UPDATE, missing
+``Fine`` rows are bulk-created (also for books returned late before the
+nightly flip caught them), and accrued amounts are recomputed by the
+database from the borrowing dates (days overdue x daily rate, capped),
+so the cost does not grow with a query per borrowing. Stale reservations
+are expired in bulk, and each affected borrower gets a single digest
+email instead of one email per fine.
+"""
+import logging
+
+from django.db import transaction
+from django.db.models import (
+    DecimalField, ExpressionWrapper, F, Func, IntegerField, OuterRef, Q,
+    Subquery, Value,
+)
+from django.db.models.functions import Coalesce, Greatest, Least
+from django.utils import timezone
+
+from .inventory import expire_holds
+from .models import Borrowing, Fine, LibrarySettings, Reservation
+
+logger = logging.getLogger(__name__)
+
+
+class DaysBetween(Func):
+    """Whole days elapsed from ``start`` to ``end``, computed in SQL."""
+    output_field = IntegerField()
+    arity = 2
+
+    def __init__(self, end, start, **extra):
+        super().__init__(end, start, **extra)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection,
+            template='CAST(FLOOR(EXTRACT(EPOCH FROM (%(expressions)s)) / 86400) AS INTEGER)',
+            arg_joiner=' - ',
+            **extra_context
+        )
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection,
+            template='CAST(julianday(%(expressions)s) AS INTEGER)',
+            arg_joiner=') - julianday(',
+            **extra_context
+        )
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        clone = self.copy()
+        clone.set_source_expressions(self.get_source_expressions()[::-1])
+        return super(DaysBetween, clone).as_sql(
+            compiler, connection,
+            template='TIMESTAMPDIFF(DAY, %(expressions)s)',
+            **extra_context
+        )
+
+
+def accrued_amount(now, cap=None):
+    """
+    Expression for a fine's amount: whole days between the due date and
+    the return date (or ``now``) times the fine's daily rate, capped.
+    """
+    days = Borrowing.objects.filter(pk=OuterRef('borrowing_id')).annotate(
+        days=DaysBetween(
+            Coalesce('returned_date', Value(now)), 'due_date'
+        )
+    ).values('days')[:1]
+    amount = ExpressionWrapper(
+        Greatest(Subquery(days), Value(0)) * F('daily_rate'),
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+    if cap is not None:
+        amount = Least(amount, Value(cap), output_field=DecimalField(
+            max_digits=10, decimal_places=2
+        ))
+    return amount
+
+
+def process_overdues(now=None):
+    """
+    Run the overdue/fine batch. Returns counters and the ids of borrowers
+    who should receive a digest.
+    """
+    now = now or timezone.now()
+    settings = LibrarySettings.objects.first()
+    fines_enabled = settings is None or settings.allow_fines
+    daily_rate = settings.daily_fine_rate if settings else Fine._meta.get_field(
+        'daily_rate'
+    ).default
+    cap = settings.max_fine_amount if settings else None
+
+    with transaction.atomic():
+        past_due = Borrowing.objects.filter(status='borrowed', due_date__lt=now)
+        notify = set(past_due.values_list('borrower_id', flat=True))
+        flipped = past_due.update(status='overdue', updated_at=now)
+
+        created = recomputed = 0
+        if fines_enabled:
+            missing = list(
+                Borrowing.objects.filter(fine__isnull=True).filter(
+                    Q(status='overdue')
+                    | Q(status='returned', returned_date__gt=F('due_date'))
+                ).values_list('id', 'borrower_id', 'status')
+            )
+            Fine.objects.bulk_create(
+                [
+                    Fine(borrowing_id=borrowing_id, amount=0, daily_rate=daily_rate)
+                    for borrowing_id, _, _ in missing
+                ],
+                ignore_conflicts=True,
+                batch_size=1000,
+            )
+            created = len(missing)
+            # Late returns have nothing left to chase in the digest
+            notify.update(
+                borrower_id for _, borrower_id, status in missing
+                if status == 'overdue'
+            )
+            late_returns = [
+                borrowing_id for borrowing_id, _, status in missing
+                if status == 'returned'
+            ]
+
+            if settings is None or settings.auto_calculate_fines:
+                # Fines still accruing, plus those whose book came back
+                # since the amount was last computed.
+                recomputed = Fine.objects.filter(status='pending').filter(
+                    Q(borrowing__status='overdue')
+                    | Q(borrowing__returned_date__gte=F('updated_at'))
+                    | Q(borrowing_id__in=late_returns)
+                ).update(amount=accrued_amount(now, cap), updated_at=now)
+
+        expired = Reservation.objects.filter(
+            status='pending', expiry_date__lte=now
+        ).update(status='expired', updated_at=now)
+
+    expired += expire_holds()
+    logger.info(
+        f"Library overdue batch: {flipped} newly overdue, {created} fines "
+        f"created, {recomputed} fines recomputed, {expired} reservations expired"
+    )
+    return {
+        'newly_overdue': flipped,
+        'fines_created': created,
+        'fines_recomputed': recomputed,
+        'reservations_expired': expired,
+        'notify_borrower_ids': sorted(notify),
+    }
+
+
+def borrower_digest(user):
+    """Subject and body of the overdue digest for one borrower."""
+    overdue = list(
+        Borrowing.objects.filter(borrower=user, status='overdue')
+        .select_related('book', 'fine')
+        .order_by('due_date')
+    )
+    if not overdue:
+        return None
+
+    lines = []
+    total = 0
+    for borrowing in overdue:
+        fine = getattr(borrowing, 'fine', None)
+        amount = fine.amount if fine is not None and fine.status == 'pending' else 0
+        total += amount
+        lines.append(
+            f"- {borrowing.book.title} (due {borrowing.due_date:%Y-%m-%d}), "
+            f"fine: {amount}"
+        )
+
+    subject = f"Library notice - {len(overdue)} overdue book(s)"
+    message = (
+        f"Dear {user.get_full_name() or user.username},\n\n"
+        f"The following books are overdue:\n"
+        + "\n".join(lines)
+        + f"\n\nTotal pending fines: {total}\n\n"
+        "Please return the books and pay the fines as soon as possible.\n\n"
+        "Best regards,\nLibrary Management System\n"
+    )
+    return subject, message
@@ -0,0 +1,273 @@
+"""
+Race-free book inventory.
+
+Every change to ``Book.available_copies`` is a single conditional
+``UPDATE`` (``... SET available_copies = available_copies - 1 WHERE
+available_copies > 0``), so concurrent borrowers can never take more
+copies than exist and counts cannot drift through read-modify-write.
+
+Returned copies go to the reservation queue first: the oldest pending
+reservation is promoted to ``ready`` and the copy is held for it instead
+of going back on the shelf. ``reconcile`` recomputes the counters from
+borrowings and holds and repairs any drift.
+"""
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, Value, When
+from django.utils import timezone
+
+from .activity import refresh_borrower_activity
+from .models import Book, Borrowing, LibrarySettings, Reservation
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_BORROWING = ('borrowed', 'overdue')
+# Statuses set by staff that availability changes must not overwrite.
+MANUAL_BOOK_STATUSES = ('maintenance', 'lost')
+
+
+class InventoryError(Exception):
+    """Raised when an inventory transition is not allowed."""
+
+
+def _status_after(delta):
+    """
+    Book status once ``available_copies`` moves by ``delta``. Evaluated
+    inside the same UPDATE, where ``available_copies`` is the old value.
+    """
+    return Case(
+        When(status__in=MANUAL_BOOK_STATUSES, then=F('status')),
+        When(available_copies__gt=-delta, then=Value('available')),
+        default=Value('borrowed'),
+    )
+
+
+def take_copy(book_id):
+    """Take one copy off the shelf; returns ``False`` if none is left."""
+    return Book.objects.filter(
+        pk=book_id, is_active=True, available_copies__gt=0
+    ).exclude(status__in=MANUAL_BOOK_STATUSES).update(
+        available_copies=F('available_copies') - 1,
+        status=_status_after(-1),
+        updated_at=timezone.now(),
+    ) == 1
+
+
+def release_copy(book_id):
+    """Put one copy back on the shelf, never above ``total_copies``."""
+    return Book.objects.filter(
+        pk=book_id, available_copies__lt=F('total_copies')
+    ).update(
+        available_copies=F('available_copies') + 1,
+        status=_status_after(1),
+        updated_at=timezone.now(),
+    ) == 1
+
+
+def _refresh_activity_on_commit(user_id):
+    transaction.on_commit(lambda: refresh_borrower_activity([user_id]))
+
+
+def _library_settings():
+    return LibrarySettings.objects.first()
+
+
+def _hold_window():
+    settings = _library_settings()
+    return timedelta(days=settings.max_reservation_days if settings else 7)
+
+
+def hand_on_copy(book_id):
+    """
+    Give a freed copy to the oldest pending reservation, or put it back
+    on the shelf when nobody is waiting. Returns the promoted
+    reservation, if any.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        reservation = (
+            Reservation.objects.select_for_update(skip_locked=True)
+            .filter(book_id=book_id, status='pending', expiry_date__gt=now)
+            .order_by('reserved_date', 'id')
+            .first()
+        )
+        if reservation is None:
+            release_copy(book_id)
+            return None
+
+        Reservation.objects.filter(pk=reservation.pk).update(
+            status='ready', ready_at=now, expiry_date=now + _hold_window(),
+            updated_at=now,
+        )
+    reservation.refresh_from_db()
+    logger.info(f"Reservation {reservation.pk} promoted for book {book_id}")
+    return reservation
+
+
+def borrow(book_id, user, due_date):
+    """
+    Lend a copy to ``user``.
+
+    A ``ready`` reservation held for the user is fulfilled with its held
+    copy; otherwise a copy is taken from the shelf with a conditional
+    UPDATE.
+    """
+    settings = _library_settings()
+    with transaction.atomic():
+        if settings:
+            active = Borrowing.objects.filter(
+                borrower=user, status__in=ACTIVE_BORROWING
+            ).count()
+            if active >= settings.max_books_per_user:
+                raise InventoryError(
+                    "You have reached the maximum number of books you can borrow"
+                )
+
+        held = Reservation.objects.filter(
+            book_id=book_id, user=user, status='ready'
+        ).update(status='fulfilled', updated_at=timezone.now())
+        if not held and not take_copy(book_id):
+            raise InventoryError("No copies of this book are available")
+
+        borrowing = Borrowing.objects.create(
+            book_id=book_id, borrower=user, due_date=due_date
+        )
+        _refresh_activity_on_commit(user.pk)
+    return borrowing
+
+
+def return_borrowing(borrowing, notes=None):
+    """Return a borrowed book and hand the copy to the reservation queue."""
+    now = timezone.now()
+    changes = {'status': 'returned', 'returned_date': now, 'updated_at': now}
+    if notes:
+        changes['notes'] = notes
+    with transaction.atomic():
+        returned = Borrowing.objects.filter(
+            pk=borrowing.pk, status__in=ACTIVE_BORROWING
+        ).update(**changes)
+        if not returned:
+            raise InventoryError("This borrowing is not active")
+        hand_on_copy(borrowing.book_id)
+        _refresh_activity_on_commit(borrowing.borrower_id)
+    borrowing.refresh_from_db()
+    return borrowing
+
+
+def mark_lost(borrowing):
+    """Write off a borrowed copy: the title loses one copy for good."""
+    with transaction.atomic():
+        lost = Borrowing.objects.filter(
+            pk=borrowing.pk, status__in=ACTIVE_BORROWING
+        ).update(status='lost', updated_at=timezone.now())
+        if not lost:
+            raise InventoryError("This borrowing is not active")
+        Book.objects.filter(pk=borrowing.book_id, total_copies__gt=0).update(
+            total_copies=F('total_copies') - 1, updated_at=timezone.now()
+        )
+        _refresh_activity_on_commit(borrowing.borrower_id)
+    borrowing.refresh_from_db()
+    return borrowing
+
+
+def reserve(book_id, user, expiry_date):
+    """
+    Join the reservation queue for a book.
+
+    When nobody is queued and a copy is on the shelf the copy is held
+    immediately and the reservation starts ``ready``.
+    """
+    with transaction.atomic():
+        if Reservation.objects.filter(
+            book_id=book_id, user=user, status__in=('pending', 'ready')
+        ).exists():
+            raise InventoryError(
+                "You already have a pending reservation for this book"
+            )
+
+        queued = Reservation.objects.filter(
+            book_id=book_id, status='pending'
+        ).exists()
+        now = timezone.now()
+        if not queued and take_copy(book_id):
+            return Reservation.objects.create(
+                book_id=book_id, user=user, status='ready', ready_at=now,
+                expiry_date=now + _hold_window(),
+            )
+        return Reservation.objects.create(
+            book_id=book_id, user=user, expiry_date=expiry_date
+        )
+
+
+def cancel_reservation(reservation):
+    """Cancel a reservation, passing on its held copy if it had one."""
+    with transaction.atomic():
+        was_ready = Reservation.objects.filter(
+            pk=reservation.pk, status='ready'
+        ).update(status='cancelled', updated_at=timezone.now())
+        if not was_ready and not Reservation.objects.filter(
+            pk=reservation.pk, status='pending'
+        ).update(status='cancelled', updated_at=timezone.now()):
+            raise InventoryError("Only pending or ready reservations can be cancelled")
+        if was_ready:
+            hand_on_copy(reservation.book_id)
+    reservation.refresh_from_db()
+    return reservation
+
+
+def expire_holds():
+    """Expire ``ready`` reservations nobody collected and pass the copies on."""
+    now = timezone.now()
+    expired = list(
+        Reservation.objects.filter(status='ready', expiry_date__lte=now)
+        .values_list('id', 'book_id')
+    )
+    handed = 0
+    for reservation_id, book_id in expired:
+        with transaction.atomic():
+            if Reservation.objects.filter(
+                pk=reservation_id, status='ready'
+            ).update(status='expired', updated_at=now):
+                hand_on_copy(book_id)
+                handed += 1
+    return handed
+
+
+def reconcile(book_ids=None):
+    """
+    Recompute ``available_copies`` as total copies minus active
+    borrowings and held reservations, fixing books that drifted.
+    Returns the number of books corrected.
+    """
+    books = Book.objects.annotate(
+        on_loan=Count(
+            'borrowings', filter=Q(borrowings__status__in=ACTIVE_BORROWING),
+            distinct=True,
+        ),
+        on_hold=Count(
+            'reservations', filter=Q(reservations__status='ready'),
+            distinct=True,
+        ),
+    )
+    if book_ids is not None:
+        books = books.filter(pk__in=book_ids)
+
+    drifted = []
+    for book in books.only('id', 'total_copies', 'available_copies', 'status'):
+        expected = max(book.total_copies - book.on_loan - book.on_hold, 0)
+        if book.available_copies != expected:
+            logger.warning(
+                f"Book {book.pk} available_copies drifted: "
+                f"{book.available_copies} -> {expected}"
+            )
+            book.available_copies = expected
+            if book.status not in MANUAL_BOOK_STATUSES:
+                book.status = 'available' if expected else 'borrowed'
+            drifted.append(book)
+
+    Book.objects.bulk_update(
+        drifted, ['available_copies', 'status'], batch_size=500
+    )
+    return len(drifted)
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:07
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_user_admin_institutes_user_admin_level_and_more'),
+        ('library', '0002_reservation_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BorrowerActivity',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='library_activity', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total_borrowings', models.PositiveIntegerField(default=0)),
+                ('active_borrowings', models.PositiveIntegerField(default=0)),
+                ('overdue_borrowings', models.PositiveIntegerField(default=0)),
+                ('total_fines', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('pending_fines', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('refreshed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Borrower Activity',
+                'verbose_name_plural': 'Borrower Activity',
+            },
+        ),
+    ]
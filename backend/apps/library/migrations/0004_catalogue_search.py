@@ -0,0 +1,79 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:11
+
+from django.db import migrations
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS library_book_fts USING fts5(
+        title, author, publisher, isbn, description,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS library_book_fts_vocab
+    USING fts5vocab(library_book_fts, 'row')
+    """,
+    """
+    INSERT INTO library_book_fts (rowid, title, author, publisher, isbn, description)
+    SELECT b.id, b.title, a.name, b.publisher, b.isbn, b.description
+    FROM library_book b JOIN library_author a ON a.id = b.author_id
+    """,
+]
+SQLITE_BACKWARD = [
+    "DROP TABLE IF EXISTS library_book_fts_vocab",
+    "DROP TABLE IF EXISTS library_book_fts",
+]
+
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    CREATE TABLE IF NOT EXISTS library_book_search (
+        book_id bigint PRIMARY KEY
+            REFERENCES library_book (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED,
+        document tsvector NOT NULL,
+        words text NOT NULL
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS library_book_search_document
+    ON library_book_search USING GIN (document)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS library_book_search_words
+    ON library_book_search USING GIN (words gin_trgm_ops)
+    """,
+    """
+    INSERT INTO library_book_search (book_id, document, words)
+    SELECT b.id,
+           setweight(to_tsvector('simple', b.title), 'A')
+           || setweight(to_tsvector('simple', a.name), 'A')
+           || setweight(to_tsvector('simple', b.isbn || ' ' || b.publisher), 'B')
+           || setweight(to_tsvector('simple', b.description), 'D'),
+           lower(b.title || ' ' || a.name)
+    FROM library_book b JOIN library_author a ON a.id = b.author_id
+    """,
+]
+POSTGRES_BACKWARD = [
+    "DROP TABLE IF EXISTS library_book_search",
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0003_borrower_activity'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD}),
+            _run({'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRES_BACKWARD}),
+        ),
+    ]
@@ -15,6 +15,10 @@ class Category(models.Model):
     """Book category model"""
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
+    parent = models.ForeignKey(
+        'self', on_delete=models.CASCADE, null=True, blank=True,
+        related_name='children'
+    )
     color = models.CharField(max_length=7, default="#3B82F6", help_text="Hex color code")
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -136,30 +140,20 @@ class Borrowing(models.Model):
             raise ValidationError(_("Due date must be after borrowed date"))
 
     def save(self, *args, **kwargs):
-        if not self.pk:  # New borrowing
-            # Update book availability
-            self.book.available_copies -= 1
-            if self.book.available_copies == 0:
-                self.book.status = 'borrowed'
-            self.book.save()
-        
+        # Copies are taken and returned through apps.library.inventory,
+        # which keeps Book.available_copies in step with conditional
+        # UPDATEs; saving a borrowing never touches the book.
+
         # Check if overdue
         if self.status == 'borrowed' and timezone.now() > self.due_date:
             self.status = 'overdue'
         
         super().save(*args, **kwargs)
 
-    def return_book(self):
+    def return_book(self, notes=None):
         """Return the borrowed book"""
-        self.status = 'returned'
-        self.returned_date = timezone.now()
-        self.save()
-        
-        # Update book availability
-        self.book.available_copies += 1
-        if self.book.status == 'borrowed':
-            self.book.status = 'available'
-        self.book.save()
+        from .inventory import return_borrowing
+        return return_borrowing(self, notes=notes)
 
     @property
     def is_overdue(self):
@@ -176,6 +170,7 @@ class Reservation(models.Model):
     """Book reservation model"""
     STATUS_CHOICES = [
         ('pending', _('Pending')),
+        ('ready', _('Ready for Pickup')),
         ('fulfilled', _('Fulfilled')),
         ('cancelled', _('Cancelled')),
         ('expired', _('Expired')),
@@ -186,6 +181,7 @@ class Reservation(models.Model):
     reserved_date = models.DateTimeField(auto_now_add=True)
     expiry_date = models.DateTimeField()
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    ready_at = models.DateTimeField(null=True, blank=True, help_text="When a copy was set aside")
     notes = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -199,7 +195,8 @@ class Reservation(models.Model):
         return f"{self.book.title} - {self.user.get_full_name()}"
 
     def clean(self):
-        if self.expiry_date <= self.reserved_date:
+        # reserved_date is only filled in by auto_now_add on insert
+        if self.expiry_date <= (self.reserved_date or timezone.now()):
             raise ValidationError(_("Expiry date must be after reserved date"))
 
     def save(self, *args, **kwargs):
@@ -268,6 +265,24 @@ class Fine(models.Model):
         self.save()
 
 
+class BorrowerActivity(models.Model):
+    """Per-borrower library counters, maintained by apps.library.activity"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='library_activity')
+    total_borrowings = models.PositiveIntegerField(default=0)
+    active_borrowings = models.PositiveIntegerField(default=0)
+    overdue_borrowings = models.PositiveIntegerField(default=0)
+    total_fines = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    pending_fines = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    refreshed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = _("Borrower Activity")
+        verbose_name_plural = _("Borrower Activity")
+
+    def __str__(self):
+        return f"Library activity - {self.user}"
+
+
 class LibrarySettings(models.Model):
     """Library settings model"""
     max_books_per_user = models.PositiveIntegerField(default=5)
@@ -0,0 +1,316 @@
+"""
+Catalogue search.
+
+Books are indexed into a full-text index over title, author, publisher,
+ISBN and description: a weighted ``tsvector`` table with GIN indexes on
+PostgreSQL, an FTS5 virtual table on SQLite. Matches are ranked by the
+engine (``bm25`` on SQLite, length-normalised ``ts_rank_cd`` on
+PostgreSQL) and misspelt terms are recovered with trigram similarity
+(``pg_trgm`` on PostgreSQL, the FTS5 vocabulary scored in Python on
+SQLite). Facet counts by category, language and availability come back
+from one UNION query over the matching books.
+
+The index is kept current by the ``Book``/``Author`` signals and rebuilt
+nightly, which also picks up changes made with ``QuerySet.update``.
+"""
+import logging
+import re
+
+from django.db import connection, transaction
+from django.db.models import (
+    Case, CharField, Count, F, IntegerField, Q, Value, When,
+)
+from django.db.models.functions import Cast
+
+from .models import Author, Book
+
+logger = logging.getLogger(__name__)
+
+SQLITE_TABLE = 'library_book_fts'
+SQLITE_VOCAB = 'library_book_fts_vocab'
+POSTGRES_TABLE = 'library_book_search'
+
+# Column weights for bm25: title, author, publisher, isbn, description.
+BM25_WEIGHTS = (10.0, 6.0, 2.0, 8.0, 1.0)
+MAX_CANDIDATES = 500
+# Typo recovery only kicks in when exact matching finds fewer hits.
+FUZZY_BELOW = 5
+TRIGRAM_THRESHOLD = 0.3
+FUZZY_TERMS_PER_TOKEN = 5
+
+AVAILABLE = Q(available_copies__gt=0, status='available')
+FACETS = ('category', 'language', 'availability')
+
+
+def tokenize(text):
+    return re.findall(r'\w+', (text or '').lower())
+
+
+def trigrams(word):
+    """``pg_trgm``-style trigrams of a word, padded with two leading blanks."""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(a, b):
+    ta, tb = trigrams(a), trigrams(b)
+    return len(ta & tb) / len(ta | tb)
+
+
+# Indexing
+
+def _sqlite_index(cursor, book_ids):
+    placeholders = ', '.join(['%s'] * len(book_ids))
+    cursor.execute(
+        f"DELETE FROM {SQLITE_TABLE} WHERE rowid IN ({placeholders})", book_ids
+    )
+    cursor.execute(
+        f"""
+        INSERT INTO {SQLITE_TABLE} (rowid, title, author, publisher, isbn, description)
+        SELECT b.id, b.title, a.name, b.publisher, b.isbn, b.description
+        FROM {Book._meta.db_table} b
+        JOIN {Author._meta.db_table} a ON a.id = b.author_id
+        WHERE b.id IN ({placeholders})
+        """,
+        book_ids,
+    )
+
+
+def _postgres_index(cursor, book_ids):
+    cursor.execute(
+        f"DELETE FROM {POSTGRES_TABLE} WHERE book_id = ANY(%s)", [book_ids]
+    )
+    cursor.execute(
+        f"""
+        INSERT INTO {POSTGRES_TABLE} (book_id, document, words)
+        SELECT b.id,
+               setweight(to_tsvector('simple', b.title), 'A')
+               || setweight(to_tsvector('simple', a.name), 'A')
+               || setweight(to_tsvector('simple', b.isbn || ' ' || b.publisher), 'B')
+               || setweight(to_tsvector('simple', b.description), 'D'),
+               lower(b.title || ' ' || a.name)
+        FROM {Book._meta.db_table} b
+        JOIN {Author._meta.db_table} a ON a.id = b.author_id
+        WHERE b.id = ANY(%s)
+        """,
+        [book_ids],
+    )
+
+
+def index_books(book_ids):
+    """(Re)index the given books; ids of deleted books are dropped."""
+    book_ids = [int(pk) for pk in book_ids]
+    if not book_ids:
+        return
+    with transaction.atomic(), connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            _sqlite_index(cursor, book_ids)
+        elif connection.vendor == 'postgresql':
+            _postgres_index(cursor, book_ids)
+
+
+def rebuild_index(batch_size=1000):
+    """Reindex the whole catalogue. Returns the number of books indexed."""
+    ids = list(Book.objects.order_by('pk').values_list('pk', flat=True))
+    if connection.vendor in ('sqlite', 'postgresql'):
+        table = SQLITE_TABLE if connection.vendor == 'sqlite' else POSTGRES_TABLE
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {table}")
+    for start in range(0, len(ids), batch_size):
+        index_books(ids[start:start + batch_size])
+    logger.info(f"Catalogue search index rebuilt for {len(ids)} books")
+    return len(ids)
+
+
+# Matching
+
+def _fts5_phrase(term, prefix=False):
+    return '"' + term.replace('"', '""') + '"' + ('*' if prefix else '')
+
+
+def _sqlite_match(cursor, expression, limit):
+    weights = ', '.join(str(w) for w in BM25_WEIGHTS)
+    cursor.execute(
+        f"""
+        SELECT rowid FROM {SQLITE_TABLE}
+        WHERE {SQLITE_TABLE} MATCH %s
+        ORDER BY bm25({SQLITE_TABLE}, {weights})
+        LIMIT %s
+        """,
+        [expression, limit],
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def _similar_terms(cursor, token):
+    """Indexed terms within trigram similarity of a (possibly misspelt) token."""
+    cursor.execute(
+        f"SELECT term FROM {SQLITE_VOCAB} WHERE length(term) BETWEEN %s AND %s",
+        [max(len(token) - 2, 1), len(token) + 2],
+    )
+    scored = sorted(
+        (
+            (similarity(token, term), term)
+            for (term,) in cursor.fetchall()
+            if term != token
+        ),
+        reverse=True,
+    )
+    return [
+        term for score, term in scored[:FUZZY_TERMS_PER_TOKEN]
+        if score >= TRIGRAM_THRESHOLD
+    ]
+
+
+def _sqlite_candidates(tokens, limit):
+    with connection.cursor() as cursor:
+        exact = ' '.join(
+            _fts5_phrase(token, prefix=i == len(tokens) - 1)
+            for i, token in enumerate(tokens)
+        )
+        ids = _sqlite_match(cursor, exact, limit)
+        if len(ids) >= FUZZY_BELOW:
+            return ids
+
+        groups = []
+        for i, token in enumerate(tokens):
+            alternatives = [_fts5_phrase(token, prefix=i == len(tokens) - 1)]
+            alternatives += [_fts5_phrase(term) for term in _similar_terms(cursor, token)]
+            groups.append('(' + ' OR '.join(alternatives) + ')')
+        seen = set(ids)
+        ids += [
+            pk for pk in _sqlite_match(cursor, ' AND '.join(groups), limit)
+            if pk not in seen
+        ]
+    return ids[:limit]
+
+
+def _postgres_candidates(query, limit):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT s.book_id
+            FROM {POSTGRES_TABLE} s, websearch_to_tsquery('simple', %s) q
+            WHERE s.document @@ q
+            ORDER BY ts_rank_cd('{{0.1, 0.2, 0.4, 1.0}}', s.document, q, 1 | 32) DESC
+            LIMIT %s
+            """,
+            [query, limit],
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+        if len(ids) >= FUZZY_BELOW:
+            return ids
+
+        cursor.execute(
+            f"""
+            SELECT book_id FROM {POSTGRES_TABLE}
+            WHERE %s <%% words
+            ORDER BY word_similarity(%s, words) DESC
+            LIMIT %s
+            """,
+            [query.lower(), query.lower(), limit],
+        )
+        seen = set(ids)
+        ids += [row[0] for row in cursor.fetchall() if row[0] not in seen]
+    return ids[:limit]
+
+
+def _fallback_candidates(tokens, limit):
+    condition = Q()
+    for token in tokens:
+        condition &= (
+            Q(title__icontains=token) | Q(author__name__icontains=token)
+            | Q(publisher__icontains=token) | Q(isbn__icontains=token)
+            | Q(description__icontains=token)
+        )
+    return list(Book.objects.filter(condition).values_list('pk', flat=True)[:limit])
+
+
+def candidates(query, limit=MAX_CANDIDATES):
+    """Ids of the books matching ``query``, best match first."""
+    tokens = tokenize(query)
+    if not tokens:
+        return []
+    if connection.vendor == 'sqlite':
+        return _sqlite_candidates(tokens, limit)
+    if connection.vendor == 'postgresql':
+        return _postgres_candidates(query, limit)
+    return _fallback_candidates(tokens, limit)
+
+
+# Filtering and facets
+
+def _filter(books, filters, skip=None):
+    if filters.get('category') is not None and skip != 'category':
+        books = books.filter(category_id=filters['category'])
+    if filters.get('language') and skip != 'language':
+        books = books.filter(language__iexact=filters['language'])
+    if filters.get('available') is not None and skip != 'availability':
+        books = books.filter(AVAILABLE) if filters['available'] else books.exclude(AVAILABLE)
+    if filters.get('author') is not None:
+        books = books.filter(author_id=filters['author'])
+    return books
+
+
+def _facet_branch(books, facet):
+    if facet == 'category':
+        key = Cast('category_id', CharField())
+        label = F('category__name')
+    elif facet == 'language':
+        key = label = F('language')
+    else:
+        key = label = Case(
+            When(AVAILABLE, then=Value('available')),
+            default=Value('unavailable'),
+        )
+    return books.order_by().annotate(
+        facet=Value(facet, output_field=CharField()),
+        key=key,
+        label=label,
+    ).values('facet', 'key', 'label').annotate(count=Count('pk'))
+
+
+def facet_counts(books, filters):
+    """
+    Counts per category, language and availability over ``books``. Each
+    facet ignores its own filter so the other values stay selectable.
+    """
+    branches = [
+        _facet_branch(_filter(books, filters, skip=facet), facet)
+        for facet in FACETS
+    ]
+    facets = {facet: [] for facet in FACETS}
+    for row in branches[0].union(*branches[1:], all=True):
+        facets[row['facet']].append(
+            {'key': row['key'], 'label': row['label'], 'count': row['count']}
+        )
+    for values in facets.values():
+        values.sort(key=lambda value: (-value['count'], str(value['label'])))
+    return facets
+
+
+def search(query, **filters):
+    """
+    Search the catalogue.
+
+    Returns the matching active books ordered by relevance (or by title
+    when ``query`` is blank) and their facet counts.
+    """
+    books = Book.objects.filter(is_active=True)
+    if tokenize(query):
+        ids = candidates(query)
+        if not ids:
+            return books.none(), {facet: [] for facet in FACETS}
+        books = books.filter(pk__in=ids).annotate(
+            relevance=Case(
+                *[When(pk=pk, then=Value(position)) for position, pk in enumerate(ids)],
+                output_field=IntegerField(),
+            )
+        )
+        ordering = ['relevance']
+    else:
+        ordering = ['title']
+
+    facets = facet_counts(books, filters)
+    results = _filter(books, filters).select_related('author', 'category')
+    return results.order_by(*ordering), facets
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.utils import timezone
 from django.core.exceptions import ValidationError
+from core.trees import descendant_ids
 from .models import (
     Category, Author, Book, Borrowing, Reservation, Fine, LibrarySettings
 )
@@ -12,14 +13,25 @@ class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = [
-            'id', 'name', 'description', 'color', 'is_active',
+            'id', 'name', 'description', 'parent', 'color', 'is_active',
             'book_count', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
     def get_book_count(self, obj):
+        if hasattr(obj, 'book_count'):
+            return obj.book_count
         return obj.books.count()
 
+    def validate_parent(self, value):
+        if value and self.instance and value.pk in descendant_ids(
+            Category, self.instance.pk
+        ):
+            raise ValidationError(
+                "A category cannot be placed under itself or its subcategories"
+            )
+        return value
+
 
 class AuthorSerializer(serializers.ModelSerializer):
     book_count = serializers.SerializerMethodField()
@@ -90,9 +102,10 @@ class BorrowingSerializer(serializers.ModelSerializer):
             'due_date', 'returned_date', 'status', 'notes', 'is_overdue',
             'days_overdue', 'created_at', 'updated_at'
         ]
+        # Status moves only through the inventory (return_book, mark_lost)
         read_only_fields = [
-            'id', 'borrowed_date', 'returned_date', 'created_at', 'updated_at',
-            'is_overdue', 'days_overdue'
+            'id', 'borrowed_date', 'returned_date', 'status', 'created_at',
+            'updated_at', 'is_overdue', 'days_overdue'
         ]
 
     def validate(self, data):
@@ -101,6 +114,35 @@ class BorrowingSerializer(serializers.ModelSerializer):
                 raise ValidationError("Due date must be in the future")
         return data
 
+    def create(self, validated_data):
+        """Lend through the inventory so the copy is taken atomically"""
+        from django.contrib.auth import get_user_model
+        from .inventory import InventoryError, borrow
+
+        if 'due_date' not in validated_data:
+            raise serializers.ValidationError({'due_date': 'This field is required.'})
+        borrower = get_user_model().objects.filter(
+            pk=validated_data['borrower_id']
+        ).first()
+        if borrower is None:
+            raise serializers.ValidationError({'borrower_id': 'User not found.'})
+        try:
+            borrowing = borrow(
+                validated_data['book_id'], borrower, validated_data['due_date']
+            )
+        except InventoryError as e:
+            raise serializers.ValidationError({'error': str(e)})
+        if validated_data.get('notes'):
+            Borrowing.objects.filter(pk=borrowing.pk).update(notes=validated_data['notes'])
+            borrowing.notes = validated_data['notes']
+        return borrowing
+
+    def update(self, instance, validated_data):
+        # The book and borrower of a loan are fixed once the copy is taken
+        validated_data.pop('book_id', None)
+        validated_data.pop('borrower_id', None)
+        return super().update(instance, validated_data)
+
 
 class BorrowingListSerializer(serializers.ModelSerializer):
     book = serializers.StringRelatedField()
@@ -227,11 +269,8 @@ class BorrowBookSerializer(serializers.Serializer):
     due_date = serializers.DateTimeField()
 
     def validate_book_id(self, value):
-        try:
-            book = Book.objects.get(id=value)
-            if not book.is_available:
-                raise ValidationError("Book is not available for borrowing")
-        except Book.DoesNotExist:
+        # Availability is checked atomically when the copy is taken.
+        if not Book.objects.filter(id=value).exists():
             raise ValidationError("Book not found")
         return value
 
@@ -274,3 +313,11 @@ class PayFineSerializer(serializers.Serializer):
 class WaiveFineSerializer(serializers.Serializer):
     fine_id = serializers.IntegerField()
     reason = serializers.CharField(max_length=500, required=False)
+
+
+class CatalogueSearchSerializer(serializers.Serializer):
+    q = serializers.CharField(max_length=200, required=False, allow_blank=True, default='')
+    category = serializers.IntegerField(required=False)
+    author = serializers.IntegerField(required=False)
+    language = serializers.CharField(max_length=50, required=False)
+    available = serializers.BooleanField(required=False, allow_null=True, default=None)
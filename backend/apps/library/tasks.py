@@ -0,0 +1,81 @@
+"""
+Celery tasks for library app.
+"""
+
+from celery import shared_task
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.mail import send_mail
+import logging
+
+from .activity import refresh_borrower_activity
+from .fines import borrower_digest, process_overdues
+from .inventory import expire_holds, reconcile
+from .search import rebuild_index
+
+User = get_user_model()
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def expire_reservation_holds():
+    """Release copies held for reservations that were never collected."""
+    handed = expire_holds()
+    logger.info(f"Expired {handed} uncollected reservation holds")
+    return f"Expired {handed} holds"
+
+
+@shared_task
+def reconcile_book_inventory():
+    """Repair drift between available copies and active loans/holds."""
+    corrected = reconcile()
+    return f"Corrected {corrected} books"
+
+
+@shared_task
+def rebuild_catalogue_search_index():
+    """Rebuild the catalogue search index from the book table."""
+    indexed = rebuild_index()
+    return f"Indexed {indexed} books"
+
+
+@shared_task
+def process_library_overdues():
+    """
+    Nightly overdue/fine batch; queues one digest email per affected
+    borrower.
+    """
+    result = process_overdues()
+    refresh_borrower_activity()
+    for user_id in result['notify_borrower_ids']:
+        send_library_digest.delay(user_id)
+    return (
+        f"{result['newly_overdue']} newly overdue, "
+        f"{result['fines_created']} fines created, "
+        f"{len(result['notify_borrower_ids'])} digests queued"
+    )
+
+
+@shared_task
+def send_library_digest(user_id):
+    """Send one borrower their overdue books and pending fines."""
+    try:
+        user = User.objects.get(id=user_id)
+    except User.DoesNotExist:
+        logger.error(f"Library digest: user {user_id} not found")
+        return None
+
+    digest = borrower_digest(user)
+    if digest is None or not user.email:
+        return None
+
+    subject, message = digest
+    send_mail(
+        subject,
+        message,
+        settings.DEFAULT_FROM_EMAIL,
+        [user.email],
+        fail_silently=False,
+    )
+    return f"Sent library digest to {user.email}"
@@ -0,0 +1,80 @@
+"""
+Query-count regression tests for the library user activity report: the
+report must cost the same number of queries however many borrowers
+there are.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.library.activity import refresh_borrower_activity
+from apps.library.models import Borrowing, Fine
+from apps.library.views import LibraryAnalyticsViewSet
+
+from .test_inventory import make_book, make_user
+
+User = get_user_model()
+
+
+class UserActivityQueryTests(TestCase):
+    def setUp(self):
+        self.staff = make_user('librarian', is_staff=True, is_superuser=True)
+        self.book = make_book(copies=100)
+        self.view = LibraryAnalyticsViewSet.as_view({'get': 'user_activity'})
+
+    def add_borrowers(self, count):
+        due = timezone.now() + timedelta(days=7)
+        for i in range(count):
+            user = make_user(f'borrower{User.objects.count()}')
+            Borrowing.objects.create(book=self.book, borrower=user, due_date=due)
+            overdue = Borrowing.objects.create(
+                book=self.book, borrower=user, due_date=due, status='returned'
+            )
+            # Fine.save recomputes the amount from the due date
+            Fine.objects.bulk_create([Fine(borrowing=overdue, amount=Decimal('2.50'))])
+
+    def get(self, **params):
+        request = APIRequestFactory().get('/api/library/analytics/user_activity/', params)
+        force_authenticate(request, self.staff)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.view(request)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_query_count_does_not_grow_with_borrowers(self):
+        self.add_borrowers(3)
+        _, few = self.get()
+        self.add_borrowers(15)
+        response, many = self.get()
+
+        self.assertEqual(few, many)
+        # One COUNT for the paginator and one grouped page query
+        self.assertLessEqual(many, 2)
+        self.assertEqual(response.data['count'], User.objects.count())
+
+    def test_aggregates_per_borrower(self):
+        self.add_borrowers(1)
+        response, _ = self.get()
+        row = next(r for r in response.data['results'] if r['total_borrowings'])
+        self.assertEqual(row['total_borrowings'], 2)
+        self.assertEqual(row['active_borrowings'], 1)
+        self.assertEqual(Decimal(str(row['total_fines'])), Decimal('2.50'))
+        self.assertEqual(Decimal(str(row['pending_fines'])), Decimal('2.50'))
+
+    def test_counter_table_reads_are_constant(self):
+        self.add_borrowers(3)
+        refresh_borrower_activity()
+        _, few = self.get(source='counters')
+        self.add_borrowers(15)
+        refresh_borrower_activity()
+        response, many = self.get(source='counters')
+
+        self.assertEqual(few, many)
+        self.assertLessEqual(many, 2)
+        self.assertTrue(any(r['total_borrowings'] == 2 for r in response.data['results']))
@@ -0,0 +1,53 @@
+"""
+Tests for the nightly overdue batch: past-due borrowings are flipped and
+fined, and a book returned late before the flip is still fined.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.library.fines import process_overdues
+from apps.library.inventory import borrow, return_borrowing
+from apps.library.models import Borrowing, Fine, LibrarySettings
+from apps.library.tests.test_inventory import make_book, make_user
+
+
+class ProcessOverduesTests(TestCase):
+    def setUp(self):
+        LibrarySettings.objects.create(daily_fine_rate=Decimal('2.00'))
+        self.reader = make_user('reader')
+
+    def borrow_days_ago(self, days, due_in_days=14):
+        borrowing = borrow(make_book().pk, self.reader, timezone.now() + timedelta(days=1))
+        Borrowing.objects.filter(pk=borrowing.pk).update(
+            due_date=timezone.now() - timedelta(days=days) + timedelta(days=due_in_days)
+        )
+        borrowing.refresh_from_db()
+        return borrowing
+
+    def test_overdue_borrowing_is_flipped_and_fined(self):
+        borrowing = self.borrow_days_ago(17)
+        result = process_overdues()
+        self.assertEqual(result['newly_overdue'], 1)
+        self.assertEqual(result['notify_borrower_ids'], [self.reader.pk])
+        borrowing.refresh_from_db()
+        self.assertEqual(borrowing.status, 'overdue')
+        self.assertEqual(borrowing.fine.amount, Decimal('6.00'))
+
+    def test_late_return_before_the_flip_is_fined(self):
+        borrowing = self.borrow_days_ago(17)
+        return_borrowing(borrowing)
+        result = process_overdues()
+        self.assertEqual(result['fines_created'], 1)
+        self.assertEqual(result['notify_borrower_ids'], [])
+        self.assertEqual(Fine.objects.get(borrowing=borrowing).amount, Decimal('6.00'))
+
+        self.assertEqual(process_overdues()['fines_created'], 0)
+        self.assertEqual(Fine.objects.get(borrowing=borrowing).amount, Decimal('6.00'))
+
+    def test_return_on_time_is_not_fined(self):
+        return_borrowing(self.borrow_days_ago(3))
+        process_overdues()
+        self.assertFalse(Fine.objects.exists())
@@ -0,0 +1,112 @@
+"""
+Tests for catalogue search: the full-text index created by the search
+migration ranks title hits first, recovers misspelt terms, follows book
+and author writes, and the facet counts ignore their own filter.
+"""
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.library.models import Author, Book, Category
+from apps.library.search import rebuild_index, search
+from apps.library.views import BookViewSet
+
+User = get_user_model()
+
+
+def titles(books):
+    return [book.title for book in books]
+
+
+class CatalogueSearchTests(TestCase):
+    def setUp(self):
+        self.science = Category.objects.create(name='Science')
+        self.fiction = Category.objects.create(name='Fiction')
+        self.lutz = Author.objects.create(name='Mark Lutz')
+        self.other = Author.objects.create(name='Ann Other')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.python = self.make_book('Learning Python', self.lutz, self.science)
+            self.snakes = self.make_book(
+                'Snakes of the World', self.other, self.science,
+                description='Field guide covering the python and the boa.',
+            )
+            self.novel = self.make_book(
+                'The Garden', self.other, self.fiction, language='French',
+                available_copies=0,
+            )
+
+    def make_book(self, title, author, category, **kwargs):
+        return Book.objects.create(
+            title=title, author=author, category=category,
+            isbn=f'978{Book.objects.count():010d}', **kwargs
+        )
+
+    def test_title_match_ranks_above_description_match(self):
+        books, _ = search('python')
+        self.assertEqual(titles(books), ['Learning Python', 'Snakes of the World'])
+
+    def test_author_and_prefix_match(self):
+        books, _ = search('lut')
+        self.assertEqual(titles(books), ['Learning Python'])
+
+    def test_misspelt_term_is_recovered(self):
+        books, _ = search('pythn')
+        self.assertIn('Learning Python', titles(books))
+
+    def test_no_match(self):
+        books, facets = search('astronomy')
+        self.assertEqual(list(books), [])
+        self.assertEqual(facets, {'category': [], 'language': [], 'availability': []})
+
+    def test_index_follows_book_and_author_writes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other.name = 'Rosa Gardner'
+            self.other.save()
+        books, _ = search('gardner')
+        self.assertCountEqual(titles(books), ['Snakes of the World', 'The Garden'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.novel.title = 'The Orchard'
+            self.novel.save()
+        books, _ = search('orchard')
+        self.assertEqual(titles(books), ['The Orchard'])
+
+    def test_rebuild_picks_up_bulk_updates(self):
+        Book.objects.filter(pk=self.python.pk).update(title='Programming Ruby')
+        self.assertEqual(list(search('ruby')[0]), [])
+
+        self.assertEqual(rebuild_index(), 3)
+        books, _ = search('ruby')
+        self.assertEqual(titles(books), ['Programming Ruby'])
+
+    def test_facets_ignore_their_own_filter(self):
+        books, facets = search('', category=self.fiction.pk)
+        self.assertEqual(titles(books), ['The Garden'])
+        self.assertEqual(
+            [(value['label'], value['count']) for value in facets['category']],
+            [('Science', 2), ('Fiction', 1)],
+        )
+        self.assertEqual(
+            [(value['key'], value['count']) for value in facets['language']],
+            [('French', 1)],
+        )
+        self.assertEqual(
+            [(value['key'], value['count']) for value in facets['availability']],
+            [('unavailable', 1)],
+        )
+
+    def test_search_endpoint(self):
+        request = APIRequestFactory().get(
+            '/api/library/books/search/', {'q': 'python', 'available': 'true'}
+        )
+        force_authenticate(request, user=User.objects.create(email='reader@example.com'))
+        response = BookViewSet.as_view({'get': 'search'})(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [book['title'] for book in response.data['results']],
+            ['Learning Python', 'Snakes of the World'],
+        )
+        self.assertEqual(
+            {value['key']: value['count'] for value in response.data['facets']['availability']},
+            {'available': 2},
+        )
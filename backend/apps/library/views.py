@@ -2,15 +2,19 @@ from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.settings import api_settings
+from django.contrib.auth import get_user_model
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Count, Sum, Q, Avg
+from django.db.models import Count, Sum, Q, Avg, OuterRef, Subquery, IntegerField
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.shortcuts import get_object_or_404
 from django.core.exceptions import ValidationError
 from datetime import timedelta
 
 from .models import (
-    Category, Author, Book, Borrowing, Reservation, Fine, LibrarySettings
+    Category, Author, Book, Borrowing, Reservation, Fine, LibrarySettings,
+    BorrowerActivity
 )
 from .serializers import (
     CategorySerializer, AuthorSerializer, BookSerializer, BookListSerializer,
@@ -19,8 +23,16 @@ from .serializers import (
     LibrarySettingsSerializer, LibraryDashboardSerializer,
     BookAnalyticsSerializer, UserLibraryActivitySerializer,
     BorrowBookSerializer, ReturnBookSerializer, ReserveBookSerializer,
-    PayFineSerializer, WaiveFineSerializer
+    PayFineSerializer, WaiveFineSerializer, CatalogueSearchSerializer
 )
+from .categories import category_tree
+from .activity import activity_queryset, refresh_borrower_activity
+from .inventory import (
+    InventoryError, borrow, cancel_reservation, mark_lost, reconcile, reserve
+)
+from .search import AVAILABLE, search as search_catalogue
+
+User = get_user_model()
 
 
 class CategoryViewSet(viewsets.ModelViewSet):
@@ -38,6 +50,29 @@ class CategoryViewSet(viewsets.ModelViewSet):
             return CategorySerializer
         return CategorySerializer
 
+    def get_queryset(self):
+        return super().get_queryset().annotate(
+            book_count=Coalesce(Subquery(
+                Book.objects.filter(category=OuterRef('pk')).order_by()
+                .values('category').annotate(count=Count('pk')).values('count'),
+                output_field=IntegerField()
+            ), 0)
+        )
+
+    @action(detail=False, methods=['get'])
+    def tree(self, request):
+        """Get the category tree with book counts (?root=<id> for a subtree)"""
+        root = request.query_params.get('root')
+        if root:
+            subtree = category_tree.subtree(root)
+            if subtree is None:
+                return Response(
+                    {"error": "Category not found"},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            return Response(subtree)
+        return Response(category_tree.snapshot())
+
     @action(detail=True, methods=['get'])
     def books(self, request, pk=None):
         """Get all books in a category"""
@@ -49,7 +84,7 @@ class CategoryViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def active(self, request):
         """Get only active categories"""
-        categories = self.queryset.filter(is_active=True)
+        categories = self.get_queryset().filter(is_active=True)
         serializer = self.get_serializer(categories, many=True)
         return Response(serializer.data)
 
@@ -100,10 +135,25 @@ class BookViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def available(self, request):
         """Get only available books"""
-        books = self.queryset.filter(is_available=True)
+        books = self.queryset.filter(AVAILABLE)
         serializer = BookListSerializer(books, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Ranked catalogue search with category, language and availability facets"""
+        serializer = CatalogueSearchSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = dict(serializer.validated_data)
+
+        books, facets = search_catalogue(params.pop('q'), **params)
+        page = self.paginate_queryset(books)
+        response = self.get_paginated_response(
+            BookListSerializer(page, many=True).data
+        )
+        response.data['facets'] = facets
+        return response
+
     @action(detail=False, methods=['get'])
     def popular(self, request):
         """Get most popular books by borrowing count"""
@@ -137,35 +187,19 @@ class BookViewSet(viewsets.ModelViewSet):
         
         if serializer.is_valid():
             try:
-                # Check if user can borrow more books
-                settings = LibrarySettings.objects.first()
-                if settings:
-                    user_borrowings = Borrowing.objects.filter(
-                        borrower=request.user,
-                        status__in=['borrowed', 'overdue']
-                    ).count()
-                    if user_borrowings >= settings.max_books_per_user:
-                        return Response(
-                            {"error": "You have reached the maximum number of books you can borrow"},
-                            status=status.HTTP_400_BAD_REQUEST
-                        )
-
-                # Create borrowing
-                borrowing = Borrowing.objects.create(
-                    book=book,
-                    borrower=request.user,
-                    due_date=serializer.validated_data['due_date']
+                borrowing = borrow(
+                    book.pk, request.user, serializer.validated_data['due_date']
                 )
-                
-                return Response(
-                    {"message": "Book borrowed successfully", "borrowing_id": borrowing.id},
-                    status=status.HTTP_201_CREATED
-                )
-            except Exception as e:
+            except InventoryError as e:
                 return Response(
                     {"error": str(e)},
                     status=status.HTTP_400_BAD_REQUEST
                 )
+
+            return Response(
+                {"message": "Book borrowed successfully", "borrowing_id": borrowing.id},
+                status=status.HTTP_201_CREATED
+            )
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -177,38 +211,38 @@ class BookViewSet(viewsets.ModelViewSet):
         
         if serializer.is_valid():
             try:
-                # Check if user already has a reservation for this book
-                existing_reservation = Reservation.objects.filter(
-                    book=book,
-                    user=request.user,
-                    status='pending'
-                ).first()
-                
-                if existing_reservation:
-                    return Response(
-                        {"error": "You already have a pending reservation for this book"},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-
-                # Create reservation
-                reservation = Reservation.objects.create(
-                    book=book,
-                    user=request.user,
-                    expiry_date=serializer.validated_data['expiry_date']
-                )
-                
-                return Response(
-                    {"message": "Book reserved successfully", "reservation_id": reservation.id},
-                    status=status.HTTP_201_CREATED
+                reservation = reserve(
+                    book.pk, request.user, serializer.validated_data['expiry_date']
                 )
-            except Exception as e:
+            except InventoryError as e:
                 return Response(
                     {"error": str(e)},
                     status=status.HTTP_400_BAD_REQUEST
                 )
+
+            return Response(
+                {
+                    "message": "Book reserved successfully",
+                    "reservation_id": reservation.id,
+                    "status": reservation.status,
+                },
+                status=status.HTTP_201_CREATED
+            )
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=['post'])
+    def reconcile(self, request):
+        """Recompute available copies from borrowings and holds (staff only)"""
+        if not request.user.is_staff:
+            return Response(
+                {"error": "Only staff can reconcile inventory"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        corrected = reconcile(request.data.get('book_ids'))
+        return Response({"corrected": corrected}, status=status.HTTP_200_OK)
+
 
 class BorrowingViewSet(viewsets.ModelViewSet):
     queryset = Borrowing.objects.all()
@@ -255,23 +289,43 @@ class BorrowingViewSet(viewsets.ModelViewSet):
         
         if serializer.is_valid():
             try:
-                borrowing.return_book()
-                if serializer.validated_data.get('notes'):
-                    borrowing.notes = serializer.validated_data['notes']
-                    borrowing.save()
-                
-                return Response(
-                    {"message": "Book returned successfully"},
-                    status=status.HTTP_200_OK
-                )
-            except Exception as e:
+                borrowing.return_book(notes=serializer.validated_data.get('notes'))
+            except InventoryError as e:
                 return Response(
                     {"error": str(e)},
                     status=status.HTTP_400_BAD_REQUEST
                 )
+
+            return Response(
+                {"message": "Book returned successfully"},
+                status=status.HTTP_200_OK
+            )
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=True, methods=['post'])
+    def mark_lost(self, request, pk=None):
+        """Write off a borrowed copy as lost (staff only)"""
+        if not request.user.is_staff:
+            return Response(
+                {"error": "Only staff can mark books as lost"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        borrowing = self.get_object()
+        try:
+            mark_lost(borrowing)
+        except InventoryError as e:
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(
+            {"message": "Borrowing marked as lost"},
+            status=status.HTTP_200_OK
+        )
+
 
 class ReservationViewSet(viewsets.ModelViewSet):
     queryset = Reservation.objects.all()
@@ -307,16 +361,15 @@ class ReservationViewSet(viewsets.ModelViewSet):
     def cancel(self, request, pk=None):
         """Cancel a reservation"""
         reservation = self.get_object()
-        
-        if reservation.status != 'pending':
+
+        try:
+            cancel_reservation(reservation)
+        except InventoryError as e:
             return Response(
-                {"error": "Only pending reservations can be cancelled"},
+                {"error": str(e)},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        reservation.status = 'cancelled'
-        reservation.save()
-        
         return Response(
             {"message": "Reservation cancelled successfully"},
             status=status.HTTP_200_OK
@@ -362,6 +415,7 @@ class FineViewSet(viewsets.ModelViewSet):
         if serializer.is_valid():
             try:
                 fine.pay_fine()
+                refresh_borrower_activity([fine.borrowing.borrower_id])
                 return Response(
                     {"message": "Fine paid successfully"},
                     status=status.HTTP_200_OK
@@ -392,6 +446,7 @@ class FineViewSet(viewsets.ModelViewSet):
                     request.user,
                     serializer.validated_data.get('reason', '')
                 )
+                refresh_borrower_activity([fine.borrowing.borrower_id])
                 return Response(
                     {"message": "Fine waived successfully"},
                     status=status.HTTP_200_OK
@@ -480,41 +535,39 @@ class LibraryAnalyticsViewSet(viewsets.ViewSet):
 
     @action(detail=False, methods=['get'])
     def user_activity(self, request):
-        """Get user library activity"""
-        users = request.user
+        """
+        Get user library activity.
+
+        Computed with one grouped query per page; ``?source=counters``
+        reads the precomputed ``BorrowerActivity`` table instead.
+        """
+        users = User.objects.filter(pk=request.user.pk)
         if request.user.is_staff:
-            # Staff can see all users
-            from django.contrib.auth import get_user_model
-            User = get_user_model()
+            # Staff can see all users of their tenant
             users = User.objects.all()
-
+            if not request.user.is_superuser:
+                users = users.filter(tenant=request.user.tenant)
+
+        if request.query_params.get('source') == 'counters':
+            rows = BorrowerActivity.objects.filter(user__in=users).select_related(
+                'user'
+            ).order_by('user__username')
+        else:
+            rows = activity_queryset(users).order_by('username')
+
+        paginator = api_settings.DEFAULT_PAGINATION_CLASS()
+        page = paginator.paginate_queryset(rows, request, view=self)
         data = []
-        for user in users:
-            total_borrowings = Borrowing.objects.filter(borrower=user).count()
-            active_borrowings = Borrowing.objects.filter(
-                borrower=user,
-                status__in=['borrowed', 'overdue']
-            ).count()
-            overdue_borrowings = Borrowing.objects.filter(
-                borrower=user,
-                status='overdue'
-            ).count()
-            total_fines = Fine.objects.filter(
-                borrowing__borrower=user
-            ).aggregate(total=Sum('amount'))['total'] or 0
-            pending_fines = Fine.objects.filter(
-                borrowing__borrower=user,
-                status='pending'
-            ).aggregate(total=Sum('amount'))['total'] or 0
-
+        for row in page:
+            user = row.user if isinstance(row, BorrowerActivity) else row
             data.append({
                 'user': user.get_full_name() or user.username,
-                'total_borrowings': total_borrowings,
-                'active_borrowings': active_borrowings,
-                'overdue_borrowings': overdue_borrowings,
-                'total_fines': total_fines,
-                'pending_fines': pending_fines
+                'total_borrowings': row.total_borrowings,
+                'active_borrowings': row.active_borrowings,
+                'overdue_borrowings': row.overdue_borrowings,
+                'total_fines': row.total_fines,
+                'pending_fines': row.pending_fines
             })
 
         serializer = UserLibraryActivitySerializer(data, many=True)
-        return Response(serializer.data)
+        return paginator.get_paginated_response(serializer.data)
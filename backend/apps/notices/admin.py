@@ -8,6 +8,8 @@ from .models import (
 )
 from django.utils import timezone
 
+from .delivery import queue_fan_out
+
 
 @admin.register(NoticeCategory)
 class NoticeCategoryAdmin(admin.ModelAdmin):
@@ -175,15 +177,27 @@ class NoticeAdmin(admin.ModelAdmin):
             obj.author = request.user
         super().save_model(request, obj, form, change)
     
+    def save_related(self, request, form, formsets, change):
+        """Fan published notices out once their target classes and users are saved"""
+        super().save_related(request, form, formsets, change)
+        published_now = not change or 'status' in form.changed_data
+        queue_fan_out(form.instance, push=published_now)
+    
+    def queue_fan_outs(self, notice_ids, push):
+        for notice in Notice.objects.filter(pk__in=notice_ids):
+            queue_fan_out(notice, push=push)
+    
     actions = ['approve_notices', 'reject_notices', 'mark_as_published', 'archive_notices']
     
     def approve_notices(self, request, queryset):
         """Approve selected notices"""
-        updated = queryset.filter(status='draft').update(
+        drafts = list(queryset.filter(status='draft').values_list('pk', flat=True))
+        updated = Notice.objects.filter(pk__in=drafts, status='draft').update(
             status='published',
             approved_by=request.user,
             approved_at=timezone.now()
         )
+        self.queue_fan_outs(drafts, push=True)
         self.message_user(
             request, 
             f'{updated} notices were successfully approved.'
@@ -205,7 +219,11 @@ class NoticeAdmin(admin.ModelAdmin):
     
     def mark_as_published(self, request, queryset):
         """Mark selected notices as published"""
-        updated = queryset.update(status='published')
+        published = set(queryset.filter(status='published').values_list('pk', flat=True))
+        notice_ids = list(queryset.values_list('pk', flat=True))
+        updated = Notice.objects.filter(pk__in=notice_ids).update(status='published')
+        self.queue_fan_outs(published, push=False)
+        self.queue_fan_outs(set(notice_ids) - published, push=True)
         self.message_user(
             request, 
             f'{updated} notices were marked as published.'
@@ -0,0 +1,239 @@
+"""
+Notice delivery.
+
+Audiences are resolved when a notice is published rather than when the
+notice board is read: the audience query runs once, and a
+``NoticeRecipient`` row is bulk-inserted for every user in it, in
+chunks handed to Celery. Each user's feed is then a read of their own
+inbox rows on the (user, is_read, created_at) index, with no joins
+through classes or target users and no ``DISTINCT``. Fan-out is
+idempotent: it only addresses users who do not have the notice yet,
+and the (notice, user) unique constraint covers concurrent runs.
+
+Audiences change after publication (new users, new student or guardian
+profiles, edited target users), so an hourly task fans every live
+notice out again and editing a published notice re-runs its fan-out.
+Users who leave an audience keep the notices already delivered to them.
+
+Push goes through the notification gateway: audiences that map onto
+gateway groups (everyone, a role, target classes) get one broadcast per
+group when the notice is published instead of one push per user;
+custom audiences are pushed to each user through the dispatcher.
+Re-running a fan-out does not broadcast again.
+"""
+import logging
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
+
+from apps.accounts import gateway
+from apps.accounts.notifications import notify
+
+from .models import Notice, NoticeRecipient
+
+User = get_user_model()
+
+logger = logging.getLogger(__name__)
+
+FAN_OUT_CHUNK_SIZE = 2000
+ROLE_GROUPS = {
+    'students': 'student',
+    'teachers': 'teacher',
+    'parents': 'parent',
+    'staff': 'staff',
+}
+
+
+def audience(notice):
+    """Active users a notice is addressed to."""
+    target = notice.target_audience
+    users = User.objects.filter(is_active=True)
+    if target == 'all':
+        return users
+    if target == 'students':
+        return users.filter(student_user__is_active=True)
+    if target == 'teachers':
+        return users.filter(teacher_user__isnull=False)
+    if target == 'parents':
+        return users.filter(guardian_profile__isnull=False)
+    if target == 'staff':
+        return users.filter(Q(is_staff=True) | Q(user_type='staff'))
+    if target in ('specific_class', 'specific_grade'):
+        # Grades are addressed through their classes.
+        return users.filter(
+            student_user__is_active=True,
+            student_user__current_class__in=notice.target_classes.all(),
+        )
+    if target == 'custom':
+        return users.filter(pk__in=notice.target_users.values('pk'))
+    return users.none()
+
+
+def audience_groups(notice):
+    """
+    Gateway groups covering a notice's audience, or ``None`` when it can
+    only be reached user by user.
+    """
+    target = notice.target_audience
+    if target == 'all':
+        return [gateway.EVERYONE_GROUP]
+    if target in ROLE_GROUPS:
+        return [gateway.role_group(ROLE_GROUPS[target])]
+    if target in ('specific_class', 'specific_grade'):
+        return [
+            gateway.class_group(class_id)
+            for class_id in notice.target_classes.values_list('pk', flat=True)
+        ]
+    return None
+
+
+def broadcast(notice, groups):
+    """Push a notice to its audience groups, one ``group_send`` each."""
+    payload = {
+        'notice': str(notice.pk),
+        'title': notice.title,
+        'summary': notice.summary,
+        'priority': notice.priority,
+    }
+    for group in groups:
+        gateway.broadcast(group, payload, event='notice', merge_key=f"notice:{notice.pk}")
+
+
+def live_notices():
+    """Published notices that have not expired, including scheduled ones."""
+    return Notice.objects.filter(status='published').exclude(
+        expiry_date__lt=timezone.now()
+    )
+
+
+def undelivered(notice):
+    """Ids of the notice's audience who do not have it in their inbox."""
+    delivered = NoticeRecipient.objects.filter(notice=notice, user=OuterRef('pk'))
+    return list(
+        audience(notice).filter(~Exists(delivered))
+        .order_by('pk').values_list('pk', flat=True).distinct()
+    )
+
+
+def fan_out(notice, push=False):
+    """
+    Resolve the part of a notice's audience that does not have it yet
+    and queue inbox rows for them in chunks. With ``push`` (the fan-out
+    on publishing) a group audience is also broadcast to. Returns the
+    number of users addressed.
+    """
+    from .tasks import deliver_notice_chunk
+
+    user_ids = undelivered(notice)
+    for start in range(0, len(user_ids), FAN_OUT_CHUNK_SIZE):
+        deliver_notice_chunk.delay(
+            str(notice.pk), user_ids[start:start + FAN_OUT_CHUNK_SIZE]
+        )
+    if push and notice.send_push:
+        groups = audience_groups(notice)
+        if groups is not None:
+            broadcast(notice, groups)
+    logger.info(f"Notice {notice.pk} fanned out to {len(user_ids)} users")
+    return len(user_ids)
+
+
+def deliver(notice_id, user_ids):
+    """
+    Insert inbox rows for ``user_ids``, skipping any already delivered,
+    and notify only the users whose rows this call created over the notice's push, email and SMS
+    channels.
+    """
+    notice = Notice.objects.get(pk=notice_id)
+    # Group audiences were pushed once by ``fan_out``
+    per_user_push = notice.send_push and audience_groups(notice) is None
+    with transaction.atomic():
+        delivered = set(
+            NoticeRecipient.objects.filter(
+                notice_id=notice_id, user_id__in=user_ids
+            ).values_list('user_id', flat=True)
+        )
+        rows = [
+            NoticeRecipient(notice_id=notice_id, user_id=user_id)
+            for user_id in user_ids if user_id not in delivered
+        ]
+        NoticeRecipient.objects.bulk_create(
+            rows, batch_size=FAN_OUT_CHUNK_SIZE, ignore_conflicts=True,
+        )
+        # A concurrent chunk may have inserted some of the same users
+        # since the read above; their rows were ignored, so only the
+        # primary keys generated here that exist were created by this call.
+        new = list(
+            NoticeRecipient.objects.filter(
+                pk__in=[row.pk for row in rows]
+            ).values_list('user_id', flat=True)
+        )
+        channels = [
+            channel for channel, enabled in (
+                ('push', per_user_push),
+                ('email', notice.send_email),
+                ('sms', notice.send_sms),
+            ) if enabled
+        ]
+        if new and channels:
+            # The inbox row is the in-app notification
+            notify(
+                new, notice.title, notice.summary or notice.content,
+                category='notice', priority=notice.priority,
+                channels=channels, data={'notice': str(notice.pk)},
+            )
+    return len(new)
+
+
+def refresh_audiences():
+    """Fan every live notice out to users who joined its audience since."""
+    return sum(fan_out(notice) for notice in live_notices())
+
+
+def queue_fan_out(notice, push=False):
+    """
+    Fan a published notice out once the publishing transaction commits.
+    Pass ``push`` when this call publishes it.
+    """
+    from .tasks import fan_out_notice
+
+    if notice.status == 'published':
+        transaction.on_commit(lambda: fan_out_notice.delay(str(notice.pk), push))
+
+
+def inbox(user):
+    """The user's delivered notices that are live now, newest first."""
+    now = timezone.now()
+    return NoticeRecipient.objects.filter(
+        user=user,
+        notice__status='published',
+        notice__publish_date__lte=now,
+    ).exclude(
+        notice__expiry_date__lt=now
+    ).select_related('notice', 'notice__category').order_by('-created_at')
+
+
+def mark_read(recipients):
+    """
+    Mark inbox rows read and add them to each notice's read count, with
+    one conditional UPDATE per notice so concurrent requests count each
+    read once. Returns the number of rows newly read.
+    """
+    by_notice = defaultdict(list)
+    for pk, notice_id in recipients.filter(is_read=False).values_list('pk', 'notice_id'):
+        by_notice[notice_id].append(pk)
+
+    now, read = timezone.now(), 0
+    with transaction.atomic():
+        for notice_id, pks in by_notice.items():
+            updated = NoticeRecipient.objects.filter(pk__in=pks, is_read=False).update(
+                is_read=True, read_at=now, updated_at=now
+            )
+            if updated:
+                Notice.objects.filter(pk=notice_id).update(
+                    read_count=F('read_count') + updated
+                )
+                read += updated
+    return read
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notices', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='noticerecipient',
+            index=models.Index(fields=['user', 'is_read', '-created_at'], name='notice_inbox_idx'),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:20
+
+from django.db import migrations
+from django.db.models import Q
+from django.utils import timezone
+
+
+def audience(User, notice):
+    """The audience rules of ``delivery.audience`` when inboxes were introduced."""
+    target = notice.target_audience
+    users = User.objects.filter(is_active=True)
+    if target == 'all':
+        return users
+    if target == 'students':
+        return users.filter(student_user__is_active=True)
+    if target == 'teachers':
+        return users.filter(teacher_user__isnull=False)
+    if target == 'parents':
+        return users.filter(guardian_profile__isnull=False)
+    if target == 'staff':
+        return users.filter(Q(is_staff=True) | Q(user_type='staff'))
+    if target in ('specific_class', 'specific_grade'):
+        return users.filter(
+            student_user__is_active=True,
+            student_user__current_class__in=notice.target_classes.all(),
+        )
+    if target == 'custom':
+        return users.filter(pk__in=notice.target_users.values('pk'))
+    return users.none()
+
+
+def backfill(apps, schema_editor):
+    """
+    Give every published, unexpired notice an inbox row per user in its
+    audience. These notices were already on the board, so nobody is
+    notified again.
+    """
+    Notice = apps.get_model('notices', 'Notice')
+    NoticeRecipient = apps.get_model('notices', 'NoticeRecipient')
+    User = apps.get_model('accounts', 'User')
+
+    live = Notice.objects.filter(status='published').exclude(
+        expiry_date__lt=timezone.now()
+    )
+    for notice in live:
+        user_ids = audience(User, notice).values_list('pk', flat=True).distinct()
+        NoticeRecipient.objects.bulk_create(
+            [NoticeRecipient(notice=notice, user_id=user_id) for user_id in user_ids],
+            batch_size=2000,
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notices', '0002_notice_inbox'),
+        ('accounts', '0004_notifications'),
+        ('classes', '0002_initial'),
+        ('guardians', '0001_initial'),
+        ('students', '0001_initial'),
+        ('teachers', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -241,6 +241,9 @@ class NoticeRecipient(models.Model):
         verbose_name = _('Notice Recipient')
         verbose_name_plural = _('Notice Recipients')
         unique_together = ['notice', 'user']
+        indexes = [
+            models.Index(fields=['user', 'is_read', '-created_at'], name='notice_inbox_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.get_full_name()} - {self.notice.title}"
@@ -248,12 +251,16 @@ class NoticeRecipient(models.Model):
     def mark_as_read(self):
         """Mark notice as read for this recipient"""
         if not self.is_read:
+            now = timezone.now()
+            # Conditional update so concurrent requests count a read once
+            if NoticeRecipient.objects.filter(pk=self.pk, is_read=False).update(
+                is_read=True, read_at=now, updated_at=now
+            ):
+                Notice.objects.filter(pk=self.notice_id).update(
+                    read_count=models.F('read_count') + 1
+                )
             self.is_read = True
-            self.read_at = timezone.now()
-            self.save()
-            # Update notice read count
-            self.notice.read_count += 1
-            self.notice.save(update_fields=['read_count'])
+            self.read_at = now
 
 
 class NoticeTemplate(models.Model):
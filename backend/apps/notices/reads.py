@@ -0,0 +1,97 @@
+"""
+Notice view tracking.
+
+Opening a notice must not cost a database write. Each view is added to
+a per-notice HyperLogLog of viewers in Redis; when that makes the
+estimate grow (a viewer not seen before) the notice's pending count in
+a shared hash is incremented. A periodic flush moves the pending counts
+into ``Notice.views_count`` with one ``F()``-based UPDATE, so
+``views_count`` counts distinct viewers and concurrent flushes can't
+lose increments. Reads (``NoticeRecipient.is_read``) are exact and are
+counted into ``read_count`` by the conditional updates in
+``delivery.mark_read``.
+
+Without Redis there is nothing to buffer in: a first view (tracked in
+Django's cache) adds one to ``views_count`` straight away with a
+conditional ``F()`` UPDATE, and the flush has nothing to do.
+"""
+import logging
+from django.core.cache import cache
+from django.db.models import Case, F, IntegerField, Value, When
+
+from core.redis import get_redis
+
+from .models import Notice
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = 'notices:views:pending'
+VIEWERS_TTL_SECONDS = 90 * 24 * 3600
+
+
+def _viewers_key(notice_id):
+    return f"notices:views:{notice_id}:viewers"
+
+
+def record_view(notice_id, user_id):
+    """Count ``user_id`` as a viewer of the notice, once per user."""
+    notice_id = str(notice_id)
+    client = get_redis()
+    if client is None:
+        # ``add`` only succeeds for a viewer not seen before
+        if cache.add(f"{_viewers_key(notice_id)}:{user_id}", True, VIEWERS_TTL_SECONDS):
+            Notice.objects.filter(pk=notice_id).update(views_count=F('views_count') + 1)
+        return
+    key = _viewers_key(notice_id)
+    with client.pipeline(transaction=False) as pipe:
+        pipe.pfadd(key, user_id)
+        pipe.expire(key, VIEWERS_TTL_SECONDS)
+        added, _ = pipe.execute()
+    if added:
+        client.hincrby(PENDING_KEY, notice_id, 1)
+
+
+def _take_pending():
+    client = get_redis()
+    if client is None:
+        return {}
+    with client.pipeline(transaction=True) as pipe:
+        pipe.hgetall(PENDING_KEY)
+        pipe.delete(PENDING_KEY)
+        pending, _ = pipe.execute()
+    return {notice_id: int(count) for notice_id, count in pending.items()}
+
+
+def _restore_pending(pending):
+    client = get_redis()
+    if client is None:
+        return
+    with client.pipeline(transaction=False) as pipe:
+        for notice_id, count in pending.items():
+            pipe.hincrby(PENDING_KEY, notice_id, count)
+        pipe.execute()
+
+
+def flush_views():
+    """
+    Add buffered viewer counts to ``Notice.views_count`` in one UPDATE.
+    Returns the number of notices updated.
+    """
+    pending = _take_pending()
+    if not pending:
+        return 0
+    try:
+        updated = Notice.objects.filter(pk__in=pending).update(
+            views_count=F('views_count') + Case(
+                *[When(pk=notice_id, then=Value(count))
+                  for notice_id, count in pending.items()],
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+        )
+    except Exception:
+        # Put the counts back for the next flush rather than lose them
+        _restore_pending(pending)
+        raise
+    logger.info(f"Flushed {sum(pending.values())} notice views to {updated} notices")
+    return updated
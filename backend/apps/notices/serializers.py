@@ -67,6 +67,36 @@ class NoticeRecipientSerializer(serializers.ModelSerializer):
         ]
 
 
+class NoticeInboxSerializer(serializers.ModelSerializer):
+    """Serializer for a user's notice feed, read from their inbox rows"""
+    
+    title = serializers.CharField(source='notice.title', read_only=True)
+    summary = serializers.CharField(source='notice.summary', read_only=True)
+    priority = serializers.CharField(source='notice.priority', read_only=True)
+    category_name = serializers.CharField(
+        source='notice.category.name', 
+        read_only=True
+    )
+    publish_date = serializers.DateTimeField(
+        source='notice.publish_date', 
+        read_only=True
+    )
+    expiry_date = serializers.DateTimeField(
+        source='notice.expiry_date', 
+        read_only=True
+    )
+    pin_to_top = serializers.BooleanField(source='notice.pin_to_top', read_only=True)
+    
+    class Meta:
+        model = NoticeRecipient
+        fields = [
+            'id', 'notice', 'title', 'summary', 'priority', 'category_name',
+            'publish_date', 'expiry_date', 'pin_to_top', 'is_read',
+            'read_at', 'created_at'
+        ]
+        read_only_fields = fields
+
+
 class NoticeTemplateSerializer(serializers.ModelSerializer):
     """Serializer for NoticeTemplate model"""
     
@@ -138,9 +168,10 @@ class NoticeSerializer(serializers.ModelSerializer):
     
     def get_read_percentage(self, obj):
         """Get read percentage"""
-        if obj.recipients.count() > 0:
-            read_count = obj.recipients.filter(is_read=True).count()
-            return round((read_count / obj.recipients.count()) * 100, 1)
+        # read_count is kept exact by the conditional read updates
+        recipients_count = obj.recipients.count()
+        if recipients_count > 0:
+            return round((obj.read_count / recipients_count) * 100, 1)
         return 0
 
 
@@ -148,15 +179,13 @@ class NoticeDetailSerializer(NoticeSerializer):
     """Detailed serializer for Notice model with related data"""
     
     attachments = NoticeAttachmentSerializer(many=True, read_only=True)
-    recipients = NoticeRecipientSerializer(many=True, read_only=True)
     target_classes = serializers.SerializerMethodField()
-    target_grades = serializers.SerializerMethodField()
     target_users = serializers.SerializerMethodField()
     
     class Meta(NoticeSerializer.Meta):
+        # Recipients are paged through the recipients endpoint
         fields = NoticeSerializer.Meta.fields + [
-            'attachments', 'recipients', 'target_classes', 
-            'target_grades', 'target_users'
+            'attachments', 'target_classes', 'target_users'
         ]
     
     def get_target_classes(self, obj):
@@ -164,11 +193,6 @@ class NoticeDetailSerializer(NoticeSerializer):
         from apps.classes.serializers import ClassSerializer
         return ClassSerializer(obj.target_classes.all(), many=True).data
     
-    def get_target_grades(self, obj):
-        """Get target grades data"""
-        from apps.classes.serializers import GradeSerializer
-        return GradeSerializer(obj.target_grades.all(), many=True).data
-    
     def get_target_users(self, obj):
         """Get target users data"""
         from apps.accounts.serializers import UserSerializer
@@ -182,7 +206,7 @@ class NoticeCreateSerializer(serializers.ModelSerializer):
         model = Notice
         fields = [
             'title', 'content', 'summary', 'category', 'priority', 
-            'status', 'target_audience', 'target_classes', 'target_grades',
+            'status', 'target_audience', 'target_classes',
             'target_users', 'publish_date', 'expiry_date', 
             'requires_approval', 'send_email', 'send_sms', 'send_push', 
             'pin_to_top'
@@ -218,7 +242,7 @@ class NoticeUpdateSerializer(serializers.ModelSerializer):
         model = Notice
         fields = [
             'title', 'content', 'summary', 'category', 'priority', 
-            'status', 'target_audience', 'target_classes', 'target_grades',
+            'status', 'target_audience', 'target_classes',
             'target_users', 'publish_date', 'expiry_date', 
             'requires_approval', 'send_email', 'send_sms', 'send_push', 
             'pin_to_top'
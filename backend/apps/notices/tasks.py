@@ -0,0 +1,49 @@
+"""
+Celery tasks for notices app.
+"""
+
+from celery import shared_task
+import logging
+
+from .delivery import deliver, fan_out, refresh_audiences
+from .models import Notice
+from .reads import flush_views
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def fan_out_notice(notice_id, push=False):
+    """Resolve a published notice's audience and queue its inbox rows."""
+    try:
+        notice = Notice.objects.get(pk=notice_id, status='published')
+    except Notice.DoesNotExist:
+        logger.warning(f"Notice {notice_id} is not published, skipping fan-out")
+        return "Notice not published"
+    addressed = fan_out(notice, push=push)
+    return f"Notice {notice_id} addressed to {addressed} users"
+
+
+@shared_task
+def refresh_notice_audiences():
+    """Deliver live notices to users who joined their audiences since publishing."""
+    addressed = refresh_audiences()
+    return f"Live notices addressed to {addressed} new users"
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=30)
+def deliver_notice_chunk(self, notice_id, user_ids):
+    """Insert one chunk of inbox rows; safe to retry."""
+    try:
+        delivered = deliver(notice_id, user_ids)
+    except Exception as e:
+        logger.error(f"Delivering notice {notice_id} failed, retrying: {e}")
+        raise self.retry(exc=e)
+    return f"Delivered notice {notice_id} to {delivered} users"
+
+
+@shared_task
+def flush_notice_views():
+    """Move buffered notice viewer counts into the notices table."""
+    updated = flush_views()
+    return f"Flushed views for {updated} notices"
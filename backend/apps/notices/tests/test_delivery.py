@@ -0,0 +1,218 @@
+"""
+Tests for notice delivery: a published notice lands in its audience's
+inboxes once, users who join an audience later get live notices on the
+next refresh, edits to a published notice reach added users and the
+inbox backfill covers notices published before inboxes existed.
+Group audiences are pushed with one broadcast per gateway group when a
+notice is published, and not again when it is fanned out later.
+"""
+import importlib
+from datetime import date, timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.apps import apps as django_apps
+from django.contrib import admin
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+
+from apps.academic_years.models import AcademicYear
+from apps.accounts import gateway
+from apps.classes.models import Class
+from apps.notices import tasks
+from apps.notices.admin import NoticeAdmin
+from apps.notices.delivery import (
+    deliver, fan_out, queue_fan_out, refresh_audiences,
+)
+from apps.notices.models import Notice, NoticeRecipient
+
+User = get_user_model()
+
+
+def make_user(username, **extra):
+    # No password: hashing one per fixture user slows the suite down
+    return User.objects.create_user(
+        username=username, email=f"{username}@example.com", **extra
+    )
+
+
+def make_notice(author, **fields):
+    fields.setdefault('status', 'published')
+    fields.setdefault('publish_date', timezone.now())
+    for channel in ('send_email', 'send_sms', 'send_push'):
+        fields.setdefault(channel, False)
+    return Notice.objects.create(
+        title='Sports day', content='Sports day is on Friday.', author=author, **fields
+    )
+
+
+def inbox_users(notice):
+    return set(
+        NoticeRecipient.objects.filter(notice=notice).values_list('user__username', flat=True)
+    )
+
+
+class DeliveryTestCase(TestCase):
+    def setUp(self):
+        self.author = make_user('author')
+        # Run the Celery tasks inline
+        for task in (tasks.fan_out_notice, tasks.deliver_notice_chunk):
+            patcher = mock.patch.object(task, 'delay', side_effect=task.run)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+class FanOutTests(DeliveryTestCase):
+    def test_notice_reaches_its_audience_once(self):
+        make_user('ana')
+        make_user('ben', is_active=False)
+        notice = make_notice(self.author)
+        self.assertEqual(fan_out(notice), 2)
+        self.assertEqual(inbox_users(notice), {'author', 'ana'})
+        self.assertEqual(fan_out(notice), 0)
+        self.assertEqual(NoticeRecipient.objects.filter(notice=notice).count(), 2)
+
+    def test_refresh_reaches_users_who_joined_later(self):
+        notice = make_notice(self.author)
+        expired = make_notice(
+            self.author, publish_date=timezone.now() - timedelta(days=10),
+            expiry_date=timezone.now() - timedelta(days=1),
+        )
+        fan_out(notice)
+        make_user('ana')
+        self.assertEqual(refresh_audiences(), 1)
+        self.assertEqual(inbox_users(notice), {'author', 'ana'})
+        self.assertEqual(inbox_users(expired), set())
+
+    def test_editing_a_published_notice_reaches_added_users(self):
+        # Published notices' audiences are edited in the admin; the API
+        # only allows pinning and expiry changes once a notice is out
+        ana, ben = make_user('ana'), make_user('ben')
+        notice = make_notice(self.author, target_audience='custom')
+        notice.target_users.set([ana])
+        fan_out(notice)
+
+        notice.target_users.add(ben)
+        request = RequestFactory().post('/admin/notices/notice/')
+        form = mock.Mock(instance=notice, changed_data=['target_users'])
+        with self.captureOnCommitCallbacks(execute=True):
+            NoticeAdmin(Notice, admin.site).save_related(request, form, [], True)
+        form.save_m2m.assert_called_once()
+        self.assertEqual(inbox_users(notice), {'ana', 'ben'})
+
+    def test_admin_publish_action_fans_out(self):
+        make_user('ana')
+        notice = make_notice(self.author, status='draft')
+        request = RequestFactory().post('/admin/notices/notice/')
+        model_admin = NoticeAdmin(Notice, admin.site)
+        with mock.patch.object(model_admin, 'message_user'):
+            with self.captureOnCommitCallbacks(execute=True):
+                model_admin.mark_as_published(request, Notice.objects.filter(pk=notice.pk))
+        self.assertEqual(inbox_users(notice), {'author', 'ana'})
+
+    def test_draft_is_not_fanned_out(self):
+        notice = make_notice(self.author, status='draft')
+        self.assertEqual(refresh_audiences(), 0)
+        self.assertEqual(inbox_users(notice), set())
+
+
+class DeliverTests(DeliveryTestCase):
+    def test_only_users_inserted_by_this_chunk_are_notified(self):
+        ana, ben = make_user('ana'), make_user('ben')
+        notice = make_notice(self.author, send_email=True)
+        bulk_create = NoticeRecipient.objects.bulk_create
+
+        def racing_bulk_create(rows, **kwargs):
+            # Another chunk delivers to Ana between the read and the insert
+            NoticeRecipient.objects.create(notice=notice, user=ana)
+            return bulk_create(rows, **kwargs)
+
+        with mock.patch('apps.notices.delivery.notify') as notify, \
+                mock.patch.object(NoticeRecipient.objects, 'bulk_create', racing_bulk_create):
+            self.assertEqual(deliver(str(notice.pk), [ana.pk, ben.pk]), 1)
+        self.assertEqual(notify.call_args.args[0], [ben.pk])
+        self.assertEqual(inbox_users(notice), {'ana', 'ben'})
+
+    def test_redelivery_notifies_nobody(self):
+        ana = make_user('ana')
+        notice = make_notice(self.author, send_email=True)
+        with mock.patch('apps.notices.delivery.notify') as notify:
+            deliver(str(notice.pk), [ana.pk])
+            self.assertEqual(deliver(str(notice.pk), [ana.pk]), 0)
+        notify.assert_called_once()
+
+
+class BackfillMigrationTests(DeliveryTestCase):
+    def backfill(self):
+        migration = importlib.import_module(
+            'apps.notices.migrations.0003_backfill_notice_inboxes'
+        )
+        migration.backfill(django_apps, None)
+
+    def test_live_notices_are_backfilled_without_notifying(self):
+        make_user('ana')
+        notice = make_notice(self.author, send_email=True)
+        scheduled = make_notice(self.author, publish_date=timezone.now() + timedelta(days=2))
+        expired = make_notice(
+            self.author, publish_date=timezone.now() - timedelta(days=10),
+            expiry_date=timezone.now() - timedelta(days=1),
+        )
+        with mock.patch('apps.notices.delivery.notify') as notify:
+            self.backfill()
+            self.backfill()
+        notify.assert_not_called()
+        self.assertEqual(inbox_users(notice), {'author', 'ana'})
+        self.assertEqual(inbox_users(scheduled), {'author', 'ana'})
+        self.assertEqual(inbox_users(expired), set())
+        self.assertEqual(NoticeRecipient.objects.count(), 4)
+
+
+class GroupPushTests(DeliveryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.layer = mock.Mock()
+        self.layer.group_send = mock.AsyncMock()
+        patcher = mock.patch.object(gateway, 'get_channel_layer', return_value=self.layer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def sent_groups(self):
+        return [call.args[0] for call in self.layer.group_send.call_args_list]
+
+    def test_publishing_broadcasts_to_each_class_group(self):
+        year = AcademicYear.objects.create(
+            name='2026', start_date=date(2026, 1, 1), end_date=date(2026, 12, 31)
+        )
+        classes = [
+            Class.objects.create(name=f'Class {code}', code=code, academic_year=year)
+            for code in ('7A', '7B')
+        ]
+        notice = make_notice(self.author, target_audience='specific_class', send_push=True)
+        notice.target_classes.set(classes)
+        with self.captureOnCommitCallbacks(execute=True):
+            queue_fan_out(notice, push=True)
+        self.assertEqual(
+            sorted(self.sent_groups()),
+            sorted(gateway.class_group(klass.pk) for klass in classes),
+        )
+        message = self.layer.group_send.call_args.args[1]
+        self.assertEqual(message['event'], 'notice')
+        self.assertEqual(message['payload']['notice'], str(notice.pk))
+
+    def test_role_audience_is_broadcast_once(self):
+        notice = make_notice(self.author, target_audience='teachers', send_push=True)
+        fan_out(notice, push=True)
+        self.assertEqual(self.sent_groups(), [gateway.role_group('teacher')])
+
+    def test_refan_and_disabled_push_do_not_broadcast(self):
+        fan_out(make_notice(self.author, send_push=True))
+        fan_out(make_notice(self.author, send_push=False), push=True)
+        self.layer.group_send.assert_not_called()
+
+    def test_custom_audience_is_not_broadcast(self):
+        notice = make_notice(self.author, target_audience='custom', send_push=True)
+        notice.target_users.set([make_user('ana')])
+        with mock.patch('apps.notices.delivery.notify') as notify:
+            fan_out(notice, push=True)
+        self.layer.group_send.assert_not_called()
+        self.assertEqual(notify.call_args.kwargs['channels'], ['push'])
@@ -0,0 +1,46 @@
+"""
+Tests for notice view tracking without Redis: a first view is counted
+straight into ``views_count`` and repeat views by the same user are not.
+"""
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.notices.models import Notice
+from apps.notices.reads import flush_views, record_view
+
+User = get_user_model()
+
+
+class RecordViewWithoutRedisTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch('apps.notices.reads.get_redis', return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.author = User.objects.create_user(username='author', email='author@example.com')
+        self.notice = Notice.objects.create(
+            title='Sports day', content='Sports day is on Friday.',
+            author=self.author, publish_date=timezone.now(), status='published',
+        )
+
+    def views(self):
+        self.notice.refresh_from_db()
+        return self.notice.views_count
+
+    def test_first_view_is_counted_immediately(self):
+        record_view(self.notice.pk, self.author.pk)
+        self.assertEqual(self.views(), 1)
+
+    def test_repeat_views_are_not_counted(self):
+        reader = User.objects.create_user(username='reader', email='reader@example.com')
+        record_view(self.notice.pk, self.author.pk)
+        record_view(self.notice.pk, self.author.pk)
+        record_view(self.notice.pk, reader.pk)
+        self.assertEqual(self.views(), 2)
+        # Nothing was buffered for the flush
+        self.assertEqual(flush_views(), 0)
+        self.assertEqual(self.views(), 2)
@@ -4,9 +4,12 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from django.utils import timezone
-from django.db.models import Count, Q, F
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
 
+from .delivery import inbox, mark_read, queue_fan_out
+from .reads import record_view
 from .models import (
     Notice, NoticeCategory, NoticeAttachment, 
     NoticeRecipient, NoticeTemplate
@@ -15,7 +18,7 @@ from .serializers import (
     NoticeSerializer, NoticeDetailSerializer, NoticeCreateSerializer,
     NoticeUpdateSerializer, NoticeApprovalSerializer, NoticeStatsSerializer,
     NoticeCategorySerializer, NoticeAttachmentSerializer,
-    NoticeRecipientSerializer, NoticeTemplateSerializer
+    NoticeRecipientSerializer, NoticeTemplateSerializer, NoticeInboxSerializer
 )
 
 User = get_user_model()
@@ -75,42 +78,25 @@ class NoticeViewSet(viewsets.ModelViewSet):
         if self.request.user.is_staff:
             return queryset
         
-        # For regular users, filter by target audience
-        user = self.request.user
-        user_type = self.get_user_type(user)
-        
-        if user_type == 'student':
-            return queryset.filter(
-                Q(target_audience='all') |
-                Q(target_audience='students') |
-                Q(target_audience='specific_class', target_classes__students=user) |
-                Q(target_audience='specific_grade', target_grades__students=user) |
-                Q(target_audience='custom', target_users=user)
-            ).distinct()
-        elif user_type == 'teacher':
-            return queryset.filter(
-                Q(target_audience='all') |
-                Q(target_audience='teachers') |
-                Q(target_audience='custom', target_users=user)
-            ).distinct()
-        elif user_type == 'parent':
-            return queryset.filter(
-                Q(target_audience='all') |
-                Q(target_audience='parents') |
-                Q(target_audience='custom', target_users=user)
-            ).distinct()
-        
-        return queryset.none()
-
-    def get_user_type(self, user):
-        """Determine user type"""
-        if hasattr(user, 'student'):
-            return 'student'
-        elif hasattr(user, 'teacher'):
-            return 'teacher'
-        elif hasattr(user, 'guardian'):
-            return 'parent'
-        return 'staff'
+        # Audiences are resolved into inbox rows when a notice is published
+        return queryset.filter(recipients__user=self.request.user)
+
+    def retrieve(self, request, *args, **kwargs):
+        response = super().retrieve(request, *args, **kwargs)
+        # Buffered in Redis and flushed to views_count periodically
+        record_view(kwargs[self.lookup_field], request.user.pk)
+        return response
+
+    def perform_create(self, serializer):
+        notice = serializer.save()
+        queue_fan_out(notice, push=True)
+
+    def perform_update(self, serializer):
+        was_published = serializer.instance.status == 'published'
+        notice = serializer.save()
+        # Also on edits to a published notice: users who joined its
+        # audience since get it, users who already have it are skipped
+        queue_fan_out(notice, push=not was_published)
 
     @action(detail=True, methods=['post'])
     def approve(self, request, pk=None):
@@ -129,6 +115,7 @@ class NoticeViewSet(viewsets.ModelViewSet):
                 notice.approved_by = request.user
                 notice.approved_at = timezone.now()
                 notice.save()
+                queue_fan_out(notice, push=True)
                 return Response({'message': 'Notice approved successfully'})
             else:
                 notice.status = 'draft'
@@ -210,26 +197,24 @@ class NoticeViewSet(viewsets.ModelViewSet):
             )
         
         queryset = self.get_queryset()
+        now = timezone.now()
         
-        stats = {
-            'total_notices': queryset.count(),
-            'published_notices': queryset.filter(status='published').count(),
-            'draft_notices': queryset.filter(status='draft').count(),
-            'expired_notices': queryset.filter(
-                expiry_date__lt=timezone.now()
-            ).count(),
-            'urgent_notices': queryset.filter(priority='urgent').count(),
-            'total_views': queryset.aggregate(
-                total=Count('views_count')
-            )['total'] or 0,
-            'total_reads': queryset.aggregate(
-                total=Count('read_count')
-            )['total'] or 0,
+        stats = queryset.aggregate(
+            total_notices=Count('id'),
+            published_notices=Count('id', filter=Q(status='published')),
+            draft_notices=Count('id', filter=Q(status='draft')),
+            expired_notices=Count('id', filter=Q(expiry_date__lt=now)),
+            urgent_notices=Count('id', filter=Q(priority='urgent')),
+            # Distinct viewers and readers, kept on each notice
+            total_views=Coalesce(Sum('views_count'), 0),
+            total_reads=Coalesce(Sum('read_count'), 0),
+        )
+        stats.update({
             'read_rate': 0,
             'notices_by_category': {},
             'notices_by_priority': {},
             'recent_notices': []
-        }
+        })
         
         # Calculate read rate
         if stats['total_views'] > 0:
@@ -238,7 +223,7 @@ class NoticeViewSet(viewsets.ModelViewSet):
             )
         
         # Notices by category
-        category_stats = queryset.values('category__name').annotate(
+        category_stats = queryset.order_by().values('category__name').annotate(
             count=Count('id')
         )
         stats['notices_by_category'] = {
@@ -247,7 +232,7 @@ class NoticeViewSet(viewsets.ModelViewSet):
         }
         
         # Notices by priority
-        priority_stats = queryset.values('priority').annotate(
+        priority_stats = queryset.order_by().values('priority').annotate(
             count=Count('id')
         )
         stats['notices_by_priority'] = {
@@ -284,35 +269,7 @@ class NoticeAttachmentViewSet(viewsets.ModelViewSet):
             return queryset
         
         # For regular users, filter by notice access
-        user = self.request.user
-        user_type = self.get_user_type(user)
-        
-        if user_type == 'student':
-            return queryset.filter(
-                notice__target_audience__in=['all', 'students'] |
-                Q(notice__target_audience='specific_class', 
-                  notice__target_classes__students=user) |
-                Q(notice__target_audience='specific_grade', 
-                  notice__target_grades__students=user) |
-                Q(notice__target_audience='custom', 
-                  notice__target_users=user)
-            ).distinct()
-        
-        return queryset.filter(
-            notice__target_audience__in=['all', user_type + 's'] |
-            Q(notice__target_audience='custom', 
-              notice__target_users=user)
-        ).distinct()
-
-    def get_user_type(self, user):
-        """Determine user type"""
-        if hasattr(user, 'student'):
-            return 'student'
-        elif hasattr(user, 'teacher'):
-            return 'teacher'
-        elif hasattr(user, 'guardian'):
-            return 'parent'
-        return 'staff'
+        return queryset.filter(notice__recipients__user=self.request.user)
 
 
 class NoticeRecipientViewSet(viewsets.ModelViewSet):
@@ -338,6 +295,26 @@ class NoticeRecipientViewSet(viewsets.ModelViewSet):
         # For regular users, show only their own recipients
         return queryset.filter(user=self.request.user)
 
+    @action(detail=False, methods=['get'])
+    def inbox(self, request):
+        """Current user's notice feed, optionally only unread (?is_read=false)"""
+        recipients = inbox(request.user)
+        is_read = request.query_params.get('is_read')
+        if is_read is not None:
+            recipients = recipients.filter(is_read=is_read.lower() == 'true')
+        
+        page = self.paginate_queryset(recipients)
+        if page is not None:
+            serializer = NoticeInboxSerializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = NoticeInboxSerializer(recipients, many=True)
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def unread_count(self, request):
+        """Number of unread notices in the current user's feed"""
+        return Response({'unread': inbox(request.user).filter(is_read=False).count()})
+
     @action(detail=True, methods=['post'])
     def mark_as_read(self, request, pk=None):
         """Mark recipient as read"""
@@ -355,12 +332,10 @@ class NoticeRecipientViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        recipients = self.get_queryset().filter(id__in=recipient_ids)
-        for recipient in recipients:
-            recipient.mark_as_read()
+        read = mark_read(self.get_queryset().filter(id__in=recipient_ids))
         
         return Response({
-            'message': f'{len(recipient_ids)} recipients marked as read'
+            'message': f'{read} recipients marked as read'
         })
 
 
@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.utils.html import format_html
 from .models import (
     Vehicle, Driver, Route, Trip, StudentTransport, TripPassenger,
-    MaintenanceRecord, FuelRecord, TransportSettings
+    MaintenanceRecord, FuelRecord, TransportSettings, StopLocation, RoutePlan
 )
 
 
@@ -39,6 +39,7 @@ class DriverAdmin(admin.ModelAdmin):
     list_filter = ['gender', 'status', 'is_active', 'license_type']
     search_fields = ['driver_id', 'full_name', 'phone', 'email', 'license_number']
     ordering = ['full_name']
+    raw_id_fields = ['user']
     readonly_fields = ['created_at', 'updated_at']
     
     def license_status(self, obj):
@@ -60,6 +61,24 @@ class RouteAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at', 'updated_at']
 
 
+@admin.register(StopLocation)
+class StopLocationAdmin(admin.ModelAdmin):
+    list_display = ['name', 'latitude', 'longitude']
+    search_fields = ['name', 'address']
+    ordering = ['name']
+    readonly_fields = ['created_at', 'updated_at']
+
+
+@admin.register(RoutePlan)
+class RoutePlanAdmin(admin.ModelAdmin):
+    list_display = [
+        'id', 'depot', 'status', 'route_count', 'student_count',
+        'total_distance_km', 'created_by', 'created_at'
+    ]
+    list_filter = ['status']
+    readonly_fields = ['result', 'completed_at', 'applied_at', 'created_at', 'updated_at']
+
+
 @admin.register(Trip)
 class TripAdmin(admin.ModelAdmin):
     list_display = [
@@ -0,0 +1,158 @@
+"""
+Batched passenger boarding scans.
+
+The driver app uploads scans (student id or RFID pass, status, time) in
+batches, possibly replaying an offline buffer. Scans are folded per
+student into the furthest state reached, merged with the existing
+``TripPassenger`` rows and written with one upsert on (trip, student);
+trip counters move by the number of newly boarded students with ``F()``.
+
+Passenger state only moves forward (scheduled -> absent -> picked_up ->
+dropped) and recorded times are never overwritten, so replaying or
+reordering scans yields the same rows.
+"""
+import logging
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Q
+
+from apps.students.models import Student
+
+from .models import StudentTransport, Trip, TripPassenger
+
+logger = logging.getLogger(__name__)
+
+STATUS_RANK = {'scheduled': 0, 'absent': 1, 'picked_up': 2, 'dropped': 3}
+BOARDED = ('picked_up', 'dropped')
+
+
+def _resolve_students(trip, scans):
+    """Map each scan to a student id, returning ``(student_ids, assignments)``."""
+    cards = {scan['card_uid'] for scan in scans if scan.get('card_uid')}
+    ids = {scan['student_id'] for scan in scans if scan.get('student_id')}
+
+    assignments = {
+        assignment.student_id: assignment
+        for assignment in StudentTransport.objects.filter(
+            Q(card_uid__in=cards) | Q(student_id__in=ids),
+            route_id=trip.route_id, is_active=True,
+        )
+    }
+    by_card = {
+        assignment.card_uid: student_id
+        for student_id, assignment in assignments.items() if assignment.card_uid
+    }
+    known = set(Student.objects.filter(id__in=ids).values_list('id', flat=True))
+
+    student_ids = []
+    for scan in scans:
+        if scan.get('student_id'):
+            student_ids.append(scan['student_id'] if scan['student_id'] in known else None)
+        else:
+            student_ids.append(by_card.get(scan.get('card_uid')))
+    return student_ids, assignments
+
+
+def _fold(scans, student_ids):
+    """Reduce scans to ``{student_id: (status, pickup_time, drop_time)}``."""
+    folded = {}
+    for scan, student_id in zip(scans, student_ids):
+        if student_id is None:
+            continue
+        status, pickup, drop = folded.get(student_id, ('scheduled', None, None))
+        if STATUS_RANK[scan['status']] > STATUS_RANK[status]:
+            status = scan['status']
+        if scan['status'] == 'picked_up':
+            pickup = min(filter(None, (pickup, scan['timestamp'])))
+        elif scan['status'] == 'dropped':
+            drop = max(filter(None, (drop, scan['timestamp'])))
+        folded[student_id] = (status, pickup, drop)
+    return folded
+
+
+def record_scans(trip_pk, scans):
+    """
+    Apply a batch of boarding scans to a trip.
+
+    ``scans`` are dicts with ``student_id`` or ``card_uid``, ``status``
+    (picked_up, dropped or absent) and ``timestamp``. Returns the per-scan
+    outcomes and the refreshed trip counters.
+    """
+    with transaction.atomic():
+        # Serialises concurrent batches for the same trip so the counter
+        # deltas are computed against a stable set of rows.
+        trip = Trip.objects.select_for_update().get(pk=trip_pk)
+        student_ids, assignments = _resolve_students(trip, scans)
+        folded = _fold(scans, student_ids)
+
+        existing = {
+            passenger.student_id: passenger
+            for passenger in TripPassenger.objects.filter(
+                trip=trip, student_id__in=folded
+            )
+        }
+
+        rows, changed, boarded, fares = [], set(), 0, Decimal('0')
+        for student_id, (status, pickup, drop) in folded.items():
+            passenger = existing.get(student_id)
+            if passenger is None:
+                assignment = assignments.get(student_id)
+                passenger = TripPassenger(
+                    trip=trip,
+                    student_id=student_id,
+                    pickup_location=assignment.pickup_location if assignment else trip.start_location,
+                    drop_location=assignment.drop_location if assignment else trip.end_location,
+                    fare_paid=assignment.fare_amount if assignment else Decimal('0'),
+                )
+            was_boarded = passenger.status in BOARDED
+
+            current = (passenger.status, passenger.pickup_time, passenger.drop_time)
+            merged = (
+                status if STATUS_RANK[status] > STATUS_RANK[passenger.status]
+                else passenger.status,
+                passenger.pickup_time or pickup,
+                passenger.drop_time or drop,
+            )
+            if passenger.pk is not None and merged == current:
+                continue
+
+            passenger.status, passenger.pickup_time, passenger.drop_time = merged
+            rows.append(passenger)
+            changed.add(student_id)
+            if passenger.status in BOARDED and not was_boarded:
+                boarded += 1
+                fares += passenger.fare_paid
+
+        TripPassenger.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['trip', 'student'],
+            update_fields=['status', 'pickup_time', 'drop_time'],
+        )
+        if boarded:
+            Trip.objects.filter(pk=trip.pk).update(
+                total_passengers=F('total_passengers') + boarded,
+                total_fare_collected=F('total_fare_collected') + fares,
+            )
+        trip.refresh_from_db(fields=['total_passengers', 'total_fare_collected', 'max_capacity'])
+
+    outcomes = []
+    for index, (scan, student_id) in enumerate(zip(scans, student_ids)):
+        if student_id is None:
+            outcomes.append({'index': index, 'student_id': None,
+                             'result': 'rejected', 'error': 'Unknown student or card'})
+        else:
+            outcomes.append({'index': index, 'student_id': student_id,
+                             'result': 'applied' if student_id in changed else 'unchanged'})
+
+    logger.info(
+        f"Trip {trip.trip_id}: {len(scans)} scans, {len(changed)} passengers "
+        f"updated, {boarded} newly boarded"
+    )
+    return {
+        'outcomes': outcomes,
+        'total_passengers': trip.total_passengers,
+        'total_fare_collected': trip.total_fare_collected,
+        'over_capacity': trip.total_passengers > trip.max_capacity,
+    }
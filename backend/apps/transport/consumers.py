@@ -0,0 +1,179 @@
+"""
+WebSocket consumers for live trip tracking.
+"""
+
+import json
+import logging
+from datetime import datetime, timezone as dt_timezone
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+from django.db.models import Q
+from django.utils import timezone
+
+from . import tracking
+from .models import StudentTransport, Trip, TripTrackPoint
+
+logger = logging.getLogger(__name__)
+
+FLUSH_EVERY = 20
+
+
+class DriverTrackingConsumer(AsyncWebsocketConsumer):
+    """
+    Receives GPS pings from the driver's device for one trip.
+
+    Every ping is buffered and broadcast to the route group; downsampled
+    points are written to ``TripTrackPoint`` in batches.
+    """
+
+    async def connect(self):
+        self.user = self.scope["user"]
+        self.trip_id = int(self.scope["url_route"]["kwargs"]["trip_id"])
+        self.pending = []
+
+        trip = await self.get_trip()
+        if trip is None:
+            await self.close()
+            return
+
+        self.route_id = trip.route_id
+        self.stops = tracking.stop_coordinates(trip.route.stops)
+        self.downsampler = tracking.Downsampler()
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        if getattr(self, 'pending', None):
+            await self.flush()
+
+    async def receive(self, text_data):
+        try:
+            payload = json.loads(text_data)
+        except json.JSONDecodeError:
+            await self.send(text_data=json.dumps({
+                'error': 'Invalid JSON format'
+            }))
+            return
+
+        ping = tracking.parse_ping(payload)
+        if ping is None:
+            await self.send(text_data=json.dumps({
+                'error': 'Invalid position'
+            }))
+            return
+
+        await tracking.push_ping(self.trip_id, ping)
+        await self.channel_layer.group_send(
+            tracking.route_group_name(self.route_id),
+            {
+                'type': 'trip_position',
+                'trip': self.trip_id,
+                'position': ping,
+                'eta': tracking.estimate_eta(ping, self.stops),
+            }
+        )
+
+        if self.downsampler.accept(ping):
+            self.pending.append(ping)
+            if len(self.pending) >= FLUSH_EVERY:
+                await self.flush()
+
+    async def flush(self):
+        points, self.pending = self.pending, []
+        try:
+            await self.save_points(points)
+        except Exception as e:
+            logger.error(f"Failed to store track points for trip {self.trip_id}: {e}")
+
+    @database_sync_to_async
+    def get_trip(self):
+        if not self.user.is_authenticated:
+            return None
+        trips = Trip.objects.select_related('route').filter(
+            id=self.trip_id, status__in=('scheduled', 'in_progress', 'delayed')
+        )
+        if not self.user.is_staff:
+            trips = trips.filter(driver__user=self.user, driver__is_active=True)
+        return trips.first()
+
+    @database_sync_to_async
+    def save_points(self, points):
+        TripTrackPoint.objects.bulk_create([
+            TripTrackPoint(
+                trip_id=self.trip_id,
+                recorded_at=datetime.fromtimestamp(point['ts'], tz=dt_timezone.utc),
+                latitude=point['lat'],
+                longitude=point['lng'],
+                speed=point.get('speed'),
+                heading=point.get('heading'),
+            )
+            for point in points
+        ])
+
+
+class RouteTrackingConsumer(AsyncWebsocketConsumer):
+    """
+    Streams bus positions on a route to staff, students and guardians.
+    """
+
+    async def connect(self):
+        self.user = self.scope["user"]
+        self.route_id = int(self.scope["url_route"]["kwargs"]["route_id"])
+        self.group_name = tracking.route_group_name(self.route_id)
+
+        if not await self.can_follow_route():
+            await self.close()
+            return
+
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+        # Send the last known position of each running trip so the map is
+        # populated before the next ping arrives.
+        trip_ids = await self.get_active_trip_ids()
+        latest = await tracking.latest_pings(trip_ids)
+        await self.send(text_data=json.dumps({
+            'type': 'snapshot',
+            'positions': [
+                {'trip': trip_id, 'position': ping}
+                for trip_id, ping in latest.items()
+            ],
+        }))
+
+    async def disconnect(self, close_code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(
+                self.group_name,
+                self.channel_name
+            )
+
+    async def trip_position(self, event):
+        await self.send(text_data=json.dumps({
+            'type': 'position',
+            'trip': event['trip'],
+            'position': event['position'],
+            'eta': event.get('eta'),
+        }))
+
+    @database_sync_to_async
+    def can_follow_route(self):
+        if not self.user.is_authenticated:
+            return False
+        if self.user.is_staff:
+            return True
+        return StudentTransport.objects.filter(
+            route_id=self.route_id, is_active=True
+        ).filter(
+            Q(student__user=self.user)
+            | Q(student__guardian_relationships__guardian__user=self.user)
+        ).exists()
+
+    @database_sync_to_async
+    def get_active_trip_ids(self):
+        return list(
+            Trip.objects.filter(
+                route_id=self.route_id,
+                status__in=('in_progress', 'delayed'),
+                scheduled_departure__date=timezone.localdate(),
+            ).values_list('id', flat=True)
+        )
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transport', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TripTrackPoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recorded_at', models.DateTimeField()),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+                ('speed', models.FloatField(blank=True, help_text='Meters per second', null=True)),
+                ('heading', models.FloatField(blank=True, help_text='Degrees from north', null=True)),
+                ('trip', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='track_points', to='transport.trip')),
+            ],
+            options={
+                'ordering': ['trip', 'recorded_at'],
+                'indexes': [models.Index(fields=['trip', 'recorded_at'], name='trip_track_point_idx')],
+            },
+        ),
+    ]
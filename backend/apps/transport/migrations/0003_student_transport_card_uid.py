@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transport', '0002_trip_track_point'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studenttransport',
+            name='card_uid',
+            field=models.CharField(blank=True, db_index=True, help_text='RFID transport pass', max_length=64),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-19 14:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def link_drivers(apps, schema_editor):
+    """
+    Link drivers to the account with the same email, where exactly one
+    account has it. Drivers without an email stay unlinked.
+    """
+    Driver = apps.get_model('transport', 'Driver')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    for driver in Driver.objects.exclude(email=''):
+        users = list(User.objects.filter(email__iexact=driver.email)[:2])
+        if len(users) == 1 and not Driver.objects.filter(user=users[0]).exists():
+            driver.user = users[0]
+            driver.save(update_fields=['user'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transport', '0004_route_planning'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='driver',
+            name='user',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='driver_profile', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(link_drivers, migrations.RunPython.noop),
+    ]
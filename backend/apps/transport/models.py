@@ -104,6 +104,11 @@ class Driver(models.Model):
     ]
     
     driver_id = models.CharField(max_length=20, unique=True)
+    # Account the driver signs in with to stream trip positions
+    user = models.OneToOneField(
+        User, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='driver_profile'
+    )
     full_name = models.CharField(max_length=200)
     gender = models.CharField(max_length=1, choices=GENDER_CHOICES)
     date_of_birth = models.DateField()
@@ -174,6 +179,53 @@ class Route(models.Model):
         return f"{self.route_number} - {self.name}"
 
 
+class StopLocation(models.Model):
+    """Offline geocoding table for pickup/drop stop names"""
+    name = models.CharField(max_length=200, unique=True)
+    latitude = models.FloatField(validators=[MinValueValidator(-90), MaxValueValidator(90)])
+    longitude = models.FloatField(validators=[MinValueValidator(-180), MaxValueValidator(180)])
+    address = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
+class RoutePlan(models.Model):
+    """A route optimisation run and its result"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('applied', 'Applied'),
+        ('failed', 'Failed'),
+    ]
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    depot = models.CharField(max_length=200)
+    parameters = models.JSONField(default=dict, blank=True)
+    result = models.JSONField(default=dict, blank=True)
+    route_count = models.PositiveIntegerField(default=0)
+    student_count = models.PositiveIntegerField(default=0)
+    total_distance_km = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    error_message = models.TextField(blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    applied_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Route plan {self.id} ({self.status})"
+
+
 class Trip(models.Model):
     """Individual transport trips"""
     TRIP_TYPES = [
@@ -249,6 +301,7 @@ class StudentTransport(models.Model):
     pickup_time = models.TimeField()
     drop_time = models.TimeField()
     fare_amount = models.DecimalField(max_digits=8, decimal_places=2)
+    card_uid = models.CharField(max_length=64, blank=True, db_index=True, help_text='RFID transport pass')
     is_active = models.BooleanField(default=True)
     start_date = models.DateField()
     end_date = models.DateField(null=True, blank=True)
@@ -289,6 +342,25 @@ class TripPassenger(models.Model):
         return f"{self.student.full_name} - {self.trip.trip_id}"
 
 
+class TripTrackPoint(models.Model):
+    """Downsampled GPS positions recorded during a trip"""
+    trip = models.ForeignKey(Trip, on_delete=models.CASCADE, related_name='track_points')
+    recorded_at = models.DateTimeField()
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    speed = models.FloatField(null=True, blank=True, help_text='Meters per second')
+    heading = models.FloatField(null=True, blank=True, help_text='Degrees from north')
+
+    class Meta:
+        ordering = ['trip', 'recorded_at']
+        indexes = [
+            models.Index(fields=['trip', 'recorded_at'], name='trip_track_point_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.trip.trip_id} @ {self.recorded_at}"
+
+
 class MaintenanceRecord(models.Model):
     """Vehicle maintenance records"""
     MAINTENANCE_TYPES = [
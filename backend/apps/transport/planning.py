@@ -0,0 +1,411 @@
+"""
+Route planning.
+
+Student pickup locations are geocoded against the offline
+``StopLocation`` table and grouped into stops. A haversine distance
+matrix is built in one vectorised numpy operation, stops are grouped
+into vehicle routes with the Clarke-Wright savings heuristic under the
+fleet's capacity, and each route's stop order is improved with 2-opt.
+The result is stored on a ``RoutePlan`` and only written to
+``Route.stops`` and ``StudentTransport`` when the plan is applied.
+"""
+import logging
+from decimal import Decimal
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Route, StopLocation, StudentTransport, Vehicle
+from .tracking import EARTH_RADIUS_METERS
+
+logger = logging.getLogger(__name__)
+
+AVERAGE_SPEED_KMH = 25
+DWELL_MINUTES_PER_STOP = 1
+# Savings are only evaluated between each stop and its nearest
+# neighbours, which keeps the candidate list linear in the stop count.
+NEIGHBOURS = 40
+
+
+class PlanningError(Exception):
+    """Raised when a plan cannot be computed or applied."""
+
+
+def normalise_stop_name(name):
+    return ' '.join(str(name).lower().split())
+
+
+def geocode(names):
+    """Map stop names to ``(lat, lng)``; unknown names are left out."""
+    table = {
+        normalise_stop_name(name): (lat, lng)
+        for name, lat, lng in StopLocation.objects.values_list(
+            'name', 'latitude', 'longitude'
+        )
+    }
+    coordinates = {}
+    for name in names:
+        key = normalise_stop_name(name)
+        if key in table:
+            coordinates[name] = table[key]
+    return coordinates
+
+
+def haversine_matrix(coordinates):
+    """Pairwise great-circle distances in meters for an ``(n, 2)`` array."""
+    radians = np.radians(np.asarray(coordinates, dtype=float))
+    lat, lng = radians[:, 0], radians[:, 1]
+    d_lat = lat[:, None] - lat[None, :]
+    d_lng = lng[:, None] - lng[None, :]
+    a = (np.sin(d_lat / 2) ** 2
+         + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(d_lng / 2) ** 2)
+    return 2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def _candidate_pairs(dist, neighbours):
+    """Customer pairs ``(i, j)`` with positive savings, best first."""
+    size = len(dist) - 1
+    if size < 2:
+        return np.empty((0, 2), dtype=int)
+
+    between = dist[1:, 1:].copy()
+    np.fill_diagonal(between, np.inf)
+    k = min(neighbours, size - 1)
+    nearest = np.argpartition(between, k - 1, axis=1)[:, :k]
+    first = np.repeat(np.arange(size), k)
+    second = nearest.ravel()
+    pairs = np.unique(
+        np.stack([np.minimum(first, second), np.maximum(first, second)], axis=1),
+        axis=0,
+    ) + 1
+
+    savings = dist[0, pairs[:, 0]] + dist[0, pairs[:, 1]] - dist[pairs[:, 0], pairs[:, 1]]
+    order = np.argsort(-savings, kind='stable')
+    return pairs[order][savings[order] > 0]
+
+
+def clarke_wright(dist, demand, capacity, neighbours=NEIGHBOURS):
+    """
+    Group customers (nodes ``1..n-1``; node 0 is the depot) into routes
+    whose total demand fits ``capacity``.
+    """
+    routes = {node: [node] for node in range(1, len(demand))}
+    route_of = list(range(len(demand)))
+    load = {node: demand[node] for node in routes}
+
+    for a, b in _candidate_pairs(dist, neighbours):
+        ra, rb = route_of[a], route_of[b]
+        if ra == rb or load[ra] + load[rb] > capacity:
+            continue
+        first, second = routes[ra], routes[rb]
+        # Only route ends can be joined: orient so ``a`` ends the first
+        # route and ``b`` starts the second.
+        if first[-1] != a:
+            if first[0] != a:
+                continue
+            first.reverse()
+        if second[0] != b:
+            if second[-1] != b:
+                continue
+            second.reverse()
+
+        first.extend(second)
+        load[ra] += load.pop(rb)
+        for node in second:
+            route_of[node] = ra
+        del routes[rb]
+
+    return [(route, load[key]) for key, route in routes.items()]
+
+
+def two_opt(route, dist):
+    """Return ``route`` reordered by 2-opt as a depot-to-depot tour."""
+    tour = [0] + list(route) + [0]
+    improved = True
+    while improved:
+        improved = False
+        nodes = np.array(tour)
+        for i in range(1, len(tour) - 2):
+            j = np.arange(i + 1, len(tour) - 1)
+            a, b = nodes[i - 1], nodes[i]
+            c, e = nodes[j], nodes[j + 1]
+            delta = dist[a, c] + dist[b, e] - dist[a, b] - dist[c, e]
+            best = int(np.argmin(delta))
+            if delta[best] < -1e-6:
+                end = int(j[best])
+                tour[i:end + 1] = tour[i:end + 1][::-1]
+                nodes = np.array(tour)
+                improved = True
+    return tour[1:-1]
+
+
+def tour_length(route, dist):
+    tour = [0] + list(route) + [0]
+    return float(dist[tour[:-1], tour[1:]].sum())
+
+
+def assign_vehicles(route_loads, vehicles):
+    """
+    Pair routes with vehicles, largest route first, each taking the
+    smallest free vehicle that can carry it. Returns
+    ``{route_index: vehicle}``.
+    """
+    free = sorted(vehicles, key=lambda vehicle: vehicle['capacity'])
+    assigned = {}
+    for index in sorted(range(len(route_loads)), key=lambda i: -route_loads[i]):
+        for position, vehicle in enumerate(free):
+            if vehicle['capacity'] >= route_loads[index]:
+                assigned[index] = free.pop(position)
+                break
+    return assigned
+
+
+class RoutePlanner:
+    """
+    Compute (and optionally apply) a ``RoutePlan``.
+
+    Usage:
+        plan = RoutePlan.objects.create(depot='School', parameters={...})
+        RoutePlanner(plan).execute()
+    """
+
+    def __init__(self, plan):
+        self.plan = plan
+        self.parameters = plan.parameters or {}
+
+    def execute(self):
+        plan = self.plan
+        plan.status = 'running'
+        plan.error_message = ''
+        plan.save(update_fields=['status', 'error_message', 'updated_at'])
+
+        started = timezone.now()
+        try:
+            result = self.solve()
+        except Exception as e:
+            plan.status = 'failed'
+            plan.error_message = str(e)
+            plan.save(update_fields=['status', 'error_message', 'updated_at'])
+            logger.error(f"Route plan {plan.pk} failed: {e}")
+            raise
+
+        plan.result = result
+        plan.route_count = len(result['routes'])
+        plan.student_count = sum(len(route['assignment_ids']) for route in result['routes'])
+        plan.total_distance_km = Decimal(
+            sum(route['distance_km'] for route in result['routes'])
+        ).quantize(Decimal('0.01'))
+        plan.status = 'completed'
+        plan.completed_at = timezone.now()
+        plan.save()
+        logger.info(
+            f"Route plan {plan.pk}: {plan.student_count} students on "
+            f"{plan.route_count} routes in "
+            f"{(plan.completed_at - started).total_seconds():.1f}s"
+        )
+
+        if self.parameters.get('apply'):
+            apply_plan(plan)
+        return plan
+
+    def _load(self):
+        assignments = StudentTransport.objects.filter(is_active=True)
+        if self.parameters.get('source_route_ids'):
+            assignments = assignments.filter(route_id__in=self.parameters['source_route_ids'])
+        vehicles = Vehicle.objects.filter(status='active', is_active=True)
+        if self.parameters.get('vehicle_ids'):
+            vehicles = vehicles.filter(id__in=self.parameters['vehicle_ids'])
+        return (
+            list(assignments.values_list('id', 'pickup_location')),
+            list(vehicles.values('id', 'vehicle_number', 'capacity')),
+        )
+
+    def _group(self, by_stop, coordinates, vehicles, capacity):
+        """Savings grouping for one capacity, with its score for comparison."""
+        # One node per capacity-sized chunk of a stop, so a stop busier
+        # than a vehicle is split across routes.
+        nodes = [(self.plan.depot, [])]
+        for name, ids in sorted(by_stop.items()):
+            for start in range(0, len(ids), capacity):
+                nodes.append((name, ids[start:start + capacity]))
+
+        dist = haversine_matrix([coordinates[name] for name, _ in nodes])
+        demand = [len(ids) for _, ids in nodes]
+        grouped = clarke_wright(
+            dist, demand, capacity, self.parameters.get('neighbours', NEIGHBOURS)
+        )
+        vehicle_for = assign_vehicles([load for _, load in grouped], vehicles)
+        unplaced = sum(
+            load for index, (_, load) in enumerate(grouped) if index not in vehicle_for
+        )
+        distance = sum(
+            tour_length(route, dist)
+            for index, (route, _) in enumerate(grouped) if index in vehicle_for
+        )
+        return (unplaced, distance), nodes, dist, grouped, vehicle_for
+
+    def solve(self):
+        assignments, vehicles = self._load()
+        if not vehicles:
+            raise PlanningError('No active vehicles to plan with')
+
+        names = {name for _, name in assignments} | {self.plan.depot}
+        coordinates = geocode(names)
+        if self.plan.depot not in coordinates:
+            raise PlanningError(f'Depot "{self.plan.depot}" is not geocoded')
+
+        by_stop = {}
+        ungeocoded = []
+        for assignment_id, name in assignments:
+            if name in coordinates:
+                by_stop.setdefault(name, []).append(assignment_id)
+            else:
+                ungeocoded.append(assignment_id)
+
+        # A mixed fleet is planned once per distinct capacity: routes built
+        # for the largest bus may not fit the smaller ones, so the capacity
+        # that leaves the fewest students unplaced (then the shortest total
+        # distance) wins.
+        best = None
+        for capacity in sorted({vehicle['capacity'] for vehicle in vehicles}, reverse=True):
+            candidate = self._group(by_stop, coordinates, vehicles, capacity)
+            if best is None or candidate[0] < best[0]:
+                best = candidate
+        _, nodes, dist, grouped, vehicle_for = best
+        ordered = [(two_opt(route, dist), load) for route, load in grouped]
+
+        routes, unplaced = [], []
+        for index, (route, load) in enumerate(ordered):
+            ids = [assignment_id for node in route for assignment_id in nodes[node][1]]
+            if index not in vehicle_for:
+                unplaced.extend(ids)
+                continue
+            stops = []
+            for node in route:
+                name, node_ids = nodes[node]
+                if stops and stops[-1]['name'] == name:
+                    stops[-1]['students'] += len(node_ids)
+                    continue
+                lat, lng = coordinates[name]
+                stops.append({'name': name, 'lat': lat, 'lng': lng, 'students': len(node_ids)})
+            vehicle = vehicle_for[index]
+            routes.append({
+                'vehicle_id': vehicle['id'],
+                'vehicle_number': vehicle['vehicle_number'],
+                'capacity': vehicle['capacity'],
+                'load': load,
+                'distance_km': round(tour_length(route, dist) / 1000, 2),
+                'stops': stops,
+                'assignment_ids': ids,
+            })
+
+        routes.sort(key=lambda route: route['vehicle_number'])
+        return {
+            'routes': routes,
+            'unplaced_assignment_ids': unplaced,
+            'ungeocoded_assignment_ids': ungeocoded,
+            'ungeocoded_stops': sorted(names - set(coordinates)),
+        }
+
+
+def apply_plan(plan):
+    """
+    Write a completed plan to ``Route`` and ``StudentTransport``.
+
+    Planned routes overwrite ``parameters['route_ids']`` in order; any
+    further routes are created. A student moved onto a route they already
+    have an inactive assignment for gets that assignment reactivated,
+    keeping the (student, route) pair unique.
+    """
+    if plan.status != 'completed':
+        raise PlanningError(f'Plan is {plan.status}, not completed')
+
+    parameters = plan.parameters or {}
+    depot_lat, depot_lng = geocode([plan.depot]).get(plan.depot, (None, None))
+    fare_amount = Decimal(str(parameters.get('fare_amount', 0)))
+
+    with transaction.atomic():
+        reused = Route.objects.in_bulk(parameters.get('route_ids') or [])
+        reused = [reused[pk] for pk in parameters.get('route_ids') or [] if pk in reused]
+
+        targets = {}
+        for number, planned in enumerate(plan.result.get('routes', []), start=1):
+            stops = planned['stops'] + [
+                {'name': plan.depot, 'lat': depot_lat, 'lng': depot_lng, 'students': 0}
+            ]
+            values = {
+                'stops': stops,
+                'start_location': stops[0]['name'],
+                'end_location': plan.depot,
+                'distance_km': Decimal(str(planned['distance_km'])),
+                'estimated_duration_minutes': int(
+                    planned['distance_km'] / AVERAGE_SPEED_KMH * 60
+                    + DWELL_MINUTES_PER_STOP * len(planned['stops'])
+                ),
+            }
+            if reused:
+                route = reused.pop(0)
+                for field, value in values.items():
+                    setattr(route, field, value)
+                route.save(update_fields=[*values, 'updated_at'])
+            else:
+                route = Route.objects.create(
+                    route_number=f"P{plan.pk}-{number}",
+                    name=f"{plan.depot} {planned['vehicle_number']}",
+                    fare_amount=fare_amount,
+                    **values
+                )
+            for assignment_id in planned['assignment_ids']:
+                targets[assignment_id] = route.id
+
+        moved = _reassign_students(targets)
+        plan.status = 'applied'
+        plan.applied_at = timezone.now()
+        plan.save(update_fields=['status', 'applied_at', 'updated_at'])
+
+    logger.info(f"Route plan {plan.pk} applied, {moved} students moved")
+    return moved
+
+
+def _reassign_students(targets):
+    rows = StudentTransport.objects.in_bulk(list(targets))
+    moving = {pk: row for pk, row in rows.items() if row.route_id != targets[pk]}
+    if not moving:
+        return 0
+
+    clashes = {
+        (row.student_id, row.route_id): row
+        for row in StudentTransport.objects.filter(
+            student_id__in={row.student_id for row in moving.values()},
+            route_id__in=set(targets.values()),
+        ).exclude(id__in=list(moving))
+    }
+
+    now = timezone.now()
+    updated, taken = [], set()
+    for pk, row in moving.items():
+        key = (row.student_id, targets[pk])
+        other = clashes.get(key)
+        if other is not None or key in taken:
+            row.is_active = False
+            if other is not None and key not in taken:
+                for field in ('pickup_location', 'drop_location', 'pickup_time',
+                              'drop_time', 'card_uid'):
+                    setattr(other, field, getattr(row, field))
+                other.is_active = True
+                other.updated_at = now
+                updated.append(other)
+        else:
+            row.route_id = targets[pk]
+        row.updated_at = now
+        taken.add(key)
+        updated.append(row)
+
+    StudentTransport.objects.bulk_update(
+        updated,
+        ['route', 'is_active', 'pickup_location', 'drop_location', 'pickup_time',
+         'drop_time', 'card_uid', 'updated_at'],
+        batch_size=500,
+    )
+    return len(moving)
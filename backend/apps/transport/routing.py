@@ -0,0 +1,11 @@
+"""
+WebSocket routing for live trip tracking.
+"""
+
+from django.urls import re_path
+from . import consumers
+
+websocket_urlpatterns = [
+    re_path(r'ws/transport/trips/(?P<trip_id>\d+)/track/$', consumers.DriverTrackingConsumer.as_asgi()),
+    re_path(r'ws/transport/routes/(?P<route_id>\d+)/live/$', consumers.RouteTrackingConsumer.as_asgi()),
+]
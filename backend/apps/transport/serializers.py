@@ -1,7 +1,7 @@
 from rest_framework import serializers
 from .models import (
     Vehicle, Driver, Route, Trip, StudentTransport, TripPassenger,
-    MaintenanceRecord, FuelRecord, TransportSettings
+    MaintenanceRecord, FuelRecord, TransportSettings, StopLocation, RoutePlan
 )
 from apps.students.serializers import StudentSerializer
 
@@ -172,6 +172,50 @@ class PassengerStatusUpdateSerializer(serializers.Serializer):
     notes = serializers.CharField(required=False)
 
 
+class StopLocationSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = StopLocation
+        fields = '__all__'
+
+
+class RoutePlanSerializer(serializers.ModelSerializer):
+    created_by_name = serializers.CharField(source='created_by.get_full_name', read_only=True)
+
+    class Meta:
+        model = RoutePlan
+        fields = '__all__'
+        read_only_fields = [
+            'status', 'result', 'route_count', 'student_count', 'total_distance_km',
+            'error_message', 'created_by', 'completed_at', 'applied_at'
+        ]
+
+
+class RoutePlanRequestSerializer(serializers.Serializer):
+    depot = serializers.CharField(max_length=200)
+    vehicle_ids = serializers.ListField(child=serializers.IntegerField(), required=False)
+    source_route_ids = serializers.ListField(child=serializers.IntegerField(), required=False)
+    route_ids = serializers.ListField(child=serializers.IntegerField(), required=False)
+    fare_amount = serializers.DecimalField(max_digits=8, decimal_places=2, default=0)
+    apply = serializers.BooleanField(default=False)
+    run_async = serializers.BooleanField(default=True)
+
+
+class PassengerScanSerializer(serializers.Serializer):
+    student_id = serializers.IntegerField(required=False)
+    card_uid = serializers.CharField(max_length=64, required=False)
+    status = serializers.ChoiceField(choices=['picked_up', 'dropped', 'absent'])
+    timestamp = serializers.DateTimeField()
+
+    def validate(self, data):
+        if not data.get('student_id') and not data.get('card_uid'):
+            raise serializers.ValidationError('student_id or card_uid is required')
+        return data
+
+
+class PassengerScanBatchSerializer(serializers.Serializer):
+    scans = PassengerScanSerializer(many=True, allow_empty=False, max_length=500)
+
+
 class BulkTripCreateSerializer(serializers.Serializer):
     route_id = serializers.IntegerField()
     vehicle_id = serializers.IntegerField()
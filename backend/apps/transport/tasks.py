@@ -0,0 +1,24 @@
+"""
+Celery tasks for transport app.
+"""
+
+from celery import shared_task
+import logging
+
+from .models import RoutePlan
+from .planning import RoutePlanner
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def plan_routes(plan_id):
+    """Compute a route plan, applying it when the plan asks for it."""
+    try:
+        plan = RoutePlan.objects.get(id=plan_id)
+    except RoutePlan.DoesNotExist:
+        logger.error(f"Route plan {plan_id} not found")
+        raise
+
+    plan = RoutePlanner(plan).execute()
+    return f"Route plan {plan_id}: {plan.route_count} routes, {plan.student_count} students"
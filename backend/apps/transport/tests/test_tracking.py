@@ -0,0 +1,124 @@
+"""
+Tests for live trip tracking: only the driver linked to a trip can
+stream its positions, and an ended trip's buffered pings are dropped.
+"""
+import json
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from channels.routing import URLRouter
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.transport import tracking
+from apps.transport.models import Driver, Route, Trip, Vehicle
+from apps.transport.routing import websocket_urlpatterns
+from apps.transport.views import TripViewSet
+
+User = get_user_model()
+
+
+def make_driver(number, user=None, email=''):
+    return Driver.objects.create(
+        driver_id=f'D{number}', user=user, full_name=f'Driver {number}', gender='M',
+        date_of_birth=date(1980, 1, 1), phone='0100000000', email=email,
+        address='1 Depot Road', city='Dhaka', state='Dhaka', postal_code='1000',
+        license_number=f'L{number}', license_type='heavy',
+        license_issued_date=date(2010, 1, 1), license_expiry_date=date(2030, 1, 1),
+        joining_date=date(2020, 1, 1), salary=Decimal('1000.00'),
+        emergency_contact_name='Contact', emergency_contact_phone='0100000001',
+        emergency_contact_relation='Sibling',
+    )
+
+
+def make_trip(driver):
+    vehicle = Vehicle.objects.create(
+        vehicle_number=f'V-{driver.driver_id}', registration_number=f'R-{driver.driver_id}',
+        make='Tata', model='Starbus', year=2020, capacity=40,
+        purchase_date=date(2020, 1, 1), insurance_expiry=date(2030, 1, 1),
+        permit_expiry=date(2030, 1, 1), fitness_expiry=date(2030, 1, 1),
+        puc_expiry=date(2030, 1, 1),
+    )
+    route = Route.objects.create(
+        route_number=f'R{driver.driver_id}', name='North loop', start_location='Depot',
+        end_location='School', distance_km=Decimal('12.00'),
+        estimated_duration_minutes=40, fare_amount=Decimal('20.00'),
+    )
+    departure = timezone.now()
+    return Trip.objects.create(
+        trip_id=f'T-{driver.driver_id}', vehicle=vehicle, driver=driver, route=route,
+        scheduled_departure=departure, scheduled_arrival=departure + timedelta(hours=1),
+        start_location='Depot', end_location='School', max_capacity=40,
+    )
+
+
+class DriverTrackingConsumerTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(tracking, 'get_async_redis', return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(tracking._memory_buffers.clear)
+
+    def connect(self, user, trip):
+        # ``channels.testing`` needs daphne; drive the ASGI app directly
+        async def scenario():
+            communicator = ApplicationCommunicator(URLRouter(websocket_urlpatterns), {
+                'type': 'websocket', 'path': f'/ws/transport/trips/{trip.pk}/track/',
+                'headers': [], 'subprotocols': [], 'user': user,
+            })
+            await communicator.send_input({'type': 'websocket.connect'})
+            reply = await communicator.receive_output(timeout=5)
+            connected = reply['type'] == 'websocket.accept'
+            if connected:
+                await communicator.send_input({
+                    'type': 'websocket.receive', 'text': json.dumps({'lat': 23.8, 'lng': 90.4}),
+                })
+            await communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+            await communicator.wait(timeout=5)
+            return connected
+        return async_to_sync(scenario)()
+
+    def test_linked_driver_streams_pings(self):
+        user = User.objects.create_user(username='driver', email='driver@example.com')
+        trip = make_trip(make_driver(1, user=user))
+        self.assertTrue(self.connect(user, trip))
+        self.assertEqual(len(tracking._memory_buffers[trip.pk]), 1)
+
+    def test_user_without_email_cannot_spoof_a_driver_without_email(self):
+        trip = make_trip(make_driver(1))
+        # ``create_user`` insists on an email, but accounts can exist without one
+        intruder = User.objects.create(username='intruder', email='')
+        self.assertFalse(self.connect(intruder, trip))
+        self.assertNotIn(trip.pk, tracking._memory_buffers)
+
+    def test_matching_email_alone_is_not_enough(self):
+        trip = make_trip(make_driver(1, email='driver@example.com'))
+        user = User.objects.create_user(username='driver', email='driver@example.com')
+        self.assertFalse(self.connect(user, trip))
+
+    def test_anonymous_user_is_refused(self):
+        trip = make_trip(make_driver(1))
+        self.assertFalse(self.connect(AnonymousUser(), trip))
+
+
+class EndTripTests(TestCase):
+    def test_completing_a_trip_drops_its_buffer(self):
+        trip = make_trip(make_driver(1))
+        tracking._memory_buffers[trip.pk] = [{'lat': 23.8, 'lng': 90.4}]
+        self.addCleanup(tracking._memory_buffers.clear)
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='x'
+        )
+        request = APIRequestFactory().post(
+            f'/api/transport/trips/{trip.pk}/update_status/', {'status': 'completed'}
+        )
+        force_authenticate(request, admin)
+        response = TripViewSet.as_view({'post': 'update_status'})(request, pk=trip.pk)
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertNotIn(trip.pk, tracking._memory_buffers)
@@ -0,0 +1,217 @@
+"""
+Live trip tracking.
+
+Drivers stream GPS pings over a WebSocket. Every ping goes into a short
+per-trip ring buffer in Redis (the "where is the bus now" state) and is
+fanned out to the route's channel group; only a downsampled subset is
+persisted to ``TripTrackPoint``, in batches, so the database sees a few
+writes per bus per minute instead of one per second.
+"""
+import json
+import math
+import time
+from collections import deque
+
+from core.redis import get_async_redis, get_redis
+
+BUFFER_SIZE = 120           # ~2 minutes of pings at 1 Hz
+BUFFER_TTL_SECONDS = 6 * 3600
+MIN_DISTANCE_METERS = 50
+MAX_INTERVAL_SECONDS = 30
+MIN_HEADING_CHANGE = 30
+MIN_SPEED_MPS = 3           # floor used for ETA while the bus is crawling
+
+EARTH_RADIUS_METERS = 6371000
+
+_memory_buffers = {}
+
+
+def route_group_name(route_id):
+    return f"transport_route_{route_id}"
+
+
+def _buffer_key(trip_id):
+    return f"transport:trip:{trip_id}:pings"
+
+
+def haversine_m(lat1, lng1, lat2, lng2):
+    """Great-circle distance between two points in meters."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = (math.sin(d_phi / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2)
+    return 2 * EARTH_RADIUS_METERS * math.asin(math.sqrt(a))
+
+
+async def push_ping(trip_id, ping):
+    """Append a ping to the trip's ring buffer."""
+    client = get_async_redis()
+    if client is None:
+        _memory_buffers.setdefault(
+            trip_id, deque(maxlen=BUFFER_SIZE)
+        ).appendleft(ping)
+        return
+    key = _buffer_key(trip_id)
+    async with client.pipeline(transaction=False) as pipe:
+        pipe.lpush(key, json.dumps(ping))
+        pipe.ltrim(key, 0, BUFFER_SIZE - 1)
+        pipe.expire(key, BUFFER_TTL_SECONDS)
+        await pipe.execute()
+
+
+async def latest_pings(trip_ids):
+    """Return ``{trip_id: newest ping}`` for trips that have one."""
+    client = get_async_redis()
+    if client is None:
+        return _latest_from_memory(trip_ids)
+    async with client.pipeline(transaction=False) as pipe:
+        for trip_id in trip_ids:
+            pipe.lindex(_buffer_key(trip_id), 0)
+        values = await pipe.execute()
+    return {
+        trip_id: json.loads(value)
+        for trip_id, value in zip(trip_ids, values) if value
+    }
+
+
+def recent_pings(trip_id, count=BUFFER_SIZE):
+    """Synchronous read of the newest ``count`` pings, newest first."""
+    client = get_redis()
+    if client is None:
+        return list(_memory_buffers.get(trip_id, ()))[:count]
+    return [
+        json.loads(value)
+        for value in client.lrange(_buffer_key(trip_id), 0, count - 1)
+    ]
+
+
+def end_trip(trip_id):
+    """
+    Drop an ended trip's in-process buffer; Redis buffers expire on
+    their own after ``BUFFER_TTL_SECONDS``.
+    """
+    _memory_buffers.pop(trip_id, None)
+
+
+def _latest_from_memory(trip_ids):
+    return {
+        trip_id: _memory_buffers[trip_id][0]
+        for trip_id in trip_ids if _memory_buffers.get(trip_id)
+    }
+
+
+class Downsampler:
+    """
+    Decide which pings are worth persisting.
+
+    A ping is kept when the bus has moved ``min_distance`` meters, turned
+    by ``min_heading_change`` degrees, or ``max_interval`` seconds have
+    passed since the last kept ping, so straight steady driving and long
+    stops collapse to a handful of points.
+    """
+
+    def __init__(self, min_distance=MIN_DISTANCE_METERS,
+                 max_interval=MAX_INTERVAL_SECONDS,
+                 min_heading_change=MIN_HEADING_CHANGE):
+        self.min_distance = min_distance
+        self.max_interval = max_interval
+        self.min_heading_change = min_heading_change
+        self.last = None
+
+    def accept(self, ping):
+        last = self.last
+        keep = (
+            last is None
+            or ping['ts'] - last['ts'] >= self.max_interval
+            or haversine_m(
+                last['lat'], last['lng'], ping['lat'], ping['lng']
+            ) >= self.min_distance
+            or self._turned(last.get('heading'), ping.get('heading'))
+        )
+        if keep:
+            self.last = ping
+        return keep
+
+    def _turned(self, before, after):
+        if before is None or after is None:
+            return False
+        change = abs(after - before) % 360
+        return min(change, 360 - change) >= self.min_heading_change
+
+
+def stop_coordinates(stops):
+    """
+    Extract ``(name, lat, lng)`` from ``Route.stops`` entries that carry
+    coordinates; free-text stops are skipped.
+    """
+    points = []
+    for index, stop in enumerate(stops or []):
+        if not isinstance(stop, dict):
+            continue
+        lat = stop.get('lat', stop.get('latitude'))
+        lng = stop.get('lng', stop.get('longitude'))
+        if lat is None or lng is None:
+            continue
+        try:
+            points.append((stop.get('name', f"Stop {index + 1}"),
+                           float(lat), float(lng)))
+        except (TypeError, ValueError):
+            continue
+    return points
+
+
+def estimate_eta(ping, stops):
+    """
+    Estimate the next stop and seconds to reach it and the final stop.
+
+    The next stop is the one after the closest stop; the remaining
+    distance follows the stop sequence, and speed is floored so a bus
+    waiting at a light does not report an infinite ETA.
+    """
+    if not stops:
+        return None
+    distances = [
+        haversine_m(ping['lat'], ping['lng'], lat, lng)
+        for _, lat, lng in stops
+    ]
+    closest = min(range(len(stops)), key=distances.__getitem__)
+    upcoming = closest + 1 if closest + 1 < len(stops) else closest
+    speed = max(ping.get('speed') or 0, MIN_SPEED_MPS)
+
+    to_next = distances[upcoming]
+    to_end = to_next + sum(
+        haversine_m(stops[i][1], stops[i][2], stops[i + 1][1], stops[i + 1][2])
+        for i in range(upcoming, len(stops) - 1)
+    )
+    return {
+        'next_stop': stops[upcoming][0],
+        'next_stop_eta_seconds': int(to_next / speed),
+        'final_stop_eta_seconds': int(to_end / speed),
+    }
+
+
+def parse_ping(payload):
+    """
+    Validate a driver ping; returns a normalised dict or ``None``.
+
+    ``ts`` defaults to the server clock when the device omits it.
+    """
+    try:
+        lat = float(payload['lat'])
+        lng = float(payload['lng'])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return None
+
+    ping = {'lat': lat, 'lng': lng, 'ts': time.time()}
+    for field in ('ts', 'speed', 'heading'):
+        value = payload.get(field)
+        if value is None:
+            continue
+        try:
+            ping[field] = float(value)
+        except (TypeError, ValueError):
+            return None
+    return ping
@@ -14,6 +14,7 @@ router.register(r'trip-passengers', views.TripPassengerViewSet)
 router.register(r'maintenance', views.MaintenanceRecordViewSet)
 router.register(r'fuel-records', views.FuelRecordViewSet)
 router.register(r'settings', views.TransportSettingsViewSet)
+router.register(r'stop-locations', views.StopLocationViewSet)
 router.register(r'dashboard', views.TransportDashboardViewSet, basename='transport-dashboard')
 
 urlpatterns = [
@@ -3,13 +3,17 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q, Count, F, Sum, Avg
+from django.db.models import Count, F, Sum, Avg
 from django.utils import timezone
 from datetime import datetime, timedelta, date
 
+from . import tracking
+from .boarding import record_scans
+from .planning import PlanningError, RoutePlanner, apply_plan
+from .tasks import plan_routes
 from .models import (
     Vehicle, Driver, Route, Trip, StudentTransport, TripPassenger,
-    MaintenanceRecord, FuelRecord, TransportSettings
+    MaintenanceRecord, FuelRecord, TransportSettings, StopLocation, RoutePlan
 )
 from .serializers import (
     VehicleSerializer, DriverSerializer, RouteSerializer, TripSerializer,
@@ -18,7 +22,8 @@ from .serializers import (
     DriverDetailSerializer, RouteDetailSerializer, TripDetailSerializer,
     TransportDashboardSerializer, TripStatusUpdateSerializer,
     PassengerStatusUpdateSerializer, BulkTripCreateSerializer,
-    TransportReportSerializer
+    TransportReportSerializer, PassengerScanBatchSerializer,
+    StopLocationSerializer, RoutePlanSerializer, RoutePlanRequestSerializer
 )
 
 
@@ -62,12 +67,11 @@ class VehicleViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def needing_service(self, request):
-        """Get vehicles needing service"""
+        """Get vehicles needing service, from the precomputed schedule"""
         vehicles = self.queryset.filter(
-            is_active=True
-        ).filter(
-            Q(next_service_date__lte=timezone.now().date()) |
-            Q(next_service_date__isnull=True)
+            is_active=True,
+            maintenance_due__kind='service',
+            maintenance_due__due_date__lte=timezone.now().date()
         )
         serializer = self.get_serializer(vehicles, many=True)
         return Response(serializer.data)
@@ -79,13 +83,10 @@ class VehicleViewSet(viewsets.ModelViewSet):
         future_date = timezone.now().date() + timedelta(days=days)
         
         vehicles = self.queryset.filter(
-            is_active=True
-        ).filter(
-            Q(insurance_expiry__lte=future_date) |
-            Q(permit_expiry__lte=future_date) |
-            Q(fitness_expiry__lte=future_date) |
-            Q(puc_expiry__lte=future_date)
-        )
+            is_active=True,
+            maintenance_due__kind__in=['insurance', 'permit', 'fitness', 'puc'],
+            maintenance_due__due_date__lte=future_date
+        ).distinct()
         serializer = self.get_serializer(vehicles, many=True)
         return Response(serializer.data)
 
@@ -209,6 +210,68 @@ class RouteViewSet(viewsets.ModelViewSet):
         serializer = TripSerializer(trips, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['post'])
+    def plan(self, request):
+        """
+        Plan routes and student assignments for the active fleet.
+
+        With ``run_async`` the plan is computed on Celery and the pending
+        plan is returned; ``apply`` writes the result to routes and
+        student assignments once computed.
+        """
+        serializer = RoutePlanRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        plan = RoutePlan.objects.create(
+            depot=data.pop('depot'),
+            parameters={
+                **{key: value for key, value in data.items() if key != 'run_async'},
+                'fare_amount': str(data['fare_amount']),
+            },
+            created_by=request.user
+        )
+        if data['run_async']:
+            plan_routes.delay(plan.id)
+            return Response(RoutePlanSerializer(plan).data, status=status.HTTP_202_ACCEPTED)
+
+        try:
+            plan = RoutePlanner(plan).execute()
+        except PlanningError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(RoutePlanSerializer(plan).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'])
+    def plans(self, request):
+        """List route plans"""
+        plans = RoutePlan.objects.select_related('created_by')
+        page = self.paginate_queryset(plans)
+        if page is not None:
+            serializer = RoutePlanSerializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = RoutePlanSerializer(plans, many=True)
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['post'])
+    def apply_plan(self, request):
+        """Write a completed route plan to routes and assignments"""
+        try:
+            plan = RoutePlan.objects.get(id=request.data.get('plan_id'))
+        except (RoutePlan.DoesNotExist, ValueError, TypeError):
+            return Response(
+                {'error': 'Route plan not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        try:
+            moved = apply_plan(plan)
+        except PlanningError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'plan': RoutePlanSerializer(plan).data,
+            'students_moved': moved,
+        })
+
 
 class TripViewSet(viewsets.ModelViewSet):
     queryset = Trip.objects.all()
@@ -271,10 +334,36 @@ class TripViewSet(viewsets.ModelViewSet):
             setattr(trip, field, value)
         
         trip.save()
+        if trip.status in ('completed', 'cancelled'):
+            tracking.end_trip(trip.id)
         
         response_serializer = self.get_serializer(trip)
         return Response(response_serializer.data)
 
+    @action(detail=True, methods=['get'])
+    def track(self, request, pk=None):
+        """Get the recorded path and latest live position of a trip"""
+        trip = self.get_object()
+        points = trip.track_points.values_list(
+            'recorded_at', 'latitude', 'longitude', 'speed', 'heading'
+        )
+        recent = tracking.recent_pings(trip.id, count=1)
+        latest = recent[0] if recent else None
+
+        return Response({
+            'trip': trip.id,
+            'status': trip.status,
+            'path': [
+                {'recorded_at': recorded_at, 'lat': lat, 'lng': lng,
+                 'speed': speed, 'heading': heading}
+                for recorded_at, lat, lng, speed, heading in points
+            ],
+            'latest': latest,
+            'eta': tracking.estimate_eta(
+                latest, tracking.stop_coordinates(trip.route.stops)
+            ) if latest else None,
+        })
+
     @action(detail=True, methods=['post'])
     def add_passenger(self, request, pk=None):
         """Add passenger to trip"""
@@ -329,6 +418,18 @@ class TripViewSet(viewsets.ModelViewSet):
         response_serializer = TripPassengerSerializer(passenger)
         return Response(response_serializer.data)
 
+    @action(detail=True, methods=['post'])
+    def scan(self, request, pk=None):
+        """Record a batch of boarding/alighting scans; safe to replay"""
+        trip = self.get_object()
+        serializer = PassengerScanBatchSerializer(data=request.data)
+
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        result = record_scans(trip.pk, serializer.validated_data['scans'])
+        return Response(result)
+
     @action(detail=False, methods=['post'])
     def bulk_create(self, request):
         """Create multiple trips at once"""
@@ -457,6 +558,15 @@ class TransportSettingsViewSet(viewsets.ModelViewSet):
     ordering = ['school__name']
 
 
+class StopLocationViewSet(viewsets.ModelViewSet):
+    queryset = StopLocation.objects.all()
+    serializer_class = StopLocationSerializer
+    permission_classes = [IsAuthenticated]
+    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    search_fields = ['name', 'address']
+    ordering = ['name']
+
+
 # Custom views for dashboard and analytics
 class TransportDashboardViewSet(viewsets.ViewSet):
     permission_classes = [IsAuthenticated]
@@ -484,10 +594,9 @@ class TransportDashboardViewSet(viewsets.ViewSet):
         ).count()
         
         vehicles_needing_service = Vehicle.objects.filter(
-            is_active=True
-        ).filter(
-            Q(next_service_date__lte=today) |
-            Q(next_service_date__isnull=True)
+            is_active=True,
+            maintenance_due__kind='service',
+            maintenance_due__due_date__lte=today
         ).count()
         
         drivers_with_expired_license = Driver.objects.filter(
@@ -1,6 +1,7 @@
 import os
 import django
 from django.core.asgi import get_asgi_application
+from django.urls import re_path
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
 
@@ -8,11 +9,24 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
 
 django.setup()
 
+django_application = get_asgi_application()
+
 from apps.accounts import routing as accounts_routing  # noqa: E402
+from apps.transport import routing as transport_routing  # noqa: E402
 
 application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
+    # Server-Sent Events fallback for clients that cannot hold a WebSocket;
+    # everything else goes to Django.
+    "http": URLRouter([
+        re_path(r"^sse/", AuthMiddlewareStack(
+            URLRouter(accounts_routing.sse_urlpatterns)
+        )),
+        re_path(r"", django_application),
+    ]),
     "websocket": AuthMiddlewareStack(
-        URLRouter(accounts_routing.websocket_urlpatterns)
+        URLRouter(
+            accounts_routing.websocket_urlpatterns
+            + transport_routing.websocket_urlpatterns
+        )
     ),
 })
@@ -31,12 +31,82 @@ app.conf.beat_schedule = {
         'task': 'apps.analytics.tasks.generate_daily_reports',
         'schedule': 86400.0,  # Daily
     },
+    'detect-attendance-anomalies-nightly': {
+        'task': 'apps.analytics.tasks.detect_attendance_anomalies_nightly',
+        'schedule': 86400.0,  # Daily
+    },
+    'detect-attendance-anomalies-today': {
+        'task': 'apps.analytics.tasks.detect_attendance_anomalies_today',
+        'schedule': 900.0,  # Every 15 minutes
+    },
+    'expire-library-reservation-holds': {
+        'task': 'apps.library.tasks.expire_reservation_holds',
+        'schedule': 3600.0,  # Every hour
+    },
+    'process-library-overdues': {
+        'task': 'apps.library.tasks.process_library_overdues',
+        'schedule': 86400.0,  # Daily
+    },
+    'reconcile-library-inventory': {
+        'task': 'apps.library.tasks.reconcile_book_inventory',
+        'schedule': 86400.0,  # Daily
+    },
+    'rebuild-catalogue-search-index': {
+        'task': 'apps.library.tasks.rebuild_catalogue_search_index',
+        'schedule': 86400.0,  # Daily
+    },
+    'snapshot-stock-balances': {
+        'task': 'apps.inventory.tasks.snapshot_stock_balances',
+        'schedule': 86400.0,  # Daily
+    },
+    'run-maintenance-sweep': {
+        'task': 'apps.inventory.tasks.run_maintenance_sweep',
+        'schedule': 86400.0,  # Daily
+    },
+    'generate-recurring-fee-invoices': {
+        'task': 'apps.billing.tasks.generate_recurring_fee_invoices',
+        'schedule': 86400.0,  # Daily
+    },
+    'reconcile-revenue-facts': {
+        'task': 'apps.billing.tasks.reconcile_revenue_facts',
+        'schedule': 86400.0,  # Daily
+    },
+    'run-billing-ageing-sweep': {
+        'task': 'apps.billing.tasks.run_ageing_sweep',
+        'schedule': 86400.0,  # Daily
+    },
+    'refresh-notice-audiences': {
+        'task': 'apps.notices.tasks.refresh_notice_audiences',
+        'schedule': 3600.0,  # Every hour
+    },
+    'flush-notice-views': {
+        'task': 'apps.notices.tasks.flush_notice_views',
+        'schedule': 60.0,  # Every minute
+    },
+    'send-notification-digests': {
+        'task': 'apps.accounts.tasks.send_notification_digests',
+        'schedule': 86400.0,  # Daily
+    },
     'backup-database': {
         'task': 'apps.tenants.tasks.backup_database',
         'schedule': 604800.0,  # Weekly
     },
 }
 
+# Notification channels run on their own queues so a slow channel
+# (SMTP, SMS gateway) cannot delay the others.
+app.conf.task_routes = {
+    'apps.accounts.tasks.deliver_email_notifications': {
+        'queue': 'notifications.email'
+    },
+    'apps.accounts.tasks.deliver_push_notifications': {
+        'queue': 'notifications.push'
+    },
+    'apps.accounts.tasks.deliver_sms_notifications': {
+        'queue': 'notifications.sms'
+    },
+}
+
 
 @app.task(bind=True)
 def debug_task(self):
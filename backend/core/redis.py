@@ -0,0 +1,48 @@
+"""
+Shared Redis clients for real-time state.
+
+Features that keep hot state in Redis (ring buffers, presence, counters)
+get their clients here. When ``settings.REDIS_URL`` is not configured
+both helpers return ``None`` and callers fall back to in-process
+storage, which is enough for a single development server.
+"""
+import asyncio
+import logging
+import weakref
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_sync_client = None
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_redis():
+    """Return a process-wide synchronous Redis client, or ``None``."""
+    global _sync_client
+    url = getattr(settings, 'REDIS_URL', None)
+    if not url:
+        return None
+    if _sync_client is None:
+        import redis
+        _sync_client = redis.Redis.from_url(url, decode_responses=True)
+    return _sync_client
+
+
+def get_async_redis():
+    """
+    Return an asyncio Redis client bound to the running event loop, or
+    ``None``. Connection pools cannot be shared across loops, so one
+    client is kept per loop.
+    """
+    url = getattr(settings, 'REDIS_URL', None)
+    if not url:
+        return None
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        from redis import asyncio as aioredis
+        client = aioredis.Redis.from_url(url, decode_responses=True)
+        _async_clients[loop] = client
+    return client
@@ -456,6 +456,18 @@ AUTH_PASSWORD_VALIDATORS = [
 
 # Channels
 USE_REDIS = os.environ.get("USE_REDIS", "False").lower() == "true"
+
+# Redis for real-time state (tracking buffers, presence, counters).
+# Left unset when Redis is disabled; core.redis then falls back to
+# in-process storage.
+REDIS_URL = os.environ.get(
+    "REDIS_URL",
+    "redis://{}:{}/0".format(
+        os.environ.get("REDIS_HOST", "redis"),
+        os.environ.get("REDIS_PORT", "6379"),
+    ) if USE_REDIS else None
+)
+
 if USE_REDIS:
     CHANNEL_LAYERS = {
         "default": {
@@ -481,6 +493,13 @@ EMAIL_BACKEND = os.environ.get(
     'django.core.mail.backends.console.EmailBackend'
 )
 
+# Dotted path to the SMS backend used by the notification dispatcher;
+# any class with a send(phone_number, text) method.
+SMS_BACKEND = os.environ.get(
+    'SMS_BACKEND',
+    'apps.accounts.notifications.LoggingSMSBackend'
+)
+
 # Basic Cache Configuration (can be overridden in dev/prod)
 CACHES = {
     'default': {
@@ -491,3 +510,13 @@ CACHES = {
 
 # Basic Session Configuration (can be overridden in dev/prod)
 SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+
+# Preventive maintenance scheduling (apps.inventory.maintenance)
+MAINTENANCE_ASSET_INTERVAL_DAYS = int(os.environ.get('MAINTENANCE_ASSET_INTERVAL_DAYS', '180'))
+MAINTENANCE_VEHICLE_INTERVAL_DAYS = int(os.environ.get('MAINTENANCE_VEHICLE_INTERVAL_DAYS', '90'))
+MAINTENANCE_VEHICLE_INTERVAL_KM = int(os.environ.get('MAINTENANCE_VEHICLE_INTERVAL_KM', '10000'))
+MAINTENANCE_LEAD_DAYS = int(os.environ.get('MAINTENANCE_LEAD_DAYS', '7'))
+MAINTENANCE_NOTIFICATION_EMAILS = [
+    email for email in os.environ.get('MAINTENANCE_NOTIFICATION_EMAILS', '').split(',')
+    if email
+]